@@ -0,0 +1,251 @@
+"""Offline ELBv2 stand-in for benchmarks, with injected latency and throttling.
+
+``ELBv2Standin`` keeps one listener and its rules in memory and answers
+the ELBv2 calls the tool makes (DescribeRules, CreateRule, DeleteRule,
+ModifyRule, SetRulePriorities) at the HTTP layer of a real botocore
+client: requests are serialized, and responses rendered as XML and parsed,
+retried and raised exactly as they would be with AWS. Before answering,
+every HTTP attempt waits a configurable latency and is refused with a
+``Throttling`` error at a configurable rate.
+
+moto is not used because its response rendering costs more per call than
+the tool itself, and creating thousands of rules in it takes minutes.
+"""
+
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+from botocore.awsrequest import AWSResponse
+
+REGION = "us-east-1"
+ACCOUNT = "123456789012"
+XMLNS = "http://elasticloadbalancing.amazonaws.com/doc/2015-12-01/"
+
+# Default page size of DescribeRules, as documented by AWS
+DEFAULT_PAGE_SIZE = 400
+
+class _RawBody:
+    """Raw HTTP body as botocore reads it from urllib3."""
+
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def stream(self, **kwargs: Any) -> Any:
+        yield self._data
+
+class StandinError(Exception):
+    """ELBv2 error answered by the stand-in."""
+
+    def __init__(self, code: str, message: str, status: int = 400):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+def _render(shape: Any, value: Any) -> str:
+    """Render a value as query-protocol XML following its botocore shape."""
+    if shape.type_name == "structure":
+        parts = []
+        for name, member in shape.members.items():
+            if name in value and value[name] is not None:
+                tag = member.serialization.get("name", name)
+                parts.append(f"<{tag}>{_render(member, value[name])}</{tag}>")
+        return "".join(parts)
+    if shape.type_name == "list":
+        return "".join(f"<member>{_render(shape.member, item)}</member>" for item in value)
+    if shape.type_name == "boolean":
+        return "true" if value else "false"
+    return escape(str(value))
+
+class ELBv2Standin:
+    """In-memory listener answering the ELBv2 calls of botocore clients.
+
+    Logical API calls are counted once whatever the number of retries, in
+    ``calls`` per operation; ``attempts`` and ``throttled`` count HTTP
+    attempts. The latency of every call, retries included, is recorded in
+    ``latencies``.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 throttle_rate: float = 0.0, seed: int = 0, rule_limit: int = 10000):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.rule_limit = rule_limit
+        self.load_balancer_arn = (f"arn:aws:elasticloadbalancing:{REGION}:{ACCOUNT}:"
+                                  f"loadbalancer/app/bench/50dc6c495c0c9188")
+        self.listener_arn = self.load_balancer_arn.replace(":loadbalancer/", ":listener/") + "/f2f7dc8efc522ab2"
+        self.rules: Dict[str, Dict[str, Any]] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._add_rule("default", [], [], is_default=True)
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear the recorded calls."""
+        with self._lock:
+            self.calls: Dict[str, int] = {}
+            self.attempts = 0
+            self.throttled = 0
+            self.latencies: List[float] = []
+
+    @property
+    def call_count(self) -> int:
+        """Number of logical API calls recorded."""
+        return sum(self.calls.values())
+
+    def attach(self, client: Any) -> Any:
+        """Answer the calls of an ELBv2 client and return the client."""
+        events = client.meta.events
+        service = client.meta.service_model.service_id.hyphenize()
+        events.register(f"before-parameter-build.{service}", self._before_parameter_build)
+        events.register(f"before-call.{service}", self._before_call)
+        events.register(f"after-call.{service}", self._after_call)
+        events.register(f"after-call-error.{service}", self._after_call)
+        events.register_first(f"before-send.{service}", self._before_send)
+        return client
+
+    # Rule storage
+
+    def _add_rule(self, priority: str, conditions: List[Dict[str, Any]],
+                  actions: List[Dict[str, Any]], is_default: bool = False) -> Dict[str, Any]:
+        rule_arn = (self.listener_arn.replace(":listener/", ":listener-rule/")
+                    + f"/{uuid.UUID(int=self._rng.getrandbits(128)).hex[:16]}")
+        rule = {
+            "RuleArn": rule_arn,
+            "Priority": priority,
+            "Conditions": conditions,
+            "Actions": actions,
+            "IsDefault": is_default,
+        }
+        self.rules[rule_arn] = rule
+        return rule
+
+    def load_rules(self, rules: List[Dict[str, Any]]) -> None:
+        """Put rules on the listener directly, without any API call."""
+        with self._lock:
+            for rule in rules:
+                self._add_rule(str(rule["Priority"]), rule["Conditions"], rule["Actions"])
+
+    def _sorted_rules(self) -> List[Dict[str, Any]]:
+        return sorted(self.rules.values(),
+                      key=lambda rule: (rule["IsDefault"], int(rule["Priority"]) if not rule["IsDefault"] else 0))
+
+    def _rule(self, rule_arn: str) -> Dict[str, Any]:
+        rule = self.rules.get(rule_arn)
+        if rule is None:
+            raise StandinError("RuleNotFound", f"One or more rules not found: {rule_arn}")
+        return rule
+
+    def _check_priority(self, priority: int, ignored: Optional[set] = None) -> None:
+        if not 1 <= priority <= 50000:
+            raise StandinError("ValidationError", f"Priority {priority} is out of range")
+        for rule in self.rules.values():
+            if rule["Priority"] == str(priority) and rule["RuleArn"] not in (ignored or set()):
+                raise StandinError("PriorityInUse", f"Priority '{priority}' is currently in use")
+
+    # Operations
+
+    def describe_rules(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        if "RuleArns" in params:
+            return {"Rules": [self._rule(arn) for arn in params["RuleArns"]]}
+        if params.get("ListenerArn") != self.listener_arn:
+            raise StandinError("ListenerNotFound", "One or more listeners not found")
+        rules = self._sorted_rules()
+        start = int(params.get("Marker") or 0)
+        page_size = params.get("PageSize", DEFAULT_PAGE_SIZE)
+        response: Dict[str, Any] = {"Rules": rules[start:start + page_size]}
+        if start + page_size < len(rules):
+            response["NextMarker"] = str(start + page_size)
+        return response
+
+    def create_rule(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        if params["ListenerArn"] != self.listener_arn:
+            raise StandinError("ListenerNotFound", "One or more listeners not found")
+        if len(self.rules) > self.rule_limit:
+            raise StandinError("TooManyRules", "You've reached the limit on the number of rules per listener")
+        self._check_priority(params["Priority"])
+        rule = self._add_rule(str(params["Priority"]), params["Conditions"], params["Actions"])
+        return {"Rules": [rule]}
+
+    def delete_rule(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        rule = self._rule(params["RuleArn"])
+        if rule["IsDefault"]:
+            raise StandinError("OperationNotPermitted", "The default rule cannot be deleted")
+        del self.rules[rule["RuleArn"]]
+        return {}
+
+    def modify_rule(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        rule = self._rule(params["RuleArn"])
+        for key in ("Conditions", "Actions"):
+            if key in params:
+                rule[key] = params[key]
+        return {"Rules": [rule]}
+
+    def set_rule_priorities(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        moved = {item["RuleArn"]: item["Priority"] for item in params["RulePriorities"]}
+        for rule_arn, priority in moved.items():
+            self._rule(rule_arn)
+            self._check_priority(priority, ignored=set(moved))
+        if len(set(moved.values())) != len(moved):
+            raise StandinError("PriorityInUse", "Duplicate priorities in request")
+        for rule_arn, priority in moved.items():
+            self.rules[rule_arn]["Priority"] = str(priority)
+        return {"Rules": [self.rules[rule_arn] for rule_arn in moved]}
+
+    # botocore hooks
+
+    def _before_parameter_build(self, params: Dict[str, Any], model: Any,
+                                context: Dict[str, Any], **kwargs: Any) -> None:
+        context["standin_call"] = (model, dict(params))
+
+    def _before_call(self, context: Dict[str, Any], **kwargs: Any) -> None:
+        context["standin_started"] = time.perf_counter()
+
+    def _after_call(self, model: Any, context: Dict[str, Any], **kwargs: Any) -> None:
+        started = context.get("standin_started")
+        if started is None:
+            return
+        with self._lock:
+            self.calls[model.name] = self.calls.get(model.name, 0) + 1
+            self.latencies.append(time.perf_counter() - started)
+
+    def _before_send(self, request: Any, **kwargs: Any) -> AWSResponse:
+        model, params = request.context["standin_call"]
+        with self._lock:
+            self.attempts += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            throttled = self._rng.random() < self.throttle_rate
+            if throttled:
+                self.throttled += 1
+        if delay:
+            time.sleep(delay)
+
+        request_id = str(uuid.uuid4())
+        try:
+            if throttled:
+                raise StandinError("Throttling", "Rate exceeded")
+            handler = getattr(self, _snake_case(model.name), None)
+            if handler is None:
+                raise StandinError("InvalidAction", f"{model.name} is not supported by the stand-in")
+            with self._lock:
+                result = handler(params)
+            body = (f'<{model.name}Response xmlns="{XMLNS}"><{model.name}Result>'
+                    f'{_render(model.output_shape, result) if model.output_shape else ""}'
+                    f'</{model.name}Result><ResponseMetadata><RequestId>{request_id}</RequestId>'
+                    f'</ResponseMetadata></{model.name}Response>')
+            status = 200
+        except StandinError as e:
+            body = (f'<ErrorResponse xmlns="{XMLNS}"><Error><Type>Sender</Type>'
+                    f'<Code>{e.code}</Code><Message>{escape(str(e))}</Message></Error>'
+                    f'<RequestId>{request_id}</RequestId></ErrorResponse>')
+            status = e.status
+        return AWSResponse(request.url, status, {"Content-Type": "text/xml", "x-amzn-RequestId": request_id},
+                           _RawBody(body.encode("utf-8")))
+
+def _snake_case(name: str) -> str:
+    """Turn an operation name such as 'DescribeRules' into 'describe_rules'."""
+    return "".join(f"_{char.lower()}" if char.isupper() else char for char in name).lstrip("_")
@@ -0,0 +1,208 @@
+"""Benchmark backup, compare and restore against an offline AWS stand-in.
+
+Usage:
+    python benchmarks/bench_backup_restore.py [--sizes 10 100 1000 10000] [--repeat 3]
+        [--latency 0.005] [--jitter 0.005] [--throttle-rate 0.01]
+        [--check | --save-baseline] [--baseline benchmarks/baseline.json]
+
+For every listener size an in-memory listener is filled with synthetic
+rules (see ``synthetic.py``). API calls made by the tool are answered by
+``ELBv2Standin``, which adds per-call latency and ``Throttling`` errors
+(see ``aws_standin.py``). Nothing reaches AWS. Each
+phase reports API calls per run, throttled attempts over all runs, wall
+time (p50/p99 over the repeats), per-call latency (p50/p99) and peak
+Python memory:
+
+- backup: ``backup_alb_rules`` to a local JSON file
+- compare: ``compare_rules`` between the live rules and the backup
+- restore: ``restore_alb_rules`` in incremental mode after deleting and
+  changing 10% of the rules each
+
+``--check`` exits with status 1 when a phase makes more calls than the
+baseline, or its wall time or peak memory grew beyond ``--tolerance``.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from alb_rules_tool.backup import backup_alb_rules, describe_alb_rules
+from alb_rules_tool.clients import get_client, reset_clients
+from alb_rules_tool.restore import compare_rules, load_backup_file, restore_alb_rules
+
+from aws_standin import REGION, ELBv2Standin
+from synthetic import synthetic_rules
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Settings that must match for results to be comparable with a baseline
+SETTINGS = ("latency", "jitter", "throttle_rate", "seed")
+
+# Absolute growth always tolerated, so that phases too short to measure
+# reliably do not fail the check on noise
+WALL_SLACK = 0.05
+MEMORY_SLACK = 1.0
+
+# Share of rules deleted, and changed, before each restore
+CHURN = 10
+
+def percentile(values: List[float], percent: float) -> float:
+    """Return the nearest-rank percentile of values, 0 when there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+def _churn(standin: ELBv2Standin) -> None:
+    """Delete and change some rules, so that a restore has work to do."""
+    for rule in list(standin.rules.values()):
+        if rule["IsDefault"]:
+            continue
+        priority = int(rule["Priority"])
+        if priority % CHURN == 0:
+            del standin.rules[rule["RuleArn"]]
+        elif priority % CHURN == CHURN // 2:
+            rule["Actions"] = [{
+                "Type": "fixed-response",
+                "FixedResponseConfig": {"StatusCode": "404", "ContentType": "text/plain"},
+            }]
+
+def _measure(standin: ELBv2Standin, repeat: int, run: Callable[[], Any],
+             prepare: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Time repeat runs of a phase, then measure its peak memory in one more run."""
+    walls: List[float] = []
+    latencies: List[float] = []
+    calls = attempts = throttled = 0
+    for _ in range(repeat):
+        if prepare:
+            prepare()
+        standin.reset()
+        start = time.perf_counter()
+        run()
+        walls.append(time.perf_counter() - start)
+        latencies.extend(standin.latencies)
+        # Call counts are the same on every run; throttling is random
+        calls, attempts = standin.call_count, standin.attempts
+        throttled += standin.throttled
+
+    # tracemalloc slows everything down, so memory gets a run of its own
+    if prepare:
+        prepare()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "calls": calls,
+        "attempts": attempts,
+        "throttled": throttled,
+        "wall_p50": percentile(walls, 50),
+        "wall_p99": percentile(walls, 99),
+        "call_p50": percentile(latencies, 50),
+        "call_p99": percentile(latencies, 99),
+        "peak_mib": peak / (1024 * 1024),
+    }
+
+def bench_size(size: int, args: argparse.Namespace, workdir: str) -> Dict[str, Dict[str, Any]]:
+    """Run every phase on a listener with size rules."""
+    standin = ELBv2Standin(args.latency, args.jitter, args.throttle_rate, args.seed)
+    standin.load_rules(synthetic_rules(size, seed=args.seed))
+    listener_arn = standin.listener_arn
+    backup_path = os.path.join(workdir, f"backup-{size}.json")
+
+    reset_clients()
+    standin.attach(get_client("elbv2", REGION))
+    try:
+        results = {
+            "backup": _measure(standin, args.repeat, lambda: backup_alb_rules(
+                listener_arn, output_path=backup_path)),
+        }
+        existing = describe_alb_rules(listener_arn)
+        backup = load_backup_file(backup_path)
+        results["compare"] = _measure(standin, args.repeat, lambda: compare_rules(existing, backup))
+        results["restore"] = _measure(standin, args.repeat, lambda: restore_alb_rules(
+            listener_arn, backup_path, "incremental"), prepare=lambda: _churn(standin))
+    finally:
+        reset_clients()
+    return {f"{phase}/{size}": result for phase, result in results.items()}
+
+def check_regressions(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any],
+                      tolerance: float) -> List[str]:
+    """Compare results with a baseline and describe every regression."""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline["results"].get(name)
+        if expected is None:
+            continue
+        if result["calls"] > expected["calls"]:
+            regressions.append(f"{name}: {result['calls']} API calls, baseline {expected['calls']}")
+        for metric, unit, slack in (("wall_p50", "s", WALL_SLACK), ("peak_mib", " MiB", MEMORY_SLACK)):
+            if result[metric] > expected[metric] * (1 + tolerance) + slack:
+                regressions.append(f"{name}: {metric} {result[metric]:.3f}{unit}, "
+                                   f"baseline {expected[metric]:.3f}{unit}")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds added to every API call")
+    parser.add_argument("--jitter", type=float, default=0.005, help="Random extra latency, in seconds")
+    parser.add_argument("--throttle-rate", type=float, default=0.01,
+                        help="Share of API calls answered with a Throttling error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="Allowed relative growth of wall time and peak memory")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--check", action="store_true", help="Fail on regressions against the baseline")
+    mode.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline")
+    args = parser.parse_args()
+    # botocore draws its retry backoff from the global generator
+    random.seed(args.seed)
+    # Requests are signed before the stand-in sees them
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        os.environ.setdefault(name, "testing")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    print(f"{'phase':<18}{'calls':>7}{'thr':>5}{'wall p50':>10}{'wall p99':>10}"
+          f"{'call p50':>10}{'call p99':>10}{'peak MiB':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            for name, row in bench_size(size, args, workdir).items():
+                results[name] = row
+                print(f"{name:<18}{row['calls']:>7}{row['throttled']:>5}"
+                      f"{row['wall_p50'] * 1000:>8.0f}ms{row['wall_p99'] * 1000:>8.0f}ms"
+                      f"{row['call_p50'] * 1000:>8.1f}ms{row['call_p99'] * 1000:>8.1f}ms"
+                      f"{row['peak_mib']:>10.1f}")
+
+    settings = {name: getattr(args, name) for name in SETTINGS}
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+    elif args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["settings"] != settings:
+            sys.exit(f"Baseline {args.baseline} was recorded with {baseline['settings']}, not {settings}")
+        regressions = check_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
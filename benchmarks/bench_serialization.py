@@ -0,0 +1,90 @@
+"""Benchmark backup serialization: JSON, pure-Python YAML and libyaml.
+
+Usage:
+    python benchmarks/bench_serialization.py [--sizes 100 1000 10000] [--repeat 3]
+
+For every listener size, rules are generated once, then written and read
+back with each serializer. The best of ``--repeat`` runs is reported.
+"""
+
+import io
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import yaml
+
+from alb_rules_tool.serialization import (
+    LIBYAML_AVAILABLE,
+    _write_yaml_rules,
+    write_rules
+)
+
+from synthetic import synthetic_rules
+
+def _serializers() -> List[Tuple[str, Callable[..., None], Callable[[str], Any]]]:
+    """Return (name, writer, reader) for every serializer to compare."""
+    serializers = [
+        ("json", lambda rules, f: write_rules(rules, f, "json"), json.loads),
+        ("yaml-python",
+         lambda rules, f: _write_yaml_rules(rules, f, dumper=yaml.SafeDumper),
+         lambda text: yaml.load(text, Loader=yaml.SafeLoader)),
+    ]
+    if LIBYAML_AVAILABLE:
+        serializers.append((
+            "yaml-libyaml",
+            lambda rules, f: _write_yaml_rules(rules, f, dumper=yaml.CSafeDumper),
+            lambda text: yaml.load(text, Loader=yaml.CSafeLoader),
+        ))
+    return serializers
+
+def _best_of(repeat: int, func: Callable[[], Any]) -> Tuple[float, Any]:
+    """Run func repeat times and return the fastest duration and its result."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def run(sizes: List[int], repeat: int) -> List[Dict[str, Any]]:
+    """Benchmark every serializer on every listener size."""
+    results = []
+    for size in sizes:
+        rules = synthetic_rules(size)
+        for name, writer, reader in _serializers():
+            def write() -> str:
+                buffer = io.StringIO()
+                writer(rules, buffer)
+                return buffer.getvalue()
+
+            write_seconds, text = _best_of(repeat, write)
+            read_seconds, loaded = _best_of(repeat, lambda: reader(text))
+            assert loaded == rules, f"{name} did not round-trip {size} rules"
+            results.append({
+                "serializer": name,
+                "rules": size,
+                "write_seconds": write_seconds,
+                "read_seconds": read_seconds,
+                "bytes": len(text.encode("utf-8")),
+            })
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not LIBYAML_AVAILABLE:
+        print("PyYAML was built without libyaml; skipping yaml-libyaml")
+
+    print(f"{'serializer':<14}{'rules':>8}{'write ms':>12}{'read ms':>12}{'size KiB':>12}")
+    for row in run(args.sizes, args.repeat):
+        print(f"{row['serializer']:<14}{row['rules']:>8}"
+              f"{row['write_seconds'] * 1000:>12.1f}{row['read_seconds'] * 1000:>12.1f}"
+              f"{row['bytes'] / 1024:>12.1f}")
+
+if __name__ == "__main__":
+    main()
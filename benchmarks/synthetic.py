@@ -0,0 +1,86 @@
+"""Synthetic listener rules for benchmarks.
+
+Rules are shaped like describe_rules output and mix the condition and
+action types found on real listeners: host and path routing, header,
+query string, method and source IP matches, weighted forwards, redirects
+and fixed responses. Generation is deterministic for a given seed.
+"""
+
+import random
+from typing import Any, Dict, List, Optional
+
+TARGET_GROUP_ARN = "arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/bench-{index}/{index:016x}"
+RULE_ARN = "arn:aws:elasticloadbalancing:us-east-1:123456789012:listener-rule/app/bench/1234567890/abcdef/{priority:016x}"
+
+# Rules per listener accepted by ALB once its quota is raised
+MAX_RULES = 10000
+
+def _conditions(priority: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Build one to three conditions, host or path routing first."""
+    service = f"svc{priority % 97}"
+    host = {"Field": "host-header", "HostHeaderConfig": {"Values": [f"{service}.example.com"]}}
+    path = {"Field": "path-pattern",
+            "PathPatternConfig": {"Values": [f"/api/v{priority % 3}/r{priority}/*"]}}
+    extras = [
+        {"Field": "http-header",
+         "HttpHeaderConfig": {"HttpHeaderName": "X-Tenant", "Values": [f"tenant-{priority % 13}"]}},
+        {"Field": "query-string",
+         "QueryStringConfig": {"Values": [{"Key": "version", "Value": str(priority % 5)}]}},
+        {"Field": "http-request-method", "HttpRequestMethodConfig": {"Values": ["GET", "HEAD"]}},
+        {"Field": "source-ip", "SourceIpConfig": {"Values": [f"10.{priority % 250}.0.0/16"]}},
+    ]
+    conditions = [host, path] if rng.random() < 0.6 else [rng.choice([host, path])]
+    if rng.random() < 0.3:
+        conditions.append(rng.choice(extras))
+    return conditions
+
+def _actions(priority: int, rng: random.Random, target_group_arns: List[str]) -> List[Dict[str, Any]]:
+    """Build the action of a rule, mostly forwards."""
+    roll = rng.random()
+    if roll < 0.05:
+        return [{"Type": "redirect", "Order": 1, "RedirectConfig": {
+            "Protocol": "HTTPS", "Port": "443", "Host": "#{host}",
+            "Path": "/#{path}", "Query": "#{query}", "StatusCode": "HTTP_301"}}]
+    if roll < 0.08:
+        return [{"Type": "fixed-response", "Order": 1, "FixedResponseConfig": {
+            "StatusCode": "503", "ContentType": "text/plain", "MessageBody": "maintenance"}}]
+
+    if roll < 0.2 and len(target_group_arns) > 1:
+        # Canary: two target groups with uneven weights
+        first, second = rng.sample(target_group_arns, 2)
+        target_groups = [{"TargetGroupArn": first, "Weight": 90},
+                         {"TargetGroupArn": second, "Weight": 10}]
+        return [{"Type": "forward", "Order": 1, "ForwardConfig": {
+            "TargetGroups": target_groups,
+            "TargetGroupStickinessConfig": {"Enabled": False}}}]
+
+    target_group_arn = target_group_arns[priority % len(target_group_arns)]
+    return [{"Type": "forward", "Order": 1, "TargetGroupArn": target_group_arn, "ForwardConfig": {
+        "TargetGroups": [{"TargetGroupArn": target_group_arn, "Weight": 1}],
+        "TargetGroupStickinessConfig": {"Enabled": False}}}]
+
+def synthetic_rules(count: int,
+                    target_group_arns: Optional[List[str]] = None,
+                    seed: int = 0) -> List[Dict[str, Any]]:
+    """Generate the rules of a listener, shaped like describe_rules output.
+
+    Args:
+        count: Number of non-default rules, up to 10,000
+        target_group_arns: Target groups that forward actions use
+            (defaults to 50 made-up ARNs)
+        seed: Seed making the rules reproducible
+
+    Returns:
+        Rules with priorities 1 to count
+    """
+    if not 0 <= count <= MAX_RULES:
+        raise ValueError(f"A listener holds between 0 and {MAX_RULES} rules, not {count}")
+    target_group_arns = target_group_arns or [TARGET_GROUP_ARN.format(index=index) for index in range(50)]
+    rng = random.Random(seed)
+    return [{
+        "RuleArn": RULE_ARN.format(priority=priority),
+        "Priority": str(priority),
+        "Conditions": _conditions(priority, rng),
+        "Actions": _actions(priority, rng, target_group_arns),
+        "IsDefault": False,
+    } for priority in range(1, count + 1)]
@@ -0,0 +1,700 @@
+"""asyncio engine for backing up and restoring ALB rules.
+
+Every AWS request is a coroutine, so thousands of listener operations can
+be in flight on one event loop. The number of concurrent requests is
+bounded by a semaphore shared by all operations using the same
+``AsyncClients``.
+
+Requests go through aiobotocore when it is installed. Otherwise the
+regular boto3 clients are called on a bounded thread pool, which keeps the
+same API at the cost of one thread per concurrent request.
+"""
+
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from botocore.exceptions import ClientError
+
+from alb_rules_tool.backup import DEFAULT_PAGE_SIZE
+from alb_rules_tool.clients import (
+    botocore_retries,
+    build_client_config,
+    caller_retries,
+    get_client,
+    region_from_arn,
+    single_attempt_config
+)
+from alb_rules_tool.executor import (
+    DEFAULT_BURST,
+    DEFAULT_CALLS_PER_SECOND,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MAX_RETRIES,
+    OperationResult,
+    StagedRun,
+    plan_stages,
+    report_failure
+)
+from alb_rules_tool.logger import EventAggregator
+from alb_rules_tool.metrics import propagate
+from alb_rules_tool.planner import STRATEGY_SWAP, count_api_calls, plan_swap_rollback
+from alb_rules_tool.preflight import (
+    cached_limits,
+    cached_target_groups,
+    check_plan_rules,
+    check_rule_count,
+    check_target_groups,
+    found_target_groups,
+    needs_load_balancer,
+    remember_limits,
+    remember_target_groups,
+    report_preflight,
+    target_group_not_found
+)
+from alb_rules_tool.restore import (
+    _cleanup_rule_for_create,
+    _make_restore_plan,
+    check_restore_mode,
+    load_backup_file,
+    operation_calls,
+    record_call,
+    record_created,
+    summarize_restore
+)
+from alb_rules_tool.throttling import TokenBucket, retry_delay
+
+try:
+    from aiobotocore.session import get_session as _get_aio_session
+except ImportError:
+    _get_aio_session = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Rule changes are logged one by one at DEBUG and counted at INFO
+rule_events = EventAggregator(logger)
+
+AIOBOTOCORE_AVAILABLE = _get_aio_session is not None
+
+# Requests in flight at once across every operation sharing the clients
+DEFAULT_MAX_IN_FLIGHT = 64
+
+class AsyncClients:
+    """Async AWS clients bound to one event loop.
+
+    Use as an async context manager; clients are created on first use and
+    closed on exit::
+
+        async with AsyncClients(max_in_flight=256) as clients:
+            rules = await describe_alb_rules_async(listener_arn, clients=clients)
+    """
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 use_aiobotocore: Optional[bool] = None):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        if use_aiobotocore and not AIOBOTOCORE_AVAILABLE:
+            raise ImportError("aiobotocore is not installed")
+        self.max_in_flight = max_in_flight
+        self.use_aiobotocore = AIOBOTOCORE_AVAILABLE if use_aiobotocore is None else use_aiobotocore
+        self._clients: Dict[Tuple[str, Optional[str], bool], Any] = {}
+        self._stack: Optional[AsyncExitStack] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self) -> 'AsyncClients':
+        # Created here so they belong to the running loop
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._lock = asyncio.Lock()
+        self._stack = AsyncExitStack()
+        if not self.use_aiobotocore:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._stack is not None:
+            await self._stack.aclose()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._clients.clear()
+
+    async def _client(self, service_name: str, region_name: Optional[str]) -> Any:
+        """Return the client for a service and region, creating it once."""
+        retries = botocore_retries()
+        key = (service_name, region_name, retries)
+        if key in self._clients:
+            return self._clients[key]
+        assert self._lock is not None and self._stack is not None, \
+            "use AsyncClients with 'async with'"
+        async with self._lock:
+            if key not in self._clients:
+                if self.use_aiobotocore:
+                    session = _get_aio_session()
+                    config = build_client_config(max_pool_connections=self.max_in_flight)
+                    self._clients[key] = await self._stack.enter_async_context(
+                        session.create_client(
+                            service_name,
+                            region_name=region_name,
+                            config=config if retries else single_attempt_config(config)
+                        )
+                    )
+                else:
+                    self._clients[key] = get_client(service_name, region_name)
+        return self._clients[key]
+
+    async def call(self, service_name: str, region_name: Optional[str], method: str,
+                   **kwargs: Any) -> Dict[str, Any]:
+        """Make one AWS request, waiting for a free slot first.
+
+        Args:
+            service_name: AWS service name, e.g. 'elbv2'
+            region_name: AWS region, or None for the default region
+            method: Client method name, e.g. 'describe_rules'
+            **kwargs: Request parameters
+
+        Returns:
+            Response from AWS API
+        """
+        assert self._semaphore is not None, "use AsyncClients with 'async with'"
+        client = await self._client(service_name, region_name)
+        async with self._semaphore:
+            if self.use_aiobotocore:
+                response: Dict[str, Any] = await getattr(client, method)(**kwargs)
+                return response
+            loop = asyncio.get_running_loop()
+            call = propagate(partial(getattr(client, method), **kwargs))
+            return await loop.run_in_executor(self._executor, call)
+
+@asynccontextmanager
+async def _borrow(clients: Optional[AsyncClients]) -> AsyncIterator[AsyncClients]:
+    """Use the given clients, or open short-lived ones."""
+    if clients is not None:
+        yield clients
+    else:
+        async with AsyncClients() as owned:
+            yield owned
+
+async def call_with_backoff_async(func: Callable[[], Awaitable[T]],
+                                  max_retries: int,
+                                  description: str = "AWS call") -> T:
+    """Await a coroutine function, retrying throttling and transient errors with backoff.
+
+    Args:
+        func: Coroutine function to call
+        max_retries: Maximum number of retries after the first attempt
+        description: What is being called, for log messages
+
+    Returns:
+        Result of func
+
+    Raises:
+        Exception: Whatever func raised once retries are exhausted, or any
+            error that is neither a throttling nor a transient error
+    """
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except Exception as e:
+            delay = retry_delay(e, attempt, max_retries, description)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+async def _read(clients: AsyncClients, bucket: Optional[TokenBucket],
+                region_name: Optional[str], method: str, **params: Any) -> Dict[str, Any]:
+    """Make one elbv2 read request, taking its token from the bucket first."""
+    if bucket is not None:
+        await asyncio.sleep(bucket.reserve())
+    return await clients.call('elbv2', region_name, method, **params)
+
+async def _read_all(clients: AsyncClients, bucket: Optional[TokenBucket],
+                    region_name: Optional[str], method: str, key: str,
+                    **params: Any) -> List[Dict[str, Any]]:
+    """Make a paginated elbv2 read request, returning the items of every page."""
+    items: List[Dict[str, Any]] = []
+    while True:
+        page = await _read(clients, bucket, region_name, method, **params)
+        items.extend(page[key])
+        if not page.get('NextMarker'):
+            return items
+        params['Marker'] = page['NextMarker']
+
+async def describe_alb_rules_async(listener_arn: str,
+                                   page_size: int = DEFAULT_PAGE_SIZE,
+                                   clients: Optional[AsyncClients] = None,
+                                   bucket: Optional[TokenBucket] = None) -> List[Dict[str, Any]]:
+    """Get all rules associated with an ALB listener.
+
+    Args:
+        listener_arn: ARN of the ALB listener
+        page_size: Number of rules requested per DescribeRules call
+        clients: Shared async clients (optional)
+        bucket: Token bucket shared with other requests (optional)
+
+    Returns:
+        List of rules associated with the listener
+
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    async with _borrow(clients) as active:
+        rules = await _read_all(active, bucket, region_from_arn(listener_arn), 'describe_rules',
+                                'Rules', ListenerArn=listener_arn, PageSize=page_size)
+    logger.debug("Found %s rules for listener %s", len(rules), listener_arn)
+    return rules
+
+async def create_rule_async(listener_arn: str, rule: Dict[str, Any],
+                            clients: Optional[AsyncClients] = None) -> Dict[str, Any]:
+    """Create a new rule in the ALB listener.
+
+    Args:
+        listener_arn: ARN of the ALB listener
+        rule: Rule data to create
+        clients: Shared async clients (optional)
+
+    Returns:
+        Response from AWS API
+
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    async with _borrow(clients) as active:
+        response = await active.call(
+            'elbv2', region_from_arn(listener_arn), 'create_rule',
+            ListenerArn=listener_arn, **_cleanup_rule_for_create(rule)
+        )
+    rule_events.record('created', "Successfully created rule with priority %s",
+                       rule.get('Priority'))
+    return response
+
+async def delete_rule_async(rule_arn: str,
+                            clients: Optional[AsyncClients] = None) -> Dict[str, Any]:
+    """Delete an ALB rule.
+
+    Args:
+        rule_arn: ARN of the rule to delete
+        clients: Shared async clients (optional)
+
+    Returns:
+        Response from AWS API
+
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    async with _borrow(clients) as active:
+        response = await active.call('elbv2', region_from_arn(rule_arn), 'delete_rule',
+                                     RuleArn=rule_arn)
+    rule_events.record('deleted', "Successfully deleted rule %s", rule_arn)
+    return response
+
+async def apply_operation_async(listener_arn: str, operation: Dict[str, Any],
+                                clients: AsyncClients,
+                                created: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Apply one operation of a restore plan, like ``restore.apply_operation``.
+
+    Raises:
+        ValueError: If the operation type is unknown
+        ClientError: If there is an issue with the AWS API call
+    """
+    rules: Optional[List[Dict[str, Any]]] = None
+    if operation.get('staged'):
+        rules = created
+        if rules is None:
+            rules = await describe_alb_rules_async(listener_arn, clients=clients)
+    region_name = region_from_arn(listener_arn)
+    for method, params in operation_calls(listener_arn, operation, rules):
+        response = await clients.call('elbv2', region_name, method, **params)
+        record_call(rule_events, method, params)
+        record_created(created, method, response)
+
+async def execute_operations_async(operations: List[Dict[str, Any]],
+                                   apply: Callable[[Dict[str, Any]], Awaitable[Any]],
+                                   concurrency: int = DEFAULT_CONCURRENCY,
+                                   calls_per_second: float = DEFAULT_CALLS_PER_SECOND,
+                                   burst: float = DEFAULT_BURST,
+                                   max_retries: int = DEFAULT_MAX_RETRIES,
+                                   bucket: Optional[TokenBucket] = None,
+                                   stages: Optional[List[Tuple[str, ...]]] = None,
+                                   halt_on_error: bool = False) -> List[OperationResult]:
+    """Apply restore operations concurrently under a rate limit, on the event loop.
+
+    Same stages, ordering and error handling as
+    ``executor.execute_operations``. Several restores can share one token
+    bucket so that together they stay under the account's API rate.
+
+    Args:
+        operations: Operations produced by the restore planner
+        apply: Coroutine function applying a single operation
+        concurrency: Maximum number of operations in flight
+        calls_per_second: Sustained API call rate (ignored with a shared bucket)
+        burst: Number of calls allowed in a burst (ignored with a shared bucket)
+        max_retries: Maximum retries of a throttled operation
+        bucket: Token bucket shared with other restores (optional)
+        stages: Stages to apply the operations in, STAGES by default
+        halt_on_error: Skip the remaining operations once one failed
+
+    Returns:
+        List of (operation, error) pairs, where error is None on success
+
+    Raises:
+        ValueError: If concurrency is not positive or an operation type is unknown
+    """
+    staged_run = StagedRun(operations, stages, concurrency, halt_on_error)
+    bucket = bucket or TokenBucket(calls_per_second, burst)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(operation: Dict[str, Any]) -> OperationResult:
+        async def attempt() -> Any:
+            await asyncio.sleep(bucket.reserve(count_api_calls([operation])))
+            return await apply(operation)
+
+        async with semaphore:
+            try:
+                with caller_retries():
+                    await call_with_backoff_async(attempt, max_retries,
+                                                  f"{operation['type']} operation")
+                return operation, None
+            except Exception as e:
+                return report_failure(operation, e)
+
+    for batch in staged_run.batches():
+        staged_run.record(await asyncio.gather(*(run(op) for op in batch)))
+    return staged_run.results
+
+async def _describe_target_groups_async(arns: List[str], region_name: Optional[str],
+                                        clients: AsyncClients, bucket: Optional[TokenBucket]
+                                        ) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Describe target groups, splitting the batch to single out the missing ones."""
+    try:
+        response = await _read(clients, bucket, region_name, 'describe_target_groups',
+                               TargetGroupArns=arns)
+    except ClientError as e:
+        if not target_group_not_found(e):
+            raise
+        if len(arns) == 1:
+            return {arns[0]: None}
+        middle = len(arns) // 2
+        halves = await _describe_target_groups_async(arns[:middle], region_name, clients, bucket)
+        halves.update(await _describe_target_groups_async(arns[middle:], region_name, clients,
+                                                          bucket))
+        return halves
+    return found_target_groups(arns, response)
+
+async def _resolve_target_groups_async(arns: List[str], clients: AsyncClients,
+                                       bucket: Optional[TokenBucket]
+                                       ) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Describe target groups like ``preflight.resolve_target_groups``, batches in parallel."""
+    resolved, batches = cached_target_groups(arns)
+    found_batches = await asyncio.gather(*(
+        _describe_target_groups_async(batch, region_name, clients, bucket)
+        for region_name, region_batches in batches.items()
+        for batch in region_batches
+    ))
+    for found in found_batches:
+        remember_target_groups(found)
+        resolved.update(found)
+    return resolved
+
+async def _account_limits_async(region_name: Optional[str], clients: AsyncClients,
+                                bucket: Optional[TokenBucket]) -> Dict[str, int]:
+    """Return the load balancer quotas of the account, like ``preflight.account_limits``."""
+    limits = cached_limits(region_name)
+    if limits is not None:
+        return limits
+    reported = await _read_all(clients, bucket, region_name, 'describe_account_limits', 'Limits')
+    return remember_limits(region_name, [{'Limits': reported}])
+
+async def _load_balancer_arn_async(listener_arn: str, clients: AsyncClients,
+                                   bucket: Optional[TokenBucket]) -> str:
+    response = await _read(clients, bucket, region_from_arn(listener_arn), 'describe_listeners',
+                           ListenerArns=[listener_arn])
+    return str(response['Listeners'][0]['LoadBalancerArn'])
+
+async def _load_balancer_rule_count_async(load_balancer_arn: str, clients: AsyncClients,
+                                          bucket: Optional[TokenBucket]) -> int:
+    """Count the rules of every listener of a load balancer, default rules excepted."""
+    listeners = await _read_all(clients, bucket, region_from_arn(load_balancer_arn),
+                                'describe_listeners', 'Listeners',
+                                LoadBalancerArn=load_balancer_arn)
+    rules = await asyncio.gather(*(
+        describe_alb_rules_async(listener['ListenerArn'], clients=clients, bucket=bucket)
+        for listener in listeners
+    ))
+    return sum(1 for listener_rules in rules for rule in listener_rules
+               if not rule.get('IsDefault'))
+
+async def rule_headroom_async(listener_arn: str, clients: AsyncClients,
+                              bucket: Optional[TokenBucket] = None) -> int:
+    """Return how many rules can be added before the rule quota, like ``preflight.rule_headroom``.
+
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    limits = await _account_limits_async(region_from_arn(listener_arn), clients, bucket)
+    load_balancer_arn = await _load_balancer_arn_async(listener_arn, clients, bucket)
+    count = await _load_balancer_rule_count_async(load_balancer_arn, clients, bucket)
+    return limits['rules-per-application-load-balancer'] - count
+
+async def preflight_restore_async(plan: Dict[str, Any], clients: AsyncClients,
+                                  bucket: Optional[TokenBucket] = None) -> None:
+    """Check a restore plan can be applied, like ``preflight.preflight_restore``.
+
+    Its describe calls go through the shared clients and token bucket, and
+    share the preflight module's memoized target groups and limits.
+
+    Raises:
+        PreflightError: Listing every problem found
+        ClientError: If there is an issue with the AWS API call
+    """
+    listener_arn = plan['listener_arn']
+    limits = await _account_limits_async(region_from_arn(listener_arn), clients, bucket)
+    problems, referenced, added = check_plan_rules(plan, limits)
+
+    target_groups = await _resolve_target_groups_async(list(referenced), clients, bucket)
+    load_balancer_arn = None
+    if needs_load_balancer(target_groups, added):
+        load_balancer_arn = await _load_balancer_arn_async(listener_arn, clients, bucket)
+    problems.extend(check_target_groups(referenced, target_groups, load_balancer_arn))
+    if added > 0 and load_balancer_arn is not None:
+        count = await _load_balancer_rule_count_async(load_balancer_arn, clients, bucket)
+        problems.extend(check_rule_count(load_balancer_arn, count + added, limits))
+
+    report_preflight(plan, problems, len(referenced))
+
+async def apply_restore_plan_async(plan: Dict[str, Any],
+                                   concurrency: int = DEFAULT_CONCURRENCY,
+                                   clients: Optional[AsyncClients] = None,
+                                   bucket: Optional[TokenBucket] = None,
+                                   preflight: bool = True) -> Dict[str, Any]:
+    """Apply a restore plan on the event loop, like ``restore.apply_restore_plan``.
+
+    Args:
+        plan: Restore plan computed by ``restore.build_restore_plan``
+        concurrency: Maximum number of API operations in flight for this listener
+        clients: Shared async clients (optional)
+        bucket: Token bucket shared with other restores (optional)
+        preflight: Check referenced target groups and quotas before changing anything
+
+    Returns:
+        Summary of restore operation
+
+    Raises:
+        PreflightError: If preflight is True and the plan would fail
+        ClientError: If there is an issue with the AWS API call
+    """
+    listener_arn = plan['listener_arn']
+    async with _borrow(clients) as active:
+        if preflight and plan['operations']:
+            # Target groups and limits are memoized across the listeners restored together
+            await preflight_restore_async(plan, active, bucket)
+
+        timings: List[Tuple[Dict[str, Any], float, float]] = []
+        created: List[Dict[str, Any]] = []
+
+        async def apply(operation: Dict[str, Any]) -> None:
+            start = time.monotonic()
+            try:
+                await apply_operation_async(listener_arn, operation, active, created)
+            finally:
+                timings.append((operation, start, time.monotonic()))
+
+        outcomes = await execute_operations_async(
+            plan['operations'],
+            apply,
+            concurrency=concurrency,
+            bucket=bucket,
+            stages=plan_stages(plan),
+            halt_on_error=plan.get('strategy') == STRATEGY_SWAP
+        )
+        rolled_back = None
+        halted = any(error is not None for _, error in outcomes)
+        if plan.get('strategy') == STRATEGY_SWAP and halted:
+            rolled_back = await _roll_back_swap_async(listener_arn, outcomes, concurrency,
+                                                      active, bucket)
+    rule_events.flush()
+    return summarize_restore(plan, outcomes, timings, rolled_back)
+
+async def restore_alb_rules_async(listener_arn: str,
+                                  backup_file: str,
+                                  restore_mode: str = 'incremental',
+                                  concurrency: int = DEFAULT_CONCURRENCY,
+                                  clients: Optional[AsyncClients] = None,
+                                  bucket: Optional[TokenBucket] = None,
+                                  preflight: bool = True,
+                                  minimal_moves: bool = False,
+                                  full_strategy: str = STRATEGY_SWAP) -> Dict[str, Any]:
+    """Restore ALB rules from a backup file.
+
+    The restore is planned like ``restore.build_restore_plan``: the existing
+    rules are described through the shared clients while the backup is
+    loaded on a worker thread, where the plan is then computed, and the
+    plan is applied on the event loop.
+
+    Args:
+        listener_arn: ARN of the ALB listener
+        backup_file: Path to the backup file
+        restore_mode: Mode of restore ('incremental' or 'full')
+        concurrency: Maximum number of API operations in flight for this listener
+        clients: Shared async clients (optional)
+        bucket: Token bucket shared with other restores (optional)
+        preflight: Check referenced target groups and quotas before changing anything
+        minimal_moves: In incremental mode, restore the backup's rule order
+            while moving as few rules as possible, rather than its exact priorities
+        full_strategy: In full mode, 'swap' to build the restored rules before
+            removing the existing ones, or 'delete-first'
+
+    Returns:
+        Summary of restore operation
+
+    Raises:
+        ValueError: If restore_mode or full_strategy is not supported
+        PreflightError: If preflight is True and the restore would fail
+        ClientError: If there is an issue with the AWS API call
+    """
+    check_restore_mode(restore_mode)
+    loop = asyncio.get_running_loop()
+    async with _borrow(clients) as active:
+        # Parsing a large backup and diffing it are CPU and disk bound; keep the loop responsive
+        backup_rules, existing_rules = await asyncio.gather(
+            loop.run_in_executor(None, propagate(partial(load_backup_file, backup_file))),
+            describe_alb_rules_async(listener_arn, clients=active, bucket=bucket)
+        )
+        headroom = None
+        if restore_mode == 'full' and full_strategy == STRATEGY_SWAP:
+            headroom = await _rule_headroom_async(listener_arn, active, bucket)
+        plan = await loop.run_in_executor(None, propagate(partial(
+            _make_restore_plan, listener_arn, existing_rules, backup_rules, backup_file,
+            restore_mode, concurrency, minimal_moves=minimal_moves,
+            full_strategy=full_strategy, rule_headroom=headroom
+        )))
+        return await apply_restore_plan_async(plan, concurrency, active, bucket, preflight)
+
+async def _rule_headroom_async(listener_arn: str, clients: AsyncClients,
+                               bucket: Optional[TokenBucket]) -> Optional[int]:
+    """Return the rules a swap can add before the rule quota, None when it cannot be checked."""
+    try:
+        return await rule_headroom_async(listener_arn, clients, bucket)
+    except ClientError as e:
+        logger.warning("Could not check the rule quota of %s: %s", listener_arn, e)
+        return None
+
+async def _roll_back_swap_async(listener_arn: str, outcomes: List[OperationResult],
+                                concurrency: int, clients: AsyncClients,
+                                bucket: Optional[TokenBucket]) -> Optional[int]:
+    """Delete the rules a halted swap created; return how many, None if it went too far."""
+    rules = await describe_alb_rules_async(listener_arn, clients=clients)
+    operations = plan_swap_rollback(outcomes, rules)
+    if operations is None:
+        logger.error("Swap of %s stopped after routing switched to the restored rules; "
+                     "restore again to finish it", listener_arn)
+        return None
+    logger.warning("Swap of %s stopped; deleting the %s rules it created",
+                   listener_arn, len(operations))
+    results = await execute_operations_async(
+        operations,
+        partial(apply_operation_async, listener_arn, clients=clients),
+        concurrency=concurrency,
+        bucket=bucket
+    )
+    return sum(1 for _, error in results if error is None)
+
+async def _gather_by_listener(listener_arns: List[str],
+                              func: Callable[[str], Awaitable[T]]) -> Dict[str, Any]:
+    """Run func for every listener, mapping each to its result or exception."""
+    results = await asyncio.gather(*(func(arn) for arn in listener_arns), return_exceptions=True)
+    outcome: Dict[str, Any] = {}
+    for arn, result in zip(listener_arns, results):
+        if isinstance(result, Exception):
+            logger.error("Failed to process listener %s: %s", arn, result)
+        outcome[arn] = result
+    return outcome
+
+async def describe_alb_rules_many_async(listener_arns: List[str],
+                                        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                                        page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """Get the rules of many listeners concurrently.
+
+    Args:
+        listener_arns: ARNs of the ALB listeners
+        max_in_flight: Maximum number of requests in flight
+        page_size: Number of rules requested per DescribeRules call
+
+    Returns:
+        Dictionary mapping each listener ARN to its list of rules, or to the
+        exception raised while describing it
+    """
+    async with AsyncClients(max_in_flight) as clients:
+        return await _gather_by_listener(
+            listener_arns,
+            lambda arn: describe_alb_rules_async(arn, page_size, clients)
+        )
+
+async def restore_alb_rules_many_async(backups: Dict[str, str],
+                                       restore_mode: str = 'incremental',
+                                       concurrency: int = DEFAULT_CONCURRENCY,
+                                       max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                                       calls_per_second: float = DEFAULT_CALLS_PER_SECOND,
+                                       burst: float = DEFAULT_BURST,
+                                       preflight: bool = True,
+                                       minimal_moves: bool = False,
+                                       full_strategy: str = STRATEGY_SWAP) -> Dict[str, Any]:
+    """Restore many listeners concurrently.
+
+    All listeners share one pool of in-flight requests and one token
+    bucket, so their calls stay under the account's API rate however
+    many listeners are restored.
+
+    Args:
+        backups: Dictionary mapping listener ARNs to their backup file
+        restore_mode: Mode of restore ('incremental' or 'full')
+        concurrency: Maximum number of operations in flight per listener
+        max_in_flight: Maximum number of requests in flight overall
+        calls_per_second: Sustained API call rate overall
+        burst: Number of calls allowed in a burst
+        preflight: Check referenced target groups and quotas before changing anything
+        minimal_moves: In incremental mode, restore each backup's rule order
+            while moving as few rules as possible, rather than its exact priorities
+        full_strategy: In full mode, 'swap' to build the restored rules before
+            removing the existing ones, or 'delete-first'
+
+    Returns:
+        Dictionary mapping each listener ARN to its restore summary, or to
+        the exception raised while restoring it
+    """
+    check_restore_mode(restore_mode)
+    bucket = TokenBucket(calls_per_second, burst)
+    async with AsyncClients(max_in_flight) as clients:
+        return await _gather_by_listener(
+            list(backups),
+            lambda arn: restore_alb_rules_async(
+                arn, backups[arn], restore_mode, concurrency, clients, bucket,
+                preflight=preflight, minimal_moves=minimal_moves, full_strategy=full_strategy
+            )
+        )
+
+def describe_alb_rules_many(listener_arns: List[str],
+                            max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                            page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """Synchronous wrapper of ``describe_alb_rules_many_async``."""
+    return asyncio.run(describe_alb_rules_many_async(listener_arns, max_in_flight, page_size))
+
+def restore_alb_rules_many(backups: Dict[str, str],
+                           restore_mode: str = 'incremental',
+                           concurrency: int = DEFAULT_CONCURRENCY,
+                           max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                           preflight: bool = True,
+                           minimal_moves: bool = False,
+                           full_strategy: str = STRATEGY_SWAP) -> Dict[str, Any]:
+    """Synchronous wrapper of ``restore_alb_rules_many_async``."""
+    return asyncio.run(restore_alb_rules_many_async(
+        backups, restore_mode, concurrency, max_in_flight,
+        preflight=preflight, minimal_moves=minimal_moves, full_strategy=full_strategy
+    ))
@@ -1,44 +1,138 @@
 """ALB rule backup functionality."""
 
+import os
 import json
-import yaml
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-import boto3
+from typing import IO, Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Union, cast
 from botocore.exceptions import ClientError
 
+from alb_rules_tool.catalog import SnapshotCatalog, open_catalog
+from alb_rules_tool.clients import get_client, region_from_arn
+from alb_rules_tool.diff import RuleSetFingerprint, rule_set_fingerprint
+from alb_rules_tool.metrics import phase, recorded, timed_iter
+from alb_rules_tool.serialization import (
+    backup_extension,
+    check_compression,
+    check_format,
+    split_backup_path,
+    write_rules,
+    write_rules_binary
+)
+from alb_rules_tool.store import SnapshotStore, latest_snapshot, open_store, save_snapshot
+from alb_rules_tool.streams import S3MultipartWriter
+
 logger = logging.getLogger(__name__)
 
-def describe_alb_rules(listener_arn: str) -> List[Dict[str, Any]]:
-    """Get all rules associated with an ALB listener.
+# Largest page size accepted by the DescribeRules API
+DEFAULT_PAGE_SIZE = 400
+
+# S3 user metadata key holding the rule set fingerprint of a backup
+FINGERPRINT_METADATA_KEY = "rules-fingerprint"
+
+# Suffix of the sidecar file recording the fingerprint of a local backup
+SIDECAR_SUFFIX = ".meta.json"
+
+def iter_alb_rules(listener_arn: str,
+                   page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """Iterate over all rules associated with an ALB listener.
+    
+    Rules are fetched lazily, one page at a time, following ``NextMarker``
+    until the listener has no more rules.
     
     Args:
         listener_arn: ARN of the ALB listener
+        page_size: Number of rules requested per DescribeRules call
         
-    Returns:
-        List of rules associated with the listener
+    Yields:
+        Rules associated with the listener
         
     Raises:
         ClientError: If there is an issue with the AWS API call
     """
     try:
-        client = boto3.client('elbv2')
-        response = client.describe_rules(ListenerArn=listener_arn)
-        return response['Rules']
+        client = get_client('elbv2', region_from_arn(listener_arn))
+        paginator = client.get_paginator('describe_rules')
+        pages = paginator.paginate(
+            ListenerArn=listener_arn,
+            PaginationConfig={'PageSize': page_size}
+        )
+        for page in timed_iter('fetch', pages):
+            for rule in page['Rules']:
+                yield rule
     except ClientError as e:
-        logger.error(f"Error describing rules for listener {listener_arn}: {e}")
+        logger.error("Error describing rules for listener %s: %s", listener_arn, e)
         raise
 
-def backup_rules_to_file(rules: List[Dict[str, Any]], 
+def describe_alb_rules(listener_arn: str,
+                       page_size: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """Get all rules associated with an ALB listener.
+    
+    Args:
+        listener_arn: ARN of the ALB listener
+        page_size: Number of rules requested per DescribeRules call
+        
+    Returns:
+        List of rules associated with the listener
+        
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    return list(iter_alb_rules(listener_arn, page_size))
+
+def default_backup_name(format_type: str = "json", compression: Optional[str] = None) -> str:
+    """Build a timestamped backup file name.
+    
+    Args:
+        format_type: Backup format (json or yaml)
+        compression: Compression codec (gzip or zstd), or None
+        
+    Returns:
+        File name such as 'alb-rules-backup-2025-03-18-10-00-00.json.gz'
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    return f"alb-rules-backup-{timestamp}.{backup_extension(format_type, compression)}"
+
+def _resolve_compression(path: Optional[str], compression: Optional[str]) -> Optional[str]:
+    """Use the given compression, or the one implied by the backup name."""
+    if compression is None and path:
+        return split_backup_path(path)[1]
+    return check_compression(compression)
+
+def backup_rules_to_stream(rules: Iterable[Dict[str, Any]],
+                           stream: IO[str],
+                           format_type: str = "json",
+                           compact: bool = False) -> None:
+    """Write ALB rules to any writable text stream.
+    
+    Args:
+        rules: Iterable of ALB rules to backup
+        stream: Writable text file-like object (file, socket, S3 writer, ...)
+        format_type: Format to save the rules (json or yaml)
+        compact: Write JSON without indentation
+        
+    Raises:
+        ValueError: If format_type is not supported
+    """
+    write_rules(rules, stream, format_type, compact)
+
+def backup_rules_to_file(rules: Iterable[Dict[str, Any]], 
                       file_path: Optional[str] = None,
-                      format_type: str = "json") -> str:
+                      format_type: str = "json",
+                      compression: Optional[str] = None,
+                      compact: bool = False) -> str:
     """Save ALB rules to a local file.
     
+    Rules are serialized one at a time, so a generator such as
+    ``iter_alb_rules`` can be passed without loading every rule in memory.
+    
     Args:
-        rules: List of ALB rules to backup
+        rules: Iterable of ALB rules to backup
         file_path: Path where to save the backup file (optional)
         format_type: Format to save the rules (json or yaml)
+        compression: Compression codec (gzip or zstd). Defaults to the one
+            implied by the file extension, e.g. '.json.gz'
+        compact: Write JSON without indentation
         
     Returns:
         Path to the created backup file
@@ -47,32 +141,35 @@ def backup_rules_to_file(rules: List[Dict[str, Any]],
         ValueError: If format_type is not supported
         IOError: If there's an issue writing the file
     """
+    check_format(format_type)
+    compression = _resolve_compression(file_path, compression)
+    
     if not file_path:
-        timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
-        file_path = f"alb-rules-backup-{timestamp}.{format_type}"
+        file_path = default_backup_name(format_type, compression)
     
     try:
-        with open(file_path, 'w') as f:
-            if format_type.lower() == "json":
-                json.dump(rules, f, indent=2)
-            elif format_type.lower() == "yaml":
-                yaml.dump(rules, f)
-            else:
-                raise ValueError(f"Unsupported format type: {format_type}. Use 'json' or 'yaml'.")
+        if compression:
+            with open(file_path, 'wb') as f:
+                write_rules_binary(rules, f, format_type, compression, compact)
+        else:
+            with open(file_path, 'w') as f:
+                write_rules(rules, f, format_type, compact)
                 
-        logger.info(f"Successfully backed up rules to {file_path}")
+        logger.info("Successfully backed up rules to %s", file_path)
         return file_path
     except IOError as e:
-        logger.error(f"Error writing backup to file {file_path}: {e}")
+        logger.error("Error writing backup to file %s: %s", file_path, e)
         raise
 
-def upload_backup_to_s3(file_path: str, bucket_name: str, s3_key: Optional[str] = None) -> str:
+def upload_backup_to_s3(file_path: str, bucket_name: str, s3_key: Optional[str] = None,
+                        metadata: Optional[Dict[str, str]] = None) -> str:
     """Upload a backup file to an S3 bucket.
     
     Args:
         file_path: Path to the local backup file
         bucket_name: S3 bucket name
         s3_key: S3 object key (optional)
+        metadata: S3 user metadata stored with the object (optional)
         
     Returns:
         S3 URI of the uploaded file
@@ -84,20 +181,147 @@ def upload_backup_to_s3(file_path: str, bucket_name: str, s3_key: Optional[str]
         s3_key = file_path.split("/")[-1]
     
     try:
-        s3_client = boto3.client('s3')
-        s3_client.upload_file(file_path, bucket_name, s3_key)
+        s3_client = get_client('s3')
+        extra_args = {'Metadata': metadata} if metadata else None
+        s3_client.upload_file(file_path, bucket_name, s3_key, ExtraArgs=extra_args)
         s3_uri = f"s3://{bucket_name}/{s3_key}"
-        logger.info(f"Successfully uploaded backup to {s3_uri}")
+        logger.info("Successfully uploaded backup to %s", s3_uri)
         return s3_uri
     except ClientError as e:
-        logger.error(f"Error uploading backup to S3: {e}")
+        logger.error("Error uploading backup to S3: %s", e)
         raise
 
+def stream_backup_to_s3(rules: Iterable[Dict[str, Any]],
+                        bucket_name: str,
+                        s3_key: str,
+                        format_type: str = "json",
+                        compression: Optional[str] = None,
+                        compact: bool = False,
+                        metadata: Optional[Dict[str, str]] = None) -> str:
+    """Serialize ALB rules straight into an S3 object, without a local file.
+    
+    Rules are serialized and compressed as they are consumed and uploaded
+    in multipart chunks, so memory use stays flat and no disk space is
+    needed.
+    
+    Args:
+        rules: Iterable of ALB rules to backup
+        bucket_name: S3 bucket name
+        s3_key: S3 object key
+        format_type: Format to save the rules (json or yaml)
+        compression: Compression codec (gzip or zstd). Defaults to the one
+            implied by the key, e.g. '.json.zst'
+        compact: Write JSON without indentation
+        metadata: S3 user metadata stored with the object (optional)
+        
+    Returns:
+        S3 URI of the uploaded backup
+        
+    Raises:
+        ValueError: If format_type is not supported
+        ClientError: If there is an issue with the AWS API call
+    """
+    check_format(format_type)
+    compression = _resolve_compression(s3_key, compression)
+    
+    extra_args = {'Metadata': metadata} if metadata else None
+    writer = S3MultipartWriter(get_client('s3'), bucket_name, s3_key, extra_args=extra_args)
+    try:
+        # Leaving the block by any exception, KeyboardInterrupt included, aborts the upload
+        with writer:
+            write_rules_binary(rules, cast(BinaryIO, writer), format_type, compression, compact)
+    except Exception as e:
+        logger.error("Error streaming backup to %s: %s", writer.s3_uri, e)
+        raise
+    
+    logger.info("Successfully streamed backup to %s", writer.s3_uri)
+    return writer.s3_uri
+
+def read_sidecar(backup_path: str) -> Optional[Dict[str, Any]]:
+    """Read the sidecar recording the fingerprint of a local backup.
+    
+    Args:
+        backup_path: Path to the local backup file
+        
+    Returns:
+        Sidecar contents, or None if the backup or its sidecar is missing
+        or unreadable
+    """
+    path = backup_path + SIDECAR_SUFFIX
+    if not os.path.exists(backup_path) or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            sidecar: Dict[str, Any] = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable backup sidecar %s: %s", path, e)
+        return None
+    return sidecar
+
+def write_sidecar(backup_path: str, listener_arn: str, fingerprint: str,
+                  verified_only: bool = False) -> str:
+    """Record the fingerprint of a local backup in a sidecar file.
+    
+    Args:
+        backup_path: Path to the local backup file
+        listener_arn: ARN of the backed up listener
+        fingerprint: Rule set fingerprint of the backup
+        verified_only: Only mark the existing backup as still valid,
+            keeping its original creation time
+        
+    Returns:
+        Path to the sidecar file
+    """
+    now = datetime.now().isoformat()
+    previous = read_sidecar(backup_path) if verified_only else None
+    sidecar = {
+        "listener_arn": listener_arn,
+        "fingerprint": fingerprint,
+        "created_at": (previous or {}).get("created_at", now),
+        "verified_at": now,
+    }
+    path = backup_path + SIDECAR_SUFFIX
+    with open(path, 'w') as f:
+        json.dump(sidecar, f, indent=2)
+    return path
+
+def stored_s3_fingerprint(bucket_name: str, s3_key: str) -> Optional[str]:
+    """Read the fingerprint stored in the metadata of an S3 backup.
+    
+    Args:
+        bucket_name: S3 bucket name
+        s3_key: S3 object key
+        
+    Returns:
+        Fingerprint, or None if the object does not exist or has none
+        
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    try:
+        response = get_client('s3').head_object(Bucket=bucket_name, Key=s3_key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    fingerprint: Optional[str] = response.get('Metadata', {}).get(FINGERPRINT_METADATA_KEY)
+    return fingerprint
+
+@recorded('backup')
 def backup_alb_rules(listener_arn: str, 
                    output_path: Optional[str] = None,
                    format_type: str = "json",
                    upload_to_s3: bool = False,
-                   s3_bucket: Optional[str] = None) -> Dict[str, str]:
+                   s3_bucket: Optional[str] = None,
+                   page_size: int = DEFAULT_PAGE_SIZE,
+                   s3_key: Optional[str] = None,
+                   write_local: bool = True,
+                   compression: Optional[str] = None,
+                   compact: bool = False,
+                   skip_unchanged: bool = False,
+                   previous_fingerprint: Optional[str] = None,
+                   store: Optional[Union[str, SnapshotStore]] = None,
+                   catalog: Optional[Union[str, SnapshotCatalog]] = None) -> Dict[str, Any]:
     """Backup ALB rules for a given listener ARN.
     
     Args:
@@ -106,29 +330,183 @@ def backup_alb_rules(listener_arn: str,
         format_type: Format to save the rules (json or yaml)
         upload_to_s3: Whether to upload the backup to S3
         s3_bucket: S3 bucket name
+        page_size: Number of rules requested per DescribeRules call
+        s3_key: S3 object key (optional, defaults to the backup file name)
+        write_local: Whether to write a local file. When False, rules are
+            streamed straight to S3 without touching the disk.
+        compression: Compression codec (gzip or zstd), or None
+        compact: Write JSON without indentation
+        skip_unchanged: Compare the rule set fingerprint with the one of the
+            stored backup and skip writing and uploading when they match.
+            The fingerprint is kept in a sidecar next to local backups and in
+            the metadata of S3 backups.
+        previous_fingerprint: Fingerprint of the latest stored backup, when
+            the caller already knows it (e.g. from a manifest). Otherwise it is
+            read from the sidecar and the S3 object metadata.
+        store: Content-addressed snapshot store, or its location ('s3://bucket/prefix'
+            or a directory). When given, the rules are stored there as a
+            snapshot instead of a backup file, and the file and S3 options
+            are ignored.
+        catalog: Catalog, or its location (a SQLite file or 's3://bucket/key'),
+            where the backup is recorded with its fingerprint and rule count.
+            Unchanged rule sets that are not backed up again are not recorded.
+            Catalog failures are logged as warnings and do not fail the backup.
         
     Returns:
-        Dictionary containing paths to local backup file and S3 URI if applicable
+        Dictionary containing paths to local backup file and S3 URI if applicable.
+        With skip_unchanged, also the 'fingerprint' and whether the backup
+        was 'unchanged'. With a catalog, always the 'fingerprint'. With a
+        store, the 'snapshot' location instead of the file locations.
+        'metrics' summarizes the API calls made and the time spent fetching,
+        comparing, writing and uploading.
         
     Raises:
-        ValueError: If upload_to_s3 is True but s3_bucket is not provided
+        ValueError: If upload_to_s3 is True but s3_bucket is not provided, or
+            if neither a local file nor an S3 upload is requested
     """
-    result = {}
+    if store is not None:
+        return _snapshot_alb_rules(listener_arn, store, page_size, skip_unchanged,
+                                   previous_fingerprint, catalog)
+    
+    result: Dict[str, Any] = {}
     
     # Validate parameters
     if upload_to_s3 and not s3_bucket:
         raise ValueError("S3 bucket name is required when upload_to_s3 is True")
+    if not write_local and not upload_to_s3:
+        raise ValueError("upload_to_s3 is required when write_local is False")
+    
+    # Stream rules from ALB straight into the backup
+    rules: Iterable[Dict[str, Any]] = iter_alb_rules(listener_arn, page_size)
     
-    # Get rules from ALB
-    rules = describe_alb_rules(listener_arn)
+    if not write_local and not s3_key:
+        s3_key = (output_path or default_backup_name(format_type, compression)).split("/")[-1]
     
-    # Save to file
-    local_path = backup_rules_to_file(rules, output_path, format_type)
-    result["local_path"] = local_path
+    metadata = None
+    tracker = None
+    if skip_unchanged:
+        # The fingerprint needs every rule before anything is written
+        rules = list(rules)
+        rule_count = len(rules)
+        with phase('diff'):
+            fingerprint = rule_set_fingerprint(rules)
+            result["fingerprint"] = fingerprint
+            metadata = {FINGERPRINT_METADATA_KEY: fingerprint}
+            current = _backup_is_current(listener_arn, fingerprint, previous_fingerprint,
+                                         output_path, write_local, upload_to_s3, s3_bucket,
+                                         s3_key)
+        if current:
+            logger.info("Rules of %s unchanged since the last backup, skipping", listener_arn)
+            result["unchanged"] = True
+            # With a caller-supplied fingerprint, the caller knows where the
+            # current backup lives; otherwise it is at the requested destinations
+            if previous_fingerprint is None:
+                if write_local and output_path:
+                    result["local_path"] = output_path
+                    write_sidecar(output_path, listener_arn, fingerprint, verified_only=True)
+                if upload_to_s3:
+                    key = s3_key or (output_path or "").split("/")[-1]
+                    result["s3_uri"] = f"s3://{s3_bucket}/{key}"
+            return result
+        result["unchanged"] = False
+    elif catalog is not None:
+        # Fingerprint the rules as they are written
+        tracker = RuleSetFingerprint()
+        rules = tracker.track(rules)
     
-    # Upload to S3 if requested
+    if not write_local:
+        # Validated and defaulted above: streaming uploads to a bucket and key
+        assert s3_bucket is not None and s3_key is not None
+        with phase('upload'):
+            result["s3_uri"] = stream_backup_to_s3(
+                rules, s3_bucket, s3_key, format_type, compression, compact, metadata
+            )
+    else:
+        with phase('write'):
+            local_path = backup_rules_to_file(rules, output_path, format_type, compression, compact)
+            result["local_path"] = local_path
+            if skip_unchanged:
+                write_sidecar(local_path, listener_arn, result["fingerprint"])
+        
+        # Upload to S3 if requested
+        if upload_to_s3:
+            assert s3_bucket is not None, "validated above"
+            with phase('upload'):
+                s3_uri = upload_backup_to_s3(local_path, s3_bucket, s3_key, metadata)
+            result["s3_uri"] = s3_uri
+    
+    if catalog is not None:
+        if tracker is not None:
+            result["fingerprint"] = tracker.hexdigest()
+            rule_count = tracker.rule_count
+        location = result.get("s3_uri") or result["local_path"]
+        format_name = backup_extension(format_type, _resolve_compression(location, compression))
+        _record_backup(catalog, listener_arn, result["fingerprint"], rule_count, location,
+                       format_name)
+    
+    return result
+
+def _record_backup(catalog: Union[str, SnapshotCatalog], listener_arn: str, fingerprint: str,
+                   rule_count: int, location: str, format_name: str) -> None:
+    """Record a backup in a catalog, opening and syncing it when given its location.
+
+    The backup is already written when it is recorded, so a catalog that
+    cannot be opened, written or synced is logged instead of failing it.
+    """
+    with phase('catalog'):
+        try:
+            if isinstance(catalog, str):
+                with open_catalog(catalog) as opened:
+                    opened.record(listener_arn, fingerprint, rule_count, location, format_name)
+            else:
+                catalog.record(listener_arn, fingerprint, rule_count, location, format_name)
+        except Exception as e:
+            logger.warning("Backup of %s saved to %s but not recorded in the catalog: %s",
+                           listener_arn, location, e)
+
+def _backup_is_current(listener_arn: str, fingerprint: str, previous_fingerprint: Optional[str],
+                       output_path: Optional[str], write_local: bool, upload_to_s3: bool,
+                       s3_bucket: Optional[str], s3_key: Optional[str]) -> bool:
+    """Check whether every requested backup destination already holds this rule set."""
+    if previous_fingerprint is not None:
+        return previous_fingerprint == fingerprint
+    
+    if write_local:
+        # A default, timestamped name never matches an earlier backup
+        sidecar = read_sidecar(output_path) if output_path else None
+        if not sidecar or sidecar.get("fingerprint") != fingerprint:
+            return False
+        if sidecar.get("listener_arn") != listener_arn:
+            return False
     if upload_to_s3:
-        s3_uri = upload_backup_to_s3(local_path, s3_bucket)
-        result["s3_uri"] = s3_uri
+        key = s3_key or (output_path or "").split("/")[-1]
+        if not s3_bucket or not key or stored_s3_fingerprint(s3_bucket, key) != fingerprint:
+            return False
+    return True
+
+def _snapshot_alb_rules(listener_arn: str, store: Union[str, SnapshotStore], page_size: int,
+                        skip_unchanged: bool, previous_fingerprint: Optional[str],
+                        catalog: Optional[Union[str, SnapshotCatalog]] = None) -> Dict[str, Any]:
+    """Back up a listener into a snapshot store."""
+    if isinstance(store, str):
+        store = open_store(store)
+    rules = list(iter_alb_rules(listener_arn, page_size))
+    
+    if skip_unchanged:
+        with phase('diff'):
+            fingerprint = rule_set_fingerprint(rules)
+            if previous_fingerprint is None:
+                latest = latest_snapshot(store, listener_arn)
+                previous_fingerprint = latest["fingerprint"] if latest else None
+        if previous_fingerprint == fingerprint:
+            logger.info("Rules of %s unchanged since the last snapshot, skipping", listener_arn)
+            return {"fingerprint": fingerprint, "unchanged": True}
     
+    with phase('upload'):
+        result: Dict[str, Any] = dict(save_snapshot(rules, store, listener_arn))
+    if skip_unchanged:
+        result["unchanged"] = False
+    if catalog is not None:
+        _record_backup(catalog, listener_arn, result["fingerprint"], len(rules),
+                       result["snapshot"], "snapshot")
     return result
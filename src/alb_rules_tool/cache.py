@@ -0,0 +1,267 @@
+"""Local cache of S3 backups.
+
+Backups downloaded from S3 are kept on disk, keyed by bucket and key, and
+revalidated with a conditional GET (``If-None-Match`` with the cached
+ETag) on every use: an unchanged backup costs a 304 response instead of a
+full download. The cache is bounded in size and evicts the least recently
+used backups first.
+
+The cache directory can be shared by concurrent processes. Each entry is
+guarded by a file lock while it is revalidated or downloaded, bodies are
+written to a temporary file and renamed into place, and eviction skips
+entries another process is using. Locking relies on ``fcntl`` and is
+skipped where it is not available.
+"""
+
+import os
+import json
+import errno
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from alb_rules_tool.clients import get_client
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Where backups are cached when no directory is given
+DEFAULT_CACHE_DIR = os.path.join("~", ".alb-rules", "cache")
+
+# Default size bound of the cache, in bytes
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_BODY_SUFFIX = ".body"
+_META_SUFFIX = ".json"
+_LOCK_SUFFIX = ".lock"
+_EVICTION_LOCK = "eviction.lock"
+
+# Error codes of a conditional GET whose cached copy is still current
+_NOT_MODIFIED_CODES = ('304', 'NotModified')
+
+_lock = threading.Lock()
+_cache: Optional["BackupCache"] = None
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """Hold an exclusive lock on a lock file.
+
+    Yields:
+        Whether the lock was acquired; always True when blocking
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(path, 'a') as f:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(f, flags)
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class BackupCache:
+    """Size-bounded, ETag-validated cache of S3 backups in a local directory."""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = os.path.expanduser(directory or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._counts_lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry_path(self, bucket_name: str, s3_key: str) -> str:
+        """Return the path of an entry, without suffix."""
+        digest = hashlib.sha256(f"{bucket_name}/{s3_key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def _count(self, hit: bool, uri: str) -> None:
+        with self._counts_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            hits, misses = self.hits, self.misses
+        logger.info("Backup cache %s for %s (hits: %s, misses: %s)",
+                    'hit' if hit else 'miss', uri, hits, misses)
+
+    @contextmanager
+    def open(self, bucket_name: str, s3_key: str) -> Iterator[BinaryIO]:
+        """Open the current content of an S3 backup, downloading it only if needed.
+
+        The cached copy is revalidated against S3; it is downloaded again
+        when missing or when its ETag no longer matches.
+
+        Args:
+            bucket_name: S3 bucket name
+            s3_key: S3 object key
+
+        Yields:
+            Binary file of the cached backup
+
+        Raises:
+            ClientError: If there is an issue with the AWS API call
+        """
+        entry = self._entry_path(bucket_name, s3_key)
+        with _file_lock(entry + _LOCK_SUFFIX):
+            f = self._open_entry(bucket_name, s3_key, entry)
+        try:
+            self.evict(keep=entry)
+            yield f
+        finally:
+            f.close()
+
+    def _read_etag(self, entry: str) -> Optional[str]:
+        """Return the ETag of a cached entry, None if it is not cached."""
+        try:
+            with open(entry + _META_SUFFIX) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(entry + _BODY_SUFFIX):
+            return None
+        etag: Optional[str] = metadata.get("etag")
+        return etag
+
+    def _open_entry(self, bucket_name: str, s3_key: str, entry: str) -> BinaryIO:
+        """Revalidate or download an entry and open it. Must hold the entry lock."""
+        uri = f"s3://{bucket_name}/{s3_key}"
+        s3_client = get_client('s3')
+        etag = self._read_etag(entry)
+        try:
+            if etag is None:
+                response = s3_client.get_object(Bucket=bucket_name, Key=s3_key)
+            else:
+                response = s3_client.get_object(Bucket=bucket_name, Key=s3_key, IfNoneMatch=etag)
+        except ClientError as e:
+            if etag is None or e.response.get('Error', {}).get('Code') not in _NOT_MODIFIED_CODES:
+                raise
+            self._count(True, uri)
+            body_path = entry + _BODY_SUFFIX
+            # The access time of an entry is the modification time of its body
+            os.utime(body_path)
+            return open(body_path, 'rb')
+
+        self._count(False, uri)
+        self._store(entry, response['Body'], {
+            "bucket": bucket_name,
+            "key": s3_key,
+            "etag": response['ETag'],
+        })
+        return open(entry + _BODY_SUFFIX, 'rb')
+
+    def _store(self, entry: str, body: Any, metadata: Dict[str, Any]) -> None:
+        """Write an entry's body and metadata, each replaced atomically."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in body.iter_chunks():
+                    f.write(chunk)
+            metadata["size"] = os.path.getsize(tmp_path)
+            os.replace(tmp_path, entry + _BODY_SUFFIX)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        finally:
+            body.close()
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, entry + _META_SUFFIX)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """List cached entries as (access time, size, entry path)."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_BODY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path[:-len(_BODY_SUFFIX)]))
+        return entries
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Remove least recently used entries until the cache fits its size bound.
+
+        Entries locked by another process are skipped.
+
+        Args:
+            keep: Entry path never evicted, e.g. the one just opened
+
+        Returns:
+            Number of entries removed
+        """
+        with _file_lock(os.path.join(self.directory, _EVICTION_LOCK)):
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if entry == keep:
+                    continue
+                with _file_lock(entry + _LOCK_SUFFIX, blocking=False) as locked:
+                    if not locked:
+                        continue
+                    for suffix in (_META_SUFFIX, _BODY_SUFFIX):
+                        try:
+                            os.remove(entry + suffix)
+                        except FileNotFoundError:
+                            pass
+                total -= size
+                removed += 1
+        if removed:
+            logger.debug("Evicted %s backups from cache %s", removed, self.directory)
+        return removed
+
+def _env_max_bytes() -> int:
+    """Read the cache size bound, given in MiB, from the environment."""
+    value = os.environ.get("ALB_RULES_CACHE_MAX_MB")
+    return int(value) * 1024 * 1024 if value else DEFAULT_MAX_BYTES
+
+def configure_cache(directory: Optional[str] = None,
+                    max_bytes: Optional[int] = None) -> "BackupCache":
+    """Enable the cache used for S3 backups.
+
+    Args:
+        directory: Cache directory; defaults to $ALB_RULES_CACHE_DIR, then ~/.alb-rules/cache
+        max_bytes: Size bound of the cache; defaults to $ALB_RULES_CACHE_MAX_MB MiB, then 512 MiB
+
+    Returns:
+        The configured cache
+    """
+    global _cache
+    with _lock:
+        _cache = BackupCache(directory or os.environ.get("ALB_RULES_CACHE_DIR"),
+                             _env_max_bytes() if max_bytes is None else max_bytes)
+        return _cache
+
+def reset_cache() -> None:
+    """Disable the cache; S3 backups are then read without a local copy."""
+    global _cache
+    with _lock:
+        _cache = None
+
+def get_cache() -> Optional[BackupCache]:
+    """Return the configured cache, None when caching is disabled."""
+    return _cache
@@ -0,0 +1,265 @@
+"""SQLite catalog of listener backups.
+
+Every backup written with a catalog is recorded there with its listener,
+time, rule set fingerprint, rule count, location and format. Lookups such
+as "the latest backup of a listener before 14:00" are then answered from
+indexes, without listing or downloading anything from S3.
+
+A catalog is a local SQLite file, or an S3 object ('s3://bucket/key')
+that is downloaded to a local cache when opened and merged back into S3
+by ``sync``.
+"""
+
+import os
+import sqlite3
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from alb_rules_tool.clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# Environment variable overriding the default catalog location
+CATALOG_ENV_VAR = "ALB_RULES_CATALOG"
+
+# Catalog used when no location is given
+DEFAULT_CATALOG_PATH = os.path.join("~", ".alb-rules", "catalog.db")
+
+# Where S3 catalogs are cached locally
+CACHE_DIR = os.path.join("~", ".alb-rules", "catalogs")
+
+COLUMNS = ("listener_arn", "created_at", "fingerprint", "rule_count", "location", "format")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    listener_arn TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    rule_count INTEGER NOT NULL,
+    location TEXT NOT NULL,
+    format TEXT NOT NULL,
+    UNIQUE (listener_arn, created_at, location)
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (created_at);
+CREATE INDEX IF NOT EXISTS snapshots_by_fingerprint ON snapshots (fingerprint, created_at);
+"""
+
+def format_timestamp(value: Optional[datetime] = None) -> str:
+    """Render a time as stored in the catalog: UTC ISO 8601 with microseconds.
+
+    Naive times are taken as local time. Stored times all have the same
+    width, so they sort as text in time order.
+    """
+    value = value or datetime.now(timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+class SnapshotCatalog:
+    """SQLite catalog of backups, safe to share between threads."""
+
+    def __init__(self, path: str, s3_bucket: Optional[str] = None, s3_key: Optional[str] = None):
+        self.path = path
+        self.s3_bucket = s3_bucket
+        self.s3_key = s3_key
+        self._lock = threading.Lock()
+        # Whether entries were recorded since the last sync
+        self._changed = False
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    @property
+    def location(self) -> str:
+        if self.s3_bucket:
+            return f"s3://{self.s3_bucket}/{self.s3_key}"
+        return self.path
+
+    def record(self, listener_arn: str, fingerprint: str, rule_count: int, location: str,
+               format_type: str, created_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """Record a backup.
+
+        Args:
+            listener_arn: ARN of the listener backed up
+            fingerprint: Rule set fingerprint of the backup
+            rule_count: Number of rules in the backup, default rule included
+            location: Path or URI of the backup
+            format_type: Backup format, e.g. 'json', 'yaml.gz' or 'snapshot'
+            created_at: Time of the backup (defaults to now)
+
+        Returns:
+            The recorded entry
+        """
+        entry = {
+            "listener_arn": listener_arn,
+            "created_at": format_timestamp(created_at),
+            "fingerprint": fingerprint,
+            "rule_count": rule_count,
+            "location": location,
+            "format": format_type,
+        }
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"INSERT OR IGNORE INTO snapshots ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in COLUMNS)})",
+                [entry[column] for column in COLUMNS]
+            )
+            self._changed = True
+        logger.debug("Recorded backup of %s at %s in catalog %s",
+                     listener_arn, location, self.location)
+        return entry
+
+    def _query(self, sql: str, params: List[Any]) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [{column: row[column] for column in COLUMNS} for row in rows]
+
+    def list(self, listener_arn: Optional[str] = None, since: Optional[datetime] = None,
+             until: Optional[datetime] = None, fingerprint: Optional[str] = None,
+             limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """List backups, newest first.
+
+        Args:
+            listener_arn: Only backups of this listener
+            since: Only backups taken at or after this time
+            until: Only backups taken at or before this time
+            fingerprint: Only backups of this rule set
+            limit: Maximum number of backups returned, None for all
+
+        Returns:
+            Catalog entries
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in (("listener_arn", listener_arn), ("fingerprint", fingerprint)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(format_timestamp(since))
+        if until is not None:
+            clauses.append("created_at <= ?")
+            params.append(format_timestamp(until))
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM snapshots"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._query(sql, params)
+
+    def find(self, listener_arn: str, before: Optional[datetime] = None,
+             fingerprint: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the latest backup of a listener, or None if there is none.
+
+        Args:
+            listener_arn: ARN of the listener
+            before: Latest time the backup may have been taken at
+            fingerprint: Only backups of this rule set
+        """
+        entries = self.list(listener_arn, until=before, fingerprint=fingerprint, limit=1)
+        return entries[0] if entries else None
+
+    def refresh(self) -> None:
+        """Merge in the entries of the catalog's S3 object, if it has one."""
+        if not self.s3_bucket or not self.s3_key:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, remote_path = tempfile.mkstemp(suffix=".db", dir=directory)
+        os.close(fd)
+        try:
+            if _download_catalog(self.s3_bucket, self.s3_key, remote_path):
+                self._merge(remote_path)
+        finally:
+            os.remove(remote_path)
+
+    def sync(self) -> None:
+        """Merge the catalog into its S3 object, if it has one and entries were recorded.
+
+        Entries recorded in S3 by other hosts since the catalog was opened
+        are merged in first, so concurrent writers do not drop each
+        other's entries unless they upload at the very same time.
+        """
+        if not self.s3_bucket or not self._changed:
+            return
+        self.refresh()
+        with self._lock:
+            get_client('s3').upload_file(self.path, self.s3_bucket, self.s3_key)
+            self._changed = False
+        logger.info("Synced catalog %s to %s", self.path, self.location)
+
+    def _merge(self, path: str) -> None:
+        """Add the entries of another catalog file."""
+        columns = ', '.join(COLUMNS)
+        with self._lock:
+            self._connection.execute("ATTACH DATABASE ? AS other", (path,))
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        f"INSERT OR IGNORE INTO snapshots ({columns}) "
+                        f"SELECT {columns} FROM other.snapshots"
+                    )
+            finally:
+                self._connection.execute("DETACH DATABASE other")
+
+    def close(self) -> None:
+        """Sync the catalog to S3 if needed, then close it."""
+        try:
+            self.sync()
+        finally:
+            self._connection.close()
+
+    def __enter__(self) -> "SnapshotCatalog":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+_CATALOG_MISSING_CODES = ('404', 'NoSuchKey', 'NotFound')
+
+def _download_catalog(bucket_name: str, key: str, path: str) -> bool:
+    """Download a catalog from S3, returning False when it does not exist yet."""
+    try:
+        get_client('s3').download_file(bucket_name, key, path)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in _CATALOG_MISSING_CODES:
+            return False
+        raise
+    return True
+
+def default_catalog_location() -> str:
+    """Return the catalog location used when none is given."""
+    return os.environ.get(CATALOG_ENV_VAR) or DEFAULT_CATALOG_PATH
+
+def open_catalog(location: Optional[str] = None) -> SnapshotCatalog:
+    """Open a catalog, creating it if needed.
+
+    Args:
+        location: Path of a SQLite file, or 's3://bucket/key' of one synced
+            with S3. Defaults to $ALB_RULES_CATALOG, then ~/.alb-rules/catalog.db.
+
+    Returns:
+        Snapshot catalog; close it to sync S3 catalogs
+    """
+    location = location or default_catalog_location()
+    if not location.startswith("s3://"):
+        return SnapshotCatalog(os.path.expanduser(location))
+
+    bucket_name, _, key = location[len("s3://"):].partition("/")
+    if not bucket_name or not key:
+        raise ValueError(f"S3 catalog location must be s3://bucket/key, not {location}")
+    path = os.path.join(os.path.expanduser(CACHE_DIR), bucket_name, key)
+    catalog = SnapshotCatalog(path, bucket_name, key)
+    # Entries of a run that could not sync are kept and merged with the shared ones
+    catalog.refresh()
+    return catalog
@@ -1,112 +1,114 @@
-"""Command-line interface for the ALB Rules Tool."""
+"""Command-line interface for the ALB Rules Tool.
+
+Commands live in ``alb_rules_tool.commands`` and are imported only when
+invoked, so that listing them, ``--help`` and shell completion do not pay
+for importing boto3 and the rest of the tool.
+"""
 
 import click
-import logging
-import os
-from typing import Optional
+import importlib
+from click.shell_completion import CompletionItem
+from typing import Any, Dict, List, Optional, Tuple
 
-from alb_rules_tool.backup import backup_alb_rules
-from alb_rules_tool.restore import restore_alb_rules, download_backup_from_s3
-from alb_rules_tool.logger import setup_logger
+from alb_rules_tool.logger import LOG_FORMATS, setup_logger
 from alb_rules_tool.config import load_aws_config
 
 # Set up logger
 logger = setup_logger()
 
-@click.group()
+class LazyGroup(click.Group):
+    """Click group importing its subcommands on first use.
+
+    Subcommands are given as a mapping of command name to the import path
+    of the command ('module:attribute') and its short help, which is shown
+    in the group's help without importing the command.
+    """
+
+    def __init__(self, *args: Any, lazy_subcommands: Optional[Dict[str, Tuple[str, str]]] = None,
+                 **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name in self.lazy_subcommands:
+            return self._load_command(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load_command(self, cmd_name: str) -> click.Command:
+        import_path, _ = self.lazy_subcommands[cmd_name]
+        module_name, attribute = import_path.split(':')
+        command = getattr(importlib.import_module(module_name), attribute)
+        if not isinstance(command, click.Command):
+            raise ValueError(f"{import_path} is not a click command")
+        return command
+
+    def _short_help(self, ctx: click.Context, cmd_name: str, limit: int = 45) -> Optional[str]:
+        """Return the short help of a visible command, None for hidden ones."""
+        if cmd_name in self.lazy_subcommands:
+            return self.lazy_subcommands[cmd_name][1]
+        command = super().get_command(ctx, cmd_name)
+        if command is None or command.hidden:
+            return None
+        return command.get_short_help_str(limit)
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        names = self.list_commands(ctx)
+        limit = formatter.width - 6 - max((len(name) for name in names), default=0)
+        rows = [(name, help_text) for name in names
+                if (help_text := self._short_help(ctx, name, limit)) is not None]
+        if rows:
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
+
+    def shell_complete(self, ctx: click.Context, incomplete: str) -> List[CompletionItem]:
+        results = [CompletionItem(name, help=help_text) for name in self.list_commands(ctx)
+                   if name.startswith(incomplete)
+                   and (help_text := self._short_help(ctx, name)) is not None]
+        # Options of the group itself
+        results.extend(click.Command.shell_complete(self, ctx, incomplete))
+        return results
+
+@click.group(cls=LazyGroup, lazy_subcommands={
+    'backup': ('alb_rules_tool.commands.backup:backup',
+               'Backup ALB rules for a given listener ARN.'),
+    'backup-fleet': ('alb_rules_tool.commands.backup:backup_fleet',
+                     'Backup ALB rules for many listeners in parallel.'),
+    'plan': ('alb_rules_tool.commands.restore:plan',
+             'Show and save the API calls a restore would make, without making them.'),
+    'restore': ('alb_rules_tool.commands.restore:restore',
+                'Restore ALB rules for a given listener ARN from a backup file.'),
+    'daemon': ('alb_rules_tool.commands.daemon:daemon', 'Run scheduled backups until stopped.'),
+    'list': ('alb_rules_tool.commands.catalog:list_backups',
+             'List recorded backups, newest first.'),
+    'find': ('alb_rules_tool.commands.catalog:find',
+             'Print the location of the latest backup of a listener.'),
+    'simulate': ('alb_rules_tool.commands.simulate:simulate',
+                 'Show which rule each recorded request would hit.'),
+})
 @click.option('--debug/--no-debug', default=False, help='Enable debug logging')
 @click.option('--log-file', help='Path to log file')
-def cli(debug: bool, log_file: Optional[str]) -> None:
+@click.option('--log-format', type=click.Choice(LOG_FORMATS),
+              help='Log as text or as JSON lines (default: $ALB_RULES_LOG_FORMAT, then text)')
+@click.option('--log-queue/--no-log-queue', default=None,
+              help='Write logs from a background thread (default: $ALB_RULES_LOG_QUEUE)')
+def cli(debug: bool, log_file: Optional[str], log_format: Optional[str],
+        log_queue: Optional[bool]) -> None:
     """ALB Rules backup and restore tool.
-    
+
     This tool helps you backup and restore AWS Application Load Balancer (ALB)
     rules to prevent accidental loss and improve disaster recovery capabilities.
     """
     # Configure logging based on CLI options
     log_level = "DEBUG" if debug else "INFO"
     global logger
-    logger = setup_logger(log_level=log_level, log_file=log_file)
-    
+    logger = setup_logger(log_level=log_level, log_file=log_file, log_format=log_format,
+                          use_queue=log_queue)
+
     # Load AWS configuration
     load_aws_config()
 
-@cli.command()
-@click.argument('listener-arn', required=True)
-@click.option('--output', '-o', help='Output path for the backup file')
-@click.option('--format', '-f', type=click.Choice(['json', 'yaml'], case_sensitive=False), 
-              default='json', help='Output format (json or yaml)')
-@click.option('--s3-bucket', help='S3 bucket name for uploading the backup')
-def backup(listener_arn: str, output: Optional[str], format: str, s3_bucket: Optional[str]) -> None:
-    """Backup ALB rules for a given listener ARN.
-    
-    LISTENER-ARN is the ARN of the ALB listener to backup rules from.
-    """
-    try:
-        upload_to_s3 = s3_bucket is not None
-        result = backup_alb_rules(
-            listener_arn=listener_arn,
-            output_path=output,
-            format_type=format,
-            upload_to_s3=upload_to_s3,
-            s3_bucket=s3_bucket
-        )
-        
-        click.echo(f"Backup completed successfully!")
-        click.echo(f"Local backup file: {result['local_path']}")
-        
-        if upload_to_s3 and 's3_uri' in result:
-            click.echo(f"S3 URI: {result['s3_uri']}")
-    
-    except Exception as e:
-        logger.error(f"Failed to backup ALB rules: {e}")
-        click.echo(f"Error: {e}")
-        raise click.Abort()
-
-@cli.command()
-@click.argument('listener-arn', required=True)
-@click.argument('backup-file', required=True)
-@click.option('--mode', type=click.Choice(['incremental', 'full'], case_sensitive=False),
-              default='incremental', help='Restore mode (incremental or full)')
-@click.option('--s3-bucket', help='S3 bucket name if backup file is in S3')
-@click.option('--s3-key', help='S3 key if backup file is in S3')
-def restore(listener_arn: str, backup_file: str, mode: str, 
-           s3_bucket: Optional[str], s3_key: Optional[str]) -> None:
-    """Restore ALB rules for a given listener ARN from a backup file.
-    
-    LISTENER-ARN is the ARN of the ALB listener to restore rules to.
-    
-    BACKUP-FILE is the path to the backup file. If the file is in S3,
-    provide --s3-bucket and --s3-key options.
-    """
-    try:
-        # If S3 parameters are provided, download the backup file first
-        if s3_bucket and s3_key:
-            click.echo(f"Downloading backup file from S3...")
-            backup_file = download_backup_from_s3(
-                bucket_name=s3_bucket,
-                s3_key=s3_key,
-                local_path=backup_file
-            )
-        
-        click.echo(f"Restoring ALB rules in {mode} mode...")
-        result = restore_alb_rules(
-            listener_arn=listener_arn,
-            backup_file=backup_file,
-            restore_mode=mode
-        )
-        
-        click.echo("Restore completed successfully!")
-        click.echo(f"Rules created: {result['created']}")
-        click.echo(f"Rules updated: {result['updated']}")
-        click.echo(f"Rules deleted: {result['deleted']}")
-        
-        if result['errors'] > 0:
-            click.echo(f"Errors encountered: {result['errors']} (check logs for details)")
-    
-    except Exception as e:
-        logger.error(f"Failed to restore ALB rules: {e}")
-        click.echo(f"Error: {e}")
-        raise click.Abort()
-
 if __name__ == '__main__':
-    cli()
\ No newline at end of file
+    cli()
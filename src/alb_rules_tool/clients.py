@@ -0,0 +1,248 @@
+"""Shared AWS client registry for the ALB Rules Tool."""
+
+import os
+import threading
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import DeferredRefreshableCredentials
+
+from alb_rules_tool.metrics import instrument_client
+
+logger = logging.getLogger(__name__)
+
+# Session name used when assuming a role for cross-account access
+ROLE_SESSION_NAME = "alb-rules-tool"
+
+# Defaults, overridable through environment variables or configure_clients()
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+DEFAULT_RETRY_MODE = "standard"
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+
+SessionKey = Tuple[Optional[str], Optional[str]]
+ClientKey = Tuple[str, Optional[str], Optional[str], Optional[str], bool]
+
+_lock = threading.RLock()
+_pid: Optional[int] = None
+_config: Optional[Config] = None
+_sessions: Dict[SessionKey, boto3.session.Session] = {}
+_clients: Dict[ClientKey, Any] = {}
+
+# False while the caller retries throttled calls itself, see caller_retries()
+_botocore_retries: ContextVar[bool] = ContextVar("alb_rules_botocore_retries", default=True)
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def build_client_config(max_pool_connections: Optional[int] = None,
+                        retry_mode: Optional[str] = None,
+                        max_attempts: Optional[int] = None,
+                        connect_timeout: Optional[float] = None,
+                        read_timeout: Optional[float] = None) -> Config:
+    """Build the botocore configuration shared by all clients.
+
+    Any setting not given falls back to its ``ALB_RULES_*`` environment
+    variable and then to the module default.
+
+    Args:
+        max_pool_connections: Size of each client's HTTP connection pool
+        retry_mode: botocore retry mode (legacy, standard or adaptive)
+        max_attempts: Maximum attempts per API call, including the first one
+        connect_timeout: Connection timeout in seconds
+        read_timeout: Read timeout in seconds
+
+    Returns:
+        botocore Config object
+    """
+    if max_pool_connections is None:
+        max_pool_connections = _env_int("ALB_RULES_MAX_POOL_CONNECTIONS",
+                                        DEFAULT_MAX_POOL_CONNECTIONS)
+    if retry_mode is None:
+        retry_mode = os.environ.get("ALB_RULES_RETRY_MODE", DEFAULT_RETRY_MODE)
+    if max_attempts is None:
+        max_attempts = _env_int("ALB_RULES_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+    if connect_timeout is None:
+        connect_timeout = _env_int("ALB_RULES_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)
+    if read_timeout is None:
+        read_timeout = _env_int("ALB_RULES_READ_TIMEOUT", DEFAULT_READ_TIMEOUT)
+
+    return Config(
+        max_pool_connections=max_pool_connections,
+        retries={"mode": retry_mode, "max_attempts": max_attempts},
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+    )
+
+def single_attempt_config(config: Config) -> Config:
+    """Return a copy of a client configuration that disables botocore retries."""
+    return config.merge(Config(retries={"mode": config.retries["mode"], "total_max_attempts": 1}))
+
+@contextmanager
+def caller_retries() -> Iterator[None]:
+    """Hand out clients that make a single attempt per call within the block.
+
+    Code that retries failed calls itself, with ``call_with_backoff``, runs
+    under this so that its retries do not multiply with botocore's and
+    throttling errors reach its backoff and concurrency limits right away.
+    ``call_with_backoff`` retries transient server and connection errors as
+    botocore would.
+    """
+    token = _botocore_retries.set(False)
+    try:
+        yield
+    finally:
+        _botocore_retries.reset(token)
+
+def botocore_retries() -> bool:
+    """Whether clients handed out now let botocore retry failed calls."""
+    return _botocore_retries.get()
+
+def configure_clients(**kwargs: Any) -> None:
+    """Configure the clients handed out by the registry.
+
+    Accepts the same keyword arguments as ``build_client_config``. Clients
+    created with the previous configuration are discarded.
+    """
+    global _config
+    with _lock:
+        _config = build_client_config(**kwargs)
+        _clients.clear()
+
+def reset_clients() -> None:
+    """Discard every cached session, client and custom configuration."""
+    global _config
+    with _lock:
+        _config = None
+        _sessions.clear()
+        _clients.clear()
+
+def _check_fork() -> None:
+    """Drop cached sessions inherited from a parent process.
+
+    Sessions and connection pools must not be shared across a fork.
+    Must be called with the registry lock held.
+    """
+    global _pid
+    pid = os.getpid()
+    if _pid != pid:
+        _sessions.clear()
+        _clients.clear()
+        _pid = pid
+
+def _client_config() -> Config:
+    """Return the shared client configuration, building it on first use."""
+    global _config
+    if _config is None:
+        _config = build_client_config()
+    return _config
+
+def _assume_role_session(base_session: boto3.session.Session,
+                         role_arn: str) -> boto3.session.Session:
+    """Create a session whose credentials come from assuming a role.
+
+    Credentials are fetched lazily and refreshed automatically before they
+    expire, so a long-lived session keeps working.
+    """
+    sts_client = base_session.client("sts", config=_client_config())
+
+    def refresh() -> Dict[str, str]:
+        credentials = sts_client.assume_role(
+            RoleArn=role_arn,
+            RoleSessionName=ROLE_SESSION_NAME
+        )["Credentials"]
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"].isoformat(),
+        }
+
+    botocore_session = botocore.session.get_session()
+    botocore_session._credentials = DeferredRefreshableCredentials(
+        refresh_using=refresh,
+        method="sts-assume-role"
+    )
+    if base_session.region_name:
+        botocore_session.set_config_variable("region", base_session.region_name)
+    return boto3.session.Session(botocore_session=botocore_session)
+
+def get_session(profile: Optional[str] = None,
+                role_arn: Optional[str] = None) -> boto3.session.Session:
+    """Return the process-wide session for a profile and role.
+
+    Args:
+        profile: AWS named profile (optional)
+        role_arn: ARN of an IAM role to assume (optional)
+
+    Returns:
+        Cached boto3 session
+    """
+    key = (profile, role_arn)
+    with _lock:
+        _check_fork()
+        session = _sessions.get(key)
+        if session is None:
+            session = boto3.session.Session(profile_name=profile)
+            if role_arn:
+                logger.debug("Assuming role %s for AWS session", role_arn)
+                session = _assume_role_session(session, role_arn)
+            _sessions[key] = session
+        return session
+
+def get_client(service_name: str,
+               region_name: Optional[str] = None,
+               profile: Optional[str] = None,
+               role_arn: Optional[str] = None) -> Any:
+    """Return a shared client for an AWS service.
+
+    Clients are cached per (service, region, profile, role) and are safe to
+    share between threads. Within ``caller_retries`` the client makes a
+    single attempt per call.
+
+    Args:
+        service_name: AWS service name, e.g. 'elbv2' or 's3'
+        region_name: AWS region name (optional, defaults to the session region)
+        profile: AWS named profile (optional)
+        role_arn: ARN of an IAM role to assume (optional)
+
+    Returns:
+        boto3 client for the service
+    """
+    with _lock:
+        session = get_session(profile, role_arn)
+        region_name = region_name or session.region_name
+        retries = botocore_retries()
+        key = (service_name, region_name, profile, role_arn, retries)
+        client = _clients.get(key)
+        if client is None:
+            logger.debug("Creating %s client for region %s", service_name, region_name)
+            config = _client_config()
+            client = instrument_client(session.client(
+                service_name,
+                region_name=region_name,
+                config=config if retries else single_attempt_config(config)
+            ))
+            _clients[key] = client
+        return client
+
+def region_from_arn(arn: str) -> Optional[str]:
+    """Extract the region from an AWS ARN.
+
+    Args:
+        arn: AWS resource ARN
+
+    Returns:
+        Region name, or None if the ARN has no region component
+    """
+    parts = arn.split(":")
+    if len(parts) > 3 and parts[0] == "arn" and parts[3]:
+        return parts[3]
+    return None
@@ -0,0 +1,32 @@
+"""Commands of the alb-rules CLI.
+
+Each module is only imported when one of its commands runs (see
+``cli.LazyGroup``), so the AWS SDK and other heavy dependencies they import
+do not slow down ``alb-rules --help`` or shell completion.
+"""
+
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from alb_rules_tool.metrics import recording, write_textfile
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE_HELP = 'Write API call and phase metrics to this Prometheus textfile'
+
+@contextmanager
+def exporting_metrics(metrics_file: Optional[str], command: str) -> Iterator[None]:
+    """Record the API calls of a command and write them to a Prometheus textfile.
+    
+    The file is written whether the command succeeds or fails.
+    """
+    with recording(command) as recorder:
+        try:
+            yield
+        finally:
+            if metrics_file:
+                try:
+                    write_textfile(recorder, metrics_file, {'command': command})
+                except OSError as e:
+                    logger.error("Failed to write metrics file %s: %s", metrics_file, e)
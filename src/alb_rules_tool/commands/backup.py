@@ -0,0 +1,185 @@
+"""backup and backup-fleet commands."""
+
+import click
+import logging
+from typing import Dict, Optional, Tuple
+
+from alb_rules_tool.backup import backup_alb_rules
+from alb_rules_tool.catalog import default_catalog_location
+from alb_rules_tool.commands import METRICS_FILE_HELP, exporting_metrics
+from alb_rules_tool.fleet import DEFAULT_MAX_WORKERS, backup_alb_rules_many, discover_listeners
+
+logger = logging.getLogger(__name__)
+
+CATALOG_HELP = ('Catalog recording the backups (SQLite file or s3://bucket/key); '
+                'defaults to $ALB_RULES_CATALOG or ~/.alb-rules/catalog.db')
+
+def _catalog_location(catalog: Optional[str], no_catalog: bool) -> Optional[str]:
+    """Return where backups are recorded, None when they are not."""
+    return None if no_catalog else catalog or default_catalog_location()
+
+@click.command()
+@click.argument('listener-arn', required=True)
+@click.option('--output', '-o', help='Output path for the backup file')
+@click.option('--format', '-f', type=click.Choice(['json', 'yaml'], case_sensitive=False), 
+              default='json', help='Output format (json or yaml)')
+@click.option('--s3-bucket', help='S3 bucket name for uploading the backup')
+@click.option('--no-local', is_flag=True, default=False,
+              help='Stream the backup straight to S3 without writing a local file')
+@click.option('--compress', type=click.Choice(['gzip', 'zstd'], case_sensitive=False),
+              help='Compress the backup (zstd requires the zstandard package)')
+@click.option('--compact', is_flag=True, default=False, help='Write JSON without indentation')
+@click.option('--skip-unchanged', is_flag=True, default=False,
+              help='Skip writing and uploading when the rules match the latest backup')
+@click.option('--store',
+              help='Save a deduplicated snapshot to this store (s3://bucket/prefix or directory)')
+@click.option('--catalog', help=CATALOG_HELP)
+@click.option('--no-catalog', is_flag=True, default=False,
+              help='Do not record the backup in a catalog')
+@click.option('--metrics-file', help=METRICS_FILE_HELP)
+def backup(listener_arn: str, output: Optional[str], format: str, s3_bucket: Optional[str],
+           no_local: bool, compress: Optional[str], compact: bool, skip_unchanged: bool,
+           store: Optional[str], catalog: Optional[str], no_catalog: bool,
+           metrics_file: Optional[str]) -> None:
+    """Backup ALB rules for a given listener ARN.
+    
+    LISTENER-ARN is the ARN of the ALB listener to backup rules from.
+    """
+    if no_local and not s3_bucket and not store:
+        raise click.UsageError("--no-local requires --s3-bucket or --store")
+    
+    with exporting_metrics(metrics_file, 'backup'):
+        try:
+            upload_to_s3 = s3_bucket is not None
+            result = backup_alb_rules(
+                listener_arn=listener_arn,
+                output_path=output,
+                format_type=format,
+                upload_to_s3=upload_to_s3,
+                s3_bucket=s3_bucket,
+                write_local=not no_local,
+                compression=compress,
+                compact=compact,
+                skip_unchanged=skip_unchanged,
+                store=store,
+                catalog=_catalog_location(catalog, no_catalog)
+            )
+        
+            if result.get('unchanged'):
+                click.echo("Rules unchanged since the last backup; existing backup is still valid.")
+            else:
+                click.echo(f"Backup completed successfully!")
+            if 'local_path' in result:
+                click.echo(f"Local backup file: {result['local_path']}")
+            if 'snapshot' in result:
+                click.echo(f"Snapshot: {result['snapshot']} "
+                           f"({result['new_objects']} new rule objects)")
+        
+            if upload_to_s3 and 's3_uri' in result:
+                click.echo(f"S3 URI: {result['s3_uri']}")
+    
+        except Exception as e:
+            logger.error("Failed to backup ALB rules: %s", e)
+            click.echo(f"Error: {e}")
+            raise click.Abort()
+
+def _parse_tags(tags: Tuple[str, ...]) -> Dict[str, Optional[str]]:
+    """Parse KEY=VALUE (or bare KEY) tag filters from the command line."""
+    parsed: Dict[str, Optional[str]] = {}
+    for tag in tags:
+        key, sep, value = tag.partition('=')
+        parsed[key] = value if sep else None
+    return parsed
+
+@click.command('backup-fleet')
+@click.option('--listener-arn', 'listener_arns', multiple=True,
+              help='Listener ARN to backup (repeatable)')
+@click.option('--load-balancer-arn', 'load_balancer_arns', multiple=True,
+              help='Backup every listener of this load balancer (repeatable)')
+@click.option('--name', 'names', multiple=True,
+              help='Load balancer name pattern, e.g. "prod-*" (repeatable)')
+@click.option('--tag', 'tags', multiple=True,
+              help='Load balancer tag as KEY=VALUE or KEY (repeatable)')
+@click.option('--region', help='AWS region to discover load balancers in')
+@click.option('--output-dir', '-o', default='.', help='Directory for the backup files and manifest')
+@click.option('--format', '-f', type=click.Choice(['json', 'yaml'], case_sensitive=False), 
+              default='json', help='Output format (json or yaml)')
+@click.option('--s3-bucket', help='S3 bucket name for uploading the backups')
+@click.option('--s3-prefix', default='', help='S3 key prefix for the uploaded backups')
+@click.option('--max-workers', type=click.IntRange(min=1), default=DEFAULT_MAX_WORKERS,
+              help='Maximum number of listeners backed up in parallel')
+@click.option('--no-local', is_flag=True, default=False,
+              help='Stream backups and the manifest straight to S3 without local files')
+@click.option('--compress', type=click.Choice(['gzip', 'zstd'], case_sensitive=False),
+              help='Compress the backups (zstd requires the zstandard package)')
+@click.option('--compact', is_flag=True, default=False, help='Write JSON without indentation')
+@click.option('--skip-unchanged', is_flag=True, default=False,
+              help='Skip writing and uploading when the rules match the latest backup')
+@click.option('--store',
+              help='Save deduplicated snapshots to this store (s3://bucket/prefix or directory)')
+@click.option('--catalog', help=CATALOG_HELP)
+@click.option('--no-catalog', is_flag=True, default=False,
+              help='Do not record the backups in a catalog')
+@click.option('--metrics-file', help=METRICS_FILE_HELP)
+def backup_fleet(listener_arns: Tuple[str, ...], load_balancer_arns: Tuple[str, ...],
+                 names: Tuple[str, ...], tags: Tuple[str, ...], region: Optional[str],
+                 output_dir: str, format: str, s3_bucket: Optional[str], s3_prefix: str,
+                 max_workers: int, no_local: bool, compress: Optional[str], compact: bool,
+                 skip_unchanged: bool, store: Optional[str], catalog: Optional[str],
+                 no_catalog: bool, metrics_file: Optional[str]) -> None:
+    """Backup ALB rules for many listeners in parallel.
+    
+    Listeners are given explicitly with --listener-arn, or discovered from
+    load balancer ARNs, name patterns and tags. Without any selector, every
+    application load balancer in the region is backed up.
+    """
+    if no_local and not s3_bucket:
+        raise click.UsageError("--no-local requires --s3-bucket")
+    
+    with exporting_metrics(metrics_file, 'backup-fleet'):
+        try:
+            targets = list(listener_arns)
+            if load_balancer_arns or names or tags or not targets:
+                targets.extend(discover_listeners(
+                    load_balancer_arns=list(load_balancer_arns) or None,
+                    names=list(names) or None,
+                    tags=_parse_tags(tags) or None,
+                    region_name=region
+                ))
+            # Keep the first occurrence of each listener
+            targets = list(dict.fromkeys(targets))
+        
+            click.echo(f"Backing up {len(targets)} listeners...")
+            manifest = backup_alb_rules_many(
+                listener_arns=targets,
+                output_dir=output_dir,
+                format_type=format,
+                s3_bucket=s3_bucket,
+                s3_prefix=s3_prefix,
+                max_workers=max_workers,
+                write_local=not no_local,
+                compression=compress,
+                compact=compact,
+                skip_unchanged=skip_unchanged,
+                store=store,
+                catalog=_catalog_location(catalog, no_catalog)
+            )
+        
+            click.echo(f"Fleet backup completed: {manifest['succeeded']} succeeded "
+                       f"({manifest['unchanged']} unchanged), {manifest['failed']} failed")
+            if 'manifest_path' in manifest:
+                click.echo(f"Manifest: {manifest['manifest_path']}")
+            if 'manifest_s3_uri' in manifest:
+                click.echo(f"S3 manifest URI: {manifest['manifest_s3_uri']}")
+        
+            if manifest['failed'] > 0:
+                raise click.ClickException(
+                    f"{manifest['failed']} listener backups failed (check logs for details)"
+                )
+    
+        except click.ClickException:
+            raise
+        except Exception as e:
+            logger.error("Failed to backup ALB fleet: %s", e)
+            click.echo(f"Error: {e}")
+            raise click.Abort()
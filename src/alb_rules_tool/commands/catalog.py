@@ -0,0 +1,82 @@
+"""list and find commands, answered from the backup catalog."""
+
+import json
+import click
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from alb_rules_tool.catalog import open_catalog
+
+logger = logging.getLogger(__name__)
+
+CATALOG_HELP = ('Catalog to query (SQLite file or s3://bucket/key); '
+                'defaults to $ALB_RULES_CATALOG or ~/.alb-rules/catalog.db')
+
+def _format_entry(entry: Dict[str, Any]) -> str:
+    """Render a catalog entry on one line."""
+    return (f"{entry['created_at']}  {entry['rule_count']:>5} rules  {entry['fingerprint'][:12]}  "
+            f"{entry['format']:<9} {entry['location']}")
+
+@click.command('list')
+@click.option('--listener-arn', help='Only backups of this listener')
+@click.option('--since', type=click.DateTime(),
+              help='Only backups taken at or after this local time')
+@click.option('--until', type=click.DateTime(),
+              help='Only backups taken at or before this local time')
+@click.option('--fingerprint', help='Only backups of this rule set fingerprint')
+@click.option('--limit', type=click.IntRange(min=1), default=50,
+              help='Maximum number of backups listed')
+@click.option('--catalog', help=CATALOG_HELP)
+@click.option('--json', 'as_json', is_flag=True, default=False, help='Print the backups as JSON')
+def list_backups(listener_arn: Optional[str], since: Optional[datetime],
+                 until: Optional[datetime], fingerprint: Optional[str], limit: int,
+                 catalog: Optional[str], as_json: bool) -> None:
+    """List recorded backups, newest first.
+
+    Times are shown in UTC.
+    """
+    try:
+        with open_catalog(catalog) as opened:
+            entries = opened.list(listener_arn, since, until, fingerprint, limit)
+    except Exception as e:
+        logger.error("Failed to list backups: %s", e)
+        click.echo(f"Error: {e}")
+        raise click.Abort()
+
+    if as_json:
+        click.echo(json.dumps(entries, indent=2))
+        return
+    for entry in entries:
+        line = _format_entry(entry)
+        click.echo(line if listener_arn else f"{line}  {entry['listener_arn']}")
+    if not entries:
+        click.echo("No backups found")
+
+@click.command()
+@click.argument('listener-arn', required=True)
+@click.option('--before', type=click.DateTime(),
+              help='Latest local time the backup may have been taken at')
+@click.option('--fingerprint', help='Only backups of this rule set fingerprint')
+@click.option('--catalog', help=CATALOG_HELP)
+@click.option('--json', 'as_json', is_flag=True, default=False,
+              help='Print the whole catalog entry as JSON')
+def find(listener_arn: str, before: Optional[datetime], fingerprint: Optional[str],
+         catalog: Optional[str], as_json: bool) -> None:
+    """Print the location of the latest backup of a listener.
+
+    LISTENER-ARN is the ARN of the ALB listener. With --before, the latest
+    backup taken at or before that time is found instead.
+    """
+    try:
+        with open_catalog(catalog) as opened:
+            entry = opened.find(listener_arn, before, fingerprint)
+    except Exception as e:
+        logger.error("Failed to find a backup: %s", e)
+        click.echo(f"Error: {e}")
+        raise click.Abort()
+
+    if entry is None:
+        when = f" before {before}" if before else ""
+        raise click.ClickException(f"No backup of {listener_arn}{when} in the catalog")
+    click.echo(json.dumps(entry, indent=2) if as_json else entry['location'])
@@ -0,0 +1,63 @@
+"""daemon command."""
+
+import click
+import logging
+import signal
+from typing import Any, Optional
+
+from alb_rules_tool.daemon import (
+    DEFAULT_FAILURE_THRESHOLD,
+    BackupDaemon,
+    load_schedule,
+    serve_status,
+)
+
+logger = logging.getLogger(__name__)
+
+@click.command()
+@click.argument('schedule-file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--health-host', default='127.0.0.1', help='Address of the health and status server')
+@click.option('--health-port', type=click.IntRange(min=0), default=8080,
+              help='Port of the health and status server (0 disables it)')
+@click.option('--status-file', help='Also write the daemon status to this JSON file')
+@click.option('--max-concurrent-jobs', type=click.IntRange(min=1), default=1,
+              help='Maximum number of backup jobs running at the same time')
+@click.option('--failure-threshold', type=click.IntRange(min=1), default=DEFAULT_FAILURE_THRESHOLD,
+              help='Consecutive failed runs of a job after which the daemon reports unhealthy')
+def daemon(schedule_file: str, health_host: str, health_port: int, status_file: Optional[str],
+           max_concurrent_jobs: int, failure_threshold: int) -> None:
+    """Run scheduled backups until stopped.
+    
+    SCHEDULE-FILE is a YAML or JSON file listing backup jobs, each with a
+    cron expression (UTC) and the listeners to back up. GET /healthz and
+    GET /status on the health server report on the daemon and its jobs.
+    """
+    try:
+        backup_daemon = BackupDaemon(
+            load_schedule(schedule_file),
+            max_concurrent_jobs=max_concurrent_jobs,
+            failure_threshold=failure_threshold,
+            status_file=status_file
+        )
+        backup_daemon.warm_up()
+    except Exception as e:
+        logger.error("Failed to start backup daemon: %s", e)
+        click.echo(f"Error: {e}")
+        raise click.Abort()
+    
+    server = serve_status(backup_daemon, health_host, health_port) if health_port else None
+    
+    def shutdown(signum: int, frame: Any) -> None:
+        logger.info("Received signal %s, stopping after running jobs finish", signum)
+        backup_daemon.stop()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    
+    click.echo(f"Backup daemon running {len(backup_daemon.jobs)} jobs")
+    try:
+        backup_daemon.run_forever()
+    finally:
+        if server:
+            server.shutdown()
+    click.echo("Backup daemon stopped")
@@ -0,0 +1,206 @@
+"""plan and restore commands."""
+
+import click
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from alb_rules_tool.cache import configure_cache
+from alb_rules_tool.commands import METRICS_FILE_HELP, exporting_metrics
+from alb_rules_tool.executor import DEFAULT_CONCURRENCY
+from alb_rules_tool.planner import (
+    FULL_RESTORE_STRATEGIES,
+    STRATEGY_SWAP,
+    describe_operation,
+    load_plan,
+    save_plan
+)
+from alb_rules_tool.restore import (
+    apply_restore_plan,
+    build_restore_plan,
+    restore_alb_rules
+)
+
+logger = logging.getLogger(__name__)
+
+def _default_plan_path() -> str:
+    """Build a timestamped file name for a restore plan."""
+    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    return f"alb-rules-plan-{timestamp}.json"
+
+def _echo_plan(plan: Dict[str, Any]) -> None:
+    """Print the API calls of a restore plan with its estimate."""
+    strategy = f", {plan['strategy']} strategy" if plan.get('strategy') else ""
+    click.echo(f"Restore plan for {plan['listener_arn']} ({plan['restore_mode']} mode{strategy}):")
+    for operation in plan['operations']:
+        for call in describe_operation(operation):
+            click.echo(f"  {call}")
+    if not plan['operations']:
+        click.echo("  No changes needed")
+    
+    summary = plan['summary']
+    click.echo(f"Rules to create: {summary['created']}")
+    click.echo(f"Rules to update: {summary['updated']}")
+    click.echo(f"Rules to move: {summary['moved']}")
+    click.echo(f"Rules to delete: {summary['deleted']}")
+    click.echo(f"Estimated API calls: {plan['estimate']['api_calls']}")
+    click.echo(f"Estimated duration: {plan['estimate']['duration_seconds']}s")
+
+def _backup_location(backup_file: Optional[str], s3_bucket: Optional[str],
+                     s3_key: Optional[str]) -> str:
+    """Return the backup to restore: an s3:// URI when it is in S3, read without a local copy."""
+    if s3_bucket and s3_key:
+        return f"s3://{s3_bucket}/{s3_key}"
+    if s3_bucket or s3_key:
+        raise click.UsageError("--s3-bucket and --s3-key must be given together")
+    if not backup_file:
+        raise click.UsageError("BACKUP-FILE is required unless --s3-bucket and --s3-key are given")
+    return backup_file
+
+CACHE_HELP = ('Keep S3 backups in a local cache, downloaded again only when their ETag changes '
+              '($ALB_RULES_CACHE_DIR, default ~/.alb-rules/cache)')
+
+def _enable_cache(cache: bool, backup_file: Optional[str]) -> None:
+    """Enable the backup cache for S3 backups unless disabled."""
+    if cache and backup_file and backup_file.startswith("s3://"):
+        configure_cache()
+
+FULL_STRATEGY_HELP = ('Full mode: build the restored rules before removing the existing ones '
+                      '(swap, falls back to delete-first near the rule quota) or delete them first')
+
+MINIMAL_MOVES_HELP = ("Restore the backup's rule order, not its exact priorities, "
+                      "moving as few rules as possible (incremental mode)")
+
+@click.command()
+@click.argument('listener-arn', required=True)
+@click.argument('backup-file', required=False)
+@click.option('--mode', type=click.Choice(['incremental', 'full'], case_sensitive=False),
+              default='incremental', help='Restore mode (incremental or full)')
+@click.option('--s3-bucket', help='S3 bucket name if backup file is in S3')
+@click.option('--s3-key', help='S3 key if backup file is in S3')
+@click.option('--output', '-o', help='Output path for the plan file')
+@click.option('--concurrency', type=click.IntRange(min=1), default=DEFAULT_CONCURRENCY,
+              help='Concurrency the duration estimate assumes')
+@click.option('--cache/--no-cache', default=True, help=CACHE_HELP)
+@click.option('--minimal-moves', is_flag=True, help=MINIMAL_MOVES_HELP)
+@click.option('--full-strategy', type=click.Choice(FULL_RESTORE_STRATEGIES), default=STRATEGY_SWAP,
+              help=FULL_STRATEGY_HELP)
+def plan(listener_arn: str, backup_file: Optional[str], mode: str, s3_bucket: Optional[str],
+         s3_key: Optional[str], output: Optional[str], concurrency: int, cache: bool,
+         minimal_moves: bool, full_strategy: str) -> None:
+    """Show and save the API calls a restore would make, without making them.
+    
+    LISTENER-ARN is the ARN of the ALB listener to restore rules to.
+    
+    BACKUP-FILE is the path to the backup file, or its s3://bucket/key URI.
+    S3 backups can also be given with --s3-bucket and --s3-key. They are
+    kept in a local cache and only downloaded again when they change.
+    
+    The saved plan can be applied later with `restore --plan-file`.
+    """
+    backup_file = _backup_location(backup_file, s3_bucket, s3_key)
+    _enable_cache(cache, backup_file)
+    try:
+        restore_plan = build_restore_plan(listener_arn, backup_file, mode, concurrency,
+                                          minimal_moves, full_strategy)
+        _echo_plan(restore_plan)
+        plan_path = save_plan(restore_plan, output or _default_plan_path())
+        click.echo(f"Plan file: {plan_path}")
+    
+    except Exception as e:
+        logger.error("Failed to plan ALB rules restore: %s", e)
+        click.echo(f"Error: {e}")
+        raise click.Abort()
+
+@click.command()
+@click.argument('listener-arn', required=True)
+@click.argument('backup-file', required=False)
+@click.option('--mode', type=click.Choice(['incremental', 'full'], case_sensitive=False),
+              default='incremental', help='Restore mode (incremental or full)')
+@click.option('--s3-bucket', help='S3 bucket name if backup file is in S3')
+@click.option('--s3-key', help='S3 key if backup file is in S3')
+@click.option('--concurrency', type=click.IntRange(min=1), default=DEFAULT_CONCURRENCY,
+              help='Maximum number of rule changes applied in parallel')
+@click.option('--dry-run', is_flag=True, help='Show and save the plan without changing any rule')
+@click.option('--plan-file', type=click.Path(exists=True, dir_okay=False),
+              help='Apply a plan saved by the plan command instead of comparing rules again')
+@click.option('--plan-output', help='Output path for the plan file written by --dry-run')
+@click.option('--metrics-file', help=METRICS_FILE_HELP)
+@click.option('--cache/--no-cache', default=True, help=CACHE_HELP)
+@click.option('--preflight/--no-preflight', default=True,
+              help='Check referenced target groups and quotas before changing any rule')
+@click.option('--minimal-moves', is_flag=True, help=MINIMAL_MOVES_HELP)
+@click.option('--full-strategy', type=click.Choice(FULL_RESTORE_STRATEGIES), default=STRATEGY_SWAP,
+              help=FULL_STRATEGY_HELP)
+def restore(listener_arn: str, backup_file: Optional[str], mode: str, 
+           s3_bucket: Optional[str], s3_key: Optional[str], concurrency: int,
+           dry_run: bool, plan_file: Optional[str], plan_output: Optional[str],
+           metrics_file: Optional[str], cache: bool, preflight: bool, minimal_moves: bool,
+           full_strategy: str) -> None:
+    """Restore ALB rules for a given listener ARN from a backup file.
+    
+    LISTENER-ARN is the ARN of the ALB listener to restore rules to.
+    
+    BACKUP-FILE is the path to the backup file, or its s3://bucket/key URI.
+    S3 backups can also be given with --s3-bucket and --s3-key. They are
+    kept in a local cache and only downloaded again when they change. It
+    is not needed with --plan-file.
+    """
+    if plan_file and dry_run:
+        raise click.UsageError("--dry-run cannot be combined with --plan-file")
+    # Where to restore from, unless a plan file is applied
+    location = ''
+    if not plan_file:
+        location = _backup_location(backup_file, s3_bucket, s3_key)
+        _enable_cache(cache, location)
+    
+    with exporting_metrics(metrics_file, 'restore'):
+        try:
+            if plan_file:
+                restore_plan = load_plan(plan_file)
+                if restore_plan['listener_arn'] != listener_arn:
+                    raise ValueError(
+                        f"Plan {plan_file} was made for listener {restore_plan['listener_arn']}"
+                    )
+                click.echo(f"Applying restore plan {plan_file}...")
+                result = apply_restore_plan(restore_plan, concurrency, preflight=preflight)
+            elif dry_run:
+                restore_plan = build_restore_plan(listener_arn, location, mode, concurrency,
+                                                  minimal_moves, full_strategy)
+                _echo_plan(restore_plan)
+                plan_path = save_plan(restore_plan, plan_output or _default_plan_path())
+                click.echo(f"Dry run, no rules were changed. Plan file: {plan_path}")
+                return
+            else:
+                click.echo(f"Restoring ALB rules in {mode} mode...")
+                result = restore_alb_rules(
+                    listener_arn=listener_arn,
+                    backup_file=location,
+                    restore_mode=mode,
+                    concurrency=concurrency,
+                    preflight=preflight,
+                    minimal_moves=minimal_moves,
+                    full_strategy=full_strategy
+                )
+        
+            click.echo("Restore completed successfully!")
+            click.echo(f"Rules created: {result['created']}")
+            click.echo(f"Rules updated: {result['updated']}")
+            click.echo(f"Rules moved: {result['moved']}")
+            click.echo(f"Rules deleted: {result['deleted']}")
+            click.echo(f"API calls: {result['api_calls']} ({result['calls_saved']} saved)")
+            if 'misroute_window_seconds' in result:
+                click.echo(f"Misroute window: {result['misroute_window_seconds']}s "
+                           f"({result['strategy']} strategy)")
+        
+            if result['errors'] > 0:
+                click.echo(f"Errors encountered: {result['errors']} (check logs for details)")
+            if result['skipped'] > 0:
+                click.echo(f"Operations skipped after an error: {result['skipped']}")
+            if 'rolled_back' in result:
+                click.echo(f"Rules rolled back: {result['rolled_back']}")
+    
+        except Exception as e:
+            logger.error("Failed to restore ALB rules: %s", e)
+            click.echo(f"Error: {e}")
+            raise click.Abort()
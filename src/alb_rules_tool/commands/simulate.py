@@ -0,0 +1,67 @@
+"""simulate command."""
+
+import io
+import sys
+import click
+import logging
+from typing import Optional
+
+from alb_rules_tool.backup import describe_alb_rules
+from alb_rules_tool.restore import load_backup_file
+from alb_rules_tool.serialization import open_decompressed
+from alb_rules_tool.simulate import DEFAULT_CHUNK_SIZE, simulate as simulate_requests
+
+logger = logging.getLogger(__name__)
+
+@click.command()
+@click.argument('requests-file', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--listener-arn', help='Match against the current rules of this listener')
+@click.option('--backup-file',
+              help='Match against the rules of this backup file or s3://bucket/key URI')
+@click.option('--output', '-o',
+              help='Write the line number and winning rule of every request to this file')
+@click.option('--processes', type=click.IntRange(min=1),
+              help='Worker processes (defaults to the number of CPUs)')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=DEFAULT_CHUNK_SIZE,
+              help='Requests matched per batch')
+def simulate(requests_file: str, listener_arn: Optional[str], backup_file: Optional[str],
+             output: Optional[str], processes: Optional[int], chunk_size: int) -> None:
+    """Show which rule each recorded request would hit.
+
+    REQUESTS-FILE holds one request per line: ALB access log entries, or
+    JSON objects with method, host, path, query, headers and source_ip.
+    Gzip and zstd files are read as is; '-' reads standard input.
+
+    The rules come from a listener (--listener-arn) or a backup
+    (--backup-file). Nothing is sent to the load balancer.
+    """
+    if bool(listener_arn) == bool(backup_file):
+        raise click.UsageError("Exactly one of --listener-arn and --backup-file is required")
+
+    try:
+        if listener_arn:
+            rules = describe_alb_rules(listener_arn)
+        else:
+            assert backup_file is not None, "checked above"
+            rules = load_backup_file(backup_file)
+        raw = sys.stdin.buffer if requests_file == '-' else open(requests_file, 'rb')
+        with io.TextIOWrapper(open_decompressed(raw), encoding='utf-8', errors='replace') as lines:
+            if output:
+                with open(output, 'w') as f:
+                    result = simulate_requests(rules, lines, processes, chunk_size, output=f)
+            else:
+                result = simulate_requests(rules, lines, processes, chunk_size)
+    except Exception as e:
+        logger.error("Failed to simulate requests: %s", e)
+        click.echo(f"Error: {e}")
+        raise click.Abort()
+
+    requests = result['requests']
+    click.echo(f"Requests: {requests} ({result['lines'] - requests} lines skipped)")
+    for priority, hits in result['hits'].items():
+        share = 100.0 * hits / requests if requests else 0.0
+        click.echo(f"  {priority:>8}  {hits:>10}  {share:6.2f}%")
+    if result['unmatched']:
+        click.echo(f"Unmatched requests: {result['unmatched']}")
+    if output:
+        click.echo(f"Matches written to {output}")
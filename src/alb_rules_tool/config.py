@@ -2,22 +2,24 @@
 
 import os
 from typing import Dict, Optional, Any
-import boto3
 import json
 import logging
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 def load_aws_config() -> Dict[str, str]:
     """Load AWS configuration from environment variables.
     
+    Variables from a .env file are loaded first, without overriding the
+    environment.
+    
     Returns:
         Dictionary with AWS configuration
     """
+    # Imported here, like get_client below, to keep importing this module cheap
+    from dotenv import load_dotenv
+    load_dotenv()
+    
     config = {}
     
     # AWS credentials and region
@@ -45,19 +47,17 @@ def get_secret(secret_name: str, region_name: Optional[str] = None) -> Dict[str,
     if not region_name:
         region_name = os.environ.get("AWS_REGION", os.environ.get("AWS_DEFAULT_REGION"))
     
-    # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region_name
-    )
+    from alb_rules_tool.clients import get_client
+    
+    # Get the shared Secrets Manager client
+    client = get_client('secretsmanager', region_name=region_name)
     
     try:
         get_secret_value_response = client.get_secret_value(
             SecretId=secret_name
         )
     except Exception as e:
-        logger.error(f"Error retrieving secret {secret_name}: {e}")
+        logger.error("Error retrieving secret %s: %s", secret_name, e)
         raise
     
     # Parse the secret string
@@ -65,5 +65,5 @@ def get_secret(secret_name: str, region_name: Optional[str] = None) -> Dict[str,
         secret = get_secret_value_response['SecretString']
         return json.loads(secret)
     else:
-        logger.error(f"Secret {secret_name} does not contain SecretString")
+        logger.error("Secret %s does not contain SecretString", secret_name)
         raise ValueError(f"Secret {secret_name} does not contain SecretString")
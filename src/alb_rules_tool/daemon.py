@@ -0,0 +1,474 @@
+"""Long-running scheduled backup daemon.
+
+The daemon reads a schedule of backup jobs, each with a cron expression
+and the listeners to back up, and runs them in one process, so the
+interpreter, boto3 and the AWS clients are loaded and authenticated once.
+Runs are shifted by a stable per-job offset so that jobs sharing a cron
+expression do not hit the ELBv2 API at the same moment.
+
+Schedule file (YAML or JSON)::
+
+    defaults:
+      s3_bucket: my-backup-bucket
+      skip_unchanged: true
+      spread_seconds: 300
+    jobs:
+      - name: prod
+        cron: "0 * * * *"
+        names: ["prod-*"]
+      - name: payments
+        cron: "*/15 * * * *"
+        listener_arns: ["arn:aws:elasticloadbalancing:..."]
+"""
+
+import json
+import yaml
+import zlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from alb_rules_tool.clients import get_client, get_session
+from alb_rules_tool.fleet import DEFAULT_MAX_WORKERS, backup_alb_rules_many, discover_listeners
+
+logger = logging.getLogger(__name__)
+
+# Longest random-looking delay added to a job's scheduled time, in seconds
+DEFAULT_SPREAD_SECONDS = 300
+
+# Consecutive failed runs after which a job makes the daemon unhealthy
+DEFAULT_FAILURE_THRESHOLD = 3
+
+# Jobs running at the same time; one keeps API usage smooth
+DEFAULT_MAX_CONCURRENT_JOBS = 1
+
+# Longest time the scheduler sleeps before checking for work again
+SCHEDULER_TICK_SECONDS = 30
+
+# Job settings passed through to backup_alb_rules_many
+BACKUP_OPTIONS = (
+    'output_dir', 'format_type', 's3_bucket', 's3_prefix', 'max_workers',
+    'write_local', 'compression', 'compact', 'skip_unchanged', 'store', 'catalog',
+)
+
+# Job settings selecting the listeners to back up
+SELECTOR_OPTIONS = ('listener_arns', 'load_balancer_arns', 'names', 'tags', 'region')
+
+_CRON_FIELDS: Tuple[Tuple[str, int, int, Dict[str, int]], ...] = (
+    # name, minimum, maximum, aliases
+    ('minute', 0, 59, {}),
+    ('hour', 0, 23, {}),
+    ('day of month', 1, 31, {}),
+    ('month', 1, 12, {name: index + 1 for index, name in enumerate(
+        ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}),
+    ('day of week', 0, 7, {name: index for index, name in enumerate(
+        ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}),
+)
+
+_CRON_MACROS = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+}
+
+class CronExpression:
+    """Standard five-field cron expression.
+
+    Supports ``*``, values, ranges (``1-5``), steps (``*/15``, ``0-30/10``),
+    lists, month and weekday names and the ``@hourly``-style macros. As in
+    cron, when both the day of month and the day of week are restricted, a
+    day matching either one matches.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = _CRON_MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression '{expression}': expected 5 fields")
+
+        parsed = [self._parse_field(field, *spec) for field, spec in zip(fields, _CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # Both 0 and 7 mean Sunday
+        self.weekdays = {day % 7 for day in weekdays}
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    def _parse_field(self, field: str, name: str, minimum: int, maximum: int,
+                     aliases: Dict[str, int]) -> Set[int]:
+        def value(text: str) -> int:
+            number = aliases.get(text.lower())
+            if number is None:
+                try:
+                    number = int(text)
+                except ValueError:
+                    raise ValueError(
+                        f"Invalid {name} '{text}' in cron expression '{self.expression}'"
+                    )
+            if not minimum <= number <= maximum:
+                raise ValueError(
+                    f"{name.capitalize()} {number} out of range in '{self.expression}'"
+                )
+            return number
+
+        values: Set[int] = set()
+        for part in field.split(','):
+            base, _, step_text = part.partition('/')
+            step = int(step_text) if step_text else 1
+            if step < 1:
+                raise ValueError(f"Invalid step in cron expression '{self.expression}'")
+            if base == '*':
+                start, end = minimum, maximum
+            elif '-' in base:
+                start_text, end_text = base.split('-', 1)
+                start, end = value(start_text), value(end_text)
+            else:
+                start = value(base)
+                end = maximum if step_text else start
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_match = moment.day in self.days
+        # cron counts weekdays from Sunday, datetime from Monday
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Return the first matching minute strictly after a moment.
+
+        Args:
+            moment: Reference time; its timezone, if any, is kept
+
+        Returns:
+            Next matching time
+
+        Raises:
+            ValueError: If the expression never matches (e.g. February 30)
+        """
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                # First minute of next month
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1,
+                                              day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+def spread_offset(name: str, spread_seconds: float) -> float:
+    """Return a stable offset in [0, spread_seconds) for a job name.
+
+    The offset depends only on the name, so a job keeps its slot across
+    restarts while different jobs are spread over the window.
+    """
+    if spread_seconds <= 0:
+        return 0.0
+    return (zlib.crc32(name.encode('utf-8')) % 10000) / 10000 * spread_seconds
+
+class BackupJob:
+    """A scheduled fleet backup and the state of its runs."""
+
+    def __init__(self, name: str, cron: str, options: Dict[str, Any],
+                 spread_seconds: float = DEFAULT_SPREAD_SECONDS):
+        self.name = name
+        self.cron = CronExpression(cron)
+        self.options = options
+        self.offset = spread_offset(name, spread_seconds)
+        self.next_run: Optional[datetime] = None
+        self.running = False
+        self.last_run: Optional[datetime] = None
+        self.last_success: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.consecutive_failures = 0
+        self.runs = 0
+
+    def schedule_after(self, moment: datetime) -> datetime:
+        """Set and return the next run time after a moment, offset included."""
+        # Offsetting the reference as well keeps a run from repeating in its own window
+        base = self.cron.next_after(moment - timedelta(seconds=self.offset))
+        self.next_run = base + timedelta(seconds=self.offset)
+        return self.next_run
+
+    def status(self) -> Dict[str, Any]:
+        """Return the job's state as a JSON-serializable dictionary."""
+        def iso(moment: Optional[datetime]) -> Optional[str]:
+            return moment.isoformat() if moment else None
+
+        return {
+            'name': self.name,
+            'cron': self.cron.expression,
+            'offset_seconds': round(self.offset, 1),
+            'running': self.running,
+            'next_run': iso(self.next_run),
+            'last_run': iso(self.last_run),
+            'last_success': iso(self.last_success),
+            'last_error': self.last_error,
+            'consecutive_failures': self.consecutive_failures,
+            'runs': self.runs,
+            'last_result': self.last_result,
+        }
+
+def load_schedule(path: str) -> List[BackupJob]:
+    """Load backup jobs from a YAML or JSON schedule file.
+
+    Each job needs a 'name' and a 'cron' expression. Listener selectors
+    (listener_arns, load_balancer_arns, names, tags, region) and backup
+    options (output_dir, format_type, s3_bucket, s3_prefix, max_workers,
+    write_local, compression, compact, skip_unchanged, store) can be set
+    per job or under 'defaults'.
+
+    Args:
+        path: Path to the schedule file
+
+    Returns:
+        List of backup jobs
+
+    Raises:
+        ValueError: If the schedule is invalid
+    """
+    with open(path) as f:
+        schedule = yaml.safe_load(f) or {}
+    if not isinstance(schedule, dict) or not schedule.get('jobs'):
+        raise ValueError(f"Schedule {path} has no jobs")
+
+    defaults = schedule.get('defaults') or {}
+    known = set(BACKUP_OPTIONS) | set(SELECTOR_OPTIONS) | {'name', 'cron', 'spread_seconds'}
+    jobs = []
+    names: Set[str] = set()
+    for index, entry in enumerate(schedule['jobs']):
+        settings = {**defaults, **entry}
+        unknown = set(settings) - known
+        if unknown:
+            raise ValueError(f"Unknown settings in job {index}: {', '.join(sorted(unknown))}")
+        name = settings.get('name') or f"job-{index}"
+        if name in names:
+            raise ValueError(f"Duplicate job name: {name}")
+        names.add(name)
+        if not settings.get('cron'):
+            raise ValueError(f"Job {name} has no cron expression")
+        options = {key: settings[key] for key in BACKUP_OPTIONS + SELECTOR_OPTIONS
+                   if key in settings}
+        jobs.append(BackupJob(name, settings['cron'], options,
+                              settings.get('spread_seconds', DEFAULT_SPREAD_SECONDS)))
+    return jobs
+
+def run_backup_job(options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one fleet backup with a job's options.
+
+    Listeners are discovered on every run, so new load balancers matching
+    the selectors are picked up without restarting the daemon.
+
+    Returns:
+        Manifest of the fleet backup
+    """
+    listener_arns = list(options.get('listener_arns') or [])
+    selected = any(options.get(key) for key in ('load_balancer_arns', 'names', 'tags'))
+    if selected or not listener_arns:
+        listener_arns.extend(discover_listeners(
+            load_balancer_arns=options.get('load_balancer_arns'),
+            names=options.get('names'),
+            tags=options.get('tags'),
+            region_name=options.get('region')
+        ))
+    listener_arns = list(dict.fromkeys(listener_arns))
+    backup_options = {key: options[key] for key in BACKUP_OPTIONS if key in options}
+    backup_options.setdefault('max_workers', DEFAULT_MAX_WORKERS)
+    return backup_alb_rules_many(listener_arns, **backup_options)
+
+class BackupDaemon:
+    """Run backup jobs on their schedule and report their state."""
+
+    def __init__(self, jobs: List[BackupJob],
+                 max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 status_file: Optional[str] = None,
+                 runner: Callable[[Dict[str, Any]], Dict[str, Any]] = run_backup_job,
+                 clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc)):
+        if not jobs:
+            raise ValueError("At least one job is required")
+        self.jobs = jobs
+        self.failure_threshold = failure_threshold
+        self.status_file = status_file
+        self._runner = runner
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent_jobs)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running: Set[Future] = set()
+        self.started_at: Optional[datetime] = None
+        self.last_tick: Optional[datetime] = None
+
+    def warm_up(self) -> None:
+        """Resolve credentials and create the AWS clients before the first run."""
+        # Resolving credentials now surfaces configuration errors at startup
+        if get_session().get_credentials() is None:
+            logger.warning("No AWS credentials found; "
+                           "backup jobs will fail until some are configured")
+        regions = {job.options.get('region') for job in self.jobs}
+        for region in regions:
+            get_client('elbv2', region)
+        if any(job.options.get('s3_bucket') or str(job.options.get('store', '')).startswith('s3://')
+               for job in self.jobs):
+            get_client('s3')
+        logger.info("Warmed AWS clients for %s region(s)", len(regions))
+
+    def _run_job(self, job: BackupJob) -> None:
+        started = self._clock()
+        logger.info("Starting backup job %s", job.name)
+        try:
+            manifest = self._runner(job.options)
+            summary = {key: manifest.get(key)
+                       for key in ('listener_count', 'succeeded', 'unchanged', 'failed')}
+            if manifest.get('failed'):
+                raise RuntimeError(f"{manifest['failed']} listener backups failed")
+            with self._lock:
+                job.last_success = self._clock()
+                job.last_error = None
+                job.consecutive_failures = 0
+                job.last_result = summary
+            logger.info("Backup job %s finished in %.1fs: %s",
+                        job.name, (self._clock() - started).total_seconds(), summary)
+        except Exception as e:
+            with self._lock:
+                job.last_error = str(e)
+                job.consecutive_failures += 1
+            logger.error("Backup job %s failed: %s", job.name, e)
+        finally:
+            with self._lock:
+                job.running = False
+                job.runs += 1
+            self.write_status()
+
+    def run_pending(self) -> float:
+        """Start the jobs that are due and return the seconds until the next one."""
+        now = self._clock()
+        with self._lock:
+            self.last_tick = now
+            for job in self.jobs:
+                next_run = job.next_run
+                if next_run is None:
+                    next_run = job.schedule_after(now)
+                    logger.info("Job %s next runs at %s", job.name, next_run.isoformat())
+                if next_run <= now:
+                    if job.running:
+                        logger.warning("Job %s is still running, skipping this run", job.name)
+                    else:
+                        job.running = True
+                        job.last_run = now
+                        future = self._pool.submit(self._run_job, job)
+                        self._running.add(future)
+                        future.add_done_callback(self._running.discard)
+                    job.schedule_after(now)
+            next_due = min(job.next_run for job in self.jobs if job.next_run)
+        return max(0.0, (next_due - now).total_seconds())
+
+    def run_forever(self) -> None:
+        """Run jobs on schedule until ``stop`` is called."""
+        self.started_at = self._clock()
+        self.write_status()
+        while not self._stop.is_set():
+            wait = self.run_pending()
+            self._stop.wait(min(wait, SCHEDULER_TICK_SECONDS))
+        self._pool.shutdown(wait=True)
+        self.write_status()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Wait until the jobs started so far have finished."""
+        wait(list(self._running), timeout=timeout)
+
+    def stop(self) -> None:
+        """Ask the scheduler loop to exit once running jobs are done."""
+        self._stop.set()
+
+    def healthy(self) -> bool:
+        """Whether the scheduler is alive and no job keeps failing."""
+        with self._lock:
+            if self.last_tick is None:
+                return False
+            elapsed = (self._clock() - self.last_tick).total_seconds()
+            stale = elapsed > 2 * SCHEDULER_TICK_SECONDS + 5
+            failing = any(job.consecutive_failures >= self.failure_threshold for job in self.jobs)
+        return not stale and not failing
+
+    def status(self) -> Dict[str, Any]:
+        """Return the daemon and job states as a JSON-serializable dictionary."""
+        with self._lock:
+            jobs = [job.status() for job in self.jobs]
+            last_tick = self.last_tick
+        return {
+            'healthy': self.healthy(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'last_tick': last_tick.isoformat() if last_tick else None,
+            'jobs': jobs,
+        }
+
+    def write_status(self) -> None:
+        """Write the status to the status file, if one is configured."""
+        if not self.status_file:
+            return
+        try:
+            with open(self.status_file, 'w') as f:
+                json.dump(self.status(), f, indent=2)
+        except OSError as e:
+            logger.warning("Could not write status file %s: %s", self.status_file, e)
+
+def serve_status(daemon: BackupDaemon, host: str = '127.0.0.1',
+                 port: int = 8080) -> ThreadingHTTPServer:
+    """Serve health and status over HTTP on a background thread.
+
+    ``GET /healthz`` answers 200 when healthy and 503 otherwise;
+    ``GET /status`` returns the daemon status as JSON.
+
+    Args:
+        daemon: Daemon to report on
+        host: Address to listen on
+        port: Port to listen on (0 picks a free port)
+
+    Returns:
+        The running server; call ``shutdown()`` to stop it
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path in ('/healthz', '/health'):
+                healthy = daemon.healthy()
+                self._reply(200 if healthy else 503, {'healthy': healthy})
+            elif self.path == '/status':
+                status = daemon.status()
+                self._reply(200 if status['healthy'] else 503, status)
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def _reply(self, code: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body, indent=2).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("Status server: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name='alb-rules-status', daemon=True)
+    thread.start()
+    logger.info("Serving health and status on http://%s:%s", host, server.server_address[1])
+    return server
@@ -0,0 +1,309 @@
+"""Content-based comparison of ALB rule sets."""
+
+import json
+import hashlib
+import logging
+from functools import reduce
+from math import gcd
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Condition fields whose values ALB matches case-insensitively
+CASE_INSENSITIVE_FIELDS = frozenset(['host-header', 'http-request-method'])
+
+# Condition fields whose values are echoed both in 'Values' and in a config block
+CONDITION_CONFIG_KEYS = {
+    'host-header': 'HostHeaderConfig',
+    'path-pattern': 'PathPatternConfig',
+}
+
+# Action attributes ALB fills in when they are not given
+ACTION_DEFAULTS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    'redirect': {
+        'RedirectConfig': {
+            'Protocol': '#{protocol}',
+            'Port': '#{port}',
+            'Host': '#{host}',
+            'Path': '/#{path}',
+            'Query': '#{query}',
+        },
+    },
+    'authenticate-oidc': {
+        'AuthenticateOidcConfig': {
+            'SessionCookieName': 'AWSELBAuthSessionCookie',
+            'Scope': 'openid',
+            'SessionTimeout': 604800,
+            'OnUnauthenticatedRequest': 'authenticate',
+        },
+    },
+    'authenticate-cognito': {
+        'AuthenticateCognitoConfig': {
+            'SessionCookieName': 'AWSELBAuthSessionCookie',
+            'Scope': 'openid',
+            'SessionTimeout': 604800,
+            'OnUnauthenticatedRequest': 'authenticate',
+        },
+    },
+}
+
+def _canonical_condition(condition: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a rule condition so equivalent conditions compare equal."""
+    field = condition.get('Field')
+    canonical: Dict[str, Any] = {'Field': field}
+    lower = field in CASE_INSENSITIVE_FIELDS
+
+    def values(items: Iterable[str]) -> List[str]:
+        return sorted({item.lower() if lower else item for item in items})
+
+    config_key = CONDITION_CONFIG_KEYS.get(field or '')
+    if config_key:
+        # 'Values' and the config block are two spellings of the same thing
+        merged = list(condition.get('Values') or [])
+        merged.extend((condition.get(config_key) or {}).get('Values') or [])
+        canonical['Values'] = values(merged)
+    elif field == 'http-header':
+        config = condition.get('HttpHeaderConfig') or {}
+        canonical['HttpHeaderName'] = (config.get('HttpHeaderName') or '').lower()
+        canonical['Values'] = values(config.get('Values') or [])
+    elif field == 'http-request-method':
+        config = condition.get('HttpRequestMethodConfig') or {}
+        canonical['Values'] = values(config.get('Values') or [])
+    elif field == 'source-ip':
+        config = condition.get('SourceIpConfig') or {}
+        canonical['Values'] = values(config.get('Values') or [])
+    elif field == 'query-string':
+        config = condition.get('QueryStringConfig') or {}
+        pairs = {(pair.get('Key'), pair.get('Value')) for pair in config.get('Values') or []}
+        canonical['Values'] = [
+            {'Key': key, 'Value': value}
+            for key, value in sorted(pairs, key=lambda pair: (pair[0] or '', pair[1] or ''))
+        ]
+    else:
+        canonical.update({key: value for key, value in condition.items() if key != 'Field'})
+    return canonical
+
+def _canonical_target_groups(action: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the weighted target groups of a forward action in lowest terms."""
+    forward_config = action.get('ForwardConfig') or {}
+    groups = forward_config.get('TargetGroups') or []
+    if groups:
+        weighted = [(group['TargetGroupArn'], group.get('Weight', 1)) for group in groups]
+    elif action.get('TargetGroupArn'):
+        weighted = [(action['TargetGroupArn'], 1)]
+    else:
+        weighted = []
+
+    # 50/50 and 1/1 split traffic the same way
+    divisor = reduce(gcd, (weight for _, weight in weighted if weight), 0) or 1
+    return [
+        {'TargetGroupArn': arn, 'Weight': weight // divisor}
+        for arn, weight in sorted(weighted)
+    ]
+
+def _canonical_action(action: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a rule action so equivalent actions compare equal."""
+    action_type = action.get('Type')
+    canonical: Dict[str, Any] = {'Type': action_type}
+
+    if action_type == 'forward':
+        canonical['TargetGroups'] = _canonical_target_groups(action)
+        stickiness = (action.get('ForwardConfig') or {}).get('TargetGroupStickinessConfig') or {}
+        if stickiness.get('Enabled'):
+            canonical['Stickiness'] = stickiness.get('DurationSeconds')
+        return canonical
+
+    defaults = ACTION_DEFAULTS.get(action_type or '', {})
+    for key, value in action.items():
+        if key in ('Type', 'Order'):
+            continue
+        if isinstance(value, dict) and key in defaults:
+            value = {
+                name: item for name, item in value.items()
+                if defaults[key].get(name) != item
+            }
+        canonical[key] = value
+    return canonical
+
+def canonical_actions(rule: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return a rule's actions in canonical form, in evaluation order."""
+    actions = list(rule.get('Actions') or [])
+    # Order is filled in by ALB; only the relative order matters
+    actions.sort(key=lambda action: action.get('Order', 0))
+    return [_canonical_action(action) for action in actions]
+
+def canonical_conditions(rule: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return a rule's conditions in canonical form, in a stable order."""
+    conditions = [_canonical_condition(condition) for condition in rule.get('Conditions') or []]
+    conditions.sort(key=lambda condition: json.dumps(condition, sort_keys=True))
+    return conditions
+
+def canonicalize_rule(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the canonical form of what a rule matches and does.
+
+    The priority, ARN and other server-assigned fields are left out, so two
+    rules with the same canonical form route traffic identically.
+
+    Args:
+        rule: ALB rule as returned by describe_rules or read from a backup
+
+    Returns:
+        Dictionary with canonical 'Actions' and 'Conditions'
+    """
+    return {'Actions': canonical_actions(rule), 'Conditions': canonical_conditions(rule)}
+
+def _digest(value: Any) -> str:
+    """Hash a JSON-serializable value."""
+    encoded = json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+def _combine(actions_digest: str, conditions_digest: str) -> str:
+    """Combine the digests of a rule's actions and conditions into its hash."""
+    return _digest([actions_digest, conditions_digest])
+
+def rule_hash(rule: Dict[str, Any]) -> str:
+    """Compute the content hash of a rule, independent of its priority.
+
+    Args:
+        rule: ALB rule
+
+    Returns:
+        Hex-encoded SHA-256 over the canonical actions and conditions
+    """
+    return _combine(_digest(canonical_actions(rule)), _digest(canonical_conditions(rule)))
+
+def rules_equivalent(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+    """Check whether two rules route traffic identically, ignoring priority."""
+    return canonicalize_rule(first) == canonicalize_rule(second)
+
+def rule_set_fingerprint(rules: Iterable[Dict[str, Any]]) -> str:
+    """Compute a stable fingerprint of a listener's whole rule set.
+
+    The fingerprint covers every rule, including the default rule, by
+    priority and content hash. It does not depend on the order rules are
+    listed in, nor on anything ``canonicalize_rule`` ignores.
+
+    Args:
+        rules: Iterable of ALB rules
+
+    Returns:
+        Hex-encoded SHA-256 fingerprint
+    """
+    entries = sorted((str(rule['Priority']), rule_hash(rule)) for rule in rules)
+    return _digest(entries)
+
+class RuleSetFingerprint:
+    """``rule_set_fingerprint`` computed while the rules stream past.
+
+    Only the priority and hash of each rule are kept, so rules written
+    straight from DescribeRules pages to a backup can be fingerprinted
+    without holding them all in memory.
+    """
+
+    def __init__(self) -> None:
+        self._entries: List[Tuple[str, str]] = []
+
+    def track(self, rules: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield the rules unchanged, adding each one to the fingerprint."""
+        for rule in rules:
+            self._entries.append((str(rule['Priority']), rule_hash(rule)))
+            yield rule
+
+    @property
+    def rule_count(self) -> int:
+        """Number of rules seen so far."""
+        return len(self._entries)
+
+    def hexdigest(self) -> str:
+        """Return the fingerprint of the rules seen so far."""
+        return _digest(sorted(self._entries))
+
+class _IndexedRule:
+    """A rule with its priority and canonical parts computed once."""
+
+    __slots__ = ('rule', 'priority', 'actions', 'conditions', 'hash')
+
+    def __init__(self, rule: Dict[str, Any]):
+        self.rule = rule
+        self.priority = int(rule['Priority'])
+        self.actions = _digest(canonical_actions(rule))
+        self.conditions = _digest(canonical_conditions(rule))
+        self.hash = _combine(self.actions, self.conditions)
+
+def _index(rules: Iterable[Dict[str, Any]]) -> Dict[int, _IndexedRule]:
+    """Index non-default rules by priority."""
+    indexed = (_IndexedRule(rule) for rule in rules if rule['Priority'] != 'default')
+    return {item.priority: item for item in indexed}
+
+def diff_rules(existing_rules: Iterable[Dict[str, Any]],
+               backup_rules: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compute the smallest set of changes turning existing rules into backup rules.
+
+    Rules are canonicalized and hashed once. They are matched by content
+    hash first and by priority second:
+
+    1. A rule with the same hash at the same priority is unchanged.
+    2. A rule whose hash exists at another priority is moved. Candidates
+       are paired in priority order, which keeps their relative order.
+    3. Remaining rules sharing a priority are modified, noting whether the
+       actions, the conditions or both changed.
+
+    Everything left is created or deleted. Both inputs are consumed once
+    and the cost is linear in the number of rules.
+
+    Args:
+        existing_rules: Iterable of existing ALB rules
+        backup_rules: Iterable of backup ALB rules
+
+    Returns:
+        Dictionary with:
+            - 'unchanged': priorities of rules left as they are
+            - 'moves': dicts with the existing 'rule', 'from' and 'to' priorities
+            - 'modifies': dicts with 'existing', 'backup', 'actions_changed'
+              and 'conditions_changed'
+            - 'creates': backup rules to create
+            - 'deletes': existing rules to delete
+    """
+    existing = _index(existing_rules)
+    backup = _index(backup_rules)
+
+    unchanged = [
+        priority for priority, item in sorted(backup.items())
+        if priority in existing and existing[priority].hash == item.hash
+    ]
+    for priority in unchanged:
+        del existing[priority]
+        del backup[priority]
+
+    existing_by_hash: Dict[str, List[_IndexedRule]] = {}
+    for priority in sorted(existing):
+        existing_by_hash.setdefault(existing[priority].hash, []).append(existing[priority])
+
+    moves: List[Dict[str, Any]] = []
+    for priority in sorted(backup):
+        candidates = existing_by_hash.get(backup[priority].hash)
+        if candidates:
+            source = candidates.pop(0)
+            moves.append({'rule': source.rule, 'from': source.priority, 'to': priority})
+            del existing[source.priority]
+    for move in moves:
+        del backup[move['to']]
+
+    modifies = []
+    for priority in sorted(set(existing) & set(backup)):
+        existing_item = existing.pop(priority)
+        backup_item = backup.pop(priority)
+        modifies.append({
+            'existing': existing_item.rule,
+            'backup': backup_item.rule,
+            'actions_changed': existing_item.actions != backup_item.actions,
+            'conditions_changed': existing_item.conditions != backup_item.conditions,
+        })
+
+    return {
+        'unchanged': unchanged,
+        'moves': moves,
+        'modifies': modifies,
+        'creates': [item.rule for _, item in sorted(backup.items())],
+        'deletes': [item.rule for _, item in sorted(existing.items())],
+    }
@@ -0,0 +1,224 @@
+"""Concurrent, rate-limited execution of restore operations."""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from alb_rules_tool.clients import caller_retries
+from alb_rules_tool.metrics import propagate
+from alb_rules_tool.planner import (
+    OP_CREATE,
+    OP_DELETE,
+    OP_MODIFY,
+    OP_REPLACE,
+    OP_SET_PRIORITIES,
+    STRATEGY_SWAP,
+    count_api_calls
+)
+from alb_rules_tool.throttling import TokenBucket, call_with_backoff
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+
+# ELBv2 throttles mutating calls per account and region well below describe
+# calls; stay under it so that other tooling keeps some headroom
+DEFAULT_CALLS_PER_SECOND = 5.0
+DEFAULT_BURST = 10.0
+
+DEFAULT_MAX_RETRIES = 8
+
+# Typical round-trip time of a mutating ELBv2 call, in seconds
+ESTIMATED_CALL_LATENCY = 0.3
+
+# Operations are applied in stages. Operations within a stage touch distinct
+# priorities and run concurrently; a stage starts once the previous one is
+# done, so deletes always free a priority before anything is placed on it.
+STAGES: List[Tuple[str, ...]] = [
+    (OP_DELETE,),
+    (OP_SET_PRIORITIES,),
+    (OP_MODIFY, OP_REPLACE),
+    (OP_CREATE,),
+]
+
+# Stages of a full restore that builds the restored rules before parking
+# and deleting the existing ones
+SWAP_STAGES: List[Tuple[str, ...]] = [
+    (OP_CREATE,),
+    (OP_SET_PRIORITIES,),
+    (OP_DELETE,),
+]
+
+# Stages whose operations must run one after another, in plan order
+SERIAL_TYPES = frozenset([OP_SET_PRIORITIES])
+
+OperationResult = Tuple[Dict[str, Any], Optional[Exception]]
+
+class OperationSkipped(RuntimeError):
+    """An operation was not applied because an earlier one failed."""
+
+def plan_stages(plan: Dict[str, Any]) -> List[Tuple[str, ...]]:
+    """Return the stages a restore plan is applied in."""
+    return SWAP_STAGES if plan.get('strategy') == STRATEGY_SWAP else STAGES
+
+def skip_operations(operations: List[Dict[str, Any]]) -> List[OperationResult]:
+    """Report operations as skipped after a failure."""
+    if operations:
+        logger.error("Skipping %s operations after an earlier failure", len(operations))
+    return [(operation, OperationSkipped("Skipped after an earlier operation failed"))
+            for operation in operations]
+
+class StagedRun:
+    """Order in which operations are applied, shared by the thread and asyncio executors.
+
+    ``batches`` yields the operations that can run concurrently, one stage
+    at a time; operations of serial stages come one by one. The executor
+    applies each batch and passes the outcomes to ``record`` before asking
+    for the next one. With halt_on_error, the first failure ends the run
+    and every operation not applied yet is reported as skipped.
+    """
+
+    def __init__(self, operations: List[Dict[str, Any]],
+                 stages: Optional[List[Tuple[str, ...]]] = None,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 halt_on_error: bool = False):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.stages = stages or STAGES
+        known_types = {op_type for stage in self.stages for op_type in stage}
+        for operation in operations:
+            if operation['type'] not in known_types:
+                raise ValueError(f"Unknown restore operation: {operation['type']}")
+        self.operations = operations
+        self.halt_on_error = halt_on_error
+        self.results: List[OperationResult] = []
+        self._halted = False
+
+    def batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the next operations to apply together."""
+        for stage in self.stages:
+            stage_operations = [op for op in self.operations if op['type'] in stage]
+            if not stage_operations:
+                continue
+            if self._halted:
+                self.results.extend(skip_operations(stage_operations))
+                continue
+            logger.debug("Applying %s %s operations", len(stage_operations), '/'.join(stage))
+            if any(op_type in SERIAL_TYPES for op_type in stage):
+                for index, operation in enumerate(stage_operations):
+                    yield [operation]
+                    if self._halted:
+                        self.results.extend(skip_operations(stage_operations[index + 1:]))
+                        break
+            else:
+                yield stage_operations
+
+    def record(self, outcomes: Iterable[OperationResult]) -> None:
+        """Add the outcomes of the last batch."""
+        outcomes = list(outcomes)
+        self.results.extend(outcomes)
+        if self.halt_on_error and any(error is not None for _, error in outcomes):
+            self._halted = True
+
+def report_failure(operation: Dict[str, Any], error: Exception) -> OperationResult:
+    """Log an operation that failed and return its outcome."""
+    logger.error("Error applying %s operation: %s", operation['type'], error)
+    return operation, error
+
+def execute_operations(operations: List[Dict[str, Any]],
+                       apply: Callable[[Dict[str, Any]], Any],
+                       concurrency: int = DEFAULT_CONCURRENCY,
+                       calls_per_second: float = DEFAULT_CALLS_PER_SECOND,
+                       burst: float = DEFAULT_BURST,
+                       max_retries: int = DEFAULT_MAX_RETRIES,
+                       stages: Optional[List[Tuple[str, ...]]] = None,
+                       halt_on_error: bool = False) -> List[OperationResult]:
+    """Apply restore operations concurrently under a shared rate limit.
+
+    Every API call first takes a token from a bucket refilled at
+    ``calls_per_second``. Throttled operations, and those failing with
+    transient server or connection errors, are retried with jittered
+    exponential backoff, by this function only: the clients used make a
+    single attempt per call (see ``clients.caller_retries``). A failed
+    operation does not stop the others, unless halt_on_error is set: the
+    operations after it are then skipped.
+
+    Args:
+        operations: Operations produced by the restore planner
+        apply: Function applying a single operation
+        concurrency: Maximum number of operations in flight
+        calls_per_second: Sustained API call rate
+        burst: Number of calls allowed in a burst
+        max_retries: Maximum retries of a throttled operation
+        stages: Stages to apply the operations in, STAGES by default
+        halt_on_error: Skip the remaining operations once one failed
+
+    Returns:
+        List of (operation, error) pairs, where error is None on success.
+        Skipped operations have an ``OperationSkipped`` error.
+
+    Raises:
+        ValueError: If concurrency is not positive or an operation type is unknown
+    """
+    staged_run = StagedRun(operations, stages, concurrency, halt_on_error)
+    bucket = TokenBucket(calls_per_second, burst)
+
+    def run(operation: Dict[str, Any]) -> OperationResult:
+        def attempt() -> Any:
+            bucket.acquire(count_api_calls([operation]))
+            return apply(operation)
+
+        try:
+            with caller_retries():
+                call_with_backoff(attempt, max_retries, f"{operation['type']} operation")
+            return operation, None
+        except Exception as e:
+            return report_failure(operation, e)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in staged_run.batches():
+            staged_run.record(pool.map(propagate(run), batch))
+
+    return staged_run.results
+
+def estimate_duration(operations: List[Dict[str, Any]],
+                      concurrency: int = DEFAULT_CONCURRENCY,
+                      calls_per_second: float = DEFAULT_CALLS_PER_SECOND,
+                      burst: float = DEFAULT_BURST,
+                      call_latency: float = ESTIMATED_CALL_LATENCY,
+                      stages: Optional[List[Tuple[str, ...]]] = None) -> float:
+    """Estimate how long ``execute_operations`` takes to apply operations.
+
+    The estimate is the larger of two bounds: the time the rate limiter
+    needs to hand out a token for every call, and the time the stages take
+    given the call latency and concurrency. Throttling is not accounted for.
+
+    Args:
+        operations: Operations produced by the restore planner
+        concurrency: Maximum number of operations in flight
+        calls_per_second: Sustained API call rate
+        burst: Number of calls allowed in a burst
+        call_latency: Expected duration of one API call in seconds
+        stages: Stages the operations are applied in (see ``plan_stages``),
+            STAGES by default
+
+    Returns:
+        Estimated duration in seconds
+    """
+    total_calls = count_api_calls(operations)
+    rate_bound = max(0.0, total_calls - burst) / calls_per_second
+
+    latency_bound = 0.0
+    for stage in stages or STAGES:
+        stage_operations = [op for op in operations if op['type'] in stage]
+        if not stage_operations:
+            continue
+        if any(op_type in SERIAL_TYPES for op_type in stage):
+            rounds = float(count_api_calls(stage_operations))
+        else:
+            # A replace makes two calls back to back
+            depth = max(count_api_calls([op]) for op in stage_operations)
+            rounds = -(-len(stage_operations) // concurrency) * depth
+        latency_bound += rounds * call_latency
+
+    return max(rate_bound, latency_bound)
@@ -0,0 +1,386 @@
+"""Backup of ALB rules across a fleet of listeners."""
+
+import os
+import json
+import glob
+import fnmatch
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from botocore.exceptions import ClientError
+
+from alb_rules_tool.backup import backup_alb_rules, upload_backup_to_s3
+from alb_rules_tool.catalog import SnapshotCatalog, open_catalog
+from alb_rules_tool.clients import caller_retries, get_client, region_from_arn
+from alb_rules_tool.metrics import propagate, recorded
+from alb_rules_tool.serialization import backup_extension
+from alb_rules_tool.store import listener_slug, open_store
+from alb_rules_tool.throttling import AdaptiveConcurrencyLimiter, call_with_backoff
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of ARNs accepted by DescribeLoadBalancers and DescribeTags
+DESCRIBE_BATCH_SIZE = 20
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_MAX_RETRIES = 5
+
+# Name of the copy of the latest manifest kept under the S3 prefix
+LATEST_MANIFEST_NAME = "latest-manifest.json"
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    """Split a list into consecutive chunks of at most size items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _matches_tags(resource_tags: List[Dict[str, str]], tags: Dict[str, Optional[str]]) -> bool:
+    """Check whether resource tags satisfy every tag filter."""
+    tag_map = {tag['Key']: tag['Value'] for tag in resource_tags}
+    for key, value in tags.items():
+        if key not in tag_map:
+            return False
+        if value is not None and tag_map[key] != value:
+            return False
+    return True
+
+def discover_load_balancers(load_balancer_arns: Optional[List[str]] = None,
+                            names: Optional[List[str]] = None,
+                            tags: Optional[Dict[str, Optional[str]]] = None,
+                            region_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Find application load balancers by ARN, name pattern or tags.
+
+    Every given filter must match. Without filters all application load
+    balancers in the region are returned.
+
+    Args:
+        load_balancer_arns: Load balancer ARNs (optional)
+        names: Shell-style load balancer name patterns, e.g. 'prod-*' (optional)
+        tags: Tags the load balancer must have; a None value matches any value (optional)
+        region_name: AWS region name (optional, defaults to the session region)
+
+    Returns:
+        List of load balancer descriptions
+
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    if load_balancer_arns and not region_name:
+        region_name = region_from_arn(load_balancer_arns[0])
+    client = get_client('elbv2', region_name)
+
+    load_balancers = []
+    if load_balancer_arns:
+        for batch in _chunks(list(load_balancer_arns), DESCRIBE_BATCH_SIZE):
+            response = client.describe_load_balancers(LoadBalancerArns=batch)
+            load_balancers.extend(response['LoadBalancers'])
+    else:
+        paginator = client.get_paginator('describe_load_balancers')
+        for page in paginator.paginate():
+            load_balancers.extend(page['LoadBalancers'])
+
+    load_balancers = [lb for lb in load_balancers if lb.get('Type', 'application') == 'application']
+
+    if names:
+        load_balancers = [
+            lb for lb in load_balancers
+            if any(fnmatch.fnmatchcase(lb['LoadBalancerName'], pattern) for pattern in names)
+        ]
+
+    if tags and load_balancers:
+        matching_arns = set()
+        arns = [lb['LoadBalancerArn'] for lb in load_balancers]
+        for batch in _chunks(arns, DESCRIBE_BATCH_SIZE):
+            response = client.describe_tags(ResourceArns=batch)
+            for description in response['TagDescriptions']:
+                if _matches_tags(description.get('Tags', []), tags):
+                    matching_arns.add(description['ResourceArn'])
+        load_balancers = [lb for lb in load_balancers if lb['LoadBalancerArn'] in matching_arns]
+
+    logger.info("Discovered %s application load balancers", len(load_balancers))
+    return load_balancers
+
+def discover_listeners(load_balancer_arns: Optional[List[str]] = None,
+                       names: Optional[List[str]] = None,
+                       tags: Optional[Dict[str, Optional[str]]] = None,
+                       region_name: Optional[str] = None) -> List[str]:
+    """Find the listeners of application load balancers.
+
+    Takes the same filters as ``discover_load_balancers``.
+
+    Returns:
+        List of listener ARNs
+
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    load_balancers = discover_load_balancers(load_balancer_arns, names, tags, region_name)
+
+    listener_arns: List[str] = []
+    for lb in load_balancers:
+        client = get_client('elbv2', region_from_arn(lb['LoadBalancerArn']))
+        paginator = client.get_paginator('describe_listeners')
+        for page in paginator.paginate(LoadBalancerArn=lb['LoadBalancerArn']):
+            listener_arns.extend(listener['ListenerArn'] for listener in page['Listeners'])
+
+    logger.info("Discovered %s listeners", len(listener_arns))
+    return listener_arns
+
+def listener_backup_name(listener_arn: str, format_type: str = "json",
+                         compression: Optional[str] = None) -> str:
+    """Build a unique, file-system friendly backup file name for a listener.
+
+    Args:
+        listener_arn: ARN of the ALB listener
+        format_type: Backup format (json or yaml)
+        compression: Compression codec (gzip or zstd), or None
+
+    Returns:
+        File name such as 'my-alb-1234567890abcdef.json'
+    """
+    return f"{listener_slug(listener_arn)}.{backup_extension(format_type, compression)}"
+
+def _backup_with_retries(listener_arn: str,
+                         limiter: AdaptiveConcurrencyLimiter,
+                         max_retries: int,
+                         **backup_kwargs: Any) -> Dict[str, Any]:
+    """Back up one listener, backing off and retrying when throttled.
+
+    botocore does not retry the calls made here, so the limiter sees every
+    throttling error.
+    """
+    def attempt() -> Dict[str, Any]:
+        with limiter.slot():
+            return backup_alb_rules(listener_arn=listener_arn, **backup_kwargs)
+
+    with caller_retries():
+        return call_with_backoff(attempt, max_retries, f"backup of {listener_arn}")
+
+def _open_catalog(location: str) -> Optional[SnapshotCatalog]:
+    """Open the catalog of a fleet backup, None if it cannot be opened.
+
+    Recording backups is best effort: a catalog failure does not fail them.
+    """
+    try:
+        return open_catalog(location)
+    except Exception as e:
+        logger.warning("Cannot open catalog %s, backups will not be recorded: %s", location, e)
+        return None
+
+def _close_catalog(catalog: SnapshotCatalog) -> None:
+    """Sync and close the catalog of a fleet backup, logging failures."""
+    try:
+        catalog.close()
+    except Exception as e:
+        logger.warning("Cannot sync catalog %s: %s", catalog.path, e)
+
+def _latest_manifest_key(s3_prefix: str) -> str:
+    """S3 key of the copy of the latest manifest under a prefix."""
+    return f"{s3_prefix.rstrip('/')}/{LATEST_MANIFEST_NAME}" if s3_prefix else LATEST_MANIFEST_NAME
+
+def load_latest_manifest(output_dir: str = ".",
+                         s3_bucket: Optional[str] = None,
+                         s3_prefix: str = "") -> Optional[Dict[str, Any]]:
+    """Load the manifest of the latest fleet backup.
+
+    When an S3 bucket is given, the copy kept at ``<prefix>/latest-manifest.json``
+    is used; otherwise the newest manifest in the output directory.
+
+    Args:
+        output_dir: Directory holding local manifests
+        s3_bucket: S3 bucket the backups are uploaded to (optional)
+        s3_prefix: Key prefix of the uploaded backups
+
+    Returns:
+        Manifest, or None if there is no earlier fleet backup
+    """
+    if s3_bucket:
+        try:
+            response = get_client('s3').get_object(
+                Bucket=s3_bucket, Key=_latest_manifest_key(s3_prefix)
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                return None
+            raise
+        manifest: Dict[str, Any] = json.loads(response['Body'].read())
+        return manifest
+
+    # Manifest names embed a sortable timestamp
+    paths = sorted(glob.glob(os.path.join(output_dir, "alb-rules-manifest-*.json")))
+    if not paths:
+        return None
+    with open(paths[-1]) as f:
+        manifest = json.load(f)
+    return manifest
+
+@recorded('backup-fleet')
+def backup_alb_rules_many(listener_arns: List[str],
+                          output_dir: str = ".",
+                          format_type: str = "json",
+                          s3_bucket: Optional[str] = None,
+                          s3_prefix: str = "",
+                          max_workers: int = DEFAULT_MAX_WORKERS,
+                          max_retries: int = DEFAULT_MAX_RETRIES,
+                          write_local: bool = True,
+                          compression: Optional[str] = None,
+                          compact: bool = False,
+                          skip_unchanged: bool = False,
+                          store: Optional[str] = None,
+                          catalog: Optional[str] = None) -> Dict[str, Any]:
+    """Backup ALB rules for many listeners in parallel.
+
+    Listeners are backed up on a bounded thread pool. When AWS throttles the
+    requests, the number of concurrent backups is reduced and grows back once
+    calls succeed again. The backup files of a run are written to a
+    directory named after its timestamp, as they are uploaded under a
+    timestamped key prefix, so runs do not overwrite each other. A manifest
+    indexing every backup file is written to the output directory, and
+    uploaded next to the backups when an S3 bucket is given.
+
+    Args:
+        listener_arns: ARNs of the ALB listeners
+        output_dir: Directory where to save the backup files
+        format_type: Format to save the rules (json or yaml)
+        s3_bucket: S3 bucket name for uploading the backups (optional)
+        s3_prefix: Key prefix for the uploaded backups (optional)
+        max_workers: Maximum number of listeners backed up at once
+        max_retries: Maximum retries of a throttled listener backup
+        write_local: Whether to write local files. When False, backups and
+            the manifest are streamed straight to S3.
+        compression: Compression codec of the backups (gzip or zstd), or None
+        compact: Write JSON backups without indentation
+        skip_unchanged: Skip listeners whose rule set fingerprint matches
+            their entry in the latest manifest. Their entries point at the
+            earlier backup and are marked 'unchanged' with a 'verified_at' time.
+        store: Location of a content-addressed snapshot store ('s3://bucket/prefix'
+            or a directory). When given, listeners are stored as snapshots
+            sharing rule bodies instead of as standalone backup files.
+        catalog: Location of a catalog (a SQLite file or 's3://bucket/key')
+            recording every listener backup. An S3 catalog is synced once,
+            after every listener is backed up. Catalog failures are logged as
+            warnings and do not fail the backups.
+
+    Returns:
+        Manifest describing every listener backup, plus the manifest location
+        and 'metrics' on the API calls of the whole run
+
+    Raises:
+        ValueError: If max_workers is not positive, or if write_local is
+            False without an S3 bucket
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    if not write_local and not s3_bucket:
+        raise ValueError("An S3 bucket is required when write_local is False")
+
+    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    run_dir = os.path.join(output_dir, timestamp)
+    if write_local:
+        os.makedirs(run_dir, exist_ok=True)
+    prefix = f"{s3_prefix.rstrip('/')}/{timestamp}" if s3_prefix else timestamp
+    limiter = AdaptiveConcurrencyLimiter(max_workers)
+    # One store instance remembers which rule bodies are stored across listeners
+    snapshot_store = open_store(store) if store else None
+    snapshot_catalog = _open_catalog(catalog) if catalog else None
+
+    previous_entries: Dict[str, Dict[str, Any]] = {}
+    if skip_unchanged:
+        latest = load_latest_manifest(output_dir, s3_bucket, s3_prefix)
+        for previous in (latest or {}).get("backups", []):
+            if previous.get("status") in ("success", "unchanged") and previous.get("fingerprint"):
+                previous_entries[previous["listener_arn"]] = previous
+
+    def run(listener_arn: str) -> Dict[str, Any]:
+        file_name = listener_backup_name(listener_arn, format_type, compression)
+        entry: Dict[str, Any] = {"listener_arn": listener_arn}
+        previous = previous_entries.get(listener_arn)
+        try:
+            result = _backup_with_retries(
+                listener_arn,
+                limiter,
+                max_retries,
+                output_path=os.path.join(run_dir, file_name),
+                format_type=format_type,
+                upload_to_s3=s3_bucket is not None,
+                s3_bucket=s3_bucket,
+                s3_key=f"{prefix}/{file_name}",
+                write_local=write_local,
+                compression=compression,
+                compact=compact,
+                skip_unchanged=skip_unchanged,
+                previous_fingerprint=previous["fingerprint"] if previous else None,
+                store=snapshot_store,
+                catalog=snapshot_catalog
+            )
+            # Fleet-wide metrics cover the listener's calls; keep the manifest small
+            result.pop("metrics", None)
+            entry.update(result)
+            entry["status"] = "success"
+            if result.get("unchanged"):
+                # Record that the earlier backup is still valid
+                for key in ("local_path", "s3_uri", "snapshot", "backed_up_at"):
+                    if previous and key in previous:
+                        entry[key] = previous[key]
+                entry["status"] = "unchanged"
+                entry["verified_at"] = datetime.now().isoformat()
+            else:
+                entry["backed_up_at"] = datetime.now().isoformat()
+        except Exception as e:
+            logger.error("Failed to backup listener %s: %s", listener_arn, e)
+            entry["status"] = "failed"
+            entry["error"] = str(e)
+        return entry
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            backups = list(pool.map(propagate(run), listener_arns))
+    finally:
+        if snapshot_catalog is not None:
+            _close_catalog(snapshot_catalog)
+
+    succeeded = sum(1 for entry in backups if entry["status"] != "failed")
+    unchanged = sum(1 for entry in backups if entry["status"] == "unchanged")
+    manifest: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(),
+        "format": format_type,
+        "compression": compression,
+        "listener_count": len(backups),
+        "succeeded": succeeded,
+        "unchanged": unchanged,
+        "failed": len(backups) - succeeded,
+        "backups": backups,
+    }
+
+    if not write_local:
+        manifest_key = f"{prefix}/manifest.json"
+        get_client('s3').put_object(
+            Bucket=s3_bucket,
+            Key=manifest_key,
+            Body=json.dumps(manifest, indent=2).encode('utf-8')
+        )
+        manifest["manifest_s3_uri"] = f"s3://{s3_bucket}/{manifest_key}"
+    else:
+        manifest_path = os.path.join(output_dir, f"alb-rules-manifest-{timestamp}.json")
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        manifest["manifest_path"] = manifest_path
+
+        if s3_bucket:
+            manifest["manifest_s3_uri"] = upload_backup_to_s3(
+                manifest_path, s3_bucket, f"{prefix}/manifest.json"
+            )
+
+    if skip_unchanged and s3_bucket:
+        # One small PUT lets the next run find every fingerprint
+        latest = {key: value for key, value in manifest.items() if key != "manifest_path"}
+        get_client('s3').put_object(
+            Bucket=s3_bucket,
+            Key=_latest_manifest_key(s3_prefix),
+            Body=json.dumps(latest, indent=2).encode('utf-8')
+        )
+
+    logger.info("Fleet backup finished: %s succeeded (%s unchanged), %s failed",
+                succeeded, unchanged, manifest['failed'])
+    return manifest
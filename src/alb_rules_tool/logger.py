@@ -1,50 +1,183 @@
-"""Logging configuration for the ALB Rules Tool."""
+"""Logging configuration for the ALB Rules Tool.
+
+Records go to the console and, optionally, a log file. In queue mode the
+threads that log only put records on a queue, and a ``QueueListener``
+thread formats and writes them, so rule changes applied in parallel never
+wait on handler locks or disk writes. ``JsonFormatter`` writes one JSON
+object per line for log pipelines.
+"""
 
-import logging
 import os
-from typing import Optional
+import json
+import time
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+from queue import SimpleQueue
+from typing import Any, Callable, Dict, List, Optional
+
+LOGGER_NAME = "alb_rules_tool"
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Log formats accepted by setup_logger
+LOG_FORMATS = ("text", "json")
+
+# Seconds between the INFO lines summing up per-rule events
+DEFAULT_EVENT_INTERVAL = 5.0
+
+# Attributes of every log record; any other attribute was given with extra=
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
 
-def setup_logger(log_level: Optional[str] = None, log_file: Optional[str] = None) -> logging.Logger:
+class JsonFormatter(logging.Formatter):
+    """Format records as JSON lines with time, level, logger, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        created = datetime.fromtimestamp(record.created, timezone.utc)
+        entry: Dict[str, Any] = {
+            "time": created.isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes", "on")
+
+def stop_queue_listener() -> None:
+    """Write out the records still queued and stop the queue listener, if any."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+atexit.register(stop_queue_listener)
+
+def setup_logger(log_level: Optional[str] = None, log_file: Optional[str] = None,
+                 log_format: Optional[str] = None,
+                 use_queue: Optional[bool] = None) -> logging.Logger:
     """Set up and configure logger.
-    
+
     Args:
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Path to log file (optional)
-        
+        log_format: 'text' or 'json'; defaults to $ALB_RULES_LOG_FORMAT, then 'text'
+        use_queue: Write records from a background thread; defaults to $ALB_RULES_LOG_QUEUE
+
     Returns:
         Configured logger instance
     """
+    global _listener
     # Get log level from environment if not provided
     if not log_level:
         log_level = os.environ.get("ALB_RULES_LOG_LEVEL", "INFO")
-    
+    if not log_format:
+        log_format = os.environ.get("ALB_RULES_LOG_FORMAT", "text")
+    if use_queue is None:
+        use_queue = _env_flag("ALB_RULES_LOG_QUEUE")
+
     # Convert string log level to logging constant
     numeric_level = getattr(logging, log_level.upper(), logging.INFO)
-    
+
     # Configure logger
-    logger = logging.getLogger("alb_rules_tool")
+    logger = logging.getLogger(LOGGER_NAME)
     logger.setLevel(numeric_level)
     logger.propagate = False
-    
+
     # Clear existing handlers to avoid duplicate logs
+    stop_queue_listener()
     logger.handlers = []
-    
+
     # Create formatter
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    
+    if log_format.lower() == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
     # Add console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(numeric_level)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+
     # Add file handler if log_file provided
     if log_file:
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(numeric_level)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
+        handlers.append(logging.FileHandler(log_file))
+
+    for handler in handlers:
+        handler.setLevel(numeric_level)
+        handler.setFormatter(formatter)
+
+    if use_queue:
+        records: SimpleQueue = SimpleQueue()
+        with _listener_lock:
+            _listener = logging.handlers.QueueListener(records, *handlers,
+                                                       respect_handler_level=True)
+            _listener.start()
+        logger.addHandler(logging.handlers.QueueHandler(records))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+
     return logger
+
+class EventAggregator:
+    """Log per-rule events at DEBUG, and how many happened at INFO.
+
+    One INFO line per rule changed floods the handlers of a large restore.
+    Each event is logged with its details at DEBUG only; the number of
+    events of each kind is logged at INFO at most once per interval, and
+    when ``flush`` is called. The first event after a quiet interval is
+    reported right away.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = DEFAULT_EVENT_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self._logger = logger
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._last_report: Optional[float] = None
+
+    def record(self, event: str, msg: str, *args: Any, count: int = 1) -> None:
+        """Count an event, logging msg % args at DEBUG.
+
+        Args:
+            event: Kind of event, such as 'created'
+            msg: Details of the event, formatted with args only if DEBUG is enabled
+            count: Number of events, e.g. rules moved by one call
+        """
+        self._logger.debug(msg, *args)
+        with self._lock:
+            self._counts[event] = self._counts.get(event, 0) + count
+            now = self._clock()
+            if self._last_report is not None and now - self._last_report < self.interval:
+                return
+            counts = self._take(now)
+        self._report(counts)
+
+    def flush(self) -> None:
+        """Log the events not reported yet."""
+        with self._lock:
+            counts = self._take(self._clock())
+        self._report(counts)
+
+    def _take(self, now: float) -> Dict[str, int]:
+        counts, self._counts = self._counts, {}
+        self._last_report = now
+        return counts
+
+    def _report(self, counts: Dict[str, int]) -> None:
+        if counts:
+            self._logger.info("Rules %s",
+                              ", ".join(f"{event}: {count}" for event, count in counts.items()))
@@ -0,0 +1,407 @@
+"""Per-call AWS API instrumentation and per-phase timings.
+
+Every client handed out by ``clients.get_client`` reports its calls
+through botocore event hooks: operation, latency, retries, throttled
+attempts and bytes sent and received. Calls and phase timings are added to
+every active ``MetricsRecorder``; ``recording()`` starts one for the
+duration of a block, and the process-wide ``PROCESS_METRICS`` recorder is
+always active.
+
+The active recorders are held in a context variable, so worker threads
+only report to them when started through ``propagate``.
+"""
+
+import os
+import time
+import tempfile
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+from urllib.parse import urlencode
+
+T = TypeVar('T')
+
+# Upper bounds of the API call latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Prefix of every exported metric name
+METRIC_PREFIX = "alb_rules"
+
+# Error codes counted as throttled attempts; kept in sync with throttling.py
+# without importing it, so that clients.py can import this module cheaply
+_THROTTLING_CODES = frozenset([
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+    'SlowDown',
+])
+
+class MetricsRecorder:
+    """Thread-safe accumulator of API call statistics and phase timings."""
+
+    def __init__(self, name: str = "run"):
+        self.name = name
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.operations: Dict[str, Dict[str, Any]] = {}
+        self.phases: Dict[str, float] = {}
+
+    def record_call(self, operation: str, latency: float, retries: int = 0, throttles: int = 0,
+                    bytes_sent: int = 0, bytes_received: int = 0, error: bool = False) -> None:
+        """Add one API call."""
+        with self._lock:
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = {
+                    "calls": 0, "errors": 0, "retries": 0, "throttles": 0,
+                    "bytes_sent": 0, "bytes_received": 0,
+                    "latency_sum": 0.0, "latency_max": 0.0,
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                }
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["retries"] += retries
+            stats["throttles"] += throttles
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+            stats["latency_sum"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats["buckets"][index] += 1
+                    break
+
+    def record_phase(self, phase: str, seconds: float) -> None:
+        """Add time spent in a phase."""
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the recorded metrics as a JSON-serializable dictionary.
+
+        Returns:
+            Dictionary with the 'total_seconds' since the recorder started,
+            'api_calls', 'retries' and 'throttles' over all operations, the
+            exclusive seconds spent in each of the 'phases', and per-operation
+            'api' statistics
+        """
+        with self._lock:
+            operations = {name: dict(stats) for name, stats in self.operations.items()}
+            phases = dict(self.phases)
+        api = {}
+        for name, stats in sorted(operations.items()):
+            api[name] = {
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "throttles": stats["throttles"],
+                "bytes_sent": stats["bytes_sent"],
+                "bytes_received": stats["bytes_received"],
+                "latency_seconds": round(stats["latency_sum"], 6),
+                "latency_avg_seconds": round(stats["latency_sum"] / stats["calls"], 6),
+                "latency_max_seconds": round(stats["latency_max"], 6),
+            }
+        return {
+            "total_seconds": round(time.perf_counter() - self._start, 6),
+            "api_calls": sum(stats["calls"] for stats in operations.values()),
+            "retries": sum(stats["retries"] for stats in operations.values()),
+            "throttles": sum(stats["throttles"] for stats in operations.values()),
+            "phases": {name: round(seconds, 6) for name, seconds in sorted(phases.items())},
+            "api": api,
+        }
+
+    def to_prometheus(self, labels: Optional[Dict[str, str]] = None,
+                      openmetrics: bool = False) -> str:
+        """Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            labels: Labels added to every sample, e.g. {'command': 'restore'}
+            openmetrics: Render OpenMetrics instead, which ends with '# EOF'
+
+        Returns:
+            Exposition text
+        """
+        with self._lock:
+            operations = {name: dict(stats, buckets=list(stats["buckets"]))
+                          for name, stats in self.operations.items()}
+            phases = dict(self.phases)
+        base = dict(labels or {})
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> str:
+            metric = f"{METRIC_PREFIX}_{name}"
+            # OpenMetrics names counter families without their _total suffix
+            declared = metric
+            if openmetrics and metric.endswith("_total"):
+                declared = metric[:-len("_total")]
+            lines.append(f"# HELP {declared} {help_text}")
+            lines.append(f"# TYPE {declared} {kind}")
+            return metric
+
+        def sample(metric: str, value: float, **extra: str) -> None:
+            lines.append(f"{metric}{_labels({**base, **extra})} {_number(value)}")
+
+        counters = (
+            ("api_calls_total", "calls", "AWS API calls made"),
+            ("api_errors_total", "errors", "AWS API calls that failed"),
+            ("api_retries_total", "retries", "Retried attempts of AWS API calls"),
+            ("api_throttles_total", "throttles", "Attempts of AWS API calls that were throttled"),
+            ("api_request_bytes_total", "bytes_sent", "Bytes sent in AWS API requests"),
+            ("api_response_bytes_total", "bytes_received", "Bytes received in AWS API responses"),
+        )
+        for name, key, help_text in counters:
+            metric = family(name, "counter", help_text)
+            for operation, stats in sorted(operations.items()):
+                sample(metric, stats[key], operation=operation)
+
+        metric = family("api_call_duration_seconds", "histogram",
+                        "Latency of AWS API calls, retries included")
+        for operation, stats in sorted(operations.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats["buckets"]):
+                cumulative += count
+                sample(f"{metric}_bucket", cumulative, operation=operation, le=_number(bound))
+            sample(f"{metric}_bucket", stats["calls"], operation=operation, le="+Inf")
+            sample(f"{metric}_sum", stats["latency_sum"], operation=operation)
+            sample(f"{metric}_count", stats["calls"], operation=operation)
+
+        metric = family("phase_duration_seconds", "gauge", "Time spent in each phase of the run")
+        for phase, seconds in sorted(phases.items()):
+            sample(metric, seconds, phase=phase)
+
+        metric = family("run_duration_seconds", "gauge", "Duration of the run")
+        sample(metric, time.perf_counter() - self._start)
+        metric = family("run_timestamp_seconds", "gauge", "Unix time the run started")
+        sample(metric, self.started)
+
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    """Escape a label value as the exposition format requires."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels: Dict[str, str]) -> str:
+    """Render a label set."""
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape(str(value))}"' for key, value in sorted(labels.items()))
+    return "{" + ",".join(pairs) + "}"
+
+def _number(value: float) -> str:
+    """Render a sample value without a pointless fractional part."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+PROCESS_METRICS = MetricsRecorder("process")
+
+# Recorders calls and phases are reported to, innermost last
+_recorders: contextvars.ContextVar[Tuple[MetricsRecorder, ...]] = contextvars.ContextVar(
+    "alb_rules_recorders", default=(PROCESS_METRICS,)
+)
+
+# Open phases of the current context: (name, child seconds) frames
+_phase_stack: contextvars.ContextVar[Tuple[List[Any], ...]] = contextvars.ContextVar(
+    "alb_rules_phases", default=()
+)
+
+@contextmanager
+def recording(name: str = "run") -> Iterator[MetricsRecorder]:
+    """Record the API calls and phases of a block in a new recorder.
+
+    Outer recorders, including ``PROCESS_METRICS``, keep receiving
+    everything recorded inside the block.
+
+    Args:
+        name: Name of the run, for reference
+
+    Yields:
+        The new recorder
+    """
+    recorder = MetricsRecorder(name)
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+def recorded(name: str) -> Callable[[Callable[..., Dict[str, Any]]], Callable[..., Dict[str, Any]]]:
+    """Decorate a function returning a result dictionary to record its metrics.
+
+    The summary of the calls and phases of each invocation is added to the
+    result under 'metrics'.
+    """
+    def decorate(func: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+            with recording(name) as recorder:
+                result = func(*args, **kwargs)
+            result["metrics"] = recorder.summary()
+            return result
+        return wrapper
+    return decorate
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a phase of the current run.
+
+    Phases may nest; a phase is only charged the time not spent in the
+    phases opened inside it, so phase times add up to the run time even
+    when, say, rules are fetched while the backup is being uploaded.
+    """
+    frame: List[Any] = [name, 0.0]
+    token = _phase_stack.set(_phase_stack.get() + (frame,))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _phase_stack.reset(token)
+        stack = _phase_stack.get()
+        if stack:
+            stack[-1][1] += elapsed
+        for recorder in _recorders.get():
+            recorder.record_phase(name, elapsed - frame[1])
+
+def timed_iter(name: str, iterable: Any) -> Iterator[Any]:
+    """Iterate, charging the time spent producing each item to a phase."""
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+def propagate(func: Callable[..., T]) -> Callable[..., T]:
+    """Wrap a function so that it reports to the caller's recorders in any thread.
+
+    Use it on functions handed to thread pools. Each call runs in its own
+    copy of the context captured now.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+def _request_size(body: Any) -> int:
+    """Size in bytes of a request body, 0 when it cannot be told cheaply."""
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    if isinstance(body, dict):
+        return len(urlencode(body, doseq=True))
+    try:
+        return len(body)
+    except TypeError:
+        return 0
+
+def _on_before_call(model: Any, context: Dict[str, Any], **kwargs: Any) -> None:
+    context['metrics'] = {
+        'operation': f"{model.service_model.service_name}.{model.name}",
+        'start': time.perf_counter(), 'attempts': 0, 'throttles': 0, 'bytes_sent': 0
+    }
+
+def _on_request_created(request: Any, **kwargs: Any) -> None:
+    state = getattr(request, 'context', {}).get('metrics')
+    if state is not None:
+        state['attempts'] += 1
+        state['bytes_sent'] += _request_size(request.body)
+
+def _on_needs_retry(response: Any = None, request_dict: Optional[Dict[str, Any]] = None,
+                    **kwargs: Any) -> None:
+    state = (request_dict or {}).get('context', {}).get('metrics')
+    if state is None or not response:
+        return
+    code = response[1].get('Error', {}).get('Code')
+    if code in _THROTTLING_CODES:
+        state['throttles'] += 1
+
+def _finish_call(context: Dict[str, Any], error: bool, http_response: Any = None) -> None:
+    state = context.pop('metrics', None)
+    if state is None:
+        return
+    bytes_received = 0
+    if http_response is not None:
+        try:
+            bytes_received = int(http_response.headers.get('content-length') or 0)
+        except (TypeError, ValueError):
+            bytes_received = 0
+    latency = time.perf_counter() - state['start']
+    for recorder in _recorders.get():
+        recorder.record_call(
+            state['operation'], latency,
+            retries=max(0, state['attempts'] - 1),
+            throttles=state['throttles'],
+            bytes_sent=state['bytes_sent'],
+            bytes_received=bytes_received,
+            error=error
+        )
+
+def _on_after_call(model: Any, context: Dict[str, Any], http_response: Any = None,
+                   parsed: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+    # Error responses, including throttles that ran out of retries, also end here
+    status_code = getattr(http_response, 'status_code', None)
+    error = bool((parsed or {}).get('Error')) or (status_code is not None and status_code >= 300)
+    _finish_call(context, error=error, http_response=http_response)
+
+def _on_after_call_error(context: Dict[str, Any], **kwargs: Any) -> None:
+    # Emitted without the operation model when sending the request raised
+    _finish_call(context, error=True)
+
+def instrument_client(client: Any) -> Any:
+    """Report the API calls of a botocore client to the active recorders.
+
+    Args:
+        client: boto3 or botocore client
+
+    Returns:
+        The same client
+    """
+    events = client.meta.events
+    events.register('before-call', _on_before_call, unique_id='alb-rules-metrics-before-call')
+    events.register('request-created', _on_request_created, unique_id='alb-rules-metrics-request')
+    events.register('needs-retry', _on_needs_retry, unique_id='alb-rules-metrics-retry')
+    events.register('after-call', _on_after_call, unique_id='alb-rules-metrics-after-call')
+    events.register('after-call-error', _on_after_call_error, unique_id='alb-rules-metrics-error')
+    return client
+
+def write_textfile(recorder: MetricsRecorder, path: str,
+                   labels: Optional[Dict[str, str]] = None) -> str:
+    """Write metrics for the node_exporter textfile collector.
+
+    The file is replaced atomically, so the collector never reads a
+    partial file.
+
+    Args:
+        recorder: Recorder to export
+        path: Destination, conventionally ending in '.prom'
+        labels: Labels added to every sample
+
+    Returns:
+        Path of the written file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(recorder.to_prometheus(labels))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
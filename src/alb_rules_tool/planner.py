@@ -0,0 +1,572 @@
+"""Planning of the API calls needed to restore ALB rules."""
+
+import json
+import logging
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from alb_rules_tool.diff import diff_rules
+
+logger = logging.getLogger(__name__)
+
+# Highest priority a listener rule can have
+MAX_RULE_PRIORITY = 50000
+
+# Rules moved per SetRulePriorities call
+MAX_PRIORITIES_PER_CALL = 100
+
+# Version of the plan file layout written by save_plan
+PLAN_VERSION = 2
+
+# Plan file versions load_plan accepts
+SUPPORTED_PLAN_VERSIONS = (1, 2)
+
+# Operation types, in the order they are applied
+OP_DELETE = 'delete'
+OP_SET_PRIORITIES = 'set_priorities'
+OP_MODIFY = 'modify'
+OP_REPLACE = 'replace'
+OP_CREATE = 'create'
+
+# Full restore strategies: build the restored rules next to the existing
+# ones and swap them in, or delete every existing rule first
+STRATEGY_SWAP = 'swap'
+STRATEGY_DELETE_FIRST = 'delete-first'
+FULL_RESTORE_STRATEGIES = (STRATEGY_SWAP, STRATEGY_DELETE_FIRST)
+
+def _by_priority(rules: Iterable[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """Index non-default rules by their integer priority."""
+    return {int(rule['Priority']): rule for rule in rules if rule['Priority'] != 'default'}
+
+def _free_priorities(used: Set[int], count: int) -> List[int]:
+    """Pick count unused priorities, starting from the lowest precedence."""
+    free: List[int] = []
+    priority = MAX_RULE_PRIORITY
+    while len(free) < count and priority > 0:
+        if priority not in used:
+            free.append(priority)
+        priority -= 1
+    if len(free) < count:
+        raise ValueError("Not enough free rule priorities to reorder rules")
+    return free
+
+def _set_priorities(priorities: List[Dict[str, Any]], chunk_size: int,
+                    parking: bool = False) -> List[Dict[str, Any]]:
+    """Split priority changes into set_priorities operations of at most chunk_size rules."""
+    operations = []
+    for start in range(0, len(priorities), chunk_size):
+        operation: Dict[str, Any] = {'type': OP_SET_PRIORITIES}
+        if parking:
+            operation['parking'] = True
+        operation['priorities'] = priorities[start:start + chunk_size]
+        operations.append(operation)
+    return operations
+
+def _plan_moves(moves: List[Dict[str, Any]], occupied: Set[int],
+                chunk_size: int = MAX_PRIORITIES_PER_CALL) -> List[Dict[str, Any]]:
+    """Turn rule moves into set_rule_priorities operations.
+
+    A rule cannot be moved onto a priority that another rule still holds,
+    so rules whose priority is the target of another move are first parked
+    on a free priority. Every target is then free, and all rules are moved
+    to their target in chunks of at most chunk_size rules.
+
+    Args:
+        moves: Moves as dicts with 'RuleArn', 'From' and 'To' priorities
+        occupied: Priorities held by rules that stay where they are
+        chunk_size: Maximum number of rules moved per call
+
+    Returns:
+        List of set_priorities operations
+    """
+    if not moves:
+        return []
+
+    sources = {move['From'] for move in moves}
+    targets = {move['To'] for move in moves}
+    blocking = [move for move in moves if move['From'] in targets]
+    operations = []
+
+    if blocking:
+        parking = _free_priorities(occupied | sources | targets, len(blocking))
+        operations.extend(_set_priorities(
+            [{'RuleArn': move['RuleArn'], 'Priority': temp}
+             for move, temp in zip(blocking, parking)],
+            chunk_size, parking=True
+        ))
+
+    operations.extend(_set_priorities(
+        [{'RuleArn': move['RuleArn'], 'Priority': move['To']} for move in moves], chunk_size
+    ))
+    return operations
+
+def _longest_run(items: List[Tuple[int, int]], low: int, high: int) -> List[int]:
+    """Find the longest subsequence of (index, key) items with non-decreasing keys in [low, high].
+
+    Returns:
+        Indexes of the items in the subsequence
+    """
+    tails: List[int] = []
+    tail_items: List[int] = []
+    previous: Dict[int, Optional[int]] = {}
+    for position, (index, key) in enumerate(items):
+        if not low <= key <= high:
+            continue
+        length = bisect_right(tails, key)
+        previous[position] = tail_items[length - 1] if length else None
+        if length == len(tails):
+            tails.append(key)
+            tail_items.append(position)
+        else:
+            tails[length] = key
+            tail_items[length] = position
+
+    run: List[int] = []
+    current = tail_items[-1] if tail_items else None
+    while current is not None:
+        run.append(items[current][0])
+        current = previous[current]
+    return run[::-1]
+
+def _gap_priorities(low: int, high: int, preferred: List[int], avoid: Set[int]) -> List[int]:
+    """Pick increasing priorities strictly between low and high for the rules of a gap.
+
+    The rules' backup priorities are kept when they fit. Otherwise the
+    priorities are spread over the gap, avoiding those in avoid when there
+    is room, so later rules can be inserted without moving these.
+    """
+    if (all(low < priority < high and priority not in avoid for priority in preferred)
+            and preferred == sorted(set(preferred))):
+        return preferred
+    free = [priority for priority in range(low + 1, high) if priority not in avoid]
+    if len(free) < len(preferred):
+        free = list(range(low + 1, high))
+    count = len(preferred)
+    return [free[(index + 1) * len(free) // (count + 1)] for index in range(count)]
+
+def minimize_moves(order: List[Dict[str, Any]]) -> Dict[int, int]:
+    """Pick new priorities for the fewest rules while keeping the backup's rule order.
+
+    Only the relative order of rules decides which rule a request hits.
+    The rules already in the right relative order are found as the longest
+    subsequence of movable rules whose current priorities leave room for
+    the rules ranked between them (their priority minus their rank does not
+    decrease). They keep their current priority, and only the other rules
+    get a new one, inside the gap left for them.
+
+    Args:
+        order: Rules of the restored listener in backup order, as dicts with
+            'priority' (current priority, None for rules to create) and
+            'fixed' (True for rules that must keep their priority)
+
+    Returns:
+        New priority of every rule, by position in order
+    """
+    count = len(order)
+    priorities: Dict[int, int] = {}
+    # Kept positions with their priorities, between virtual rules before and after the listener
+    kept: List[Tuple[int, int]] = [(-1, 0)]
+    segment: List[Tuple[int, int]] = []
+
+    def close_segment(high: int) -> None:
+        low = kept[-1][1] - kept[-1][0] - 1
+        for index in _longest_run(segment, low, high):
+            kept.append((index, order[index]['priority']))
+        segment.clear()
+
+    for index, rule in enumerate(order):
+        if rule['fixed']:
+            close_segment(rule['priority'] - index - 1)
+            kept.append((index, rule['priority']))
+        elif rule['priority'] is not None:
+            segment.append((index, rule['priority'] - index - 1))
+    close_segment(MAX_RULE_PRIORITY - count)
+    kept.append((count, MAX_RULE_PRIORITY + 1))
+
+    avoid = {rule['priority'] for rule in order if rule['priority'] is not None}
+    for (start, low), (end, high) in zip(kept, kept[1:]):
+        if start >= 0:
+            priorities[start] = low
+        gap = range(start + 1, end)
+        if gap:
+            preferred = [order[index]['backup_priority'] for index in gap]
+            for index, priority in zip(gap, _gap_priorities(low, high, preferred, avoid)):
+                priorities[index] = priority
+    return priorities
+
+def _reorder_minimally(moves: List[Dict[str, Any]], creates: List[Dict[str, Any]],
+                       fixed: Set[int]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+    """Retarget moves and creates so that as few rules as possible move.
+
+    Args:
+        moves: Moves to the backup priorities
+        creates: Create operations at the backup priorities
+        fixed: Priorities of rules that stay where they are
+
+    Returns:
+        The remaining moves, the creates and the number of rules left in place
+    """
+    order: List[Dict[str, Any]] = [
+        {'priority': priority, 'backup_priority': priority, 'fixed': True, 'item': None}
+        for priority in fixed
+    ]
+    order.extend({'priority': move['From'], 'backup_priority': move['To'], 'fixed': False,
+                  'item': move}
+                 for move in moves)
+    order.extend({'priority': None, 'backup_priority': op['priority'], 'fixed': False, 'item': op}
+                 for op in creates)
+    order.sort(key=lambda entry: entry['backup_priority'])
+    priorities = minimize_moves(order)
+
+    relocated = []
+    placed = []
+    for index, entry in enumerate(order):
+        item, priority = entry['item'], priorities[index]
+        if item is None or priority == entry['priority']:
+            continue
+        if entry['priority'] is not None:
+            relocated.append(dict(item, To=priority))
+        else:
+            rule = dict(item['rule'], Priority=str(priority))
+            placed.append(dict(item, priority=priority, rule=rule))
+    kept = len(moves) - len(relocated)
+    logger.debug("Minimal reordering keeps %s of %s moved rules in place", kept, len(moves))
+    return relocated, placed, kept
+
+def count_api_calls(operations: List[Dict[str, Any]]) -> int:
+    """Count the API calls needed to apply a list of operations."""
+    return sum(2 if op['type'] == OP_REPLACE else 1 for op in operations)
+
+def _plan_swap(existing: Dict[int, Dict[str, Any]], backup: Dict[int, Dict[str, Any]],
+               chunk_size: int = MAX_PRIORITIES_PER_CALL) -> List[Dict[str, Any]]:
+    """Plan a full restore that builds the backup rules before removing the existing ones.
+    
+    The backup rules are created, in order, on priorities below every
+    existing rule, where they only see requests no existing rule matches.
+    The existing rules are then parked below them in one call per chunk,
+    which is the moment routing switches to the restored rules. Finally the
+    restored rules are moved to their backup priorities, which keeps their
+    order, and the parked rules are deleted.
+    
+    Raises:
+        ValueError: If there are not enough free priorities below the rules
+    """
+    base = max(list(existing) + list(backup))
+    if base + len(backup) + len(existing) > MAX_RULE_PRIORITY:
+        raise ValueError("Not enough free rule priorities to build the restored rules first")
+    
+    staged = {priority: base + 1 + index for index, priority in enumerate(sorted(backup))}
+    parking_start = base + len(backup) + 1
+    
+    operations: List[Dict[str, Any]] = [
+        {
+            'type': OP_CREATE,
+            'priority': staged[priority],
+            'final_priority': priority,
+            'rule': dict(rule, Priority=str(staged[priority]))
+        }
+        for priority, rule in sorted(backup.items())
+    ]
+    operations.extend(_set_priorities(
+        [{'RuleArn': rule['RuleArn'], 'Priority': parking_start + index}
+         for index, (_, rule) in enumerate(sorted(existing.items()))],
+        chunk_size, parking=True
+    ))
+    for operation in _set_priorities(
+        [{'StagedPriority': staged[priority], 'Priority': priority} for priority in sorted(backup)],
+        chunk_size
+    ):
+        operation['staged'] = True
+        operations.append(operation)
+    operations.extend(
+        {'type': OP_DELETE, 'rule_arn': rule['RuleArn'], 'priority': priority}
+        for priority, rule in sorted(existing.items())
+    )
+    return operations
+
+def plan_full_restore(existing_rules: Iterable[Dict[str, Any]],
+                      backup_rules: Iterable[Dict[str, Any]],
+                      strategy: str = STRATEGY_SWAP,
+                      rule_headroom: Optional[int] = None) -> Dict[str, Any]:
+    """Plan a full restore: replace every existing rule with the backup rules.
+    
+    With the swap strategy, the backup rules are built before the existing
+    rules are removed (see ``_plan_swap``), so requests matched by a rule
+    never fall through to the default action. It falls back to deleting
+    every existing rule first when the load balancer cannot hold both rule
+    sets at once, or when there are not enough free priorities.
+    
+    Args:
+        existing_rules: Iterable of existing ALB rules
+        backup_rules: Iterable of backup ALB rules
+        strategy: STRATEGY_SWAP or STRATEGY_DELETE_FIRST
+        rule_headroom: Rules that can be added to the load balancer before
+            it reaches its rule quota, None when unknown
+        
+    Returns:
+        Plan with the ordered 'operations', the 'strategy' used and a
+        'summary' of counts and API calls
+        
+    Raises:
+        ValueError: If strategy is not supported
+    """
+    if strategy not in FULL_RESTORE_STRATEGIES:
+        raise ValueError(f"Unsupported full restore strategy: {strategy}. "
+                         f"Use {' or '.join(FULL_RESTORE_STRATEGIES)}")
+    existing = _by_priority(existing_rules)
+    backup = _by_priority(backup_rules)
+    
+    operations = None
+    if strategy == STRATEGY_SWAP and existing and backup:
+        if rule_headroom is not None and rule_headroom < len(backup):
+            logger.warning("Only %s rules can be added before the rule quota is reached and %s are "
+                           "needed to swap; deleting existing rules first",
+                           rule_headroom, len(backup))
+        else:
+            try:
+                operations = _plan_swap(existing, backup)
+            except ValueError as e:
+                logger.warning("%s; deleting existing rules first", e)
+    if operations is None:
+        # Also when either rule set is empty, as there is nothing to swap then
+        strategy = STRATEGY_DELETE_FIRST
+        operations = [
+            {'type': OP_DELETE, 'rule_arn': rule['RuleArn'], 'priority': priority}
+            for priority, rule in sorted(existing.items())
+        ]
+        operations.extend(
+            {'type': OP_CREATE, 'priority': priority, 'rule': rule}
+            for priority, rule in sorted(backup.items())
+        )
+    
+    summary = {
+        'created': len(backup),
+        'updated': 0,
+        'moved': 0,
+        'deleted': len(existing),
+        'unchanged': 0,
+        'api_calls': count_api_calls(operations),
+        'calls_saved': 0,
+    }
+    logger.debug("Full restore plan (%s): %s", strategy, summary)
+    return {'operations': operations, 'strategy': strategy, 'summary': summary}
+
+def resolve_staged(priorities: List[Dict[str, Any]],
+                   rules: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill in the ARNs of staged rules, created after planning, from the listener's rules.
+    
+    Args:
+        priorities: Items of a set_priorities operation; staged rules have a
+            'StagedPriority' instead of a 'RuleArn'
+        rules: Current rules of the listener
+        
+    Returns:
+        Items with 'RuleArn' and 'Priority'
+        
+    Raises:
+        ValueError: If a staged rule is missing, e.g. its creation failed
+    """
+    arns = {rule['Priority']: rule['RuleArn'] for rule in rules}
+    resolved = []
+    for item in priorities:
+        rule_arn = item.get('RuleArn') or arns.get(str(item['StagedPriority']))
+        if rule_arn is None:
+            raise ValueError(f"No staged rule at priority {item['StagedPriority']}")
+        resolved.append({'RuleArn': rule_arn, 'Priority': item['Priority']})
+    return resolved
+
+def plan_swap_rollback(outcomes: Iterable[Tuple[Dict[str, Any], Optional[Exception]]],
+                       rules: Iterable[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Plan deleting the staged rules of a swap that stopped before switching routing.
+    
+    Staged priorities are free when the swap is planned, so every rule
+    found on one was created by the swap, including rules whose create
+    call failed after the rule was made.
+    
+    Args:
+        outcomes: (operation, error) pairs of the applied swap operations
+        rules: Current rules of the listener
+        
+    Returns:
+        Delete operations, or None if existing rules were already parked and
+        routing goes through the restored rules
+    """
+    staged = set()
+    for operation, error in outcomes:
+        if operation.get('parking') and error is None:
+            return None
+        if operation['type'] == OP_CREATE and 'final_priority' in operation:
+            staged.add(operation['priority'])
+    return [
+        {'type': OP_DELETE, 'rule_arn': rule['RuleArn'], 'priority': int(rule['Priority'])}
+        for rule in rules
+        if rule['Priority'] != 'default' and int(rule['Priority']) in staged
+    ]
+
+def plan_incremental_restore(existing_rules: Iterable[Dict[str, Any]],
+                             backup_rules: Iterable[Dict[str, Any]],
+                             minimal_moves: bool = False) -> Dict[str, Any]:
+    """Plan the API calls that bring a listener in line with a backup.
+    
+    The rule sets are compared with ``diff_rules``, which matches rules by
+    content hash first and priority second. Rules found at another priority
+    are moved with set_rule_priorities instead of being recreated. Rules
+    sharing a priority are changed in place with one modify_rule call,
+    which sets their actions, their conditions or both, so the priority is
+    never left without a rule. Anything left over is created or deleted.
+    Plans never contain 'replace' operations any more; they are only
+    applied from plan files saved by earlier versions.
+    
+    With minimal_moves, the backup's rule order is restored rather than its
+    exact priorities (see ``minimize_moves``): rules already in the right
+    relative order stay where they are, and only the others are moved or
+    created at a priority between their neighbours.
+    
+    Args:
+        existing_rules: Iterable of existing ALB rules
+        backup_rules: Iterable of backup ALB rules
+        minimal_moves: Move as few rules as possible instead of restoring
+            exact priorities
+        
+    Returns:
+        Plan with the ordered 'operations' and a 'summary' of counts and API calls
+    """
+    diff = diff_rules(existing_rules, backup_rules)
+    
+    moves = [
+        {'RuleArn': move['rule']['RuleArn'], 'From': move['from'], 'To': move['to']}
+        for move in diff['moves']
+    ]
+    
+    modifies = []
+    for change in diff['modifies']:
+        backup_rule = change['backup']
+        operation: Dict[str, Any] = {
+            'type': OP_MODIFY,
+            'rule_arn': change['existing']['RuleArn'],
+            'priority': int(backup_rule['Priority'])
+        }
+        if change['actions_changed']:
+            operation['actions'] = backup_rule.get('Actions', [])
+        if change['conditions_changed']:
+            operation['conditions'] = backup_rule.get('Conditions', [])
+        modifies.append(operation)
+    
+    deletes = [
+        {'type': OP_DELETE, 'rule_arn': rule['RuleArn'], 'priority': int(rule['Priority'])}
+        for rule in diff['deletes']
+    ]
+    creates = [
+        {'type': OP_CREATE, 'priority': int(rule['Priority']), 'rule': rule}
+        for rule in diff['creates']
+    ]
+    
+    # What matching rules by priority alone, with delete and recreate for
+    # every difference, would have cost
+    existing_priorities = {op['priority'] for op in modifies + deletes}
+    existing_priorities |= {move['From'] for move in moves}
+    backup_priorities = {op['priority'] for op in modifies + creates}
+    backup_priorities |= {move['To'] for move in moves}
+    previous_calls = len(existing_priorities ^ backup_priorities)
+    previous_calls += 2 * len(existing_priorities & backup_priorities)
+    
+    # Rules that keep their priority, whatever happens to their content
+    occupied = set(diff['unchanged']) | {op['priority'] for op in modifies}
+    kept = 0
+    if minimal_moves:
+        moves, creates, kept = _reorder_minimally(moves, creates, occupied)
+        occupied |= {move['From'] for move in moves}
+    operations = deletes + _plan_moves(moves, occupied) + modifies + creates
+    
+    api_calls = count_api_calls(operations)
+    summary = {
+        'created': len(creates),
+        'updated': len(modifies),
+        'moved': len(moves),
+        'deleted': len(deletes),
+        'unchanged': len(diff['unchanged']) + kept,
+        'api_calls': api_calls,
+        'calls_saved': previous_calls - api_calls,
+    }
+    logger.debug("Incremental restore plan: %s", summary)
+    return {'operations': operations, 'summary': summary}
+
+def describe_operation(operation: Dict[str, Any]) -> List[str]:
+    """Describe the API calls an operation makes, one line per call.
+    
+    Args:
+        operation: Operation produced by the restore planner
+        
+    Returns:
+        Human-readable API calls
+    """
+    op_type = operation['type']
+    if op_type == OP_DELETE:
+        return [f"DeleteRule RuleArn={operation['rule_arn']} (priority {operation['priority']})"]
+    if op_type == OP_SET_PRIORITIES:
+        moves = ", ".join(
+            f"{item.get('RuleArn') or 'staged rule ' + str(item['StagedPriority'])} "
+            f"-> {item['Priority']}"
+            for item in operation['priorities']
+        )
+        note = " (temporary)" if operation.get('parking') else ""
+        return [f"SetRulePriorities{note} {moves}"]
+    if op_type == OP_MODIFY:
+        changed = [name for name in ('actions', 'conditions') if name in operation]
+        return [
+            f"ModifyRule RuleArn={operation['rule_arn']} (priority {operation['priority']}, "
+            f"{' and '.join(changed)})"
+        ]
+    if op_type == OP_REPLACE:
+        return [
+            f"DeleteRule RuleArn={operation['rule_arn']} (priority {operation['priority']})",
+            f"CreateRule Priority={operation['priority']}",
+        ]
+    if op_type == OP_CREATE:
+        if 'final_priority' in operation:
+            return [f"CreateRule Priority={operation['priority']} "
+                    f"(staged for {operation['final_priority']})"]
+        return [f"CreateRule Priority={operation['priority']}"]
+    raise ValueError(f"Unknown restore operation: {op_type}")
+
+def save_plan(plan: Dict[str, Any], file_path: str) -> str:
+    """Write a restore plan to a JSON file.
+    
+    Args:
+        plan: Restore plan
+        file_path: Path of the plan file
+        
+    Returns:
+        Path to the plan file
+    """
+    with open(file_path, 'w') as f:
+        json.dump(plan, f, indent=2)
+    logger.info("Saved restore plan to %s", file_path)
+    return file_path
+
+def load_plan(file_path: str) -> Dict[str, Any]:
+    """Read a restore plan written by ``save_plan``.
+    
+    Args:
+        file_path: Path of the plan file
+        
+    Returns:
+        Restore plan
+        
+    Raises:
+        ValueError: If the file is not a plan this version can apply
+    """
+    with open(file_path, 'r') as f:
+        try:
+            plan = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid plan file {file_path}: {e}")
+    
+    if not isinstance(plan, dict) or 'operations' not in plan:
+        raise ValueError(f"Invalid plan file {file_path}: no operations found")
+    if plan.get('version') not in SUPPORTED_PLAN_VERSIONS:
+        raise ValueError(
+            f"Unsupported plan version {plan.get('version')} in {file_path}, "
+            f"expected {PLAN_VERSION}"
+        )
+    return plan
@@ -0,0 +1,339 @@
+"""Checks run before a restore changes anything.
+
+A restore that references a deleted target group, or that would exceed
+a load balancer quota, used to fail one rule at a time and leave the
+listener half restored. ``preflight_restore`` checks a whole restore plan
+up front instead:
+
+- every target group referenced by the rules written is resolved with
+  batched DescribeTargetGroups calls, and must exist and not be attached
+  to another load balancer
+- rules must stay within the condition value, wildcard and target group
+  per action quotas
+- the load balancer must stay within its rule quota
+
+Target group descriptions and account limits are memoized, so restoring
+many listeners does not describe the same resources again.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from botocore.exceptions import ClientError
+
+from alb_rules_tool.backup import iter_alb_rules
+from alb_rules_tool.clients import get_client, region_from_arn
+from alb_rules_tool.diff import canonical_conditions
+from alb_rules_tool.planner import OP_CREATE, OP_DELETE, OP_MODIFY, OP_REPLACE, STRATEGY_SWAP
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of ARNs per DescribeTargetGroups call
+DESCRIBE_TARGET_GROUPS_BATCH_SIZE = 20
+
+# Default quotas, used when DescribeAccountLimits does not report them
+DEFAULT_LIMITS = {
+    'rules-per-application-load-balancer': 100,
+    'condition-values-per-alb-rule': 5,
+    'condition-wildcards-per-alb-rule': 5,
+    'target-groups-per-action-on-application-load-balancer': 5,
+}
+
+# Error codes of DescribeTargetGroups for ARNs that cannot be resolved
+_NOT_FOUND_CODES = ('TargetGroupNotFound', 'ValidationError')
+
+_lock = threading.Lock()
+_target_groups: Dict[str, Optional[Dict[str, Any]]] = {}
+_limits: Dict[Optional[str], Dict[str, int]] = {}
+
+class PreflightError(ValueError):
+    """A restore plan would fail; nothing was changed."""
+
+    def __init__(self, listener_arn: str, problems: List[str]):
+        self.problems = problems
+        details = "\n".join(f"  - {problem}" for problem in problems)
+        super().__init__(f"Preflight checks failed for {listener_arn}:\n{details}")
+
+def clear_preflight_cache() -> None:
+    """Forget memoized target group descriptions and account limits."""
+    with _lock:
+        _target_groups.clear()
+        _limits.clear()
+
+def target_group_arns(actions: Iterable[Dict[str, Any]]) -> Set[str]:
+    """Return the ARNs of the target groups actions forward to."""
+    arns = set()
+    for action in actions:
+        if action.get('TargetGroupArn'):
+            arns.add(action['TargetGroupArn'])
+        for group in (action.get('ForwardConfig') or {}).get('TargetGroups') or []:
+            arns.add(group['TargetGroupArn'])
+    return arns
+
+def target_group_not_found(error: ClientError) -> bool:
+    """Check whether DescribeTargetGroups failed on an ARN that cannot be resolved."""
+    return error.response.get('Error', {}).get('Code') in _NOT_FOUND_CODES
+
+def found_target_groups(arns: List[str],
+                        response: Dict[str, Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Map described ARNs to their target group, None for those not in the response."""
+    found: Dict[str, Optional[Dict[str, Any]]] = dict.fromkeys(arns)
+    for group in response['TargetGroups']:
+        found[group['TargetGroupArn']] = group
+    return found
+
+def _describe_batch(client: Any, arns: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Describe target groups, splitting the batch to single out the missing ones."""
+    try:
+        response = client.describe_target_groups(TargetGroupArns=arns)
+    except ClientError as e:
+        if not target_group_not_found(e):
+            raise
+        # One unknown ARN fails the whole call
+        if len(arns) == 1:
+            return {arns[0]: None}
+        middle = len(arns) // 2
+        halves = _describe_batch(client, arns[:middle])
+        halves.update(_describe_batch(client, arns[middle:]))
+        return halves
+    return found_target_groups(arns, response)
+
+def cached_target_groups(arns: Iterable[str]) -> Tuple[Dict[str, Optional[Dict[str, Any]]],
+                                                       Dict[Optional[str], List[List[str]]]]:
+    """Split target group ARNs into remembered descriptions and batches left to describe.
+
+    Returns:
+        Remembered descriptions by ARN, and the ARNs left to describe per
+        region, in batches of DESCRIBE_TARGET_GROUPS_BATCH_SIZE
+    """
+    arns = set(arns)
+    with _lock:
+        resolved = {arn: _target_groups[arn] for arn in arns if arn in _target_groups}
+    by_region: Dict[Optional[str], List[str]] = {}
+    for arn in sorted(arns - set(resolved)):
+        by_region.setdefault(region_from_arn(arn), []).append(arn)
+    batch_size = DESCRIBE_TARGET_GROUPS_BATCH_SIZE
+    batches = {
+        region_name: [region_arns[start:start + batch_size]
+                      for start in range(0, len(region_arns), batch_size)]
+        for region_name, region_arns in by_region.items()
+    }
+    return resolved, batches
+
+def remember_target_groups(found: Dict[str, Optional[Dict[str, Any]]]) -> None:
+    """Remember described target groups, None for those that do not exist."""
+    with _lock:
+        _target_groups.update(found)
+
+def resolve_target_groups(arns: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Describe target groups by ARN, in batches, remembering the results.
+
+    Args:
+        arns: Target group ARNs
+
+    Returns:
+        Mapping of each ARN to its description, None when it does not exist
+
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    resolved, batches = cached_target_groups(arns)
+    cached = len(resolved)
+    for region_name, region_batches in batches.items():
+        client = get_client('elbv2', region_name)
+        for batch in region_batches:
+            found = _describe_batch(client, batch)
+            remember_target_groups(found)
+            resolved.update(found)
+    if len(resolved) > cached:
+        logger.debug("Described %s target groups (%s cached)", len(resolved) - cached, cached)
+    return resolved
+
+def cached_limits(region_name: Optional[str]) -> Optional[Dict[str, int]]:
+    """Return the remembered load balancer quotas of a region, None if not described yet."""
+    with _lock:
+        return _limits.get(region_name)
+
+def remember_limits(region_name: Optional[str], pages: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """Remember the quotas reported by DescribeAccountLimits pages, over the defaults."""
+    limits = dict(DEFAULT_LIMITS)
+    for page in pages:
+        for limit in page['Limits']:
+            limits[limit['Name']] = int(limit['Max'])
+    with _lock:
+        _limits[region_name] = limits
+    return limits
+
+def account_limits(region_name: Optional[str] = None) -> Dict[str, int]:
+    """Return the load balancer quotas of the account, remembering them per region.
+
+    Quotas DescribeAccountLimits does not report keep their default value.
+    """
+    limits = cached_limits(region_name)
+    if limits is not None:
+        return limits
+    paginator = get_client('elbv2', region_name).get_paginator('describe_account_limits')
+    return remember_limits(region_name, paginator.paginate())
+
+def _has_wildcard(value: Any) -> bool:
+    """Check whether a condition value, or query string pair, contains a wildcard."""
+    if isinstance(value, dict):
+        texts = [value.get('Key') or '', value.get('Value') or '']
+    else:
+        texts = [value]
+    return any('*' in text or '?' in text for text in texts)
+
+def _check_rule(priority: Any, conditions: Optional[List[Dict[str, Any]]],
+                actions: Optional[List[Dict[str, Any]]], limits: Dict[str, int]) -> List[str]:
+    """Check a rule written by a restore against the per-rule quotas."""
+    problems = []
+    if conditions is not None:
+        values = [value for condition in canonical_conditions({'Conditions': conditions})
+                  for value in condition.get('Values') or []]
+        if len(values) > limits['condition-values-per-alb-rule']:
+            problems.append(f"Rule {priority} has {len(values)} condition values, "
+                            f"the limit is {limits['condition-values-per-alb-rule']}")
+        wildcards = sum(1 for value in values if _has_wildcard(value))
+        if wildcards > limits['condition-wildcards-per-alb-rule']:
+            problems.append(f"Rule {priority} has {wildcards} wildcard condition values, "
+                            f"the limit is {limits['condition-wildcards-per-alb-rule']}")
+    for action in actions or []:
+        groups = (action.get('ForwardConfig') or {}).get('TargetGroups') or []
+        group_limit = limits['target-groups-per-action-on-application-load-balancer']
+        if len(groups) > group_limit:
+            problems.append(f"Rule {priority} forwards to {len(groups)} target groups, "
+                            f"the limit is {group_limit}")
+    return problems
+
+def _load_balancer_arn(listener_arn: str) -> str:
+    listener = get_client('elbv2', region_from_arn(listener_arn)).describe_listeners(
+        ListenerArns=[listener_arn]
+    )['Listeners'][0]
+    return str(listener['LoadBalancerArn'])
+
+def _load_balancer_rule_count(load_balancer_arn: str) -> int:
+    """Count the rules of every listener of a load balancer, default rules excepted."""
+    client = get_client('elbv2', region_from_arn(load_balancer_arn))
+    count = 0
+    paginator = client.get_paginator('describe_listeners')
+    for page in paginator.paginate(LoadBalancerArn=load_balancer_arn):
+        for listener in page['Listeners']:
+            rules = iter_alb_rules(listener['ListenerArn'])
+            count += sum(1 for rule in rules if not rule.get('IsDefault'))
+    return count
+
+def rule_headroom(listener_arn: str) -> int:
+    """Return how many rules can be added to a listener's load balancer before its rule quota.
+
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    limits = account_limits(region_from_arn(listener_arn))
+    count = _load_balancer_rule_count(_load_balancer_arn(listener_arn))
+    return limits['rules-per-application-load-balancer'] - count
+
+def check_plan_rules(plan: Dict[str, Any],
+                     limits: Dict[str, int]) -> Tuple[List[str], Dict[str, List[Any]], int]:
+    """Check the rules a restore plan writes against the per-rule quotas.
+
+    Returns:
+        Problems found, the priorities referencing each target group, and
+        how many rules the plan adds at its peak
+    """
+    problems: List[str] = []
+    referenced: Dict[str, List[Any]] = {}
+    creates = deletes = 0
+
+    for operation in plan['operations']:
+        op_type = operation['type']
+        if op_type == OP_DELETE:
+            deletes += 1
+            continue
+        if op_type in (OP_CREATE, OP_REPLACE):
+            rule = operation['rule']
+            conditions, actions = rule.get('Conditions', []), rule.get('Actions', [])
+            creates += op_type == OP_CREATE
+        elif op_type == OP_MODIFY:
+            conditions, actions = operation.get('conditions'), operation.get('actions')
+        else:
+            continue
+        # Rules built before a swap are reported by their backup priority
+        priority = operation.get('final_priority', operation['priority'])
+        problems.extend(_check_rule(priority, conditions, actions, limits))
+        for arn in target_group_arns(actions or []):
+            referenced.setdefault(arn, []).append(priority)
+
+    # Deletes run first, so the rule count only peaks above its current value when rules are
+    # added; a swap creates every rule before deleting any
+    if plan.get('strategy') == STRATEGY_SWAP:
+        deletes = 0
+    return problems, referenced, creates - deletes
+
+def needs_load_balancer(target_groups: Dict[str, Optional[Dict[str, Any]]], added: int) -> bool:
+    """Check whether the listener's load balancer must be looked up to finish the checks."""
+    attached = any(group and group.get('LoadBalancerArns') for group in target_groups.values())
+    return attached or added > 0
+
+def check_target_groups(referenced: Dict[str, List[Any]],
+                        target_groups: Dict[str, Optional[Dict[str, Any]]],
+                        load_balancer_arn: Optional[str]) -> List[str]:
+    """Check the referenced target groups exist and are not attached to another load balancer."""
+    problems = []
+    for arn, priorities in sorted(referenced.items()):
+        rules = ", ".join(str(priority) for priority in priorities)
+        group = target_groups[arn]
+        if group is None:
+            problems.append(f"Target group {arn} of rules {rules} does not exist")
+            continue
+        attached = group.get('LoadBalancerArns') or []
+        if attached and load_balancer_arn not in attached:
+            problems.append(f"Target group {arn} of rules {rules} is attached to another "
+                            f"load balancer ({', '.join(attached)})")
+    return problems
+
+def check_rule_count(load_balancer_arn: str, peak_count: int, limits: Dict[str, int]) -> List[str]:
+    """Check a load balancer stays within its rule quota."""
+    if peak_count > limits['rules-per-application-load-balancer']:
+        return [f"Load balancer {load_balancer_arn} would have {peak_count} rules, "
+                f"the limit is {limits['rules-per-application-load-balancer']}"]
+    return []
+
+def report_preflight(plan: Dict[str, Any], problems: List[str], target_groups: int) -> None:
+    """Log the outcome of the preflight checks of a plan.
+
+    Raises:
+        PreflightError: Listing every problem found
+    """
+    listener_arn = plan['listener_arn']
+    if problems:
+        for problem in problems:
+            logger.error("Preflight: %s", problem)
+        raise PreflightError(listener_arn, problems)
+    logger.info("Preflight checks passed for %s (%s target groups, %s operations)",
+                listener_arn, target_groups, len(plan['operations']))
+
+def preflight_restore(plan: Dict[str, Any]) -> None:
+    """Check a restore plan can be applied, before any rule is changed.
+
+    Args:
+        plan: Restore plan computed by ``build_restore_plan``
+
+    Raises:
+        PreflightError: Listing every problem found
+        ClientError: If there is an issue with the AWS API call
+    """
+    listener_arn = plan['listener_arn']
+    limits = account_limits(region_from_arn(listener_arn))
+    problems, referenced, added = check_plan_rules(plan, limits)
+
+    target_groups = resolve_target_groups(referenced)
+    load_balancer_arn = None
+    if needs_load_balancer(target_groups, added):
+        load_balancer_arn = _load_balancer_arn(listener_arn)
+    problems.extend(check_target_groups(referenced, target_groups, load_balancer_arn))
+    if added > 0 and load_balancer_arn is not None:
+        peak_count = _load_balancer_rule_count(load_balancer_arn) + added
+        problems.extend(check_rule_count(load_balancer_arn, peak_count, limits))
+
+    report_preflight(plan, problems, len(referenced))
@@ -4,17 +4,75 @@ import json
 import yaml
 import logging
 import os
-from typing import Dict, List, Optional, Any, Tuple
-import boto3
+import time
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Any, Tuple, cast
 from botocore.exceptions import ClientError
 
+from alb_rules_tool.backup import iter_alb_rules
+from alb_rules_tool.cache import get_cache
+from alb_rules_tool.clients import get_client, region_from_arn
+from alb_rules_tool.diff import rule_set_fingerprint, rules_equivalent
+from alb_rules_tool.logger import EventAggregator
+from alb_rules_tool.metrics import phase, recorded
+from alb_rules_tool.planner import (
+    OP_CREATE,
+    OP_DELETE,
+    OP_MODIFY,
+    OP_REPLACE,
+    OP_SET_PRIORITIES,
+    PLAN_VERSION,
+    STRATEGY_SWAP,
+    plan_full_restore,
+    plan_incremental_restore,
+    plan_swap_rollback,
+    resolve_staged
+)
+from alb_rules_tool.preflight import preflight_restore, rule_headroom
+from alb_rules_tool.executor import (
+    DEFAULT_CONCURRENCY,
+    OperationSkipped,
+    OperationResult,
+    estimate_duration,
+    execute_operations,
+    plan_stages
+)
+from alb_rules_tool.store import is_snapshot, rebuild_snapshot
+from alb_rules_tool.serialization import (
+    COMPRESSION_EXTENSIONS,
+    open_decompressed,
+    read_rules,
+    split_backup_path
+)
+
 logger = logging.getLogger(__name__)
 
+# Rule changes are logged one by one at DEBUG and counted at INFO
+rule_events = EventAggregator(logger)
+
+def parse_s3_uri(uri: str) -> Tuple[str, str]:
+    """Split an 's3://bucket/key' URI into its bucket and key.
+    
+    Raises:
+        ValueError: If the URI does not name an S3 object
+    """
+    bucket_name, _, key = uri[len("s3://"):].partition("/")
+    if not uri.startswith("s3://") or not bucket_name or not key:
+        raise ValueError(f"Not an S3 object URI: {uri}")
+    return bucket_name, key
+
 def load_backup_file(file_path: str) -> List[Dict[str, Any]]:
     """Load backup rules from a file.
     
+    The format is taken from the extension. Compressed backups (.gz, .zst)
+    are recognized by their leading bytes and decompressed while parsing.
+    Snapshot manifests are rebuilt from the store they name.
+    
     Args:
-        file_path: Path to the backup file
+        file_path: Path to the backup file, or 's3://bucket/key' of a backup
+            to read straight from S3 (see ``load_backup_from_s3``)
         
     Returns:
         List of ALB rules
@@ -23,35 +81,102 @@ def load_backup_file(file_path: str) -> List[Dict[str, Any]]:
         FileNotFoundError: If the file doesn't exist
         ValueError: If the file format is not supported
     """
+    if file_path.startswith("s3://"):
+        return load_backup_from_s3(*parse_s3_uri(file_path))
+    
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Backup file not found: {file_path}")
     
     try:
-        _, ext = os.path.splitext(file_path)
-        with open(file_path, 'r') as f:
-            if ext.lower() == '.json':
-                rules = json.load(f)
-            elif ext.lower() in ['.yaml', '.yml']:
-                rules = yaml.safe_load(f)
-            else:
-                raise ValueError(f"Unsupported file format: {ext}")
-        
-        logger.info(f"Successfully loaded rules from {file_path}")
+        format_type, _ = split_backup_path(file_path)
+        if format_type is None:
+            _, ext = os.path.splitext(file_path)
+            raise ValueError(f"Unsupported file format: {ext}")
+        with open(file_path, 'rb') as f:
+            rules = read_rules(f, format_type)
+        if is_snapshot(rules):
+            # read_rules returned the snapshot manifest, a dict
+            rules = rebuild_snapshot(cast(Dict[str, Any], rules))
+        
+        logger.info("Successfully loaded rules from %s", file_path)
         return rules
     except (json.JSONDecodeError, yaml.YAMLError) as e:
-        logger.error(f"Error parsing backup file {file_path}: {e}")
+        logger.error("Error parsing backup file %s: %s", file_path, e)
         raise ValueError(f"Invalid file format: {e}")
     except Exception as e:
-        logger.error(f"Error loading backup file {file_path}: {e}")
+        logger.error("Error loading backup file %s: %s", file_path, e)
         raise
 
-def download_backup_from_s3(bucket_name: str, s3_key: str, local_path: Optional[str] = None) -> str:
+@contextmanager
+def _open_s3_backup(bucket_name: str, s3_key: str) -> Iterator[BinaryIO]:
+    """Open an S3 backup, through the backup cache when it is enabled."""
+    cache = get_cache()
+    if cache is not None:
+        with cache.open(bucket_name, s3_key) as f:
+            yield f
+        return
+    body = get_client('s3').get_object(Bucket=bucket_name, Key=s3_key)['Body']
+    try:
+        yield body
+    finally:
+        body.close()
+
+def load_backup_from_s3(bucket_name: str, s3_key: str) -> List[Dict[str, Any]]:
+    """Load backup rules straight from an S3 object.
+    
+    The object body is parsed as it streams in, decompressing gzip and
+    zstd bodies on the fly. The format is taken from the key's extension.
+    When the backup cache is enabled (see ``alb_rules_tool.cache``), the
+    body is read from the cached copy instead, once revalidated.
+    
+    Args:
+        bucket_name: S3 bucket name
+        s3_key: S3 object key
+        
+    Returns:
+        List of ALB rules
+        
+    Raises:
+        FileNotFoundError: If the object doesn't exist
+        ValueError: If the format is not supported or the content cannot be parsed
+        ClientError: If there is an issue with the AWS API call
+    """
+    uri = f"s3://{bucket_name}/{s3_key}"
+    format_type, _ = split_backup_path(s3_key)
+    if format_type is None:
+        raise ValueError(f"Unsupported file format: {os.path.splitext(s3_key)[1]}")
+    
+    try:
+        with _open_s3_backup(bucket_name, s3_key) as body:
+            rules = read_rules(body, format_type)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+            raise FileNotFoundError(f"Backup file not found: {uri}")
+        logger.error("Error reading backup from S3: %s", e)
+        raise
+    except (json.JSONDecodeError, yaml.YAMLError) as e:
+        logger.error("Error parsing backup %s: %s", uri, e)
+        raise ValueError(f"Invalid file format: {e}")
+    if is_snapshot(rules):
+        rules = rebuild_snapshot(cast(Dict[str, Any], rules))
+    
+    logger.info("Successfully loaded rules from %s", uri)
+    return rules
+
+def download_backup_from_s3(bucket_name: str, s3_key: str, local_path: Optional[str] = None,
+                            decompress: bool = False) -> str:
     """Download a backup file from S3.
     
     Args:
         bucket_name: S3 bucket name
         s3_key: S3 object key
         local_path: Local path to download the file to (optional)
+        decompress: Decompress gzip or zstd backups while downloading. The
+            codec is detected from the content, and the compression suffix
+            is dropped from the default local path.
+    
+    When the backup cache is enabled, the backup is copied from the cache,
+    which only downloads it again when it changed in S3.
         
     Returns:
         Path to the downloaded file
@@ -61,14 +186,26 @@ def download_backup_from_s3(bucket_name: str, s3_key: str, local_path: Optional[
     """
     if not local_path:
         local_path = s3_key.split("/")[-1]
+        if decompress:
+            root, ext = os.path.splitext(local_path)
+            if ext.lower() in COMPRESSION_EXTENSIONS.values():
+                local_path = root
     
     try:
-        s3_client = boto3.client('s3')
-        s3_client.download_file(bucket_name, s3_key, local_path)
-        logger.info(f"Successfully downloaded backup from s3://{bucket_name}/{s3_key} to {local_path}")
+        if decompress:
+            with _open_s3_backup(bucket_name, s3_key) as body, \
+                    open_decompressed(body) as source, open(local_path, 'wb') as f:
+                shutil.copyfileobj(source, f)
+        elif get_cache() is not None:
+            with _open_s3_backup(bucket_name, s3_key) as source, open(local_path, 'wb') as f:
+                shutil.copyfileobj(source, f)
+        else:
+            get_client('s3').download_file(bucket_name, s3_key, local_path)
+        logger.info("Successfully downloaded backup from s3://%s/%s to %s",
+                    bucket_name, s3_key, local_path)
         return local_path
     except ClientError as e:
-        logger.error(f"Error downloading backup from S3: {e}")
+        logger.error("Error downloading backup from S3: %s", e)
         raise
 
 def _cleanup_rule_for_create(rule: Dict[str, Any]) -> Dict[str, Any]:
@@ -96,6 +233,10 @@ def _cleanup_rule_for_create(rule: Dict[str, Any]) -> Dict[str, Any]:
         if field in rule:
             create_rule[field] = rule[field]
     
+    # describe_rules returns priorities as strings, create_rule expects integers
+    if 'Priority' in create_rule:
+        create_rule['Priority'] = int(create_rule['Priority'])
+    
     return create_rule
 
 def create_rule(listener_arn: str, rule: Dict[str, Any]) -> Dict[str, Any]:
@@ -114,16 +255,17 @@ def create_rule(listener_arn: str, rule: Dict[str, Any]) -> Dict[str, Any]:
     try:
         cleaned_rule = _cleanup_rule_for_create(rule)
         
-        client = boto3.client('elbv2')
+        client = get_client('elbv2', region_from_arn(listener_arn))
         response = client.create_rule(
             ListenerArn=listener_arn,
             **cleaned_rule
         )
         
-        logger.info(f"Successfully created rule with priority {rule.get('Priority')}")
+        rule_events.record('created', "Successfully created rule with priority %s",
+                           rule.get('Priority'))
         return response
     except ClientError as e:
-        logger.error(f"Error creating rule: {e}")
+        logger.error("Error creating rule: %s", e)
         raise
 
 def delete_rule(rule_arn: str) -> Dict[str, Any]:
@@ -139,24 +281,190 @@ def delete_rule(rule_arn: str) -> Dict[str, Any]:
         ClientError: If there is an issue with the AWS API call
     """
     try:
-        client = boto3.client('elbv2')
+        client = get_client('elbv2', region_from_arn(rule_arn))
         response = client.delete_rule(
             RuleArn=rule_arn
         )
         
-        logger.info(f"Successfully deleted rule {rule_arn}")
+        rule_events.record('deleted', "Successfully deleted rule %s", rule_arn)
         return response
     except ClientError as e:
-        logger.error(f"Error deleting rule {rule_arn}: {e}")
+        logger.error("Error deleting rule %s: %s", rule_arn, e)
         raise
 
-def compare_rules(existing_rules: List[Dict[str, Any]], 
-                backup_rules: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
-    """Compare existing rules with backup rules.
+def modify_rule(rule_arn: str,
+                actions: Optional[List[Dict[str, Any]]] = None,
+                conditions: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Modify the actions and/or conditions of an ALB rule in place.
     
     Args:
-        existing_rules: List of existing ALB rules
-        backup_rules: List of backup ALB rules
+        rule_arn: ARN of the rule to modify
+        actions: New actions (optional, unchanged if not given)
+        conditions: New conditions (optional, unchanged if not given)
+        
+    Returns:
+        Response from AWS API
+        
+    Raises:
+        ValueError: If neither actions nor conditions are given
+        ClientError: If there is an issue with the AWS API call
+    """
+    if actions is None and conditions is None:
+        raise ValueError("At least one of actions or conditions is required to modify a rule")
+    
+    params: Dict[str, Any] = {'RuleArn': rule_arn}
+    if actions is not None:
+        params['Actions'] = actions
+    if conditions is not None:
+        params['Conditions'] = conditions
+    
+    try:
+        client = get_client('elbv2', region_from_arn(rule_arn))
+        response: Dict[str, Any] = client.modify_rule(**params)
+        
+        rule_events.record('modified', "Successfully modified rule %s", rule_arn)
+        return response
+    except ClientError as e:
+        logger.error("Error modifying rule %s: %s", rule_arn, e)
+        raise
+
+def set_rule_priorities(rule_priorities: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Change the priorities of several ALB rules in a single call.
+    
+    Args:
+        rule_priorities: List of dicts with 'RuleArn' and 'Priority' keys
+        
+    Returns:
+        Response from AWS API
+        
+    Raises:
+        ClientError: If there is an issue with the AWS API call
+    """
+    try:
+        client = get_client('elbv2', region_from_arn(rule_priorities[0]['RuleArn']))
+        response: Dict[str, Any] = client.set_rule_priorities(
+            RulePriorities=[
+                {'RuleArn': item['RuleArn'], 'Priority': int(item['Priority'])}
+                for item in rule_priorities
+            ]
+        )
+        
+        rule_events.record('moved', "Successfully set priorities of %s rules", len(rule_priorities),
+                           count=len(rule_priorities))
+        return response
+    except ClientError as e:
+        logger.error("Error setting rule priorities: %s", e)
+        raise
+
+def _create_call(listener_arn: str, rule: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    return 'create_rule', dict(ListenerArn=listener_arn, **_cleanup_rule_for_create(rule))
+
+def operation_calls(listener_arn: str, operation: Dict[str, Any],
+                    rules: Optional[Iterable[Dict[str, Any]]] = None
+                    ) -> List[Tuple[str, Dict[str, Any]]]:
+    """Return the API calls applying one operation of a restore plan, in order.
+    
+    Both ``apply_operation`` and the asyncio engine apply operations
+    through this function.
+    
+    Args:
+        listener_arn: ARN of the ALB listener
+        operation: Operation produced by the restore planner
+        rules: Rules created by the restore so far, or the listener's current
+            rules, needed by staged set_priorities operations, which refer to
+            rules created by the restore by their staged priority
+        
+    Returns:
+        List of (elbv2 client method, parameters) pairs
+        
+    Raises:
+        ValueError: If the operation type is unknown
+    """
+    op_type = operation['type']
+    if op_type == OP_DELETE:
+        return [('delete_rule', {'RuleArn': operation['rule_arn']})]
+    if op_type == OP_SET_PRIORITIES:
+        priorities = operation['priorities']
+        if operation.get('staged'):
+            # Rules created by this restore are only known by their priority
+            priorities = resolve_staged(priorities, rules or [])
+        return [('set_rule_priorities', {'RulePriorities': [
+            {'RuleArn': item['RuleArn'], 'Priority': int(item['Priority'])}
+            for item in priorities
+        ]})]
+    if op_type == OP_MODIFY:
+        params: Dict[str, Any] = {'RuleArn': operation['rule_arn']}
+        if operation.get('actions') is not None:
+            params['Actions'] = operation['actions']
+        if operation.get('conditions') is not None:
+            params['Conditions'] = operation['conditions']
+        return [('modify_rule', params)]
+    if op_type == OP_REPLACE:
+        return [('delete_rule', {'RuleArn': operation['rule_arn']}),
+                _create_call(listener_arn, operation['rule'])]
+    if op_type == OP_CREATE:
+        return [_create_call(listener_arn, operation['rule'])]
+    raise ValueError(f"Unknown restore operation: {op_type}")
+
+def record_call(events: EventAggregator, method: str, params: Dict[str, Any]) -> None:
+    """Count the rule change made by a successful call from ``operation_calls``."""
+    if method == 'create_rule':
+        events.record('created', "Successfully created rule with priority %s",
+                      params.get('Priority'))
+    elif method == 'delete_rule':
+        events.record('deleted', "Successfully deleted rule %s", params['RuleArn'])
+    elif method == 'modify_rule':
+        events.record('modified', "Successfully modified rule %s", params['RuleArn'])
+    else:
+        moved = len(params['RulePriorities'])
+        events.record('moved', "Successfully set priorities of %s rules", moved, count=moved)
+
+def record_created(created: Optional[List[Dict[str, Any]]], method: str,
+                   response: Dict[str, Any]) -> None:
+    """Keep the rules returned by a create_rule call from ``operation_calls``."""
+    if created is not None and method == 'create_rule':
+        created.extend(response.get('Rules', []))
+
+def apply_operation(listener_arn: str, operation: Dict[str, Any],
+                    created: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Apply one operation of a restore plan.
+    
+    Args:
+        listener_arn: ARN of the ALB listener
+        operation: Operation produced by the restore planner
+        created: Rules created so far by the restore, extended with the ones
+            this operation creates. Staged set_priorities operations find the
+            rules they move in it; without it, the listener is described.
+        
+    Raises:
+        ValueError: If the operation type is unknown
+        ClientError: If there is an issue with the AWS API call
+    """
+    rules: Optional[Iterable[Dict[str, Any]]] = None
+    if operation.get('staged'):
+        rules = created if created is not None else iter_alb_rules(listener_arn)
+    client = get_client('elbv2', region_from_arn(listener_arn))
+    for method, params in operation_calls(listener_arn, operation, rules):
+        response = getattr(client, method)(**params)
+        record_call(rule_events, method, params)
+        record_created(created, method, response)
+
+def compare_rules(existing_rules: Iterable[Dict[str, Any]],
+                  backup_rules: Iterable[Dict[str, Any]]
+                  ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Compare existing rules with backup rules by priority.
+    
+    Rules are compared in canonical form (see ``diff.canonicalize_rule``),
+    so reordered condition values or defaults echoed back by ALB do not
+    count as differences. Restores use ``diff.diff_rules`` instead, which
+    also detects rules that only changed priority.
+    
+    Both inputs are consumed in a single pass, so generators such as
+    ``iter_alb_rules`` can be passed directly.
+    
+    Args:
+        existing_rules: Iterable of existing ALB rules
+        backup_rules: Iterable of backup ALB rules
         
     Returns:
         Tuple containing:
@@ -177,7 +485,6 @@ def compare_rules(existing_rules: List[Dict[str, Any]],
     rules_to_delete = [existing_by_priority[p] for p in delete_priorities]
     
     # Find rules to update (in both but with differences)
-    # Note: This is a simple comparison and may need more sophisticated logic
     rules_to_update = []
     common_priorities = set(backup_by_priority.keys()) & set(existing_by_priority.keys())
     
@@ -186,100 +493,312 @@ def compare_rules(existing_rules: List[Dict[str, Any]],
         existing_rule = existing_by_priority[priority]
         
         # Compare the rule content (excluding system fields like ARN, etc.)
-        if (backup_rule.get('Actions') != existing_rule.get('Actions') or
-            backup_rule.get('Conditions') != existing_rule.get('Conditions')):
+        if not rules_equivalent(backup_rule, existing_rule):
             rules_to_update.append((existing_rule, backup_rule))
     
     return rules_to_create, rules_to_delete, rules_to_update
 
-def restore_alb_rules(listener_arn: str, 
-                     backup_file: str,
-                     restore_mode: str = 'incremental') -> Dict[str, Any]:
-    """Restore ALB rules from a backup file.
+def _recording(rules: Iterable[Dict[str, Any]],
+               seen: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Pass rules through, keeping a reference to each one in seen."""
+    for rule in rules:
+        seen.append(rule)
+        yield rule
+
+def build_restore_plan(listener_arn: str,
+                       backup_file: str,
+                       restore_mode: str = 'incremental',
+                       concurrency: int = DEFAULT_CONCURRENCY,
+                       minimal_moves: bool = False,
+                       full_strategy: str = STRATEGY_SWAP) -> Dict[str, Any]:
+    """Compute the operations needed to restore ALB rules, without applying them.
+    
+    The plan records a fingerprint of the listener's rules at planning time,
+    so that ``apply_restore_plan`` can refuse to apply a stale plan.
     
     Args:
         listener_arn: ARN of the ALB listener
-        backup_file: Path to the backup file
+        backup_file: Path to the backup file, or its 's3://bucket/key' URI
         restore_mode: Mode of restore ('incremental' or 'full')
+        concurrency: Concurrency used to estimate the restore duration
+        minimal_moves: In incremental mode, restore the backup's rule order
+            while moving as few rules as possible, rather than its exact priorities
+        full_strategy: In full mode, 'swap' to build the restored rules before
+            removing the existing ones, or 'delete-first'
         
     Returns:
-        Summary of restore operation
+        Restore plan with its operations, summary and estimate
         
     Raises:
-        ValueError: If restore_mode is not supported
+        ValueError: If restore_mode or full_strategy is not supported
         ClientError: If there is an issue with the AWS API call
     """
+    check_restore_mode(restore_mode)
+    
+    # Load backup rules
+    with phase('load'):
+        backup_rules = load_backup_file(backup_file)
+    
+    # Existing rules are fetched page by page as they are consumed. Both
+    # planners read every existing rule before anything is changed, so the
+    # pagination markers stay valid.
+    headroom = None
+    if restore_mode == 'full' and full_strategy == STRATEGY_SWAP:
+        with phase('preflight'):
+            headroom = _rule_headroom(listener_arn)
+    with phase('diff'):
+        return _make_restore_plan(listener_arn, iter_alb_rules(listener_arn), backup_rules,
+                                  backup_file, restore_mode, concurrency,
+                                  minimal_moves=minimal_moves, full_strategy=full_strategy,
+                                  rule_headroom=headroom)
+
+def _rule_headroom(listener_arn: str) -> Optional[int]:
+    """Return the rules a swap can add before the rule quota, None when it cannot be checked."""
+    try:
+        return rule_headroom(listener_arn)
+    except ClientError as e:
+        logger.warning("Could not check the rule quota of %s: %s", listener_arn, e)
+        return None
+
+def check_restore_mode(restore_mode: str) -> None:
+    """Validate a restore mode.
+    
+    Raises:
+        ValueError: If restore_mode is not supported
+    """
     if restore_mode not in ['incremental', 'full']:
         raise ValueError(f"Unsupported restore mode: {restore_mode}. Use 'incremental' or 'full'")
+
+def _make_restore_plan(listener_arn: str,
+                       existing_rules: Iterable[Dict[str, Any]],
+                       backup_rules: List[Dict[str, Any]],
+                       backup_file: str,
+                       restore_mode: str,
+                       concurrency: int,
+                       minimal_moves: bool = False,
+                       full_strategy: str = STRATEGY_SWAP,
+                       rule_headroom: Optional[int] = None) -> Dict[str, Any]:
+    """Plan a restore from existing and backup rules and record how it was made."""
+    seen: List[Dict[str, Any]] = []
+    existing_rules = _recording(existing_rules, seen)
     
-    # Load backup rules
-    backup_rules = load_backup_file(backup_file)
+    if restore_mode == 'full':
+        # In full mode, replace all non-default existing rules with the
+        # backup rules, building them first unless the quota is too tight
+        plan = plan_full_restore(existing_rules, backup_rules, full_strategy, rule_headroom)
+    else:
+        # In incremental mode, plan the cheapest set of calls: rules are
+        # moved with set_rule_priorities and changed in place with
+        # modify_rule, and only created or deleted when nothing else fits
+        plan = plan_incremental_restore(existing_rules, backup_rules, minimal_moves)
+    
+    plan.update({
+        'version': PLAN_VERSION,
+        'listener_arn': listener_arn,
+        'backup_file': backup_file,
+        'restore_mode': restore_mode,
+        'minimal_moves': minimal_moves and restore_mode != 'full',
+        'created_at': datetime.now().isoformat(),
+        'listener_fingerprint': rule_set_fingerprint(seen),
+        'estimate': {
+            'api_calls': plan['summary']['api_calls'],
+            'duration_seconds': round(estimate_duration(plan['operations'], concurrency,
+                                                        stages=plan_stages(plan)), 1),
+        },
+    })
+    return plan
+
+@recorded('restore')
+def apply_restore_plan(plan: Dict[str, Any],
+                       concurrency: int = DEFAULT_CONCURRENCY,
+                       verify: bool = True,
+                       preflight: bool = True) -> Dict[str, Any]:
+    """Apply a restore plan computed by ``build_restore_plan``.
+    
+    Args:
+        plan: Restore plan, possibly loaded from a plan file
+        concurrency: Maximum number of API operations in flight
+        verify: Check the listener's rules did not change since the plan was made
+        preflight: Check referenced target groups and quotas before changing
+            anything (see ``alb_rules_tool.preflight``)
+        
+    Returns:
+        Summary of restore operation, with 'metrics' on the API calls made
+        
+    Raises:
+        ValueError: If verify is True and the listener changed since planning
+        PreflightError: If preflight is True and the plan would fail
+        ClientError: If there is an issue with the AWS API call
+    """
+    listener_arn = plan['listener_arn']
+    
+    if verify and plan.get('listener_fingerprint'):
+        with phase('diff'):
+            current = rule_set_fingerprint(iter_alb_rules(listener_arn))
+        if current != plan['listener_fingerprint']:
+            raise ValueError(
+                f"Rules of listener {listener_arn} changed since the plan was created; "
+                "create a new plan"
+            )
+    
+    if preflight and plan['operations']:
+        with phase('preflight'):
+            preflight_restore(plan)
+    
+    timings: List[Tuple[Dict[str, Any], float, float]] = []
+    # Swaps move the rules they staged without describing the listener again
+    created: List[Dict[str, Any]] = []
+    
+    def apply(operation: Dict[str, Any]) -> None:
+        start = time.monotonic()
+        try:
+            apply_operation(listener_arn, operation, created)
+        finally:
+            timings.append((operation, start, time.monotonic()))
+    
+    with phase('apply'):
+        outcomes = execute_operations(
+            plan['operations'],
+            apply,
+            concurrency=concurrency,
+            stages=plan_stages(plan),
+            # Until the existing rules are parked, a failed swap leaves routing untouched
+            halt_on_error=plan.get('strategy') == STRATEGY_SWAP
+        )
+    rolled_back = None
+    if plan.get('strategy') == STRATEGY_SWAP and any(error is not None for _, error in outcomes):
+        with phase('rollback'):
+            rolled_back = _roll_back_swap(listener_arn, outcomes, concurrency)
+    rule_events.flush()
+    return summarize_restore(plan, outcomes, timings, rolled_back)
+
+def _roll_back_swap(listener_arn: str, outcomes: List[OperationResult],
+                    concurrency: int) -> Optional[int]:
+    """Delete the rules a halted swap created; return how many, None if it went too far."""
+    operations = plan_swap_rollback(outcomes, iter_alb_rules(listener_arn))
+    if operations is None:
+        logger.error("Swap of %s stopped after routing switched to the restored rules; "
+                     "restore again to finish it", listener_arn)
+        return None
+    logger.warning("Swap of %s stopped; deleting the %s rules it created",
+                   listener_arn, len(operations))
+    results = execute_operations(
+        operations,
+        lambda operation: apply_operation(listener_arn, operation),
+        concurrency=concurrency
+    )
+    return sum(1 for _, error in results if error is None)
+
+def misroute_window(plan: Dict[str, Any],
+                    timings: Iterable[Tuple[Dict[str, Any], float, float]]) -> float:
+    """Measure how long requests matched by a rule could have been misrouted by a full restore.
+    
+    When existing rules are deleted first, this lasts from the first
+    delete until the last rule is created. With a swap, it only lasts as
+    long as the calls parking the existing rules below the restored ones.
     
-    # Get existing rules
-    client = boto3.client('elbv2')
-    response = client.describe_rules(ListenerArn=listener_arn)
-    existing_rules = response['Rules']
+    Args:
+        plan: Restore plan that was applied
+        timings: (operation, start, end) monotonic times of every attempt
+        
+    Returns:
+        Duration in seconds
+    """
+    swap = plan.get('strategy') == STRATEGY_SWAP
+    spans = [(start, end) for operation, start, end in timings
+             if not swap or operation.get('parking')]
+    if not spans:
+        return 0.0
+    return round(max(end for _, end in spans) - min(start for start, _ in spans), 3)
+
+def summarize_restore(plan: Dict[str, Any],
+                      outcomes: Iterable[Tuple[Dict[str, Any], Optional[Exception]]],
+                      timings: Optional[Iterable[Tuple[Dict[str, Any], float, float]]] = None,
+                      rolled_back: Optional[int] = None) -> Dict[str, Any]:
+    """Count what a restore changed from the outcome of each operation.
     
-    result = {
+    Operations skipped after a failure are counted in 'skipped', not in
+    'errors'.
+    
+    Args:
+        plan: Restore plan that was applied
+        outcomes: (operation, error) pairs, where error is None on success
+        timings: (operation, start, end) times of the calls made; for full
+            restores, the summary then has the 'misroute_window_seconds'
+        rolled_back: Rules deleted to undo a halted swap, if any
+        
+    Returns:
+        Summary of restore operation
+    """
+    result: Dict[str, Any] = {
         'created': 0,
         'deleted': 0,
         'updated': 0,
-        'errors': 0
+        'moved': 0,
+        'errors': 0,
+        'skipped': 0
     }
     
-    if restore_mode == 'full':
-        # In full mode, delete all non-default existing rules first
-        for rule in existing_rules:
-            if rule['Priority'] != 'default':
-                try:
-                    delete_rule(rule['RuleArn'])
-                    result['deleted'] += 1
-                except Exception as e:
-                    logger.error(f"Error deleting rule {rule['RuleArn']}: {e}")
-                    result['errors'] += 1
-        
-        # Then create all backup rules
-        for rule in backup_rules:
-            if rule['Priority'] != 'default':
-                try:
-                    create_rule(listener_arn, rule)
-                    result['created'] += 1
-                except Exception as e:
-                    logger.error(f"Error creating rule from backup: {e}")
-                    result['errors'] += 1
-    else:
-        # In incremental mode, compare rules and apply changes
-        rules_to_create, rules_to_delete, rules_to_update = compare_rules(
-            existing_rules, backup_rules
-        )
+    for operation, error in outcomes:
+        op_type = operation['type']
+        if isinstance(error, OperationSkipped):
+            result['skipped'] += 1
+        elif error is not None:
+            result['errors'] += 1
+        elif op_type == OP_CREATE:
+            result['created'] += 1
+        elif op_type == OP_DELETE:
+            result['deleted'] += 1
+        elif op_type in (OP_MODIFY, OP_REPLACE):
+            result['updated'] += 1
+        elif not operation.get('parking') and not operation.get('staged'):
+            result['moved'] += len(operation['priorities'])
+    
+    result['api_calls'] = plan['summary']['api_calls']
+    result['calls_saved'] = plan['summary']['calls_saved']
+    if 'strategy' in plan and timings is not None:
+        result['strategy'] = plan['strategy']
+        result['misroute_window_seconds'] = misroute_window(plan, timings)
+    if rolled_back is not None:
+        result['rolled_back'] = rolled_back
+    
+    logger.info("Restore summary: %s", result)
+    return result
+
+@recorded('restore')
+def restore_alb_rules(listener_arn: str, 
+                     backup_file: str,
+                     restore_mode: str = 'incremental',
+                     concurrency: int = DEFAULT_CONCURRENCY,
+                     preflight: bool = True,
+                     minimal_moves: bool = False,
+                     full_strategy: str = STRATEGY_SWAP) -> Dict[str, Any]:
+    """Restore ALB rules from a backup file.
+    
+    The changes are planned first, then applied by a rate-limited executor
+    that runs independent operations concurrently.
+    
+    Args:
+        listener_arn: ARN of the ALB listener
+        backup_file: Path to the backup file, or its 's3://bucket/key' URI.
+            S3 backups are parsed as they are downloaded, without a local copy.
+        restore_mode: Mode of restore ('incremental' or 'full')
+        concurrency: Maximum number of API operations in flight
+        preflight: Check referenced target groups and quotas before changing anything
+        minimal_moves: In incremental mode, restore the backup's rule order
+            while moving as few rules as possible, rather than its exact priorities
+        full_strategy: In full mode, 'swap' to build the restored rules before
+            removing the existing ones, or 'delete-first'
         
-        # Create new rules
-        for rule in rules_to_create:
-            try:
-                create_rule(listener_arn, rule)
-                result['created'] += 1
-            except Exception as e:
-                logger.error(f"Error creating rule from backup: {e}")
-                result['errors'] += 1
-        
-        # Update existing rules (delete and recreate)
-        for existing_rule, backup_rule in rules_to_update:
-            try:
-                delete_rule(existing_rule['RuleArn'])
-                create_rule(listener_arn, backup_rule)
-                result['updated'] += 1
-            except Exception as e:
-                logger.error(f"Error updating rule {existing_rule['RuleArn']}: {e}")
-                result['errors'] += 1
-        
-        # Delete rules not in backup
-        for rule in rules_to_delete:
-            try:
-                delete_rule(rule['RuleArn'])
-                result['deleted'] += 1
-            except Exception as e:
-                logger.error(f"Error deleting rule {rule['RuleArn']}: {e}")
-                result['errors'] += 1
-    
-    logger.info(f"Restore summary: {result}")
-    return result
\ No newline at end of file
+    Returns:
+        Summary of restore operation, with 'metrics' on the API calls made
+        
+    Raises:
+        ValueError: If restore_mode or full_strategy is not supported
+        PreflightError: If preflight is True and the restore would fail
+        ClientError: If there is an issue with the AWS API call
+    """
+    plan = build_restore_plan(listener_arn, backup_file, restore_mode, concurrency, minimal_moves,
+                              full_strategy)
+    # The plan was just computed from the live rules, no need to check them again
+    return apply_restore_plan(plan, concurrency, verify=False, preflight=preflight)
@@ -0,0 +1,511 @@
+"""Offline simulation of how a listener routes requests.
+
+A rule set, read from a backup or described from a live listener, is
+compiled into a ``RuleMatcher`` indexing every condition value:
+
+- host-header patterns in a trie of host labels, most specific label first
+- path-pattern, header and query string wildcards in lazily built automata
+  matching all patterns of a field in one pass over the value
+- exact values, request methods and source IP networks in hash tables
+
+Matching a request looks up each of its fields once, counts the satisfied
+conditions of every rule and picks the lowest priority rule whose
+conditions are all satisfied, as ALB does. Recorded requests, e.g. ALB
+access logs, are matched in batches spread over several processes.
+"""
+
+import os
+import json
+import logging
+import ipaddress
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import (
+    Any, Deque, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+)
+from urllib.parse import parse_qsl, urlsplit
+
+from alb_rules_tool.diff import canonical_conditions
+
+logger = logging.getLogger(__name__)
+
+# Requests matched per batch handed to a worker process
+DEFAULT_CHUNK_SIZE = 5000
+
+# Lazily built automaton states kept before the automaton starts over
+MAX_AUTOMATON_STATES = 10000
+
+# Field values whose matches are remembered by each table
+MAX_MEMO_SIZE = 65536
+
+# Fields of an ALB access log entry
+_LOG_FIELD = re.compile(r'"[^"]*"|\S+')
+_LOG_CLIENT, _LOG_REQUEST, _LOG_USER_AGENT = 3, 12, 13
+
+def _normalize_pattern(pattern: str) -> str:
+    """Collapse runs of '*', which match the same values as a single one."""
+    return re.sub(r'\*+', '*', pattern)
+
+class _GlobAutomaton:
+    """Automaton matching a value against many '*' and '?' wildcard patterns at once.
+
+    The states of the equivalent deterministic automaton are built as
+    values need them: a state is the set of (pattern, position) pairs
+    still alive, and each state remembers its transitions.
+    """
+
+    def __init__(self, patterns: List[Tuple[str, int]]):
+        self._patterns = [pattern for pattern, _ in patterns]
+        self._ids = [condition_id for _, condition_id in patterns]
+        self._reset()
+
+    def _reset(self) -> None:
+        self._states: Dict[FrozenSet[Tuple[int, int]], int] = {}
+        self._positions: List[FrozenSet[Tuple[int, int]]] = []
+        self._accepts: List[Tuple[int, ...]] = []
+        self._transitions: List[Dict[str, int]] = []
+        self._dead = self._state(frozenset())
+        self._start = self._state(self._closure((index, 0) for index in range(len(self._patterns))))
+
+    def _closure(self, positions: Iterable[Tuple[int, int]]) -> FrozenSet[Tuple[int, int]]:
+        """Add the positions reached by letting a '*' match nothing."""
+        closed: Set[Tuple[int, int]] = set()
+        for index, position in positions:
+            pattern = self._patterns[index]
+            closed.add((index, position))
+            # Runs of '*' are collapsed, so one step is enough
+            if position < len(pattern) and pattern[position] == '*':
+                closed.add((index, position + 1))
+        return frozenset(closed)
+
+    def _state(self, positions: FrozenSet[Tuple[int, int]]) -> int:
+        state = self._states.get(positions)
+        if state is None:
+            state = len(self._positions)
+            self._states[positions] = state
+            self._positions.append(positions)
+            self._accepts.append(tuple(sorted({
+                self._ids[index] for index, position in positions
+                if position == len(self._patterns[index])
+            })))
+            self._transitions.append({})
+        return state
+
+    def _step(self, state: int, char: str) -> int:
+        following = []
+        for index, position in self._positions[state]:
+            pattern = self._patterns[index]
+            if position == len(pattern):
+                continue
+            token = pattern[position]
+            if token == '*':
+                following.append((index, position))
+            elif token == '?' or token == char:
+                following.append((index, position + 1))
+        target = self._state(self._closure(following))
+        self._transitions[state][char] = target
+        return target
+
+    def match(self, value: str) -> Tuple[int, ...]:
+        """Return the ids of the patterns matching a whole value."""
+        if len(self._positions) > MAX_AUTOMATON_STATES:
+            self._reset()
+        state = self._start
+        for char in value:
+            target = self._transitions[state].get(char)
+            state = self._step(state, char) if target is None else target
+            if state == self._dead:
+                return ()
+        return self._accepts[state]
+
+class _GlobTable:
+    """Values and wildcard patterns of one field, mapped to condition ids."""
+
+    def __init__(self, ignore_case: bool = False):
+        self.ignore_case = ignore_case
+        self._exact: Dict[str, List[int]] = {}
+        self._patterns: List[Tuple[str, int]] = []
+        self._automaton: Optional[_GlobAutomaton] = None
+        self._memo: Dict[str, Tuple[int, ...]] = {}
+
+    def add(self, pattern: str, condition_id: int) -> None:
+        if self.ignore_case:
+            pattern = pattern.lower()
+        if '*' in pattern or '?' in pattern:
+            self._patterns.append((_normalize_pattern(pattern), condition_id))
+            self._automaton = None
+        else:
+            self._exact.setdefault(pattern, []).append(condition_id)
+
+    def match(self, value: str) -> Tuple[int, ...]:
+        """Return the ids of the conditions matching a value."""
+        if self.ignore_case:
+            value = value.lower()
+        matched = self._memo.get(value)
+        if matched is not None:
+            return matched
+        matched = tuple(self._exact.get(value, ()))
+        if self._patterns:
+            if self._automaton is None:
+                self._automaton = _GlobAutomaton(self._patterns)
+            matched += self._automaton.match(value)
+        if len(self._memo) >= MAX_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[value] = matched
+        return matched
+
+class _HostNode:
+    __slots__ = ('children', 'exact', 'prefixes')
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_HostNode"] = {}
+        self.exact: List[int] = []
+        # Patterns whose labels left of this node contain wildcards
+        self.prefixes: Optional[_GlobTable] = None
+
+class _HostTrie:
+    """Host-header patterns in a trie of host labels, read from the right.
+
+    A pattern is stored under its longest suffix of labels without
+    wildcards; what is left of it, such as '*' in '*.example.com', is
+    matched against the rest of the host at that node.
+    """
+
+    def __init__(self) -> None:
+        self._root = _HostNode()
+
+    def add(self, pattern: str, condition_id: int) -> None:
+        labels = pattern.lower().split('.')
+        split = len(labels)
+        while split > 0 and '*' not in labels[split - 1] and '?' not in labels[split - 1]:
+            split -= 1
+        node = self._root
+        for label in reversed(labels[split:]):
+            node = node.children.setdefault(label, _HostNode())
+        if split == 0:
+            node.exact.append(condition_id)
+            return
+        if node.prefixes is None:
+            node.prefixes = _GlobTable()
+        node.prefixes.add('.'.join(labels[:split]), condition_id)
+
+    def match(self, host: str) -> List[int]:
+        """Return the ids of the conditions matching a host."""
+        labels = host.lower().rstrip('.').split('.')
+        matched: List[int] = []
+        node: Optional[_HostNode] = self._root
+        remaining = len(labels)
+        while node is not None:
+            if remaining == 0:
+                matched.extend(node.exact)
+                break
+            if node.prefixes is not None:
+                matched.extend(node.prefixes.match('.'.join(labels[:remaining])))
+            node = node.children.get(labels[remaining - 1])
+            remaining -= 1
+        return matched
+
+class _NetworkTable:
+    """Source IP networks, hashed by address family and prefix length."""
+
+    def __init__(self) -> None:
+        self._networks: Dict[Tuple[int, int], Dict[int, List[int]]] = {}
+
+    def add(self, cidr: str, condition_id: int) -> None:
+        network = ipaddress.ip_network(cidr, strict=False)
+        shift = network.max_prefixlen - network.prefixlen
+        table = self._networks.setdefault((network.version, network.prefixlen), {})
+        table.setdefault(int(network.network_address) >> shift, []).append(condition_id)
+
+    def __bool__(self) -> bool:
+        return bool(self._networks)
+
+    def match(self, address: str) -> List[int]:
+        """Return the ids of the conditions whose networks contain an address."""
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return []
+        matched: List[int] = []
+        for (version, prefixlen), table in self._networks.items():
+            if version == ip.version:
+                matched.extend(table.get(int(ip) >> (ip.max_prefixlen - prefixlen), ()))
+        return matched
+
+class RuleMatcher:
+    """Rule set compiled for matching requests the way ALB evaluates rules."""
+
+    def __init__(self, rules: Iterable[Dict[str, Any]]):
+        rules = list(rules)
+        ordered = sorted((rule for rule in rules if rule['Priority'] != 'default'),
+                         key=lambda rule: int(rule['Priority']))
+        self.default = 'default' if any(rule['Priority'] == 'default' for rule in rules) else None
+        self.priorities: List[str] = [str(rule['Priority']) for rule in ordered]
+
+        self._required: List[int] = []
+        self._owners: List[int] = []
+        self._hosts = _HostTrie()
+        self._paths = _GlobTable()
+        self._headers: Dict[str, _GlobTable] = {}
+        self._queries = _GlobTable(ignore_case=True)
+        self._methods: Dict[str, List[int]] = {}
+        self._networks = _NetworkTable()
+        for index, rule in enumerate(ordered):
+            conditions = canonical_conditions(rule)
+            self._required.append(len(conditions))
+            for condition in conditions:
+                self._add_condition(index, condition)
+        logger.debug("Compiled %s rules with %s conditions", len(ordered), len(self._owners))
+
+    def _add_condition(self, rule_index: int, condition: Dict[str, Any]) -> None:
+        condition_id = len(self._owners)
+        self._owners.append(rule_index)
+        field = condition['Field']
+        for value in condition.get('Values') or []:
+            if field == 'host-header':
+                self._hosts.add(value, condition_id)
+            elif field == 'path-pattern':
+                self._paths.add(value, condition_id)
+            elif field == 'http-header':
+                table = self._headers.setdefault(condition['HttpHeaderName'],
+                                                 _GlobTable(ignore_case=True))
+                table.add(value, condition_id)
+            elif field == 'query-string':
+                # A pair without key matches the value under any key
+                pair = f"{value.get('Key') or '*'}\0{value.get('Value') or ''}"
+                self._queries.add(pair, condition_id)
+            elif field == 'http-request-method':
+                self._methods.setdefault(value.upper(), []).append(condition_id)
+            elif field == 'source-ip':
+                self._networks.add(value, condition_id)
+            else:
+                logger.warning("Condition field %s cannot be simulated; rule %s will never match",
+                               field, self.priorities[rule_index])
+                return
+
+    def _satisfied(self, request: Dict[str, Any]) -> Set[int]:
+        """Return the ids of the conditions a request satisfies."""
+        satisfied: Set[int] = set()
+        if request.get('host'):
+            satisfied.update(self._hosts.match(request['host']))
+        if request.get('path') is not None:
+            satisfied.update(self._paths.match(request['path']))
+        if request.get('method'):
+            satisfied.update(self._methods.get(request['method'].upper(), ()))
+        if request.get('source_ip') and self._networks:
+            satisfied.update(self._networks.match(request['source_ip']))
+        for name, values in (request.get('headers') or {}).items():
+            table = self._headers.get(name.lower())
+            if table is not None:
+                for value in values if isinstance(values, list) else [values]:
+                    satisfied.update(table.match(value))
+        for key, value in request.get('query') or ():
+            satisfied.update(self._queries.match(f"{key}\0{value}"))
+        return satisfied
+
+    def match(self, request: Dict[str, Any]) -> Optional[str]:
+        """Return the priority of the rule a request hits.
+
+        Args:
+            request: Request with 'method', 'host', 'path', 'query' (list of
+                key and value pairs), 'headers' (mapping of name to value or
+                values) and 'source_ip'; missing fields match no condition
+
+        Returns:
+            Priority of the winning rule, 'default' for the default rule, or
+            None when no rule matches and the rule set has no default rule
+        """
+        counts: Dict[int, int] = {}
+        best: Optional[int] = None
+        for condition_id in self._satisfied(request):
+            rule_index = self._owners[condition_id]
+            count = counts.get(rule_index, 0) + 1
+            counts[rule_index] = count
+            if count == self._required[rule_index] and (best is None or rule_index < best):
+                best = rule_index
+        return self.default if best is None else self.priorities[best]
+
+def compile_rules(rules: Iterable[Dict[str, Any]]) -> RuleMatcher:
+    """Compile a rule set, as loaded from a backup or described from a listener."""
+    return RuleMatcher(rules)
+
+def _parse_url_request(method: str, url: str, **fields: Any) -> Dict[str, Any]:
+    parts = urlsplit(url)
+    request = {
+        'method': method,
+        'host': parts.hostname or '',
+        'path': parts.path or '/',
+        'query': parse_qsl(parts.query, keep_blank_values=True),
+    }
+    request.update(fields)
+    return request
+
+def parse_request_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parse a recorded request.
+
+    Lines are either ALB access log entries or JSON objects with 'method',
+    'host', 'path', 'query' (a query string or a mapping), 'headers' and
+    'source_ip' keys, or a 'url' key instead of host, path and query.
+
+    Returns:
+        Request as taken by ``RuleMatcher.match``, None for lines that are
+        not requests
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        headers = {name.lower(): value for name, value in (record.get('headers') or {}).items()}
+        if 'url' in record:
+            return _parse_url_request(record.get('method', 'GET'), record['url'], headers=headers,
+                                      source_ip=record.get('source_ip'))
+        query = record.get('query') or []
+        if isinstance(query, str):
+            query = parse_qsl(query, keep_blank_values=True)
+        elif isinstance(query, dict):
+            query = list(query.items())
+        return {
+            'method': record.get('method', 'GET'),
+            'host': record.get('host', ''),
+            'path': record.get('path', '/'),
+            'query': query,
+            'headers': headers,
+            'source_ip': record.get('source_ip'),
+        }
+
+    fields = _LOG_FIELD.findall(line)
+    if len(fields) <= _LOG_USER_AGENT:
+        return None
+    request_line = fields[_LOG_REQUEST].strip('"').split(' ')
+    if len(request_line) < 2:
+        return None
+    return _parse_url_request(
+        request_line[0], request_line[1],
+        headers={'user-agent': fields[_LOG_USER_AGENT].strip('"')},
+        source_ip=fields[_LOG_CLIENT].rpartition(':')[0],
+    )
+
+_worker_matcher: Optional[RuleMatcher] = None
+
+def _init_worker(rules: List[Dict[str, Any]]) -> None:
+    """Compile the rule set once per worker process."""
+    global _worker_matcher
+    _worker_matcher = RuleMatcher(rules)
+
+def _match_chunk(chunk: Tuple[int, List[str]],
+                 matcher: Optional[RuleMatcher] = None) -> List[Tuple[int, Optional[str]]]:
+    """Match a batch of lines, returning (line number, priority) for each request."""
+    matcher = matcher or _worker_matcher
+    if matcher is None:
+        raise RuntimeError("No rule matcher given and the worker was not initialized")
+    first_line, lines = chunk
+    matches = []
+    for offset, line in enumerate(lines):
+        request = parse_request_line(line)
+        if request is not None:
+            matches.append((first_line + offset, matcher.match(request)))
+    return matches
+
+def _chunks(lines: Iterable[str], chunk_size: int) -> Iterator[Tuple[int, List[str]]]:
+    chunk: List[str] = []
+    first_line = 1
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == chunk_size:
+            yield first_line, chunk
+            first_line += len(chunk)
+            chunk = []
+    if chunk:
+        yield first_line, chunk
+
+def iter_matches(rules: Iterable[Dict[str, Any]], lines: Iterable[str],
+                 processes: Optional[int] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[int, Optional[str]]]:
+    """Match recorded requests against a rule set, in order.
+
+    Lines are matched in batches by a pool of worker processes, each with
+    its own compiled copy of the rules. Only a few batches per worker are
+    read ahead, so files of any size are matched in bounded memory.
+
+    Args:
+        rules: Rule set, as loaded from a backup or described from a listener
+        lines: Recorded requests, see ``parse_request_line``
+        processes: Number of worker processes; defaults to the number of
+            CPUs, 1 matches in this process
+        chunk_size: Number of lines per batch
+
+    Yields:
+        Line number (from 1) and winning rule priority of each request;
+        lines that are not requests are skipped
+    """
+    rules = list(rules)
+    processes = processes or os.cpu_count() or 1
+    chunks = _chunks(lines, chunk_size)
+    if processes == 1:
+        matcher = RuleMatcher(rules)
+        for chunk in chunks:
+            yield from _match_chunk(chunk, matcher)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(rules,)) as executor:
+        pending: Deque["Future[List[Tuple[int, Optional[str]]]]"] = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_match_chunk, chunk))
+            if len(pending) >= processes * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def simulate(rules: Iterable[Dict[str, Any]], lines: Iterable[str],
+             processes: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+             output: Optional[TextIO] = None) -> Dict[str, Any]:
+    """Count the requests each rule of a rule set would win.
+
+    Args:
+        rules: Rule set, as loaded from a backup or described from a listener
+        lines: Recorded requests, see ``parse_request_line``
+        processes: Number of worker processes (see ``iter_matches``)
+        chunk_size: Number of lines per batch
+        output: Text stream receiving the line number and winning rule of
+            each request, tab separated
+
+    Returns:
+        Dictionary with the number of lines, requests and unmatched
+        requests, and the hits of every rule by priority, in evaluation order
+    """
+    rules = list(rules)
+    matcher = RuleMatcher(rules)
+    hits = {priority: 0 for priority in matcher.priorities}
+    if matcher.default:
+        hits[matcher.default] = 0
+    line_count = 0
+
+    def counted(source: Iterable[str]) -> Iterator[str]:
+        nonlocal line_count
+        for line in source:
+            line_count += 1
+            yield line
+
+    requests = unmatched = 0
+    for line_number, priority in iter_matches(rules, counted(lines), processes, chunk_size):
+        requests += 1
+        if priority is None:
+            unmatched += 1
+        else:
+            hits[priority] += 1
+        if output is not None:
+            output.write(f"{line_number}\t{priority or '-'}\n")
+
+    logger.info("Simulated %s requests against %s rules", requests, len(matcher.priorities))
+    return {
+        "lines": line_count,
+        "requests": requests,
+        "unmatched": unmatched,
+        "hits": hits,
+    }
@@ -0,0 +1,342 @@
+"""Content-addressed, deduplicated snapshot store for ALB rules.
+
+Each rule body is stored once under its content hash, so a rule shared by
+many listeners, or unchanged across many backups, takes space only once.
+A snapshot is a small manifest of (priority, rule hash) pairs for one
+listener. Layout, on local disk or under an S3 prefix::
+
+    objects/<hash[:2]>/<hash>.json
+    snapshots/<listener>/<timestamp>-<fingerprint>.json
+"""
+
+import os
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from botocore.exceptions import ClientError
+
+from alb_rules_tool.clients import get_client
+from alb_rules_tool.diff import rule_hash, rule_set_fingerprint
+from alb_rules_tool.metrics import propagate
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+DEFAULT_STORE_WORKERS = 16
+
+# Rule attributes kept in the stored body; the rest is listener specific
+RULE_BODY_KEYS = ('Conditions', 'Actions')
+
+def listener_slug(listener_arn: str) -> str:
+    """Build a unique, file-system friendly name for a listener.
+
+    Args:
+        listener_arn: ARN of the ALB listener
+
+    Returns:
+        Name such as 'my-alb-1234567890abcdef'
+    """
+    # arn:...:listener/app/<lb-name>/<lb-id>/<listener-id>
+    resource = listener_arn.split(":")[-1]
+    parts = resource.split("/")
+    if len(parts) >= 5:
+        return f"{parts[2]}-{parts[4]}"
+    return resource.replace("/", "-")
+
+def object_key(digest: str) -> str:
+    """Return the store key of a rule body."""
+    return f"objects/{digest[:2]}/{digest}.json"
+
+class SnapshotStore:
+    """Key/value storage backing snapshots; subclasses provide the I/O."""
+
+    def __init__(self) -> None:
+        # Hashes known to be stored, so shared rules are checked only once
+        self._known: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Location of the store, accepted by ``open_store``."""
+        raise NotImplementedError
+
+    def read(self, key: str) -> Optional[bytes]:
+        """Return the content stored under key, or None if it is missing."""
+        raise NotImplementedError
+
+    def write(self, key: str, data: bytes) -> None:
+        """Store data under key, replacing any previous content."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        """Check whether something is stored under key."""
+        raise NotImplementedError
+
+    def list(self, prefix: str) -> List[str]:
+        """Return the keys starting with prefix, sorted."""
+        raise NotImplementedError
+
+    def uri(self, key: str) -> str:
+        """Return the location of a key."""
+        return f"{self.url.rstrip('/')}/{key}"
+
+    def has_object(self, digest: str) -> bool:
+        """Check whether a rule body is stored, remembering positive answers."""
+        with self._lock:
+            if digest in self._known:
+                return True
+        if not self.exists(object_key(digest)):
+            return False
+        with self._lock:
+            self._known.add(digest)
+        return True
+
+    def put_object(self, digest: str, body: Dict[str, Any]) -> None:
+        """Store a rule body under its hash."""
+        data = json.dumps(body, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        self.write(object_key(digest), data)
+        with self._lock:
+            self._known.add(digest)
+
+    def get_object(self, digest: str) -> Dict[str, Any]:
+        """Return a stored rule body.
+
+        Raises:
+            KeyError: If the body is not in the store
+        """
+        data = self.read(object_key(digest))
+        if data is None:
+            raise KeyError(f"Rule object {digest} missing from {self.url}")
+        body: Dict[str, Any] = json.loads(data)
+        return body
+
+class LocalStore(SnapshotStore):
+    """Snapshot store in a local directory."""
+
+    def __init__(self, root: str):
+        super().__init__()
+        self.root = os.path.abspath(root)
+
+    @property
+    def url(self) -> str:
+        return self.root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent readers never see partial objects
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def list(self, prefix: str) -> List[str]:
+        directory, _, name_prefix = prefix.rpartition("/")
+        try:
+            names = os.listdir(self._path(directory)) if directory else os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        base = f"{directory}/" if directory else ""
+        return sorted(f"{base}{name}" for name in names
+                      if name.startswith(name_prefix) and not name.endswith(".tmp"))
+
+class S3Store(SnapshotStore):
+    """Snapshot store under an S3 prefix."""
+
+    def __init__(self, bucket_name: str, prefix: str = ""):
+        super().__init__()
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip("/")
+
+    @property
+    def url(self) -> str:
+        if self.prefix:
+            return f"s3://{self.bucket_name}/{self.prefix}"
+        return f"s3://{self.bucket_name}"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            response = get_client('s3').get_object(Bucket=self.bucket_name, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                return None
+            raise
+        data: bytes = response['Body'].read()
+        return data
+
+    def write(self, key: str, data: bytes) -> None:
+        get_client('s3').put_object(Bucket=self.bucket_name, Key=self._key(key), Body=data)
+
+    def exists(self, key: str) -> bool:
+        try:
+            get_client('s3').head_object(Bucket=self.bucket_name, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def list(self, prefix: str) -> List[str]:
+        paginator = get_client('s3').get_paginator('list_objects_v2')
+        strip = len(self._key(""))
+        keys: List[str] = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self._key(prefix)):
+            keys.extend(item['Key'][strip:] for item in page.get('Contents', []))
+        return sorted(keys)
+
+def open_store(url: str) -> SnapshotStore:
+    """Open a snapshot store from its location.
+
+    Args:
+        url: 's3://bucket/prefix' or a local directory
+
+    Returns:
+        Snapshot store
+    """
+    if url.startswith("s3://"):
+        bucket_name, _, prefix = url[len("s3://"):].partition("/")
+        return S3Store(bucket_name, prefix)
+    return LocalStore(url)
+
+def rule_body(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the listener-independent part of a rule that is stored."""
+    return {key: rule[key] for key in RULE_BODY_KEYS if key in rule}
+
+def save_snapshot(rules: Iterable[Dict[str, Any]],
+                  store: SnapshotStore,
+                  listener_arn: str,
+                  max_workers: int = DEFAULT_STORE_WORKERS) -> Dict[str, Any]:
+    """Store a listener's rules as a snapshot, writing only new rule bodies.
+
+    Rule bodies already in the store are not written again. Existence
+    checks and uploads of new bodies run in parallel.
+
+    Args:
+        rules: Iterable of ALB rules
+        store: Snapshot store
+        listener_arn: ARN of the listener the rules belong to
+        max_workers: Maximum number of parallel store requests
+
+    Returns:
+        Dictionary with the 'snapshot' location, its 'fingerprint', the
+        number of 'rules' and the number of 'new_objects' written
+    """
+    rules = list(rules)
+    hashed = [(rule, rule_hash(rule)) for rule in rules]
+
+    bodies: Dict[str, Dict[str, Any]] = {}
+    for rule, digest in hashed:
+        bodies.setdefault(digest, rule_body(rule))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        present = dict(zip(bodies, pool.map(propagate(store.has_object), bodies)))
+        missing = [digest for digest, stored in present.items() if not stored]
+        list(pool.map(propagate(lambda digest: store.put_object(digest, bodies[digest])), missing))
+
+    fingerprint = rule_set_fingerprint(rules)
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "store": store.url,
+        "listener_arn": listener_arn,
+        "created_at": datetime.now().isoformat(),
+        "fingerprint": fingerprint,
+        "rules": [[str(rule['Priority']), digest] for rule, digest in hashed],
+    }
+    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+    key = f"snapshots/{listener_slug(listener_arn)}/{timestamp}-{fingerprint[:12]}.json"
+    store.write(key, json.dumps(snapshot, indent=2).encode('utf-8'))
+
+    logger.info("Stored snapshot of %s (%s rules, %s new objects) at %s",
+                listener_arn, len(rules), len(missing), store.uri(key))
+    return {
+        "snapshot": store.uri(key),
+        "fingerprint": fingerprint,
+        "rules": len(rules),
+        "new_objects": len(missing),
+    }
+
+def latest_snapshot(store: SnapshotStore, listener_arn: str) -> Optional[Dict[str, Any]]:
+    """Return the newest snapshot of a listener, or None if there is none."""
+    keys = store.list(f"snapshots/{listener_slug(listener_arn)}/")
+    if not keys:
+        return None
+    data = store.read(keys[-1])
+    return json.loads(data) if data is not None else None
+
+def is_snapshot(document: Any) -> bool:
+    """Check whether a parsed backup document is a snapshot manifest."""
+    return isinstance(document, dict) and "store" in document and "rules" in document
+
+def rebuild_snapshot(snapshot: Dict[str, Any],
+                     store: Optional[SnapshotStore] = None,
+                     cache_dir: Optional[str] = None,
+                     max_workers: int = DEFAULT_STORE_WORKERS) -> List[Dict[str, Any]]:
+    """Rebuild a listener's rules from a snapshot manifest.
+
+    Every distinct rule body is fetched once, in parallel. With a cache
+    directory, bodies already there are read locally and fetched ones are
+    kept there; bodies never change, so cached ones are always valid.
+
+    Args:
+        snapshot: Parsed snapshot manifest
+        store: Snapshot store (optional, defaults to the one named in the snapshot)
+        cache_dir: Local directory caching rule bodies (optional)
+        max_workers: Maximum number of parallel fetches
+
+    Returns:
+        List of ALB rules, in snapshot order
+
+    Raises:
+        ValueError: If the snapshot version is not supported
+        KeyError: If a rule body is missing from the store
+    """
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {snapshot.get('version')}")
+    store = store or open_store(snapshot["store"])
+    cache = LocalStore(cache_dir) if cache_dir else None
+
+    def fetch(digest: str) -> Dict[str, Any]:
+        if cache and cache.has_object(digest):
+            return cache.get_object(digest)
+        body = store.get_object(digest)
+        if cache:
+            cache.put_object(digest, body)
+        return body
+
+    digests = list(dict.fromkeys(digest for _, digest in snapshot["rules"]))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        bodies = dict(zip(digests, pool.map(propagate(fetch), digests)))
+
+    rules = []
+    for priority, digest in snapshot["rules"]:
+        rule = {"Priority": priority, "IsDefault": priority == "default"}
+        rule.update(bodies[digest])
+        rules.append(rule)
+    logger.info("Rebuilt %s rules of %s from %s objects",
+                len(rules), snapshot.get('listener_arn'), len(digests))
+    return rules
@@ -0,0 +1,128 @@
+"""Streaming I/O to and from S3."""
+
+import io
+import logging
+from types import TracebackType
+from typing import Any, Dict, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart parts smaller than 5 MiB, except for the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+class S3MultipartWriter(io.BufferedIOBase):
+    """Binary file-like object that uploads what is written to an S3 object.
+
+    Data is buffered up to ``part_size`` bytes and sent as one part of a
+    multipart upload, so memory use does not depend on the object size and
+    nothing touches the local disk. Objects smaller than one part are sent
+    with a single PutObject call. The upload is completed on ``close()``
+    and aborted by ``abort()``, when the ``with`` block raises (including
+    KeyboardInterrupt), or when the writer is garbage-collected without
+    being closed, so a truncated body never replaces an existing object.
+    """
+
+    def __init__(self, client: Any, bucket_name: str, s3_key: str,
+                 part_size: int = DEFAULT_PART_SIZE,
+                 extra_args: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.client = client
+        self.bucket_name = bucket_name
+        self.s3_key = s3_key
+        self.part_size = part_size
+        self.extra_args = dict(extra_args or {})
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Any]] = []
+
+    @property
+    def s3_uri(self) -> str:
+        """S3 URI of the object being written."""
+        return f"s3://{self.bucket_name}/{self.s3_key}"
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        if self.closed:
+            raise ValueError("write to closed S3 writer")
+        data = bytes(data)
+        self._buffer.extend(data)
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, data: bytes) -> None:
+        """Send one part, starting the multipart upload if needed."""
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=self.s3_key, **self.extra_args
+            )
+            self._upload_id = response['UploadId']
+            logger.debug("Started multipart upload to %s", self.s3_uri)
+        part_number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.s3_key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+    def close(self) -> None:
+        """Upload what is left and complete the object."""
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self.s3_key,
+                    Body=bytes(self._buffer),
+                    **self.extra_args
+                )
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=self.s3_key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={'Parts': self._parts}
+                )
+            self._buffer.clear()
+        except BaseException:
+            self.abort()
+            raise
+        super().close()
+
+    def abort(self) -> None:
+        """Discard the upload; nothing is stored in S3."""
+        if self.closed:
+            return
+        if self._upload_id is not None:
+            try:
+                self.client.abort_multipart_upload(
+                    Bucket=self.bucket_name, Key=self.s3_key, UploadId=self._upload_id
+                )
+            except Exception as e:
+                logger.warning("Error aborting multipart upload to %s: %s", self.s3_uri, e)
+        self._buffer.clear()
+        super().close()
+
+    def __del__(self) -> None:
+        # IOBase finalization would call close() and store what was written so far
+        self.abort()
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
@@ -0,0 +1,273 @@
+"""Throttling detection and adaptive concurrency for AWS API calls."""
+
+import time
+import random
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, TypeVar
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Backoff applied to throttled calls, in seconds
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 20.0
+
+# Error codes AWS services use to signal request throttling
+THROTTLING_ERROR_CODES = frozenset([
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+    'SlowDown',
+])
+
+# Error codes and HTTP statuses of failures that may succeed when retried,
+# as botocore's standard retry mode treats them
+TRANSIENT_ERROR_CODES = frozenset([
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'PriorRequestNotComplete',
+    'InternalError',
+    'InternalFailure',
+    'ServiceUnavailable',
+])
+TRANSIENT_STATUS_CODES = frozenset([500, 502, 503, 504])
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Check whether an exception is an AWS throttling error.
+
+    Args:
+        error: Exception raised by a boto3 call
+
+    Returns:
+        True if the error means the request was throttled
+    """
+    if not isinstance(error, ClientError):
+        return False
+    return error.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+def is_transient_error(error: BaseException) -> bool:
+    """Check whether an exception is a server or connection error worth retrying.
+
+    Args:
+        error: Exception raised by a boto3 call
+
+    Returns:
+        True if the error is a 5xx response, a transient error code, or a
+        failure to connect to or read from the endpoint
+    """
+    if isinstance(error, (BotocoreConnectionError, HTTPClientError)):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    if error.response.get('Error', {}).get('Code') in TRANSIENT_ERROR_CODES:
+        return True
+    status_code = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return status_code in TRANSIENT_STATUS_CODES
+
+def backoff_delay(attempt: int,
+                  base: float = DEFAULT_BACKOFF_BASE,
+                  cap: float = DEFAULT_BACKOFF_CAP) -> float:
+    """Compute a "full jitter" exponential backoff delay.
+
+    Args:
+        attempt: Number of attempts already made, starting at 0
+        base: Delay ceiling of the first retry in seconds
+        cap: Maximum delay ceiling in seconds
+
+    Returns:
+        Random delay between 0 and min(cap, base * 2 ** attempt) seconds
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def retry_delay(error: BaseException, attempt: int, max_retries: int,
+                description: str = "AWS call") -> Optional[float]:
+    """Decide whether a failed attempt is retried, and after how long.
+
+    Throttling errors and transient server or connection errors are retried.
+
+    Args:
+        error: Exception raised by the attempt
+        attempt: Number of retries already made
+        max_retries: Maximum number of retries after the first attempt
+        description: What is being called, for log messages
+
+    Returns:
+        Seconds to wait before retrying, or None if the error must be raised
+    """
+    if attempt >= max_retries:
+        return None
+    if is_throttling_error(error):
+        delay = backoff_delay(attempt)
+        logger.warning("Throttled during %s, retrying in %.1fs", description, delay)
+        return delay
+    if is_transient_error(error):
+        delay = backoff_delay(attempt)
+        logger.warning("Transient error during %s (%s), retrying in %.1fs", description, error,
+                       delay)
+        return delay
+    return None
+
+def call_with_backoff(func: Callable[[], T],
+                      max_retries: int,
+                      description: str = "AWS call",
+                      sleep: Optional[Callable[[float], None]] = None) -> T:
+    """Call a function, retrying with jittered backoff on throttling and transient errors.
+
+    Args:
+        func: Function to call
+        max_retries: Maximum number of retries after the first attempt
+        description: What is being called, for log messages
+        sleep: Function used to wait between attempts (defaults to time.sleep)
+
+    Returns:
+        Return value of func
+
+    Raises:
+        Exception: Whatever func raised once retries are exhausted, or any
+            error that is neither a throttling nor a transient error
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            delay = retry_delay(e, attempt, max_retries, description)
+            if delay is None:
+                raise
+            (sleep or time.sleep)(delay)
+            attempt += 1
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the rate of API calls.
+
+    Tokens are added at ``rate`` per second up to ``capacity``. Callers
+    reserve tokens up front and sleep until their reservation is covered,
+    so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Take tokens from the bucket, waiting until they are available.
+
+        Args:
+            tokens: Number of tokens to take
+
+        Returns:
+            Time spent waiting in seconds
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take tokens from the bucket without waiting for them.
+
+        The caller must wait for the returned time before making its calls,
+        e.g. with ``asyncio.sleep`` on an event loop.
+
+        Args:
+            tokens: Number of tokens to take
+
+        Returns:
+            Time to wait in seconds before the tokens are covered
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+class AdaptiveConcurrencyLimiter:
+    """Limit concurrent work with an additive-increase/multiplicative-decrease policy.
+
+    The limit starts at ``max_concurrency``, is halved every time a caller
+    reports throttling, and grows back by one after ``increase_after``
+    consecutive successful operations.
+    """
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1, increase_after: int = 10):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min(min_concurrency, max_concurrency))
+        self.increase_after = increase_after
+        self._limit = max_concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """Current number of operations allowed to run at once."""
+        with self._condition:
+            return self._limit
+
+    def acquire(self) -> None:
+        """Block until an operation is allowed to start."""
+        with self._condition:
+            while self._in_flight >= self._limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, throttled: bool = False) -> None:
+        """Finish an operation and adjust the limit.
+
+        Args:
+            throttled: Whether the operation was throttled
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self._successes = 0
+                new_limit = max(self.min_concurrency, self._limit // 2)
+                if new_limit != self._limit:
+                    logger.warning("Throttled by AWS, reducing concurrency from %s to %s",
+                                   self._limit, new_limit)
+                self._limit = new_limit
+            else:
+                self._successes += 1
+                if self._successes >= self.increase_after and self._limit < self.max_concurrency:
+                    self._successes = 0
+                    self._limit += 1
+                    logger.debug("Increasing concurrency to %s", self._limit)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Run the enclosed block as one operation.
+
+        Throttling errors raised inside the block shrink the limit before
+        being re-raised.
+        """
+        self.acquire()
+        throttled = False
+        try:
+            yield
+        except Exception as e:
+            throttled = is_throttling_error(e)
+            raise
+        finally:
+            self.release(throttled)
@@ -3,7 +3,11 @@
 import os
 import pytest
 import boto3
-from moto import mock_elbv2, mock_s3
+from moto import mock_ec2, mock_elbv2, mock_s3
+
+from alb_rules_tool.cache import reset_cache
+from alb_rules_tool.clients import reset_clients
+from alb_rules_tool.preflight import clear_preflight_cache
 
 @pytest.fixture(scope="function")
 def aws_credentials():
@@ -13,11 +17,20 @@ def aws_credentials():
     os.environ["AWS_SECURITY_TOKEN"] = "testing"
     os.environ["AWS_SESSION_TOKEN"] = "testing"
     os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    
+    # Make sure no client or cache from a previous test outlives its mock
+    reset_clients()
+    reset_cache()
+    clear_preflight_cache()
+    yield
+    reset_clients()
+    reset_cache()
+    clear_preflight_cache()
 
 @pytest.fixture(scope="function")
 def elbv2_client(aws_credentials):
     """Mocked ELBv2 client."""
-    with mock_elbv2():
+    with mock_elbv2(), mock_ec2():
         client = boto3.client("elbv2", region_name="us-east-1")
         yield client
 
@@ -81,7 +94,7 @@ def mock_alb_listener(elbv2_client):
     # Create some rules
     rule1 = elbv2_client.create_rule(
         ListenerArn=listener_arn,
-        Priority="1",
+        Priority=1,
         Conditions=[
             {
                 "Field": "path-pattern",
@@ -98,7 +111,7 @@ def mock_alb_listener(elbv2_client):
     
     rule2 = elbv2_client.create_rule(
         ListenerArn=listener_arn,
-        Priority="2",
+        Priority=2,
         Conditions=[
             {
                 "Field": "host-header",
@@ -0,0 +1,215 @@
+"""Tests for the aio module."""
+
+import json
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from botocore.exceptions import ClientError
+
+from alb_rules_tool.aio import (
+    AsyncClients,
+    create_rule_async,
+    delete_rule_async,
+    describe_alb_rules_async,
+    describe_alb_rules_many,
+    restore_alb_rules_many,
+    restore_alb_rules_async
+)
+from alb_rules_tool.backup import describe_alb_rules
+from alb_rules_tool.preflight import PreflightError
+from alb_rules_tool.restore import build_restore_plan
+from alb_rules_tool.throttling import TokenBucket
+
+def _write_backup(tmp_path, target_group_arn, rules):
+    """Write a backup of forward rules given as (priority, field, value)."""
+    backup_path = tmp_path / "backup.json"
+    backup_path.write_text(json.dumps([
+        {"Priority": str(priority), "Conditions": [{"Field": field, "Values": [value]}],
+         "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]}
+        for priority, field, value in rules
+    ]))
+    return str(backup_path)
+
+def _routing(listener_arn):
+    """Return the condition value of every non-default rule, in priority order."""
+    rules = [rule for rule in describe_alb_rules(listener_arn) if rule["Priority"] != "default"]
+    rules.sort(key=lambda rule: int(rule["Priority"]))
+    return [(rule["Priority"], rule["Conditions"][0]["Values"][0]) for rule in rules]
+
+def test_describe_create_delete_async(elbv2_client, mock_alb_listener):
+    """Test async rule calls share clients on one event loop."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    
+    async def scenario():
+        async with AsyncClients(max_in_flight=8, use_aiobotocore=False) as clients:
+            await asyncio.gather(*(
+                create_rule_async(listener_arn, {
+                    "Priority": str(priority),
+                    "Conditions": [{"Field": "path-pattern", "Values": [f"/p{priority}"]}],
+                    "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]
+                }, clients=clients)
+                for priority in range(10, 30)
+            ))
+            rules = await describe_alb_rules_async(listener_arn, page_size=5, clients=clients)
+            await delete_rule_async(mock_alb_listener["rule_arns"][0], clients=clients)
+            return rules, await describe_alb_rules_async(listener_arn, clients=clients)
+    
+    created, after_delete = asyncio.run(scenario())
+    
+    assert len(created) == 23
+    assert len(after_delete) == 22
+
+def test_restore_alb_rules_async(elbv2_client, mock_alb_listener, tmp_path):
+    """Test the async restore plans and applies like the synchronous one."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    forward = [{"Type": "forward", "TargetGroupArn": mock_alb_listener["target_group_arn"]}]
+    backup_path = tmp_path / "backup.json"
+    backup_path.write_text(json.dumps([
+        {"Priority": "1", "Conditions": [{"Field": "path-pattern", "Values": ["/v2/*"]}],
+         "Actions": forward},
+        {"Priority": "8", "Conditions": [{"Field": "path-pattern", "Values": ["/new/*"]}],
+         "Actions": forward}
+    ]))
+    
+    result = asyncio.run(restore_alb_rules_async(listener_arn, str(backup_path)))
+    
+    assert result["errors"] == 0
+    assert result["updated"] == 1
+    assert result["created"] == 1
+    assert result["deleted"] == 1
+    rules = {rule["Priority"]: rule for rule in elbv2_client.describe_rules(
+        ListenerArn=listener_arn)["Rules"]}
+    assert sorted(rules) == ["1", "8", "default"]
+    assert rules["1"]["RuleArn"] == mock_alb_listener["rule_arns"][0]
+    assert rules["1"]["Conditions"][0]["Values"] == ["/v2/*"]
+
+def test_many_listener_wrappers_report_failures(elbv2_client, mock_alb_listener, tmp_path):
+    """Test the synchronous fleet wrappers keep going when one listener fails."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    missing_arn = listener_arn[:-4] + "dead"
+    
+    described = describe_alb_rules_many([listener_arn, missing_arn])
+    assert len(described[listener_arn]) == 3
+    assert isinstance(described[missing_arn], Exception)
+    
+    backup_path = tmp_path / "backup.json"
+    backup_path.write_text(json.dumps(described[listener_arn]))
+    restored = restore_alb_rules_many({listener_arn: str(backup_path),
+                                       missing_arn: str(backup_path)})
+    assert restored[listener_arn]["api_calls"] == 0
+    assert isinstance(restored[missing_arn], Exception)
+
+@pytest.mark.parametrize("restore_mode, minimal_moves, full_strategy", [
+    ("incremental", False, "swap"),
+    ("incremental", True, "swap"),
+    ("full", False, "swap"),
+    ("full", False, "delete-first"),
+])
+def test_async_restore_applies_the_sync_plan(elbv2_client, mock_alb_listener, tmp_path,
+                                             restore_mode, minimal_moves, full_strategy):
+    """Test the async restore applies the plan the synchronous restore would."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    backup_file = _write_backup(tmp_path, mock_alb_listener["target_group_arn"], [
+        (1, "host-header", "api.example.com"),
+        (3, "path-pattern", "/api/*"),
+    ])
+    expected = build_restore_plan(listener_arn, backup_file, restore_mode,
+                                  minimal_moves=minimal_moves, full_strategy=full_strategy)
+
+    from alb_rules_tool import aio
+    applied = []
+
+    def spy(plan, *args):
+        applied.append(plan)
+        return aio_summarize(plan, *args)
+
+    aio_summarize = aio.summarize_restore
+    with patch("alb_rules_tool.aio.summarize_restore", side_effect=spy):
+        result = asyncio.run(restore_alb_rules_async(
+            listener_arn, backup_file, restore_mode,
+            minimal_moves=minimal_moves, full_strategy=full_strategy
+        ))
+
+    assert applied[0]["operations"] == expected["operations"]
+    assert applied[0].get("strategy") == expected.get("strategy")
+    assert (result["errors"], result["skipped"]) == (0, 0)
+    routing = _routing(listener_arn)
+    assert [value for _, value in routing] == ["api.example.com", "/api/*"]
+    if not minimal_moves:
+        assert [priority for priority, _ in routing] == ["1", "3"]
+
+def test_halted_async_swap_removes_staged_rules(elbv2_client, mock_alb_listener, tmp_path):
+    """Test a failed create rolls an async swap back like the synchronous one."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    backup_file = _write_backup(tmp_path, mock_alb_listener["target_group_arn"], [
+        (priority, "path-pattern", f"/p{priority}") for priority in (1, 3, 5)
+    ])
+    before = describe_alb_rules(listener_arn)
+
+    from alb_rules_tool import aio
+    apply_operation_async = aio.apply_operation_async
+
+    async def failing_apply(listener, operation, clients, created=None):
+        if operation["type"] == "create" and operation["final_priority"] == 5:
+            raise ClientError({"Error": {"Code": "ValidationError", "Message": "Bad rule"}},
+                              "CreateRule")
+        await apply_operation_async(listener, operation, clients, created)
+
+    with patch("alb_rules_tool.aio.apply_operation_async", side_effect=failing_apply):
+        result = asyncio.run(restore_alb_rules_async(listener_arn, backup_file, "full"))
+
+    assert (result["created"], result["errors"], result["skipped"]) == (2, 1, 4)
+    assert result["rolled_back"] == 2
+    assert describe_alb_rules(listener_arn) == before
+
+def test_restore_many_passes_restore_options(elbv2_client, mock_alb_listener, tmp_path):
+    """Test the fleet wrapper hands preflight and the full restore strategy to each restore."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    backup_file = _write_backup(tmp_path, mock_alb_listener["target_group_arn"], [
+        (1, "path-pattern", "/new/*"),
+    ])
+
+    with patch("alb_rules_tool.aio.preflight_restore_async") as preflight_mock:
+        restored = restore_alb_rules_many({listener_arn: backup_file}, "full",
+                                          preflight=False, full_strategy="delete-first")
+
+    preflight_mock.assert_not_called()
+    assert restored[listener_arn]["strategy"] == "delete-first"
+    assert _routing(listener_arn) == [("1", "/new/*")]
+
+def test_async_restore_reads_through_the_shared_clients(elbv2_client, mock_alb_listener,
+                                                        tmp_path):
+    """Test planning and preflight describe calls share the clients and the token bucket."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    missing_arn = target_group_arn.split(":targetgroup/")[0] + ":targetgroup/gone/0123456789abcdef"
+    backup_file = _write_backup(tmp_path, missing_arn, [(1, "path-pattern", "/new/*")])
+    before = describe_alb_rules(listener_arn)
+    bucket = TokenBucket(1000, 1000)
+    methods = []
+
+    async def scenario():
+        async with AsyncClients(use_aiobotocore=False) as clients:
+            call = clients.call
+
+            async def counting_call(service_name, region_name, method, **kwargs):
+                methods.append(method)
+                return await call(service_name, region_name, method, **kwargs)
+
+            clients.call = counting_call
+            await restore_alb_rules_async(listener_arn, backup_file, "full",
+                                          clients=clients, bucket=bucket)
+
+    # Nothing is described through the synchronous clients
+    with patch("alb_rules_tool.preflight.get_client", side_effect=AssertionError), \
+         patch("alb_rules_tool.restore.iter_alb_rules", side_effect=AssertionError), \
+         patch.object(bucket, "reserve", wraps=bucket.reserve) as reserve, \
+         pytest.raises(PreflightError, match="gone"):
+        asyncio.run(scenario())
+
+    assert {"describe_rules", "describe_account_limits", "describe_listeners",
+            "describe_target_groups"} <= set(methods)
+    assert reserve.call_count == len(methods)
+    assert describe_alb_rules(listener_arn) == before
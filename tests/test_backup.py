@@ -5,7 +5,14 @@ import json
 import yaml
 from unittest.mock import patch, mock_open
 import pytest
-from alb_rules_tool.backup import describe_alb_rules, backup_rules_to_file, upload_backup_to_s3, backup_alb_rules
+from alb_rules_tool.backup import (
+    describe_alb_rules,
+    iter_alb_rules,
+    backup_rules_to_file,
+    upload_backup_to_s3,
+    stream_backup_to_s3,
+    backup_alb_rules
+)
 
 def test_describe_alb_rules(elbv2_client, mock_alb_listener):
     """Test describe_alb_rules function."""
@@ -21,6 +28,52 @@ def test_describe_alb_rules(elbv2_client, mock_alb_listener):
     assert "1" in rule_priorities
     assert "2" in rule_priorities
 
+def test_iter_alb_rules_follows_pagination(elbv2_client, mock_alb_listener):
+    """Test iter_alb_rules returns every page of rules."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    
+    for priority in range(10, 40):
+        elbv2_client.create_rule(
+            ListenerArn=listener_arn,
+            Priority=priority,
+            Conditions=[{"Field": "path-pattern", "Values": [f"/p{priority}/*"]}],
+            Actions=[{"Type": "forward", "TargetGroupArn": target_group_arn}]
+        )
+    
+    rules = iter_alb_rules(listener_arn, page_size=7)
+    
+    # Rules are produced lazily
+    assert not isinstance(rules, list)
+    
+    # default + 2 fixture rules + 30 new rules, spread over several pages
+    priorities = [rule["Priority"] for rule in rules]
+    assert len(priorities) == 33
+    assert len(set(priorities)) == 33
+    assert len(describe_alb_rules(listener_arn, page_size=7)) == 33
+
+def test_backup_rules_to_file_streams_generator(tmp_path):
+    """Test backup_rules_to_file writes rules from a generator."""
+    test_rules = [
+        {"Priority": "1", "Conditions": [], "Actions": []},
+        {"Priority": "2", "Conditions": [], "Actions": []}
+    ]
+    
+    json_path = str(tmp_path / "backup.json")
+    backup_rules_to_file((rule for rule in test_rules), json_path, "json")
+    with open(json_path) as f:
+        assert json.load(f) == test_rules
+    
+    yaml_path = str(tmp_path / "backup.yaml")
+    backup_rules_to_file((rule for rule in test_rules), yaml_path, "yaml")
+    with open(yaml_path) as f:
+        assert yaml.safe_load(f) == test_rules
+    
+    empty_path = str(tmp_path / "empty.json")
+    backup_rules_to_file(iter([]), empty_path, "json")
+    with open(empty_path) as f:
+        assert json.load(f) == []
+
 def test_backup_rules_to_file():
     """Test backup_rules_to_file function."""
     test_rules = [
@@ -92,3 +145,76 @@ def test_backup_alb_rules(elbv2_client, mock_alb_listener, s3_client, mock_s3_bu
         assert mock_upload_to_s3.called
         assert result["local_path"] == "test_output.json"
         assert result["s3_uri"] == f"s3://{mock_s3_bucket}/test_output.json"
+
+def test_backup_alb_rules_streams_to_s3(elbv2_client, mock_alb_listener, s3_client, mock_s3_bucket,
+                                        tmp_path, monkeypatch):
+    """Test backup_alb_rules writes straight to S3 when write_local is False."""
+    monkeypatch.chdir(tmp_path)
+    listener_arn = mock_alb_listener["listener_arn"]
+    
+    result = backup_alb_rules(
+        listener_arn=listener_arn,
+        upload_to_s3=True,
+        s3_bucket=mock_s3_bucket,
+        s3_key="backups/rules.yaml",
+        format_type="yaml",
+        write_local=False
+    )
+    
+    assert "upload" in result.pop("metrics")["phases"]
+    assert result == {"s3_uri": f"s3://{mock_s3_bucket}/backups/rules.yaml"}
+    assert list(tmp_path.iterdir()) == []
+    body = s3_client.get_object(Bucket=mock_s3_bucket, Key="backups/rules.yaml")["Body"].read()
+    rules = yaml.safe_load(body)
+    assert sorted(rule["Priority"] for rule in rules) == ["1", "2", "default"]
+    
+    with pytest.raises(ValueError):
+        backup_alb_rules(listener_arn, write_local=False)
+
+def test_stream_backup_to_s3_aborts_on_error(s3_client, mock_s3_bucket):
+    """Test a failing rule source leaves no object behind."""
+    def failing_rules():
+        yield {"Priority": "1"}
+        raise RuntimeError("describe failed")
+    
+    with pytest.raises(RuntimeError):
+        stream_backup_to_s3(failing_rules(), mock_s3_bucket, "partial.json")
+    
+    assert "Contents" not in s3_client.list_objects_v2(Bucket=mock_s3_bucket)
+
+def test_backup_alb_rules_skips_unchanged(elbv2_client, mock_alb_listener, s3_client,
+                                          mock_s3_bucket, tmp_path):
+    """Test unchanged rule sets are neither rewritten nor uploaded again."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    output_path = str(tmp_path / "rules.json")
+    kwargs = dict(output_path=output_path, upload_to_s3=True, s3_bucket=mock_s3_bucket,
+                  skip_unchanged=True)
+    
+    first = backup_alb_rules(listener_arn, **kwargs)
+    assert first["unchanged"] is False
+    head = s3_client.head_object(Bucket=mock_s3_bucket, Key="rules.json")
+    assert head["Metadata"]["rules-fingerprint"] == first["fingerprint"]
+    
+    with patch("alb_rules_tool.backup.backup_rules_to_file") as mock_backup_to_file, \
+         patch("alb_rules_tool.backup.upload_backup_to_s3") as mock_upload_to_s3:
+        second = backup_alb_rules(listener_arn, **kwargs)
+        assert not mock_backup_to_file.called
+        assert not mock_upload_to_s3.called
+    assert second["unchanged"] is True
+    assert second["fingerprint"] == first["fingerprint"]
+    assert second["s3_uri"] == f"s3://{mock_s3_bucket}/rules.json"
+    with open(output_path + ".meta.json") as f:
+        sidecar = json.load(f)
+    assert sidecar["fingerprint"] == first["fingerprint"]
+    assert sidecar["verified_at"] >= sidecar["created_at"]
+    
+    elbv2_client.create_rule(
+        ListenerArn=listener_arn,
+        Priority=3,
+        Conditions=[{"Field": "path-pattern", "Values": ["/new/*"]}],
+        Actions=[{"Type": "forward", "TargetGroupArn": mock_alb_listener["target_group_arn"]}]
+    )
+    third = backup_alb_rules(listener_arn, **kwargs)
+    assert third["unchanged"] is False
+    with open(output_path) as f:
+        assert len(json.load(f)) == 4
@@ -0,0 +1,82 @@
+"""Tests for the cache module."""
+
+import os
+import json
+import logging
+import threading
+
+from alb_rules_tool.cache import BackupCache, configure_cache
+from alb_rules_tool.restore import download_backup_from_s3, load_backup_from_s3
+
+RULES = [{"Priority": "1", "Conditions": [], "Actions": []}]
+
+def _read(cache, bucket_name, key):
+    with cache.open(bucket_name, key) as f:
+        return f.read()
+
+def test_revalidates_with_etag(s3_client, mock_s3_bucket, tmp_path, caplog):
+    """Test cached backups are only downloaded again when their ETag changes."""
+    s3_client.put_object(Bucket=mock_s3_bucket, Key="backups/rules.json", Body=json.dumps(RULES))
+    configure_cache(str(tmp_path / "cache"))
+
+    with caplog.at_level(logging.INFO, logger="alb_rules_tool.cache"):
+        assert load_backup_from_s3(mock_s3_bucket, "backups/rules.json") == RULES
+        assert load_backup_from_s3(mock_s3_bucket, "backups/rules.json") == RULES
+    assert "Backup cache miss" in caplog.text
+    assert "Backup cache hit" in caplog.text and "(hits: 1, misses: 1)" in caplog.text
+
+    # A changed backup is downloaded again
+    changed = RULES + [{"Priority": "2", "Conditions": [], "Actions": []}]
+    s3_client.put_object(Bucket=mock_s3_bucket, Key="backups/rules.json", Body=json.dumps(changed))
+    local_path = download_backup_from_s3(mock_s3_bucket, "backups/rules.json",
+                                         str(tmp_path / "rules.json"))
+    with open(local_path) as f:
+        assert json.load(f) == changed
+
+def test_conditional_get_counts(s3_client, mock_s3_bucket, tmp_path):
+    """Test hits are answered by a conditional GET without a body."""
+    s3_client.put_object(Bucket=mock_s3_bucket, Key="rules.json", Body=b"[]")
+    cache = BackupCache(str(tmp_path), max_bytes=1024)
+
+    assert _read(cache, mock_s3_bucket, "rules.json") == b"[]"
+    assert _read(cache, mock_s3_bucket, "rules.json") == b"[]"
+    assert _read(BackupCache(str(tmp_path)), mock_s3_bucket, "rules.json") == b"[]"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_evicts_least_recently_used(s3_client, mock_s3_bucket, tmp_path):
+    """Test the least recently used backups are evicted once over the size bound."""
+    for name in ("a", "b", "c"):
+        s3_client.put_object(Bucket=mock_s3_bucket, Key=f"{name}.json", Body=name.encode() * 100)
+    cache = BackupCache(str(tmp_path), max_bytes=250)
+
+    _read(cache, mock_s3_bucket, "a.json")
+    _read(cache, mock_s3_bucket, "b.json")
+    # Using a makes b the least recently used backup
+    os.utime(cache._entry_path(mock_s3_bucket, "b.json") + ".body", (0, 0))
+    _read(cache, mock_s3_bucket, "a.json")
+    _read(cache, mock_s3_bucket, "c.json")
+
+    assert (cache.hits, cache.misses) == (1, 3)
+    _read(cache, mock_s3_bucket, "a.json")
+    _read(cache, mock_s3_bucket, "b.json")
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert sum(size for _, size, _ in cache._entries()) <= 250
+
+def test_concurrent_readers_share_entries(s3_client, mock_s3_bucket, tmp_path):
+    """Test concurrent users of a cache directory download a backup once."""
+    s3_client.put_object(Bucket=mock_s3_bucket, Key="rules.json", Body=b"[]" * 1000)
+    caches = [BackupCache(str(tmp_path)) for _ in range(8)]
+    results = []
+
+    def read(cache):
+        results.append(_read(cache, mock_s3_bucket, "rules.json"))
+
+    threads = [threading.Thread(target=read, args=(cache,)) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [b"[]" * 1000] * 8
+    assert sum(cache.misses for cache in caches) == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,135 @@
+"""Tests for the catalog module."""
+
+from datetime import datetime, timedelta, timezone
+
+from click.testing import CliRunner
+
+from alb_rules_tool.backup import backup_alb_rules, describe_alb_rules
+from alb_rules_tool.catalog import format_timestamp, open_catalog
+from alb_rules_tool.cli import cli
+from alb_rules_tool.diff import rule_set_fingerprint
+from alb_rules_tool.fleet import backup_alb_rules_many
+
+LISTENER_ARN = "arn:aws:elasticloadbalancing:us-east-1:123456789012:listener/app/test/1/2"
+
+def test_record_list_and_find(tmp_path):
+    """Test backups are found by listener and time from the catalog indexes."""
+    start = datetime(2025, 3, 18, 10, 0, tzinfo=timezone.utc)
+    with open_catalog(str(tmp_path / "catalog.db")) as catalog:
+        for hour in range(5):
+            catalog.record(LISTENER_ARN, f"fp{hour}", 3 + hour, f"backup-{hour}.json", "json",
+                           created_at=start + timedelta(hours=hour))
+        catalog.record("other-listener", "fp", 1, "other.json", "json", created_at=start)
+
+        entries = catalog.list(LISTENER_ARN)
+        expected = [f"backup-{hour}.json" for hour in range(4, -1, -1)]
+        assert [entry["location"] for entry in entries] == expected
+        assert entries[0] == {
+            "listener_arn": LISTENER_ARN,
+            "created_at": "2025-03-18T14:00:00.000000+00:00",
+            "fingerprint": "fp4",
+            "rule_count": 7,
+            "location": "backup-4.json",
+            "format": "json",
+        }
+        assert len(catalog.list()) == 6
+        assert len(catalog.list(since=start + timedelta(hours=3))) == 2
+
+        found = catalog.find(LISTENER_ARN, before=start + timedelta(hours=2, minutes=30))
+        assert found["location"] == "backup-2.json"
+        assert catalog.find(LISTENER_ARN, fingerprint="fp1")["location"] == "backup-1.json"
+        assert catalog.find(LISTENER_ARN, before=start - timedelta(seconds=1)) is None
+
+        # Lookups by listener and time are answered from an index
+        plan = catalog._connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM snapshots WHERE listener_arn = ? "
+            "AND created_at <= ? ORDER BY created_at DESC LIMIT 1",
+            (LISTENER_ARN, format_timestamp(start))
+        ).fetchall()
+        assert any("USING INDEX" in row[-1] for row in plan)
+        assert not any("TEMP B-TREE" in row[-1] for row in plan)
+
+def test_backups_are_recorded(elbv2_client, mock_alb_listener, tmp_path):
+    """Test backup_alb_rules and fleet backups record their fingerprint and rule count."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    catalog_path = str(tmp_path / "catalog.db")
+    backup_path = str(tmp_path / "backup.json.gz")
+
+    result = backup_alb_rules(listener_arn, output_path=backup_path, skip_unchanged=True,
+                              catalog=catalog_path)
+    fingerprint = rule_set_fingerprint(describe_alb_rules(listener_arn))
+    assert result["fingerprint"] == fingerprint
+
+    # Unchanged rule sets are not backed up nor recorded again
+    backup_alb_rules(listener_arn, output_path=backup_path, skip_unchanged=True,
+                     catalog=catalog_path)
+    backup_alb_rules_many([listener_arn], output_dir=str(tmp_path / "fleet"), catalog=catalog_path)
+    backup_alb_rules(listener_arn, store=str(tmp_path / "store"), catalog=catalog_path)
+
+    with open_catalog(catalog_path) as catalog:
+        entries = catalog.list(listener_arn)
+    assert [entry["format"] for entry in entries] == ["snapshot", "json", "json.gz"]
+    assert {entry["fingerprint"] for entry in entries} == {fingerprint}
+    assert {entry["rule_count"] for entry in entries} == {3}
+    assert entries[-1]["location"] == backup_path
+
+def test_unwritable_catalog_does_not_fail_backups(elbv2_client, mock_alb_listener, tmp_path):
+    """Test backups succeed, and are reported as such, when the catalog cannot be written."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    (tmp_path / "read-only").write_text("")
+    catalog_path = str(tmp_path / "read-only" / "catalog.db")
+    backup_path = tmp_path / "backup.json"
+
+    result = backup_alb_rules(listener_arn, output_path=str(backup_path), catalog=catalog_path)
+    assert result["local_path"] == str(backup_path)
+    assert backup_path.exists()
+
+    manifest = backup_alb_rules_many([listener_arn], output_dir=str(tmp_path / "fleet"),
+                                     catalog=catalog_path)
+    assert manifest["succeeded"] == 1
+
+    invoked = CliRunner().invoke(cli, [
+        "backup", listener_arn, "--output", str(tmp_path / "cli.json"), "--catalog", catalog_path
+    ])
+    assert invoked.exit_code == 0, invoked.output
+    assert (tmp_path / "cli.json").exists()
+
+def test_s3_catalog_is_synced(s3_client, mock_s3_bucket, tmp_path, monkeypatch):
+    """Test S3 catalogs merge the entries recorded by separate hosts."""
+    monkeypatch.setenv("HOME", str(tmp_path / "first"))
+    location = f"s3://{mock_s3_bucket}/catalog/backups.db"
+    with open_catalog(location) as catalog:
+        catalog.record(LISTENER_ARN, "fp1", 3, "s3://bucket/one.json", "json")
+
+    # Another host, with its own cache, adds an entry
+    monkeypatch.setenv("HOME", str(tmp_path / "second"))
+    with open_catalog(location) as catalog:
+        assert len(catalog.list()) == 1
+        catalog.record(LISTENER_ARN, "fp2", 3, "s3://bucket/two.json", "json")
+
+    monkeypatch.setenv("HOME", str(tmp_path / "first"))
+    with open_catalog(location) as catalog:
+        assert [entry["fingerprint"] for entry in catalog.list()] == ["fp2", "fp1"]
+
+def test_list_and_find_commands(tmp_path, monkeypatch):
+    """Test the list and find commands query the catalog."""
+    monkeypatch.setenv("ALB_RULES_CATALOG", str(tmp_path / "catalog.db"))
+    with open_catalog() as catalog:
+        catalog.record(LISTENER_ARN, "0123456789abcdef", 3, "backup-1.json", "json",
+                       created_at=datetime(2025, 3, 18, 10, 0))
+        catalog.record(LISTENER_ARN, "fedcba9876543210", 4, "backup-2.json", "json",
+                       created_at=datetime(2025, 3, 18, 15, 0))
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["find", LISTENER_ARN, "--before", "2025-03-18 14:00:00"])
+    assert result.exit_code == 0
+    assert result.output.strip() == "backup-1.json"
+
+    result = runner.invoke(cli, ["find", LISTENER_ARN, "--before", "2025-03-17"])
+    assert result.exit_code != 0
+
+    result = runner.invoke(cli, ["list", "--listener-arn", LISTENER_ARN])
+    assert result.exit_code == 0
+    lines = result.output.strip().splitlines()
+    assert "backup-2.json" in lines[0] and "fedcba987654" in lines[0]
+    assert "backup-1.json" in lines[1]
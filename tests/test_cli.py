@@ -0,0 +1,64 @@
+"""Tests for the cli module."""
+
+import sys
+import subprocess
+
+import click
+from click.testing import CliRunner
+
+from alb_rules_tool.cli import cli
+
+# Modules too slow to import before a command needs them
+HEAVY_MODULES = ("boto3", "botocore", "yaml", "dotenv", "alb_rules_tool.commands")
+
+# Budget for importing the CLI, in microseconds; boto3 alone takes longer
+IMPORT_BUDGET_US = 150000
+
+def _run_python(*args):
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, check=True)
+
+def test_cli_import_time_budget():
+    """Test importing the CLI stays within budget and skips heavy modules."""
+    stderr = _run_python("-X", "importtime", "-c", "import alb_rules_tool.cli").stderr
+
+    imported = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported[name.strip()] = int(cumulative)
+
+    heavy = sorted(name for name in imported if name.startswith(HEAVY_MODULES))
+    assert heavy == []
+    assert imported["alb_rules_tool.cli"] < IMPORT_BUDGET_US
+
+def test_help_and_completion_do_not_import_commands():
+    """Test listing commands uses their short help without importing them."""
+    script = (
+        "import sys, click\n"
+        "from alb_rules_tool.cli import cli\n"
+        "cli(['--help'], standalone_mode=False)\n"
+        "ctx = click.Context(cli)\n"
+        "print('|'.join(item.value for item in cli.shell_complete(ctx, 'back')))\n"
+        "prefixes = ('boto3', 'alb_rules_tool.commands')\n"
+        "print(sorted(m for m in sys.modules if m.startswith(prefixes)))\n"
+    )
+    lines = _run_python("-c", script).stdout.splitlines()
+
+    assert "  backup-fleet  Backup ALB rules for many listeners in parallel." in lines
+    assert lines[-2] == "backup|backup-fleet"
+    assert lines[-1] == "[]"
+
+def test_commands_load_on_use():
+    """Test every listed command resolves to the command it names."""
+    ctx = click.Context(cli)
+    for name in cli.list_commands(ctx):
+        command = cli.get_command(ctx, name)
+        assert isinstance(command, click.Command)
+        assert command.name == name
+        # The help listed without importing the command stays in sync with it
+        assert cli.lazy_subcommands[name][1] == command.help.splitlines()[0]
+
+    result = CliRunner().invoke(cli, ["backup", "--help"])
+    assert result.exit_code == 0
+    assert "--metrics-file" in result.output
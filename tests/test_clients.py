@@ -0,0 +1,85 @@
+"""Tests for the clients module."""
+
+import threading
+import pytest
+from alb_rules_tool.clients import (
+    build_client_config,
+    caller_retries,
+    configure_clients,
+    get_client,
+    get_session,
+    region_from_arn,
+    reset_clients
+)
+
+def test_get_client_is_cached(aws_credentials):
+    """Test get_client returns one client per service and region."""
+    client = get_client("elbv2")
+
+    assert get_client("elbv2") is client
+    assert get_client("elbv2", "us-east-1") is client
+    assert get_client("elbv2", "eu-west-1") is not client
+    assert get_client("s3") is not client
+    assert get_session() is get_session()
+
+def test_get_client_is_thread_safe(aws_credentials):
+    """Test concurrent callers share a single client."""
+    clients = []
+
+    def worker():
+        clients.append(get_client("elbv2"))
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(clients) == 16
+    assert all(client is clients[0] for client in clients)
+
+def test_configure_clients(aws_credentials):
+    """Test configure_clients applies settings to new clients."""
+    client = get_client("elbv2")
+
+    configure_clients(max_pool_connections=7, retry_mode="adaptive", read_timeout=5)
+    configured = get_client("elbv2")
+
+    assert configured is not client
+    assert configured.meta.config.max_pool_connections == 7
+    assert configured.meta.config.retries["mode"] == "adaptive"
+    assert configured.meta.config.read_timeout == 5
+
+    reset_clients()
+    assert get_client("elbv2").meta.config.max_pool_connections == 50
+
+def test_caller_retries_clients_make_one_attempt(aws_credentials):
+    """Test clients handed out under caller_retries leave retries to the caller."""
+    client = get_client("elbv2")
+    with caller_retries():
+        single = get_client("elbv2")
+        assert get_client("elbv2") is single
+
+    assert single is not client
+    assert single.meta.config.retries["total_max_attempts"] == 1
+    assert single.meta.config.retries["mode"] == client.meta.config.retries["mode"]
+    assert get_client("elbv2") is client
+
+def test_build_client_config_from_environment(monkeypatch):
+    """Test settings fall back to environment variables."""
+    monkeypatch.setenv("ALB_RULES_MAX_POOL_CONNECTIONS", "3")
+    monkeypatch.setenv("ALB_RULES_RETRY_MODE", "legacy")
+
+    config = build_client_config(max_attempts=2)
+
+    assert config.max_pool_connections == 3
+    assert config.retries == {"mode": "legacy", "max_attempts": 2}
+
+@pytest.mark.parametrize("arn,region", [
+    ("arn:aws:elasticloadbalancing:eu-west-1:123456789012:listener/app/lb/1/2", "eu-west-1"),
+    ("arn:aws:s3:::my-bucket", None),
+    ("not-an-arn", None),
+])
+def test_region_from_arn(arn, region):
+    """Test region_from_arn extracts the region component."""
+    assert region_from_arn(arn) == region
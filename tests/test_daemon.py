@@ -0,0 +1,134 @@
+"""Tests for the daemon module."""
+
+import json
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+import pytest
+from alb_rules_tool.daemon import (
+    BackupDaemon,
+    BackupJob,
+    CronExpression,
+    load_schedule,
+    run_backup_job,
+    serve_status,
+    spread_offset
+)
+
+UTC = timezone.utc
+
+def test_cron_next_after():
+    """Test cron expressions find the next matching minute."""
+    start = datetime(2025, 3, 18, 10, 7, 30, tzinfo=UTC)  # a Tuesday
+
+    def next_after(expression, after=start):
+        return CronExpression(expression).next_after(after)
+
+    assert next_after("*/15 * * * *") == datetime(2025, 3, 18, 10, 15, tzinfo=UTC)
+    assert next_after("@hourly") == datetime(2025, 3, 18, 11, 0, tzinfo=UTC)
+    assert next_after("30 2 * * mon-fri") == datetime(2025, 3, 19, 2, 30, tzinfo=UTC)
+    assert next_after("0 0 * * 7") == datetime(2025, 3, 23, 0, 0, tzinfo=UTC)
+    assert next_after("0 0 1 jan *") == datetime(2026, 1, 1, 0, 0, tzinfo=UTC)
+    # Day of month and day of week restricted: either one matches
+    assert next_after("0 0 20 * fri") == datetime(2025, 3, 20, 0, 0, tzinfo=UTC)
+    # Strictly after: an exact match moves to the next occurrence
+    assert next_after("15 10 * * *", datetime(2025, 3, 18, 10, 15, tzinfo=UTC)) == \
+        datetime(2025, 3, 19, 10, 15, tzinfo=UTC)
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* * * foo *", "*/0 * * * *"])
+def test_cron_invalid(expression):
+    """Test invalid cron expressions are rejected."""
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+def test_jobs_spread_over_window():
+    """Test jobs on the same schedule get stable, distinct offsets."""
+    offsets = [spread_offset(f"job-{index}", 300) for index in range(10)]
+    assert offsets == [spread_offset(f"job-{index}", 300) for index in range(10)]
+    assert all(0 <= offset < 300 for offset in offsets)
+    assert len(set(offsets)) == 10
+    assert spread_offset("job-0", 0) == 0
+
+    job = BackupJob("prod", "0 * * * *", {}, spread_seconds=300)
+    first = job.schedule_after(datetime(2025, 3, 18, 10, 0, tzinfo=UTC))
+    assert first == datetime(2025, 3, 18, 10, 0, tzinfo=UTC) + timedelta(seconds=job.offset)
+    # Once the run starts, the next one is a full period later
+    assert job.schedule_after(first) == first + timedelta(hours=1)
+
+def test_load_schedule(tmp_path):
+    """Test schedules merge defaults into jobs and reject unknown settings."""
+    path = tmp_path / "schedule.yaml"
+    path.write_text(
+        "defaults:\n  s3_bucket: bucket\n  spread_seconds: 0\n"
+        "jobs:\n  - name: prod\n    cron: '@hourly'\n    names: ['prod-*']\n"
+        "  - name: dev\n    cron: '0 0 * * *'\n    s3_bucket: dev-bucket\n"
+    )
+    prod, dev = load_schedule(str(path))
+    assert prod.options == {"s3_bucket": "bucket", "names": ["prod-*"]}
+    assert dev.options == {"s3_bucket": "dev-bucket"}
+    assert prod.offset == 0
+
+    path.write_text("jobs:\n  - name: prod\n    cron: '@hourly'\n    bucket: typo\n")
+    with pytest.raises(ValueError, match="bucket"):
+        load_schedule(str(path))
+
+def test_daemon_runs_due_jobs(tmp_path):
+    """Test due jobs run, failures are counted and health reflects them."""
+    now = [datetime(2025, 3, 18, 10, 0, 30, tzinfo=UTC)]
+    calls = []
+
+    def runner(options):
+        calls.append(options)
+        if options.get("fail"):
+            raise RuntimeError("boom")
+        return {"listener_count": 1, "succeeded": 1, "unchanged": 0, "failed": 0}
+
+    jobs = [
+        BackupJob("good", "* * * * *", {}, spread_seconds=0),
+        BackupJob("bad", "* * * * *", {"fail": True}, spread_seconds=0),
+    ]
+    status_file = tmp_path / "status.json"
+    daemon = BackupDaemon(jobs, failure_threshold=2, status_file=str(status_file),
+                          runner=runner, clock=lambda: now[0])
+
+    assert not daemon.healthy()
+    assert daemon.run_pending() == 30
+    assert calls == []
+
+    for _ in range(2):
+        now[0] += timedelta(minutes=1)
+        daemon.run_pending()
+        daemon.wait()
+
+    good, bad = daemon.status()["jobs"]
+    assert good["runs"] == 2 and good["last_success"] is not None
+    assert good["last_result"]["succeeded"] == 1
+    assert bad["consecutive_failures"] == 2 and bad["last_error"] == "boom"
+    assert not daemon.healthy()
+    assert json.loads(status_file.read_text())["jobs"][1]["last_error"] == "boom"
+
+def test_status_server():
+    """Test the health endpoint answers with the daemon health."""
+    now = datetime(2025, 3, 18, 10, 0, tzinfo=UTC)
+    daemon = BackupDaemon([BackupJob("prod", "@hourly", {})],
+                          runner=lambda options: {}, clock=lambda: now)
+    server = serve_status(daemon, port=0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(f"{url}/healthz")
+        assert excinfo.value.code == 503
+
+        daemon.run_pending()
+        with urllib.request.urlopen(f"{url}/healthz") as response:
+            assert json.load(response) == {"healthy": True}
+        with urllib.request.urlopen(f"{url}/status") as response:
+            assert json.load(response)["jobs"][0]["name"] == "prod"
+    finally:
+        server.shutdown()
+
+def test_run_backup_job(elbv2_client, mock_alb_listener, tmp_path):
+    """Test a job discovers its listeners and backs them up."""
+    manifest = run_backup_job({"names": ["test-*"], "output_dir": str(tmp_path)})
+    assert manifest["listener_count"] == 1
+    assert manifest["backups"][0]["listener_arn"] == mock_alb_listener["listener_arn"]
@@ -0,0 +1,113 @@
+"""Tests for the diff module."""
+
+import time
+from alb_rules_tool.diff import canonicalize_rule, diff_rules, rule_hash, rules_equivalent
+
+TG_A = "arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/a/1"
+TG_B = "arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/b/2"
+
+def _rule(priority, path, arn=None):
+    rule = {
+        "Priority": str(priority),
+        "Conditions": [{"Field": "path-pattern", "Values": [path]}],
+        "Actions": [{"Type": "forward", "TargetGroupArn": TG_A}]
+    }
+    if arn:
+        rule["RuleArn"] = arn
+    return rule
+
+def test_canonicalize_ignores_echoes_and_ordering():
+    """Test equivalent spellings of a rule share one canonical form."""
+    backup_rule = {
+        "Priority": "1",
+        "Conditions": [
+            {"Field": "host-header", "Values": ["B.example.com", "a.example.com"]},
+            {"Field": "http-header",
+             "HttpHeaderConfig": {"HttpHeaderName": "X-Env", "Values": ["blue", "green"]}}
+        ],
+        "Actions": [{"Type": "forward", "TargetGroupArn": TG_A}]
+    }
+    described_rule = {
+        "Priority": "7",
+        "RuleArn": "arn:rule",
+        "IsDefault": False,
+        "Conditions": [
+            {"Field": "http-header",
+             "HttpHeaderConfig": {"HttpHeaderName": "x-env", "Values": ["green", "blue"]}},
+            {"Field": "host-header", "Values": ["a.example.com", "b.example.com"],
+             "HostHeaderConfig": {"Values": ["a.example.com", "b.example.com"]}}
+        ],
+        "Actions": [{
+            "Type": "forward",
+            "Order": 1,
+            "TargetGroupArn": TG_A,
+            "ForwardConfig": {
+                "TargetGroups": [{"TargetGroupArn": TG_A, "Weight": 1}],
+                "TargetGroupStickinessConfig": {"Enabled": False}
+            }
+        }]
+    }
+
+    assert canonicalize_rule(backup_rule) == canonicalize_rule(described_rule)
+    assert rule_hash(backup_rule) == rule_hash(described_rule)
+    assert rules_equivalent(backup_rule, described_rule)
+
+def test_canonicalize_normalizes_weights_and_defaults():
+    """Test target group weights and redirect defaults are normalized."""
+    def weighted(weight_a, weight_b):
+        return {"Actions": [{"Type": "forward", "ForwardConfig": {"TargetGroups": [
+            {"TargetGroupArn": TG_B, "Weight": weight_b},
+            {"TargetGroupArn": TG_A, "Weight": weight_a}
+        ]}}]}
+
+    assert rules_equivalent(weighted(50, 50), weighted(1, 1))
+    assert not rules_equivalent(weighted(90, 10), weighted(1, 1))
+
+    short_redirect = {"Actions": [{"Type": "redirect", "RedirectConfig": {
+        "Protocol": "HTTPS", "StatusCode": "HTTP_301"}}]}
+    full_redirect = {"Actions": [{"Type": "redirect", "RedirectConfig": {
+        "Protocol": "HTTPS", "Port": "#{port}", "Host": "#{host}", "Path": "/#{path}",
+        "Query": "#{query}", "StatusCode": "HTTP_301"}}]}
+    assert rules_equivalent(short_redirect, full_redirect)
+
+def test_diff_rules_matches_by_hash_then_priority():
+    """Test diff_rules finds unchanged, moved, modified, new and stale rules."""
+    existing = [
+        {"Priority": "default"},
+        _rule(1, "/same", "r1"),
+        _rule(2, "/moved", "r2"),
+        _rule(3, "/before", "r3"),
+        _rule(4, "/stale", "r4"),
+    ]
+    backup = [
+        _rule(1, "/same"),
+        _rule(3, "/after"),
+        _rule(5, "/moved"),
+        _rule(6, "/new"),
+    ]
+
+    diff = diff_rules(existing, backup)
+
+    assert diff["unchanged"] == [1]
+    assert [(m["rule"]["RuleArn"], m["from"], m["to"]) for m in diff["moves"]] == [("r2", 2, 5)]
+    assert len(diff["modifies"]) == 1
+    change = diff["modifies"][0]
+    assert change["existing"]["RuleArn"] == "r3"
+    assert change["conditions_changed"] and not change["actions_changed"]
+    assert [rule["Priority"] for rule in diff["creates"]] == ["6"]
+    assert [rule["RuleArn"] for rule in diff["deletes"]] == ["r4"]
+
+def test_diff_rules_priority_shift_is_all_moves():
+    """Test shifting every priority is reported as moves on large listeners."""
+    count = 5000
+    existing = [_rule(priority, f"/p{priority}", f"r{priority}")
+                for priority in range(1, count + 1)]
+    backup = [_rule(priority + 1, f"/p{priority}") for priority in range(1, count + 1)]
+
+    start = time.perf_counter()
+    diff = diff_rules(existing, backup)
+    elapsed = time.perf_counter() - start
+
+    assert len(diff["moves"]) == count
+    assert not diff["modifies"] and not diff["creates"] and not diff["deletes"]
+    assert elapsed < 5
@@ -0,0 +1,201 @@
+"""Tests for the executor module."""
+
+import threading
+from unittest.mock import patch
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+from alb_rules_tool.clients import caller_retries, get_client
+from alb_rules_tool.executor import (
+    SWAP_STAGES,
+    OperationSkipped,
+    estimate_duration,
+    execute_operations,
+)
+from alb_rules_tool.throttling import TokenBucket
+
+THROTTLING_BODY = (b'<ErrorResponse><Error><Type>Sender</Type><Code>Throttling</Code>'
+                   b'<Message>Rate exceeded</Message></Error>'
+                   b'<RequestId>1</RequestId></ErrorResponse>')
+
+class _RawBody:
+    """Raw HTTP body as botocore reads it from urllib3."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def stream(self, **kwargs):
+        yield self._data
+
+def _op(op_type, priority, **extra):
+    operation = {"type": op_type, "priority": priority}
+    operation.update(extra)
+    return operation
+
+def test_execute_operations_respects_stages():
+    """Test deletes run before moves, updates and creates."""
+    applied = []
+    lock = threading.Lock()
+
+    def apply(operation):
+        with lock:
+            applied.append(operation["type"])
+
+    operations = [
+        _op("create", 1),
+        _op("modify", 2),
+        _op("set_priorities", None, priorities=[]),
+        _op("delete", 1),
+        _op("replace", 3),
+        _op("create", 4),
+    ]
+    results = execute_operations(operations, apply, concurrency=4, calls_per_second=1000,
+                                 burst=1000)
+
+    assert all(error is None for _, error in results)
+    assert applied[0] == "delete"
+    assert applied[1] == "set_priorities"
+    assert sorted(applied[2:4]) == ["modify", "replace"]
+    assert applied[4:] == ["create", "create"]
+
+def test_execute_operations_runs_concurrently():
+    """Test independent operations of a stage overlap."""
+    barrier = threading.Barrier(3, timeout=5)
+
+    def apply(operation):
+        barrier.wait()
+
+    operations = [_op("create", priority) for priority in range(3)]
+    results = execute_operations(operations, apply, concurrency=3, calls_per_second=1000,
+                                 burst=1000)
+
+    assert all(error is None for _, error in results)
+
+def test_throttled_calls_are_only_retried_by_the_executor(elbv2_client, mock_alb_listener):
+    """Test botocore does not retry the calls the executor backs off on."""
+    sent = []
+
+    def throttle(request, **kwargs):
+        sent.append(request)
+        return AWSResponse(request.url, 400, {}, _RawBody(THROTTLING_BODY))
+
+    with caller_retries():
+        get_client("elbv2").meta.events.register_first(
+            "before-send.elastic-load-balancing-v2", throttle)
+
+    def apply(operation):
+        get_client("elbv2").delete_rule(RuleArn=mock_alb_listener["rule_arns"][0])
+
+    with patch("alb_rules_tool.throttling.time.sleep"):
+        results = execute_operations([_op("delete", 1)], apply, max_retries=2,
+                                     calls_per_second=1000, burst=1000)
+
+    assert isinstance(results[0][1], ClientError)
+    assert len(sent) == 3
+
+def test_transient_errors_are_retried_by_the_executor(elbv2_client, mock_alb_listener):
+    """Test a 503 under caller_retries is retried instead of failing the operation."""
+    sent = []
+
+    def unavailable_once(request, **kwargs):
+        sent.append(request)
+        if len(sent) == 1:
+            return AWSResponse(request.url, 503, {}, _RawBody(b""))
+        return None
+
+    with caller_retries():
+        get_client("elbv2").meta.events.register_first(
+            "before-send.elastic-load-balancing-v2", unavailable_once)
+
+    def apply(operation):
+        get_client("elbv2").delete_rule(RuleArn=mock_alb_listener["rule_arns"][0])
+
+    with patch("alb_rules_tool.throttling.time.sleep"):
+        results = execute_operations([_op("delete", 1)], apply, max_retries=2,
+                                     calls_per_second=1000, burst=1000)
+
+    assert results[0][1] is None
+    assert len(sent) == 2
+    remaining = elbv2_client.describe_rules(ListenerArn=mock_alb_listener["listener_arn"])["Rules"]
+    assert mock_alb_listener["rule_arns"][0] not in [rule["RuleArn"] for rule in remaining]
+
+def test_execute_operations_retries_throttling():
+    """Test throttled operations are retried and failures are reported."""
+    attempts = []
+
+    def apply(operation):
+        attempts.append(operation["priority"])
+        if operation["priority"] == 1 and attempts.count(1) == 1:
+            raise ClientError({"Error": {"Code": "Throttling", "Message": "Rate exceeded"}},
+                              "CreateRule")
+        if operation["priority"] == 2:
+            raise ValueError("bad rule")
+
+    with patch("alb_rules_tool.throttling.time.sleep"):
+        results = execute_operations([_op("create", 1), _op("create", 2)], apply,
+                                     calls_per_second=1000, burst=1000)
+
+    errors = {operation["priority"]: error for operation, error in results}
+    assert errors[1] is None
+    assert isinstance(errors[2], ValueError)
+    assert attempts.count(1) == 2
+
+def test_execute_operations_halts_swap_on_error():
+    """Test a swap creates before parking and deleting, and stops once an operation failed."""
+    applied = []
+
+    def apply(operation):
+        applied.append(operation["type"])
+        if operation["priority"] == 2:
+            raise ValueError("bad rule")
+
+    operations = [
+        _op("delete", 5),
+        _op("set_priorities", 3, priorities=[]),
+        _op("create", 1),
+        _op("create", 2),
+    ]
+    results = execute_operations(operations, apply, concurrency=1, calls_per_second=1000,
+                                 burst=1000, stages=SWAP_STAGES, halt_on_error=True)
+
+    assert applied == ["create", "create"]
+    errors = {operation["priority"]: error for operation, error in results}
+    assert errors[1] is None
+    assert isinstance(errors[2], ValueError)
+    assert isinstance(errors[3], OperationSkipped)
+    assert isinstance(errors[5], OperationSkipped)
+
+def test_execute_operations_validates_input():
+    """Test invalid concurrency and unknown operations are rejected."""
+    with pytest.raises(ValueError):
+        execute_operations([], lambda op: None, concurrency=0)
+    with pytest.raises(ValueError):
+        execute_operations([_op("rename", 1)], lambda op: None)
+
+def test_token_bucket():
+    """Test the token bucket enforces its rate after the burst."""
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire(2) == pytest.approx(1.0)
+    now[0] += 10
+    assert bucket.acquire() == 0
+    assert waits == [pytest.approx(0.5), pytest.approx(1.0)]
+
+def test_estimate_duration_follows_the_given_stages():
+    """Test estimates count one round per stage the operations are applied in."""
+    operations = [_op("delete", priority) for priority in range(4)]
+    operations += [_op("create", priority) for priority in range(4)]
+    kwargs = dict(concurrency=8, calls_per_second=1000, burst=1000, call_latency=1.0)
+
+    assert estimate_duration(operations, **kwargs) == 2.0
+    assert estimate_duration(operations, stages=[("create", "delete")], **kwargs) == 1.0
@@ -0,0 +1,135 @@
+"""Tests for the fleet module."""
+
+import os
+import json
+from datetime import datetime
+from unittest.mock import patch
+import pytest
+from botocore.exceptions import ClientError
+from alb_rules_tool.fleet import (
+    backup_alb_rules_many,
+    discover_listeners,
+    discover_load_balancers,
+    listener_backup_name
+)
+
+def _throttling_error():
+    return ClientError({"Error": {"Code": "Throttling", "Message": "Rate exceeded"}},
+                       "DescribeRules")
+
+def test_discover_listeners(elbv2_client, mock_alb_listener):
+    """Test listeners are discovered from ARNs, names and tags."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    listener = elbv2_client.describe_listeners(ListenerArns=[listener_arn])["Listeners"][0]
+    lb_arn = listener["LoadBalancerArn"]
+    elbv2_client.add_tags(ResourceArns=[lb_arn], Tags=[{"Key": "env", "Value": "prod"}])
+
+    assert discover_listeners() == [listener_arn]
+    assert discover_listeners(load_balancer_arns=[lb_arn]) == [listener_arn]
+    assert discover_listeners(names=["test-*"]) == [listener_arn]
+    assert discover_listeners(names=["other-*"]) == []
+    assert discover_listeners(tags={"env": "prod"}) == [listener_arn]
+    assert discover_listeners(tags={"env": None}) == [listener_arn]
+    assert discover_listeners(tags={"env": "dev"}) == []
+    assert len(discover_load_balancers(names=["test-alb"])) == 1
+
+def test_listener_backup_name():
+    """Test backup file names are derived from the listener ARN."""
+    arn = ("arn:aws:elasticloadbalancing:us-east-1:123456789012:"
+           "listener/app/my-alb/50dc6c495c0c9188/f2f7dc8efc522ab2")
+    assert listener_backup_name(arn) == "my-alb-f2f7dc8efc522ab2.json"
+    assert listener_backup_name(arn, "yaml") == "my-alb-f2f7dc8efc522ab2.yaml"
+
+def test_backup_alb_rules_many(elbv2_client, mock_alb_listener, tmp_path):
+    """Test fleet backup writes one file per listener and a manifest."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    missing_arn = listener_arn[:-4] + "dead"
+
+    manifest = backup_alb_rules_many([listener_arn, missing_arn], output_dir=str(tmp_path),
+                                     max_workers=2)
+
+    assert manifest["listener_count"] == 2
+    assert manifest["succeeded"] == 1
+    assert manifest["failed"] == 1
+
+    entries = {entry["listener_arn"]: entry for entry in manifest["backups"]}
+    assert entries[missing_arn]["status"] == "failed"
+    local_path = entries[listener_arn]["local_path"]
+    with open(local_path) as f:
+        assert len(json.load(f)) == 3
+
+    with open(manifest["manifest_path"]) as f:
+        stored = json.load(f)
+    assert stored["backups"][0]["local_path"] == local_path
+    assert os.path.dirname(manifest["manifest_path"]) == str(tmp_path)
+
+def test_backup_alb_rules_many_keeps_earlier_runs(elbv2_client, mock_alb_listener, tmp_path):
+    """Test each run writes its backups to its own timestamped directory."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    now = [datetime(2025, 3, 18, 10, 0, 0)]
+
+    class _Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now[0]
+
+    with patch("alb_rules_tool.fleet.datetime", _Clock):
+        first = backup_alb_rules_many([listener_arn], output_dir=str(tmp_path))
+        now[0] = datetime(2025, 3, 18, 11, 0, 0)
+        second = backup_alb_rules_many([listener_arn], output_dir=str(tmp_path))
+
+    first_path = first["backups"][0]["local_path"]
+    second_path = second["backups"][0]["local_path"]
+    assert os.path.dirname(first_path) == str(tmp_path / "2025-03-18-10-00-00")
+    assert os.path.dirname(second_path) == str(tmp_path / "2025-03-18-11-00-00")
+    assert os.path.exists(first_path) and os.path.exists(second_path)
+
+def test_backup_alb_rules_many_retries_throttling(tmp_path):
+    """Test throttled listener backups are retried."""
+    calls = []
+
+    def flaky_backup(listener_arn, **kwargs):
+        calls.append(listener_arn)
+        if len(calls) == 1:
+            raise _throttling_error()
+        return {"local_path": kwargs["output_path"]}
+
+    with patch("alb_rules_tool.fleet.backup_alb_rules", side_effect=flaky_backup), \
+         patch("alb_rules_tool.throttling.time.sleep"):
+        manifest = backup_alb_rules_many(
+            ["arn:aws:elasticloadbalancing:us-east-1:1:listener/app/a/1/2"],
+            output_dir=str(tmp_path)
+        )
+
+    assert len(calls) == 2
+    assert manifest["succeeded"] == 1
+
+def test_backup_alb_rules_many_requires_workers(tmp_path):
+    """Test max_workers must be positive."""
+    with pytest.raises(ValueError):
+        backup_alb_rules_many([], output_dir=str(tmp_path), max_workers=0)
+
+def test_backup_alb_rules_many_skips_unchanged(elbv2_client, mock_alb_listener, s3_client,
+                                                mock_s3_bucket, tmp_path):
+    """Test a second fleet run only records unchanged listeners as still valid."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    kwargs = dict(output_dir=str(tmp_path), s3_bucket=mock_s3_bucket, s3_prefix="fleet",
+                  write_local=False, skip_unchanged=True)
+
+    first = backup_alb_rules_many([listener_arn], **kwargs)
+    assert first["unchanged"] == 0
+    s3_uri = first["backups"][0]["s3_uri"]
+
+    with patch("alb_rules_tool.backup.stream_backup_to_s3") as mock_stream:
+        second = backup_alb_rules_many([listener_arn], **kwargs)
+        assert not mock_stream.called
+
+    entry = second["backups"][0]
+    assert second["succeeded"] == 1 and second["unchanged"] == 1
+    assert entry["status"] == "unchanged"
+    assert entry["s3_uri"] == s3_uri
+    assert entry["fingerprint"] == first["backups"][0]["fingerprint"]
+    assert "verified_at" in entry
+
+    latest = s3_client.get_object(Bucket=mock_s3_bucket, Key="fleet/latest-manifest.json")
+    assert json.loads(latest["Body"].read())["unchanged"] == 1
@@ -0,0 +1,74 @@
+"""Tests for the logger module."""
+
+import sys
+import json
+import logging
+import logging.handlers
+import pytest
+
+from alb_rules_tool.logger import EventAggregator, JsonFormatter, setup_logger, stop_queue_listener
+
+@pytest.fixture
+def tool_logger():
+    """Restore the package logger configuration after a test."""
+    logger = logging.getLogger("alb_rules_tool")
+    saved = logger.handlers[:], logger.level, logger.propagate
+    yield logger
+    stop_queue_listener()
+    logger.handlers, logger.level, logger.propagate = saved
+
+def test_queue_logging_writes_json_lines(tool_logger, tmp_path):
+    """Test queued records are written by the listener thread as JSON lines."""
+    log_file = tmp_path / "tool.log"
+    setup_logger("INFO", str(log_file), log_format="json", use_queue=True)
+    assert [type(handler) for handler in tool_logger.handlers] == [logging.handlers.QueueHandler]
+
+    restore_logger = logging.getLogger("alb_rules_tool.restore")
+    restore_logger.info("Restored %s rules", 3, extra={"listener": "l-1"})
+    restore_logger.debug("Not written %s", "at INFO")
+    stop_queue_listener()
+
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["message"] == "Restored 3 rules"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "alb_rules_tool.restore"
+    assert entry["listener"] == "l-1"
+
+def test_json_formatter_includes_exceptions():
+    """Test exceptions are formatted into the JSON line."""
+    try:
+        raise ValueError("bad rule")
+    except ValueError:
+        record = logging.getLogger("test").makeRecord(
+            "test", logging.ERROR, __file__, 1, "Failed %s", ("restore",), sys.exc_info()
+        )
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Failed restore"
+    assert "ValueError: bad rule" in entry["exception"]
+
+def test_event_aggregator_counts_at_info(caplog):
+    """Test per-rule events are detailed at DEBUG and summed up at INFO once per interval."""
+    now = [0.0]
+    logger = logging.getLogger("test.events")
+    events = EventAggregator(logger, interval=5.0, clock=lambda: now[0])
+
+    with caplog.at_level(logging.INFO, logger="test.events"):
+        for index in range(10):
+            events.record("created", "Created rule %s", index)
+        now[0] = 6.0
+        events.record("deleted", "Deleted rule %s", "r1")
+        events.record("moved", "Moved %s rules", 4, count=4)
+        events.flush()
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "Rules created: 1",
+        "Rules created: 9, deleted: 1",
+        "Rules moved: 4",
+    ]
+
+    caplog.clear()
+    with caplog.at_level(logging.DEBUG, logger="test.events"):
+        events.record("created", "Created rule %s", 11)
+    assert "Created rule 11" in caplog.text
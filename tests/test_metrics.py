@@ -0,0 +1,156 @@
+"""Tests for the metrics module."""
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+
+from alb_rules_tool.backup import backup_alb_rules
+from alb_rules_tool.clients import get_client
+from alb_rules_tool.fleet import backup_alb_rules_many
+from alb_rules_tool.metrics import (
+    MetricsRecorder,
+    phase,
+    propagate,
+    recording,
+    write_textfile
+)
+from alb_rules_tool.restore import restore_alb_rules
+
+THROTTLING_BODY = (b'<ErrorResponse><Error><Type>Sender</Type><Code>Throttling</Code>'
+                   b'<Message>Rate exceeded</Message></Error>'
+                   b'<RequestId>1</RequestId></ErrorResponse>')
+
+class _RawBody:
+    """Raw HTTP body as botocore reads it from urllib3."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def stream(self, **kwargs):
+        yield self._data
+
+def test_backup_and_restore_report_metrics(elbv2_client, mock_alb_listener, tmp_path):
+    """Test backup and restore results carry their API calls and phases."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    backup_path = str(tmp_path / "backup.json")
+
+    backup = backup_alb_rules(listener_arn, output_path=backup_path)
+    metrics = backup["metrics"]
+    assert metrics["api"]["elbv2.DescribeRules"]["calls"] == 1
+    assert metrics["api"]["elbv2.DescribeRules"]["bytes_sent"] > 0
+    assert metrics["api_calls"] == 1
+    assert {"fetch", "write"} <= set(metrics["phases"])
+
+    rule_arn = next(rule["RuleArn"] for rule in elbv2_client.describe_rules(
+        ListenerArn=listener_arn)["Rules"] if rule["Priority"] == "2")
+    elbv2_client.delete_rule(RuleArn=rule_arn)
+
+    result = restore_alb_rules(listener_arn, backup_path, "incremental")
+    metrics = result["metrics"]
+    assert metrics["api"]["elbv2.CreateRule"]["calls"] == 1
+    assert {"load", "fetch", "diff", "apply"} <= set(metrics["phases"])
+
+def test_throttled_attempts_are_counted(elbv2_client, mock_alb_listener):
+    """Test retries and throttled attempts of a call are recorded once per call."""
+    client = get_client("elbv2")
+    attempts = []
+
+    def throttle_once(request, **kwargs):
+        attempts.append(request)
+        if len(attempts) == 1:
+            return AWSResponse(request.url, 400, {}, _RawBody(THROTTLING_BODY))
+        return None
+
+    client.meta.events.register_first("before-send.elastic-load-balancing-v2", throttle_once)
+    with recording() as recorder:
+        client.describe_rules(ListenerArn=mock_alb_listener["listener_arn"])
+
+    stats = recorder.summary()["api"]["elbv2.DescribeRules"]
+    assert stats["calls"] == 1
+    assert stats["retries"] == 1
+    assert stats["throttles"] == 1
+    assert stats["errors"] == 0
+
+def test_failed_calls_are_counted_as_errors(elbv2_client, mock_alb_listener):
+    """Test a call the service rejects is recorded as an error."""
+    client = get_client("elbv2")
+    bogus_arn = mock_alb_listener["rule_arns"][0].rsplit("/", 1)[0] + "/0000000000000000"
+    with recording() as recorder:
+        with pytest.raises(ClientError):
+            client.modify_rule(RuleArn=bogus_arn, Conditions=[])
+
+    stats = recorder.summary()["api"]["elbv2.ModifyRule"]
+    assert stats["calls"] == 1
+    assert stats["errors"] == 1
+
+def test_calls_raising_while_sending_are_counted_as_errors(elbv2_client, mock_alb_listener):
+    """Test a request that never got a response is recorded as an error."""
+    client = get_client("elbv2")
+
+    def fail(request, **kwargs):
+        raise RuntimeError("connection reset")
+
+    client.meta.events.register_first("before-send.elastic-load-balancing-v2", fail)
+    try:
+        with recording() as recorder:
+            with pytest.raises(RuntimeError):
+                client.describe_rules(ListenerArn=mock_alb_listener["listener_arn"])
+    finally:
+        client.meta.events.unregister("before-send.elastic-load-balancing-v2", fail)
+
+    assert recorder.summary()["api"]["elbv2.DescribeRules"]["errors"] == 1
+
+def test_phases_and_worker_threads():
+    """Test nested phases report exclusive time and propagate reaches worker threads."""
+    def work(_):
+        with phase("worker"):
+            pass
+
+    with recording() as recorder:
+        with phase("outer"):
+            with phase("inner"):
+                pass
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(propagate(work), range(3)))
+    with phase("after"):
+        pass
+
+    assert set(recorder.summary()["phases"]) == {"outer", "inner", "worker"}
+
+def test_prometheus_textfile(tmp_path):
+    """Test metrics are written in the Prometheus text format."""
+    recorder = MetricsRecorder()
+    recorder.record_call("elbv2.DescribeRules", 0.02, retries=2, throttles=1)
+    recorder.record_call("elbv2.DescribeRules", 0.3, error=True)
+    recorder.record_phase("fetch", 0.5)
+
+    path = write_textfile(recorder, str(tmp_path / "metrics" / "restore.prom"),
+                          {"command": "restore"})
+    with open(path) as f:
+        text = f.read()
+
+    assert os.listdir(tmp_path / "metrics") == ["restore.prom"]
+    assert "# TYPE alb_rules_api_calls_total counter" in text
+    labels = '{command="restore",operation="elbv2.DescribeRules"}'
+    assert f'alb_rules_api_calls_total{labels} 2' in text
+    assert f'alb_rules_api_errors_total{labels} 1' in text
+    assert f'alb_rules_api_throttles_total{labels} 1' in text
+    assert ('alb_rules_api_call_duration_seconds_bucket{command="restore",le="0.025",'
+            'operation="elbv2.DescribeRules"} 1') in text
+    assert ('alb_rules_api_call_duration_seconds_bucket{command="restore",le="+Inf",'
+            'operation="elbv2.DescribeRules"} 2') in text
+    assert 'alb_rules_phase_duration_seconds{command="restore",phase="fetch"} 0.5' in text
+    assert recorder.to_prometheus(openmetrics=True).endswith("# EOF\n")
+
+def test_fleet_manifest_metrics(elbv2_client, mock_alb_listener, tmp_path):
+    """Test fleet metrics cover every listener without bloating manifest entries."""
+    manifest = backup_alb_rules_many([mock_alb_listener["listener_arn"]], output_dir=str(tmp_path))
+
+    assert manifest["metrics"]["api"]["elbv2.DescribeRules"]["calls"] == 1
+    assert "metrics" not in manifest["backups"][0]
+    with open(manifest["manifest_path"]) as f:
+        assert "metrics" not in json.load(f)
@@ -0,0 +1,246 @@
+"""Tests for the planner module."""
+
+import json
+import pytest
+from alb_rules_tool.planner import (
+    describe_operation,
+    load_plan,
+    minimize_moves,
+    plan_full_restore,
+    plan_incremental_restore,
+    resolve_staged,
+    save_plan
+)
+
+def _rule(priority, path, target="tg-1", arn=None):
+    rule = {
+        "Priority": str(priority),
+        "Conditions": [{"Field": "path-pattern", "Values": [path]}],
+        "Actions": [{"Type": "forward", "TargetGroupArn": target}]
+    }
+    if arn:
+        rule["RuleArn"] = arn
+    return rule
+
+def _types(plan):
+    return [operation["type"] for operation in plan["operations"]]
+
+def test_plan_unchanged_rules():
+    """Test identical rule sets need no calls."""
+    existing = [{"Priority": "default"}, _rule(1, "/a", arn="r1")]
+    backup = [{"Priority": "default"}, _rule(1, "/a")]
+
+    plan = plan_incremental_restore(existing, backup)
+
+    assert plan["operations"] == []
+    assert plan["summary"]["unchanged"] == 1
+
+def test_plan_modify_instead_of_recreate():
+    """Test rules with changed actions, conditions or both are modified in place."""
+    existing = [_rule(1, "/a", arn="r1"), _rule(2, "/b", arn="r2"), _rule(3, "/c", arn="r3")]
+    backup = [_rule(1, "/a", target="tg-2"), _rule(2, "/b2"), _rule(3, "/c2", target="tg-2")]
+
+    plan = plan_incremental_restore(existing, backup)
+
+    assert _types(plan) == ["modify", "modify", "modify"]
+    actions_only, conditions_only, both = plan["operations"]
+    assert actions_only["rule_arn"] == "r1"
+    assert actions_only["actions"][0]["TargetGroupArn"] == "tg-2"
+    assert "conditions" not in actions_only
+    assert conditions_only["conditions"][0]["Values"] == ["/b2"]
+    assert "actions" not in conditions_only
+    assert both["rule_arn"] == "r3"
+    assert both["actions"][0]["TargetGroupArn"] == "tg-2"
+    assert both["conditions"][0]["Values"] == ["/c2"]
+    assert plan["summary"]["updated"] == 3
+    assert plan["summary"]["api_calls"] == 3
+    assert plan["summary"]["calls_saved"] == 3
+
+def test_plan_moves_are_batched():
+    """Test rules that only changed priority are moved in one call."""
+    existing = [_rule(1, "/a", arn="r1"), _rule(2, "/b", arn="r2")]
+    backup = [_rule(5, "/a"), _rule(6, "/b")]
+
+    plan = plan_incremental_restore(existing, backup)
+
+    assert _types(plan) == ["set_priorities"]
+    assert plan["operations"][0]["priorities"] == [
+        {"RuleArn": "r1", "Priority": 5},
+        {"RuleArn": "r2", "Priority": 6}
+    ]
+    assert plan["summary"]["moved"] == 2
+    assert plan["summary"]["calls_saved"] == 3
+
+def test_plan_swapped_rules_are_parked():
+    """Test swapping priorities goes through free priorities."""
+    existing = [_rule(1, "/a", arn="r1"), _rule(2, "/b", arn="r2")]
+    backup = [_rule(1, "/b"), _rule(2, "/a")]
+
+    plan = plan_incremental_restore(existing, backup)
+
+    assert _types(plan) == ["set_priorities", "set_priorities"]
+    parking, final = plan["operations"]
+    assert parking["parking"] is True
+    assert all(item["Priority"] > 2 for item in parking["priorities"])
+    assert sorted((item["RuleArn"], item["Priority"]) for item in final["priorities"]) == [
+        ("r1", 2), ("r2", 1)
+    ]
+
+def test_plan_only_blocking_rules_are_parked():
+    """Test rules moving to a free priority are not parked, and moves are chunked."""
+    existing = [_rule(1, "/a", arn="r1"), _rule(2, "/b", arn="r2")]
+    existing += [_rule(100 + i, f"/{i}", arn=f"m{i}") for i in range(250)]
+    backup = [_rule(1, "/b"), _rule(2, "/a")]
+    backup += [_rule(1000 + i, f"/{i}") for i in range(250)]
+
+    plan = plan_incremental_restore(existing, backup)
+
+    assert _types(plan) == ["set_priorities"] * 4
+    parking = plan["operations"][0]
+    assert parking["parking"] is True
+    assert sorted(item["RuleArn"] for item in parking["priorities"]) == ["r1", "r2"]
+    assert [len(op["priorities"]) for op in plan["operations"][1:]] == [100, 100, 52]
+    assert plan["summary"]["moved"] == 252
+
+def _final_order(existing, plan):
+    """Apply a plan's moves and creates to existing rules, returning paths by priority."""
+    priorities = {rule["RuleArn"]: int(rule["Priority"]) for rule in existing}
+    paths = {rule["RuleArn"]: rule["Conditions"][0]["Values"][0] for rule in existing}
+    for operation in plan["operations"]:
+        if operation["type"] == "set_priorities":
+            for item in operation["priorities"]:
+                priorities[item["RuleArn"]] = item["Priority"]
+        elif operation["type"] == "create":
+            arn = f"new-{operation['priority']}"
+            priorities[arn] = int(operation["rule"]["Priority"])
+            paths[arn] = operation["rule"]["Conditions"][0]["Values"][0]
+    assert len(set(priorities.values())) == len(priorities)
+    return [paths[arn] for arn in sorted(priorities, key=priorities.get)]
+
+def test_plan_minimal_moves():
+    """Test reordering a large listener moves only the rules out of order."""
+    existing = [_rule(10 * (i + 1), f"/{i}", arn=f"r{i}") for i in range(800)]
+    order = [f"/{i}" for i in range(800)]
+    # Move one rule up, another down, and insert a new rule
+    order.insert(100, order.pop(500))
+    order.insert(700, order.pop(10))
+    order.insert(300, "/new")
+    backup = [_rule(index + 1, path) for index, path in enumerate(order)]
+
+    exact = plan_incremental_restore(existing, backup)
+    plan = plan_incremental_restore(existing, backup, minimal_moves=True)
+
+    assert exact["summary"]["moved"] == 800
+    assert plan["summary"]["moved"] == 2
+    assert plan["summary"]["created"] == 1
+    assert plan["summary"]["unchanged"] == 798
+    assert _types(plan) == ["set_priorities", "create"]
+    assert _final_order(existing, plan) == order
+
+def test_minimize_moves_keeps_fixed_rules_and_makes_room():
+    """Test fixed rules keep their priority and crowded rules are moved apart."""
+    order = [
+        {"priority": 5, "backup_priority": 1, "fixed": False},
+        {"priority": 2, "backup_priority": 2, "fixed": True},
+        {"priority": 3, "backup_priority": 3, "fixed": False},
+        {"priority": None, "backup_priority": 4, "fixed": False},
+        {"priority": 4, "backup_priority": 5, "fixed": False},
+    ]
+
+    priorities = minimize_moves(order)
+
+    assert priorities[1] == 2
+    assert priorities[0] == 1
+    # Only one of the rules at 3 and 4 can stay, the created rule needs a priority between them
+    values = [priorities[index] for index in range(5)]
+    assert values == sorted(values) and len(set(values)) == 5
+    assert sum(priorities[index] == order[index]["priority"] for index in (2, 4)) == 1
+
+def test_plan_full_restore_swap():
+    """Test full restores build the backup rules below the existing ones before swapping."""
+    existing = [_rule(1, "/a", arn="r1"), _rule(2, "/b", arn="r2")]
+    backup = [_rule(1, "/x"), _rule(5, "/y")]
+
+    plan = plan_full_restore(existing, backup)
+
+    assert plan["strategy"] == "swap"
+    assert _types(plan) == [
+        "create", "create", "set_priorities", "set_priorities", "delete", "delete"
+    ]
+    staged = plan["operations"][:2]
+    assert [(op["priority"], op["final_priority"], op["rule"]["Priority"]) for op in staged] == [
+        (6, 1, "6"), (7, 5, "7")
+    ]
+    parking, shift = plan["operations"][2:4]
+    assert parking["parking"] is True
+    assert parking["priorities"] == [
+        {"RuleArn": "r1", "Priority": 8}, {"RuleArn": "r2", "Priority": 9}
+    ]
+    assert shift["staged"] is True
+    assert shift["priorities"] == [
+        {"StagedPriority": 6, "Priority": 1}, {"StagedPriority": 7, "Priority": 5}
+    ]
+    assert plan["summary"]["api_calls"] == 6
+    assert describe_operation(shift) == ["SetRulePriorities staged rule 6 -> 1, staged rule 7 -> 5"]
+
+    current = [_rule(6, "/x", arn="n1"), _rule(7, "/y", arn="n2")]
+    assert resolve_staged(shift["priorities"], current) == [
+        {"RuleArn": "n1", "Priority": 1}, {"RuleArn": "n2", "Priority": 5}
+    ]
+    with pytest.raises(ValueError):
+        resolve_staged(shift["priorities"], current[:1])
+
+def test_plan_full_restore_falls_back_near_quota():
+    """Test full restores delete first when both rule sets do not fit."""
+    existing = [_rule(1, "/a", arn="r1"), _rule(2, "/b", arn="r2")]
+    backup = [_rule(1, "/x"), _rule(5, "/y")]
+
+    plan = plan_full_restore(existing, backup, rule_headroom=1)
+    assert plan["strategy"] == "delete-first"
+    assert _types(plan) == ["delete", "delete", "create", "create"]
+
+    plan = plan_full_restore(existing, [_rule(49999, "/x")])
+    assert plan["strategy"] == "delete-first"
+
+    with pytest.raises(ValueError):
+        plan_full_restore(existing, backup, strategy="shuffle")
+
+def test_plan_deletes_before_moves_and_creates():
+    """Test deletes free priorities before rules are moved onto them."""
+    existing = [_rule(1, "/old", arn="r1"), _rule(2, "/a", arn="r2")]
+    backup = [_rule(1, "/a"), _rule(4, "/new")]
+
+    plan = plan_incremental_restore(existing, backup)
+
+    assert _types(plan) == ["delete", "set_priorities", "create"]
+    assert plan["operations"][0]["rule_arn"] == "r1"
+    assert plan["operations"][2]["priority"] == 4
+
+def test_describe_operation():
+    """Test operations are described as the API calls they make."""
+    assert describe_operation({"type": "create", "priority": 4, "rule": {}}) == [
+        "CreateRule Priority=4"
+    ]
+    assert describe_operation({"type": "replace", "rule_arn": "r3", "priority": 3, "rule": {}}) == [
+        "DeleteRule RuleArn=r3 (priority 3)",
+        "CreateRule Priority=3"
+    ]
+    modify = {"type": "modify", "rule_arn": "r1", "priority": 1, "actions": []}
+    assert describe_operation(modify) == [
+        "ModifyRule RuleArn=r1 (priority 1, actions)"
+    ]
+    with pytest.raises(ValueError):
+        describe_operation({"type": "rename"})
+
+def test_save_and_load_plan(tmp_path):
+    """Test plans survive a round trip and unknown versions are rejected."""
+    plan = plan_incremental_restore([_rule(1, "/a", arn="r1")], [_rule(2, "/a")])
+    plan["version"] = 1
+    path = save_plan(plan, str(tmp_path / "plan.json"))
+
+    assert load_plan(path) == plan
+
+    with open(path, "w") as f:
+        json.dump(dict(plan, version=99), f)
+    with pytest.raises(ValueError):
+        load_plan(path)
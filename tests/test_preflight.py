@@ -0,0 +1,103 @@
+"""Tests for the preflight module."""
+
+import json
+
+import pytest
+
+from alb_rules_tool.backup import describe_alb_rules
+from alb_rules_tool.metrics import recording
+from alb_rules_tool.preflight import (
+    PreflightError,
+    preflight_restore,
+    resolve_target_groups,
+    target_group_arns
+)
+from alb_rules_tool.restore import build_restore_plan, restore_alb_rules
+
+def _forward(target_group_arn):
+    return [{"Type": "forward", "TargetGroupArn": target_group_arn}]
+
+def _missing_arn(target_group_arn, name):
+    prefix = target_group_arn.split(":targetgroup/")[0]
+    return f"{prefix}:targetgroup/{name}/0123456789abcdef"
+
+def test_resolve_target_groups_in_batches(elbv2_client, mock_alb_listener):
+    """Test target groups are described 20 at a time and remembered."""
+    vpc_id = elbv2_client.describe_target_groups()["TargetGroups"][0]["VpcId"]
+    arns = [
+        elbv2_client.create_target_group(Name=f"tg-{index}", Protocol="HTTP", Port=80,
+                                         VpcId=vpc_id)["TargetGroups"][0]["TargetGroupArn"]
+        for index in range(43)
+    ]
+    missing = _missing_arn(arns[0], "deleted")
+
+    with recording() as recorder:
+        resolved = resolve_target_groups(arns + [missing])
+    assert resolved[missing] is None
+    assert all(resolved[arn]["TargetGroupArn"] == arn for arn in arns)
+    # 3 batches, the one with the missing ARN split in halves down to it
+    calls = recorder.summary()["api"]["elbv2.DescribeTargetGroups"]["calls"]
+    assert 3 < calls <= 3 + 2 * 5
+
+    # Described target groups are remembered
+    with recording() as recorder:
+        again = arns[:5] + [missing]
+        assert resolve_target_groups(again) == {arn: resolved[arn] for arn in again}
+    assert recorder.summary()["api_calls"] == 0
+
+    assert target_group_arns([
+        {"Type": "forward", "ForwardConfig": {"TargetGroups": [
+            {"TargetGroupArn": "a", "Weight": 1},
+            {"TargetGroupArn": "b", "Weight": 1},
+        ]}},
+        {"Type": "forward", "TargetGroupArn": "c"},
+        {"Type": "fixed-response", "FixedResponseConfig": {"StatusCode": "404"}},
+    ]) == {"a", "b", "c"}
+
+def test_restore_fails_before_any_change(elbv2_client, mock_alb_listener, tmp_path):
+    """Test a restore referencing a deleted target group changes nothing."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    missing = _missing_arn(target_group_arn, "deleted")
+    backup_rules = [
+        {"Priority": "1", "Conditions": [{"Field": "path-pattern", "Values": ["/web/*"]}],
+         "Actions": _forward(target_group_arn)},
+        {"Priority": "3", "Conditions": [{"Field": "path-pattern", "Values": ["/old/*"]}],
+         "Actions": _forward(missing)},
+        {"Priority": "4", "Conditions": [{"Field": "path-pattern",
+                                          "Values": ["/a", "/b", "/c", "/d", "/e", "/f"]}],
+         "Actions": _forward(target_group_arn)},
+    ]
+    backup_path = tmp_path / "backup.json"
+    backup_path.write_text(json.dumps(backup_rules))
+    before = describe_alb_rules(listener_arn)
+
+    with pytest.raises(PreflightError) as excinfo:
+        restore_alb_rules(listener_arn, str(backup_path), "full")
+    problems = excinfo.value.problems
+    assert len(problems) == 2
+    assert "Rule 4 has 6 condition values, the limit is 5" in problems
+    assert f"Target group {missing} of rules 3 does not exist" in problems
+
+    assert describe_alb_rules(listener_arn) == before
+
+def test_rule_quota_of_load_balancer(elbv2_client, mock_alb_listener, tmp_path):
+    """Test restores that would exceed the load balancer's rule quota are refused."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    backup_rules = [
+        {"Priority": str(priority),
+         "Conditions": [{"Field": "path-pattern", "Values": [f"/service-{priority}/*"]}],
+         "Actions": _forward(mock_alb_listener["target_group_arn"])}
+        for priority in range(1, 102)
+    ]
+    backup_path = tmp_path / "backup.json"
+    backup_path.write_text(json.dumps(backup_rules))
+
+    with pytest.raises(PreflightError, match="would have 101 rules, the limit is 100"):
+        restore_alb_rules(listener_arn, str(backup_path))
+
+    # Two rules are replaced in place, so 98 new ones fit
+    backup_path.write_text(json.dumps(backup_rules[:100]))
+    plan = build_restore_plan(listener_arn, str(backup_path))
+    assert plan["summary"]["created"] == 98
+    preflight_restore(plan)
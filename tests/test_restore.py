@@ -1,18 +1,29 @@
 """Tests for the restore module."""
 
 import os
+import gzip
 import json
 import tempfile
+import boto3
+import yaml
 from unittest.mock import patch, mock_open, MagicMock
 import pytest
+from botocore.exceptions import ClientError
 from alb_rules_tool.restore import (
     load_backup_file,
+    load_backup_from_s3,
     download_backup_from_s3,
     create_rule,
     delete_rule,
     compare_rules,
+    modify_rule,
+    set_rule_priorities,
+    build_restore_plan,
+    apply_restore_plan,
     restore_alb_rules
 )
+from alb_rules_tool.backup import backup_rules_to_file, describe_alb_rules
+from alb_rules_tool.planner import load_plan, save_plan
 
 def test_load_backup_file():
     """Test load_backup_file function."""
@@ -22,7 +33,7 @@ def test_load_backup_file():
     ]
     
     # Create temporary files
-    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as json_file:
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as json_file:
         json.dump(test_rules, json_file)
         json_path = json_file.name
     
@@ -154,7 +165,8 @@ def test_delete_rule(elbv2_client, mock_alb_listener):
     # Delete rule
     response = delete_rule(rule_arn)
     
-    # Check response
+    # Check response (ignoring the metadata boto3 attaches to every response)
+    response.pop("ResponseMetadata", None)
     assert response == {}
     
     # Check rule was deleted
@@ -205,7 +217,7 @@ def test_restore_alb_rules(elbv2_client, mock_alb_listener):
          "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]}
     ]
     
-    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
         json.dump(backup_rules, f)
         backup_file = f.name
     
@@ -215,20 +227,18 @@ def test_restore_alb_rules(elbv2_client, mock_alb_listener):
             # Test incremental restore
             result = restore_alb_rules(listener_arn, backup_file, "incremental")
             
-            # Check result
-            assert result["created"] == 1  # One new rule
+            # Check result: the backup rule is created and the rules missing
+            # from the backup are deleted
+            assert result["created"] == 1
+            assert result["deleted"] == 2
             assert result["errors"] == 0
             
-            # Check rule was created
+            # Check the listener now holds exactly the backup rules
             client = boto3.client("elbv2", region_name="us-east-1")
             rules = client.describe_rules(ListenerArn=listener_arn)
-            
-            # Should have default rule + 3 custom rules (2 original + 1 new)
-            assert len(rules["Rules"]) == 4
-            
-            # Should have the new rule with priority 5
-            priorities = [rule["Priority"] for rule in rules["Rules"]]
-            assert "5" in priorities
+            assert sorted(rule["Priority"] for rule in rules["Rules"]) == ["5", "default"]
+            new_rule = next(rule for rule in rules["Rules"] if rule["Priority"] == "5")
+            assert new_rule["Conditions"][0]["Values"] == ["/new/*"]
             
             # Test full restore
             result = restore_alb_rules(listener_arn, backup_file, "full")
@@ -251,4 +261,237 @@ def test_restore_alb_rules(elbv2_client, mock_alb_listener):
     finally:
         # Clean up
         if os.path.exists(backup_file):
-            os.remove(backup_file)
\ No newline at end of file
+            os.remove(backup_file)
+
+def test_full_restore_swaps_rules_in(elbv2_client, mock_alb_listener, tmp_path):
+    """Test full restores only switch routing once every restored rule exists."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    old_arns = set(mock_alb_listener["rule_arns"])
+    backup_rules = [
+        {"Priority": str(priority), "Conditions": [{"Field": "path-pattern", "Values": [path]}],
+         "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]}
+        for priority, path in [(1, "/new/*"), (3, "/other/*")]
+    ]
+    backup_path = tmp_path / "backup.json"
+    backup_path.write_text(json.dumps(backup_rules))
+
+    from alb_rules_tool import restore as restore_module
+    apply_operation = restore_module.apply_operation
+    first_rules = []
+
+    def checking_apply(listener, operation, created=None):
+        apply_operation(listener, operation, created)
+        rules = [rule for rule in describe_alb_rules(listener) if rule["Priority"] != "default"]
+        rules.sort(key=lambda rule: int(rule["Priority"]))
+        first_rules.append((operation["type"], rules[0]["Conditions"][0]["Values"][0]))
+
+    with patch("alb_rules_tool.restore.apply_operation", side_effect=checking_apply):
+        result = restore_alb_rules(listener_arn, str(backup_path), "full")
+
+    # The existing rules keep routing until they are parked behind the restored ones
+    assert first_rules[:2] == [("create", "/api/*"), ("create", "/api/*")]
+    assert all(path == "/new/*" for _, path in first_rules[2:])
+    assert result["strategy"] == "swap"
+    assert (result["created"], result["deleted"], result["moved"], result["errors"]) == (2, 2, 0, 0)
+    assert result["misroute_window_seconds"] >= 0
+
+    rules = [rule for rule in describe_alb_rules(listener_arn) if rule["Priority"] != "default"]
+    assert sorted((rule["Priority"], rule["Conditions"][0]["Values"][0]) for rule in rules) == [
+        ("1", "/new/*"), ("3", "/other/*")
+    ]
+    assert not old_arns & {rule["RuleArn"] for rule in rules}
+
+def test_swap_moves_staged_rules_without_describing_the_listener(elbv2_client, mock_alb_listener,
+                                                                 tmp_path):
+    """Test staged rules are moved using the ARNs returned when they were created."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    backup_rules = [
+        {"Priority": str(priority),
+         "Conditions": [{"Field": "path-pattern", "Values": [f"/p{priority}"]}],
+         "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]}
+        for priority in (1, 3)
+    ]
+    backup_path = tmp_path / "backup.json"
+    backup_path.write_text(json.dumps(backup_rules))
+    plan = build_restore_plan(listener_arn, str(backup_path), "full")
+    assert any(operation.get("staged") for operation in plan["operations"])
+
+    from alb_rules_tool import restore as restore_module
+    with patch("alb_rules_tool.restore.iter_alb_rules",
+               wraps=restore_module.iter_alb_rules) as describe:
+        result = apply_restore_plan(plan, verify=False, preflight=False)
+
+    assert not describe.called
+    assert (result["created"], result["deleted"], result["errors"]) == (2, 2, 0)
+    rules = [rule for rule in describe_alb_rules(listener_arn) if rule["Priority"] != "default"]
+    assert sorted((rule["Priority"], rule["Conditions"][0]["Values"][0]) for rule in rules) == [
+        ("1", "/p1"), ("3", "/p3")
+    ]
+
+def test_halted_swap_removes_staged_rules(elbv2_client, mock_alb_listener, tmp_path):
+    """Test a swap that fails to create a rule leaves the listener as it was."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    backup_rules = [
+        {"Priority": str(priority),
+         "Conditions": [{"Field": "path-pattern", "Values": [f"/p{priority}"]}],
+         "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]}
+        for priority in (1, 3, 5)
+    ]
+    backup_path = tmp_path / "backup.json"
+    backup_path.write_text(json.dumps(backup_rules))
+    before = describe_alb_rules(listener_arn)
+
+    from alb_rules_tool import restore as restore_module
+    apply_operation = restore_module.apply_operation
+
+    def failing_apply(listener, operation, created=None):
+        if operation["type"] == "create" and operation["final_priority"] == 5:
+            raise ClientError({"Error": {"Code": "ValidationError", "Message": "Bad rule"}},
+                              "CreateRule")
+        apply_operation(listener, operation, created)
+
+    with patch("alb_rules_tool.restore.apply_operation", side_effect=failing_apply):
+        result = restore_alb_rules(listener_arn, str(backup_path), "full")
+
+    # Parking, moving the staged rules and both deletes were never attempted
+    assert (result["created"], result["errors"], result["skipped"]) == (2, 1, 4)
+    assert result["rolled_back"] == 2
+    assert describe_alb_rules(listener_arn) == before
+
+def test_modify_rule_and_set_rule_priorities(elbv2_client, mock_alb_listener):
+    """Test modify_rule and set_rule_priorities functions."""
+    rule_arn = mock_alb_listener["rule_arns"][0]
+    
+    modify_rule(rule_arn, conditions=[{"Field": "path-pattern", "Values": ["/changed/*"]}])
+    set_rule_priorities([{"RuleArn": rule_arn, "Priority": "10"}])
+    
+    rules = elbv2_client.describe_rules(RuleArns=[rule_arn])["Rules"]
+    assert rules[0]["Conditions"][0]["Values"] == ["/changed/*"]
+    assert str(rules[0]["Priority"]) == "10"
+    
+    with pytest.raises(ValueError):
+        modify_rule(rule_arn)
+
+def test_restore_alb_rules_incremental_moves_and_modifies(elbv2_client, mock_alb_listener):
+    """Test incremental restore moves and modifies rules instead of recreating them."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    existing_arns = set(mock_alb_listener["rule_arns"])
+    forward = [{"Type": "forward", "TargetGroupArn": target_group_arn}]
+    
+    backup_rules = [
+        # Rule 1 moved to priority 7
+        {"Priority": "7", "Conditions": [{"Field": "path-pattern", "Values": ["/api/*"]}],
+         "Actions": forward},
+        # Rule 2 kept its priority but matches another host
+        {"Priority": "2", "Conditions": [{"Field": "host-header", "Values": ["www.example.com"]}],
+         "Actions": forward}
+    ]
+    
+    with patch("alb_rules_tool.restore.load_backup_file", return_value=backup_rules):
+        result = restore_alb_rules(listener_arn, "backup.json", "incremental")
+    
+    assert result["errors"] == 0
+    assert result["moved"] == 1
+    assert result["updated"] == 1
+    assert result["created"] == 0
+    assert result["deleted"] == 0
+    assert result["api_calls"] == 2
+    assert result["calls_saved"] == 2
+    
+    rules = elbv2_client.describe_rules(ListenerArn=listener_arn)["Rules"]
+    custom_rules = {str(rule["Priority"]): rule for rule in rules if rule["Priority"] != "default"}
+    
+    # Both rules kept their identity
+    assert {rule["RuleArn"] for rule in custom_rules.values()} == existing_arns
+    assert sorted(custom_rules) == ["2", "7"]
+    assert custom_rules["2"]["Conditions"][0]["Values"] == ["www.example.com"]
+
+def test_restore_plan_round_trip(elbv2_client, mock_alb_listener, tmp_path):
+    """Test a saved plan is applied later without comparing rules again."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    backup_rules = [
+        {"Priority": "1", "Conditions": [{"Field": "path-pattern", "Values": ["/api/*"]}],
+         "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]},
+        {"Priority": "9", "Conditions": [{"Field": "path-pattern", "Values": ["/new/*"]}],
+         "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]}
+    ]
+    
+    with patch("alb_rules_tool.restore.load_backup_file", return_value=backup_rules):
+        plan = build_restore_plan(listener_arn, "backup.json")
+    
+    # Planning does not change anything
+    assert len(elbv2_client.describe_rules(ListenerArn=listener_arn)["Rules"]) == 3
+    assert [op["type"] for op in plan["operations"]] == ["delete", "create"]
+    assert plan["estimate"]["api_calls"] == 2
+    assert plan["estimate"]["duration_seconds"] > 0
+    
+    plan_path = save_plan(plan, str(tmp_path / "plan.json"))
+    loaded = load_plan(plan_path)
+    
+    with patch("alb_rules_tool.restore.plan_incremental_restore") as planner_mock, \
+         patch("alb_rules_tool.restore.load_backup_file") as load_mock:
+        result = apply_restore_plan(loaded)
+        assert not planner_mock.called
+        assert not load_mock.called
+    
+    assert result["created"] == 1
+    assert result["deleted"] == 1
+    assert result["errors"] == 0
+    
+    # The listener changed since the plan was made
+    with pytest.raises(ValueError):
+        apply_restore_plan(loaded)
+
+def test_load_and_download_compressed_backups(tmp_path, s3_client, mock_s3_bucket, monkeypatch):
+    """Test compressed backups are detected and decompressed on the fly."""
+    monkeypatch.chdir(tmp_path)
+    rules = [{"Priority": "1", "Conditions": [], "Actions": []}]
+    
+    gz_path = backup_rules_to_file(rules, str(tmp_path / "rules.json.gz"))
+    assert load_backup_file(gz_path) == rules
+    
+    # Detection does not rely on the name
+    mislabeled = tmp_path / "rules.yaml"
+    mislabeled.write_bytes(gzip.compress(b"- Priority: '1'\n"))
+    assert load_backup_file(str(mislabeled)) == [{"Priority": "1"}]
+    
+    s3_client.upload_file(gz_path, mock_s3_bucket, "backups/rules.json.gz")
+    local_path = download_backup_from_s3(mock_s3_bucket, "backups/rules.json.gz", decompress=True)
+    assert local_path == "rules.json"
+    with open(local_path) as f:
+        assert json.load(f) == rules
+
+def test_restore_from_s3_uri(elbv2_client, mock_alb_listener, s3_client, mock_s3_bucket,
+                             tmp_path, monkeypatch):
+    """Test backups are restored straight from S3 without a local copy."""
+    monkeypatch.chdir(tmp_path)
+    listener_arn = mock_alb_listener["listener_arn"]
+    target_group_arn = mock_alb_listener["target_group_arn"]
+    backup_rules = [
+        {"Priority": "1", "Conditions": [{"Field": "path-pattern", "Values": ["/api/*"]}],
+         "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]},
+        {"Priority": "2", "Conditions": [{"Field": "path-pattern", "Values": ["/web/*"]}],
+         "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]},
+        {"Priority": "5", "Conditions": [{"Field": "path-pattern", "Values": ["/new/*"]}],
+         "Actions": [{"Type": "forward", "TargetGroupArn": target_group_arn}]}
+    ]
+    s3_client.put_object(Bucket=mock_s3_bucket, Key="backups/rules.yaml.gz",
+                         Body=gzip.compress(yaml.safe_dump(backup_rules).encode("utf-8")))
+    uri = f"s3://{mock_s3_bucket}/backups/rules.yaml.gz"
+    
+    assert load_backup_from_s3(mock_s3_bucket, "backups/rules.yaml.gz") == backup_rules
+    result = restore_alb_rules(listener_arn, uri, "incremental")
+    
+    assert result["created"] == 1
+    assert result["errors"] == 0
+    assert list(tmp_path.iterdir()) == []
+    
+    with pytest.raises(FileNotFoundError):
+        load_backup_file(f"s3://{mock_s3_bucket}/backups/missing.json")
+    with pytest.raises(ValueError):
+        load_backup_file(f"s3://{mock_s3_bucket}")
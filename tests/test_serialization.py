@@ -0,0 +1,82 @@
+"""Tests for the serialization module."""
+
+import io
+import gzip
+import json
+import yaml
+import pytest
+from alb_rules_tool.serialization import (
+    LIBYAML_AVAILABLE,
+    YAML_BATCH_SIZE,
+    backup_extension,
+    read_rules,
+    split_backup_path,
+    write_rules,
+    write_rules_binary
+)
+
+TEST_RULES = [
+    {"Priority": str(priority),
+     "Conditions": [{"Field": "path-pattern", "Values": [f"/p{priority}/*"]}],
+     "Actions": [{"Type": "forward", "TargetGroupArn": "arn:tg"}]}
+    for priority in range(1, 200)
+]
+
+@pytest.mark.parametrize("format_type", ["json", "yaml"])
+@pytest.mark.parametrize("compression", [None, "gzip", "zstd"])
+def test_binary_round_trip(format_type, compression):
+    """Test rules survive compression and are detected on read."""
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    
+    buffer = io.BytesIO()
+    write_rules_binary(iter(TEST_RULES), buffer, format_type, compression)
+    if compression:
+        assert len(buffer.getvalue()) < len(json.dumps(TEST_RULES)) / 4
+    
+    buffer.seek(0)
+    assert read_rules(buffer, format_type) == TEST_RULES
+
+def test_compact_json_has_no_whitespace():
+    """Test compact JSON drops indentation but stays valid."""
+    text = io.StringIO()
+    write_rules(TEST_RULES[:2], text, "json", compact=True)
+    
+    assert "\n" not in text.getvalue() and ": " not in text.getvalue()
+    assert json.loads(text.getvalue()) == TEST_RULES[:2]
+
+def test_gzip_output_is_deterministic_and_standard():
+    """Test gzip backups are plain gzip files with a stable byte content."""
+    first, second = io.BytesIO(), io.BytesIO()
+    write_rules_binary(TEST_RULES, first, "json", "gzip")
+    write_rules_binary(TEST_RULES, second, "json", "gzip")
+    
+    assert first.getvalue() == second.getvalue()
+    assert json.loads(gzip.decompress(first.getvalue())) == TEST_RULES
+
+def test_backup_names():
+    """Test extensions map to formats and compression codecs."""
+    assert backup_extension("json", "gzip") == "json.gz"
+    assert backup_extension("yaml", "zstd") == "yaml.zst"
+    assert backup_extension("yaml") == "yaml"
+    assert split_backup_path("backups/rules.json.gz") == ("json", "gzip")
+    assert split_backup_path("rules.YML.zst") == ("yaml", "zstd")
+    assert split_backup_path("rules.yaml") == ("yaml", None)
+    assert split_backup_path("rules.txt.gz") == (None, "gzip")
+    
+    with pytest.raises(ValueError):
+        backup_extension("json", "bzip2")
+
+def test_libyaml_output_matches_pure_python():
+    """Test the libyaml fast path writes the same YAML as the Python emitter."""
+    if not LIBYAML_AVAILABLE:
+        pytest.skip("PyYAML built without libyaml")
+    
+    fast = io.StringIO()
+    write_rules(TEST_RULES, fast, "yaml")
+    
+    assert fast.getvalue() == "".join(
+        yaml.dump(TEST_RULES[start:start + YAML_BATCH_SIZE], Dumper=yaml.SafeDumper)
+        for start in range(0, len(TEST_RULES), YAML_BATCH_SIZE)
+    )
+    assert yaml.safe_load(fast.getvalue()) == TEST_RULES
@@ -0,0 +1,131 @@
+"""Tests for the simulate module."""
+
+import re
+import json
+import random
+
+from click.testing import CliRunner
+
+from alb_rules_tool.backup import backup_rules_to_file
+from alb_rules_tool.cli import cli
+from alb_rules_tool.simulate import _GlobTable, compile_rules, parse_request_line, simulate
+
+def _rule(priority, *conditions):
+    return {"Priority": priority, "Conditions": list(conditions),
+            "Actions": [{"Type": "fixed-response", "FixedResponseConfig": {"StatusCode": "200"}}]}
+
+RULES = [
+    _rule("default"),
+    _rule("30", {"Field": "path-pattern", "Values": ["/api/*"]}),
+    _rule("10", {"Field": "host-header", "HostHeaderConfig": {"Values": ["*.admin.example.com"]}},
+          {"Field": "http-request-method", "HttpRequestMethodConfig": {"Values": ["POST", "PUT"]}}),
+    _rule("20", {"Field": "path-pattern", "PathPatternConfig": {"Values": ["/api/v?/users*"]}},
+          {"Field": "http-header", "HttpHeaderConfig": {"HttpHeaderName": "User-Agent",
+                                                        "Values": ["*Mobile*"]}}),
+    _rule("5", {"Field": "query-string", "QueryStringConfig": {"Values": [
+        {"Key": "debug", "Value": "true"}, {"Value": "canary"}
+    ]}}),
+    _rule("40", {"Field": "source-ip",
+                 "SourceIpConfig": {"Values": ["10.0.0.0/8", "192.168.1.7/32"]}},
+          {"Field": "host-header", "Values": ["example.com"]}),
+]
+
+def _request(path="/", host="example.com", method="GET", query=(), headers=None, source_ip=None):
+    return {"method": method, "host": host, "path": path, "query": list(query),
+            "headers": headers or {}, "source_ip": source_ip}
+
+def test_match_in_priority_order():
+    """Test requests hit the lowest priority rule whose conditions all match."""
+    matcher = compile_rules(RULES)
+
+    assert matcher.match(_request("/api/orders")) == "30"
+    assert matcher.match(_request("/api/v2/users/1")) == "30"
+    mobile = {"user-agent": "Foo mobile/1"}
+    assert matcher.match(_request("/api/v2/users/1", headers=mobile)) == "20"
+    assert matcher.match(_request("/", host="a.b.ADMIN.example.com", method="post")) == "10"
+    assert matcher.match(_request("/", host="admin.example.com", method="POST")) == "default"
+    assert matcher.match(_request("/api/x", query=[("DEBUG", "True")])) == "5"
+    assert matcher.match(_request("/api/x", query=[("release", "canary")])) == "5"
+    assert matcher.match(_request("/", source_ip="10.2.3.4")) == "40"
+    assert matcher.match(_request("/", host="other.com", source_ip="10.2.3.4")) == "default"
+    assert matcher.match(_request("/", source_ip="192.168.1.8")) == "default"
+    assert compile_rules(RULES[1:]).match(_request("/")) is None
+
+def test_wildcards_match_like_regular_expressions():
+    """Test the wildcard automaton agrees with an equivalent regular expression."""
+    rng = random.Random(7)
+    patterns = ["".join(rng.choice("ab*?") for _ in range(rng.randint(1, 6))) for _ in range(40)]
+    table = _GlobTable()
+    for index, pattern in enumerate(patterns):
+        table.add(pattern, index)
+    expressions = [re.compile(re.escape(pattern).replace(r"\*", ".*").replace(r"\?", ".") + r"\Z")
+                   for pattern in patterns]
+
+    for _ in range(500):
+        value = "".join(rng.choice("abc") for _ in range(rng.randint(0, 8)))
+        expected = {index for index, expression in enumerate(expressions)
+                    if expression.match(value)}
+        assert set(table.match(value)) == expected
+
+def _log_line(url, user_agent="curl/8.0", client="10.0.0.1", method="GET"):
+    return (f'https 2025-03-18T10:00:00.000000Z app/my-lb/1234 {client}:4242 10.0.1.5:80 '
+            f'0.001 0.002 0.000 200 200 34 366 "{method} {url} HTTP/1.1" "{user_agent}" '
+            f'ECDHE-RSA-AES128-GCM-SHA256 TLSv1.2 '
+            f'arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/tg/1 '
+            f'"Root=1-abc" "example.com" "-" 30 2025-03-18T10:00:00.000000Z "forward" "-" "-" '
+            f'"10.0.1.5:80" "200" "-" "-"')
+
+def test_parse_request_lines():
+    """Test access log entries and JSON requests are parsed."""
+    request = parse_request_line(_log_line("https://Example.com:443/api/a?x=1&y=",
+                                           "Mozilla/5.0 (Mobile)"))
+    assert request == {
+        "method": "GET", "host": "example.com", "path": "/api/a", "query": [("x", "1"), ("y", "")],
+        "headers": {"user-agent": "Mozilla/5.0 (Mobile)"}, "source_ip": "10.0.0.1",
+    }
+    request = parse_request_line(json.dumps({"url": "http://example.com/p?q=1", "method": "PUT",
+                                             "headers": {"X-Env": "canary"}}))
+    assert request["path"] == "/p" and request["query"] == [("q", "1")]
+    assert request["headers"] == {"x-env": "canary"}
+    assert parse_request_line("") is None
+    assert parse_request_line("not a log entry") is None
+
+def test_simulate_across_processes(tmp_path):
+    """Test batches matched by worker processes are reported in order."""
+    urls = ["https://example.com:443/api/orders", "https://example.com:443/",
+            "https://example.com:443/api/v1/users?debug=true"]
+    lines = [_log_line(urls[index % 3]) for index in range(300)] + ["garbage"]
+
+    single = tmp_path / "single.tsv"
+    with open(single, "w") as f:
+        result = simulate(RULES, lines, processes=1, chunk_size=64, output=f)
+    assert result == {
+        "lines": 301, "requests": 300, "unmatched": 0,
+        "hits": {"5": 100, "10": 0, "20": 0, "30": 100, "40": 100, "default": 0},
+    }
+
+    parallel = tmp_path / "parallel.tsv"
+    with open(parallel, "w") as f:
+        assert simulate(RULES, lines, processes=2, chunk_size=64, output=f) == result
+    assert parallel.read_text() == single.read_text()
+    assert single.read_text().splitlines()[:3] == ["1\t30", "2\t40", "3\t5"]
+
+def test_simulate_command(tmp_path):
+    """Test the simulate command reports the hits of a backup's rules."""
+    backup_path = backup_rules_to_file(RULES, str(tmp_path / "rules.json"))
+    requests_path = tmp_path / "requests.jsonl"
+    requests_path.write_text("\n".join(json.dumps(record) for record in [
+        {"host": "example.com", "path": "/api/a"},
+        {"host": "example.com", "path": "/api/b"},
+        {"host": "x.admin.example.com", "path": "/", "method": "POST"},
+    ]))
+
+    result = CliRunner().invoke(cli, ["simulate", str(requests_path), "--backup-file", backup_path,
+                                      "--processes", "1"])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert "Requests: 3 (0 lines skipped)" in lines
+    assert ["30", "2", "66.67%"] in [line.split() for line in lines]
+
+    result = CliRunner().invoke(cli, ["simulate", str(requests_path)])
+    assert result.exit_code != 0
@@ -0,0 +1,93 @@
+"""Tests for the store module."""
+
+import os
+import json
+from alb_rules_tool.backup import backup_alb_rules
+from alb_rules_tool.restore import load_backup_file
+from alb_rules_tool.store import (
+    LocalStore,
+    S3Store,
+    latest_snapshot,
+    listener_slug,
+    open_store,
+    rebuild_snapshot,
+    save_snapshot
+)
+
+LISTENER_A = "arn:aws:elasticloadbalancing:us-east-1:123456789012:listener/app/alb-a/1111/aaaa"
+LISTENER_B = "arn:aws:elasticloadbalancing:us-east-1:123456789012:listener/app/alb-b/2222/bbbb"
+
+def _rule(priority, path):
+    return {
+        "RuleArn": f"arn:rule/{priority}",
+        "Priority": str(priority),
+        "IsDefault": False,
+        "Conditions": [{"Field": "path-pattern", "Values": [path]}],
+        "Actions": [{"Type": "forward", "TargetGroupArn": "arn:tg"}]
+    }
+
+def test_snapshots_share_rule_objects(tmp_path):
+    """Test identical rules are stored once across listeners and snapshots."""
+    store = LocalStore(str(tmp_path / "store"))
+    shared = [_rule(priority, f"/shared{priority}") for priority in range(1, 51)]
+    
+    first = save_snapshot(shared, store, LISTENER_A)
+    assert first["new_objects"] == 50
+    
+    # Same bodies at other priorities, plus one new rule
+    moved = [_rule(priority + 100, f"/shared{priority}") for priority in range(1, 51)]
+    second = save_snapshot(moved + [_rule(500, "/only-b")], LocalStore(store.root), LISTENER_B)
+    assert second["new_objects"] == 1
+    
+    objects = [name for _, _, names in os.walk(os.path.join(store.root, "objects"))
+               for name in names]
+    assert len(objects) == 51
+    
+    rules = load_backup_file(second["snapshot"])
+    assert [rule["Priority"] for rule in rules][-1] == "500"
+    assert rules[0]["Conditions"] == [{"Field": "path-pattern", "Values": ["/shared1"]}]
+    assert "RuleArn" not in rules[0]
+
+def test_rebuild_snapshot_uses_cache(tmp_path):
+    """Test rule bodies are fetched once and then served from the cache."""
+    store = LocalStore(str(tmp_path / "store"))
+    saved = save_snapshot([_rule(1, "/a"), _rule(2, "/b")], store, LISTENER_A)
+    snapshot = latest_snapshot(store, LISTENER_A)
+    assert snapshot["fingerprint"] == saved["fingerprint"]
+    
+    cache_dir = str(tmp_path / "cache")
+    expected = rebuild_snapshot(snapshot, cache_dir=cache_dir)
+    
+    # The cache alone is enough once populated
+    empty = LocalStore(str(tmp_path / "empty"))
+    assert rebuild_snapshot(snapshot, store=empty, cache_dir=cache_dir) == expected
+
+def test_s3_store_round_trip(s3_client, mock_s3_bucket):
+    """Test snapshots in S3 are rebuilt from the objects under the prefix."""
+    store = open_store(f"s3://{mock_s3_bucket}/snapshots-root")
+    assert isinstance(store, S3Store)
+    
+    saved = save_snapshot([_rule(1, "/a"), _rule(2, "/a")], store, LISTENER_A)
+    assert saved["new_objects"] == 1
+    
+    keys = [item["Key"] for item in s3_client.list_objects_v2(Bucket=mock_s3_bucket)["Contents"]]
+    assert sum(1 for key in keys if "/objects/" in key) == 1
+    assert any(f"/snapshots/{listener_slug(LISTENER_A)}/" in key for key in keys)
+    
+    rules = rebuild_snapshot(latest_snapshot(store, LISTENER_A))
+    assert [rule["Priority"] for rule in rules] == ["1", "2"]
+
+def test_backup_alb_rules_to_store(elbv2_client, mock_alb_listener, tmp_path):
+    """Test listener backups can go to the store and skip unchanged rule sets."""
+    listener_arn = mock_alb_listener["listener_arn"]
+    store_dir = str(tmp_path / "store")
+    
+    first = backup_alb_rules(listener_arn, store=store_dir, skip_unchanged=True)
+    assert first["unchanged"] is False and first["rules"] == 3
+    
+    second = backup_alb_rules(listener_arn, store=store_dir, skip_unchanged=True)
+    assert second.pop("metrics")["api"]["elbv2.DescribeRules"]["calls"] == 1
+    assert second == {"fingerprint": first["fingerprint"], "unchanged": True}
+    
+    with open(first["snapshot"]) as f:
+        assert json.load(f)["listener_arn"] == listener_arn
@@ -0,0 +1,87 @@
+"""Tests for the streams module."""
+
+import gc
+from unittest.mock import MagicMock, patch
+import pytest
+from alb_rules_tool.backup import stream_backup_to_s3
+from alb_rules_tool.streams import S3MultipartWriter
+
+def test_small_object_uses_put_object(s3_client, mock_s3_bucket):
+    """Test an object smaller than one part is sent with a single put_object."""
+    with S3MultipartWriter(s3_client, mock_s3_bucket, "small.json") as writer:
+        writer.write(b'{"rules": ')
+        writer.write(b'[]}')
+    
+    body = s3_client.get_object(Bucket=mock_s3_bucket, Key="small.json")["Body"].read()
+    assert body == b'{"rules": []}'
+    assert writer.s3_uri == f"s3://{mock_s3_bucket}/small.json"
+
+def test_large_object_uses_multipart_upload():
+    """Test full parts are uploaded as they fill and completed on close."""
+    client = MagicMock()
+    client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    client.upload_part.side_effect = lambda **kwargs: {"ETag": f"etag-{kwargs['PartNumber']}"}
+    
+    writer = S3MultipartWriter(client, "bucket", "big.json", part_size=4)
+    writer.write(b"abcdef")
+    assert client.upload_part.call_count == 1
+    writer.write(b"ghij")
+    writer.close()
+    
+    bodies = [call.kwargs["Body"] for call in client.upload_part.call_args_list]
+    assert bodies == [b"abcd", b"efgh", b"ij"]
+    client.complete_multipart_upload.assert_called_once_with(
+        Bucket="bucket",
+        Key="big.json",
+        UploadId="upload-1",
+        MultipartUpload={"Parts": [
+            {"ETag": "etag-1", "PartNumber": 1},
+            {"ETag": "etag-2", "PartNumber": 2},
+            {"ETag": "etag-3", "PartNumber": 3},
+        ]}
+    )
+    client.put_object.assert_not_called()
+
+def test_error_aborts_multipart_upload():
+    """Test an exception inside the with block aborts the upload."""
+    client = MagicMock()
+    client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    client.upload_part.return_value = {"ETag": "etag"}
+    
+    with pytest.raises(RuntimeError):
+        with S3MultipartWriter(client, "bucket", "big.json", part_size=4) as writer:
+            writer.write(b"abcdefgh")
+            raise RuntimeError("describe failed")
+    
+    client.abort_multipart_upload.assert_called_once_with(
+        Bucket="bucket", Key="big.json", UploadId="upload-1"
+    )
+    client.complete_multipart_upload.assert_not_called()
+    client.put_object.assert_not_called()
+
+def test_unclosed_writer_is_aborted_when_collected():
+    """Test a writer dropped without close() does not store its truncated body."""
+    client = MagicMock()
+    writer = S3MultipartWriter(client, "bucket", "backup.json")
+    writer.write(b'[{"partial"')
+    del writer
+    gc.collect()
+
+    client.put_object.assert_not_called()
+    client.complete_multipart_upload.assert_not_called()
+
+def test_interrupted_stream_is_aborted():
+    """Test a KeyboardInterrupt while streaming a backup aborts the upload."""
+    client = MagicMock()
+
+    def rules():
+        yield {"Priority": "1", "Actions": [], "Conditions": []}
+        raise KeyboardInterrupt
+
+    with patch("alb_rules_tool.backup.get_client", return_value=client), \
+         pytest.raises(KeyboardInterrupt):
+        stream_backup_to_s3(rules(), "bucket", "backup.json")
+    gc.collect()
+
+    client.put_object.assert_not_called()
+    client.complete_multipart_upload.assert_not_called()
@@ -0,0 +1,58 @@
+"""Tests for the throttling module."""
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+from alb_rules_tool.throttling import (
+    AdaptiveConcurrencyLimiter,
+    is_throttling_error,
+    is_transient_error,
+    retry_delay,
+)
+
+def _client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": "error"}}, "DescribeRules")
+
+def test_is_throttling_error():
+    """Test throttling errors are told apart from other failures."""
+    assert is_throttling_error(_client_error("Throttling"))
+    assert is_throttling_error(_client_error("SlowDown"))
+    assert not is_throttling_error(_client_error("RuleNotFound"))
+    assert not is_throttling_error(ValueError("Throttling"))
+
+def test_is_transient_error():
+    """Test server and connection errors are retried like botocore would."""
+    unavailable = ClientError({"Error": {"Code": "503", "Message": "Service Unavailable"},
+                               "ResponseMetadata": {"HTTPStatusCode": 503}}, "CreateRule")
+    assert is_transient_error(unavailable)
+    assert is_transient_error(_client_error("InternalError"))
+    assert is_transient_error(EndpointConnectionError(endpoint_url="https://elb"))
+    assert is_transient_error(ReadTimeoutError(endpoint_url="https://elb"))
+    assert not is_transient_error(_client_error("Throttling"))
+    assert not is_transient_error(_client_error("PriorityInUse"))
+
+    assert retry_delay(unavailable, 0, 3) is not None
+    assert retry_delay(unavailable, 3, 3) is None
+    assert retry_delay(_client_error("PriorityInUse"), 0, 3) is None
+
+def test_adaptive_concurrency_limiter():
+    """Test the limit halves on throttling and recovers after successes."""
+    limiter = AdaptiveConcurrencyLimiter(8, increase_after=2)
+
+    with pytest.raises(ClientError):
+        with limiter.slot():
+            raise _client_error("Throttling")
+    assert limiter.limit == 4
+
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("not throttled")
+    assert limiter.limit == 4
+
+    with limiter.slot():
+        pass
+    assert limiter.limit == 5
+
+    for _ in range(10):
+        limiter.acquire()
+        limiter.release(throttled=True)
+    assert limiter.limit == 1